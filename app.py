@@ -1,12 +1,22 @@
 from app import create_app, socketio
-from flask import send_from_directory, render_template, make_response
+from flask import send_from_directory, render_template, make_response, session
 from flask_socketio import join_room
 from flask_jwt_extended import decode_token
 from app.models import Usuario
+from app.services.pendencias_service import iniciar_reconciliador_pendencias
+from app.services.notificacoes_nao_lidas import iniciar_reconciliador_nao_lidas
+from app.services.cotacoes_metais import iniciar_atualizador_cotacoes
+from app.services.scanner_lotes import iniciar_recuperador_lotes
+from app.services.importacao_arquivos import iniciar_recuperador_importacoes
 import os
 
 application = create_app()
 app = application
+iniciar_reconciliador_pendencias(app)
+iniciar_reconciliador_nao_lidas(app)
+iniciar_atualizador_cotacoes(app)
+iniciar_recuperador_lotes(app)
+iniciar_recuperador_importacoes(app)
 app.config['SCANNER_URL'] = os.environ.get('SCANNER_URL', 'https://scanv1-production.up.railway.app/')
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -90,8 +100,9 @@ def handle_connect(auth):
         if usuario:
             if usuario.tipo == 'admin':
                 join_room('admins')
-            else:
-                join_room(f'user_{usuario_id}')
+            join_room(f'user_{usuario_id}')
+            # Usado pelos eventos da conexão (ex.: entrar_fila)
+            session['usuario_id'] = usuario.id
             print(f'Usuário {usuario.nome} conectado via WebSocket e entrou na sala')
             return True
     except Exception as e:
@@ -19,6 +19,39 @@ def create_app():
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', os.getenv('SESSION_SECRET', 'jwt-secret-key'))
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
+    # Decorators de app/auth.py autorizam só pelos claims do JWT, sem consultar o usuário
+    app.config['AUTORIZACAO_POR_CLAIMS'] = os.getenv('AUTORIZACAO_POR_CLAIMS', 'false').lower() == 'true'
+    # Notificações gravadas e emitidas por uma tarefa de fundo depois do commit (ver notificacao_dispatcher)
+    app.config['NOTIFICACOES_ASSINCRONAS'] = os.getenv('NOTIFICACOES_ASSINCRONAS', 'true').lower() == 'true'
+    # Intervalo do reconciliador dos contadores de pendências (ver pendencias_service); 0 desliga
+    app.config['RECONCILIAR_PENDENCIAS_SEGUNDOS'] = int(os.getenv('RECONCILIAR_PENDENCIAS_SEGUNDOS', '300'))
+    # Intervalo do reconciliador dos contadores de notificações não lidas (ver notificacoes_nao_lidas); 0 desliga
+    app.config['RECONCILIAR_NAO_LIDAS_SEGUNDOS'] = int(os.getenv('RECONCILIAR_NAO_LIDAS_SEGUNDOS', '600'))
+    # Processos do pool de análise em lote do scanner (ver scanner_lotes); vazio = automático, 0 = sem pool
+    app.config['SCANNER_PROCESSOS'] = os.getenv('SCANNER_PROCESSOS')
+    # Cache de resultados do scanner para fotos iguais ou da mesma placa (ver scanner_cache); tamanho 0 desliga
+    app.config['SCANNER_CACHE_TAMANHO'] = int(os.getenv('SCANNER_CACHE_TAMANHO', '1024'))
+    app.config['SCANNER_CACHE_TTL_SEGUNDOS'] = int(os.getenv('SCANNER_CACHE_TTL_SEGUNDOS', str(7 * 24 * 3600)))
+    # Bits diferentes (de 64) aceitos entre os pHashes de duas fotos da mesma placa; -1 só aceita a foto idêntica
+    app.config['SCANNER_CACHE_LIMIAR'] = int(os.getenv('SCANNER_CACHE_LIMIAR', '6'))
+    # Explicações da Perplexity por faixa de resultado (ver scanner_explicacoes): validade e espera máxima por uma nova
+    app.config['SCANNER_EXPLICACAO_TTL_SEGUNDOS'] = int(os.getenv('SCANNER_EXPLICACAO_TTL_SEGUNDOS', str(30 * 24 * 3600)))
+    app.config['SCANNER_EXPLICACAO_ORCAMENTO_MS'] = int(os.getenv('SCANNER_EXPLICACAO_ORCAMENTO_MS', '1000'))
+    # Validade das URLs assinadas das fotos do scanner (image_url/thumbnail_url, ver scanner_imagens)
+    app.config['SCANNER_URL_VALIDADE_SEGUNDOS'] = int(os.getenv('SCANNER_URL_VALIDADE_SEGUNDOS', '3600'))
+    # Importação sem sinal de vida por mais que isso é retomada por outro processo (ver importacao_arquivos); 0 desliga
+    app.config['IMPORTACAO_EXPIRACAO_SEGUNDOS'] = int(os.getenv('IMPORTACAO_EXPIRACAO_SEGUNDOS', '600'))
+    # Lote do scanner sem sinal de vida por mais que isso é retomado por outro processo (ver scanner_lotes); 0 desliga
+    app.config['SCANNER_LOTE_EXPIRACAO_SEGUNDOS'] = int(os.getenv('SCANNER_LOTE_EXPIRACAO_SEGUNDOS', '600'))
+    # Cache compartilhado entre workers (ver app/utils/cache_compartilhado): 'redis', 'banco' ou 'memoria'; vazio = redis com REDIS_URL, senão banco
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL')
+    app.config['CACHE_COMPARTILHADO_BACKEND'] = os.getenv('CACHE_COMPARTILHADO_BACKEND')
+    # Cotações de metais (ver cotacoes_metais): intervalo do laço de atualização (0 desliga) e prazo total das APIs
+    app.config['COTACOES_METAIS_SEGUNDOS'] = int(os.getenv('COTACOES_METAIS_SEGUNDOS', '30'))
+    app.config['COTACOES_METAIS_PRAZO_SEGUNDOS'] = float(os.getenv('COTACOES_METAIS_PRAZO_SEGUNDOS', '4'))
+    # Dias guardados do histórico de cotações por minuto e por hora (ver historico_metais); por dia fica tudo
+    app.config['COTACOES_HISTORICO_MINUTOS_DIAS'] = int(os.getenv('COTACOES_HISTORICO_MINUTOS_DIAS', '2'))
+    app.config['COTACOES_HISTORICO_HORAS_DIAS'] = int(os.getenv('COTACOES_HISTORICO_HORAS_DIAS', '365'))
 
     database_url = os.getenv('DATABASE_URL')
     # Forçar URL do Railway explicitamente
@@ -33,9 +66,24 @@ def create_app():
     app.config['UPLOAD_FOLDER'] = 'uploads'
 
     db.init_app(app)
+    from app.services.dashboard_service import registrar_eventos_resumo_mensal
+    registrar_eventos_resumo_mensal()
+    from app.services.notificacao_dispatcher import registrar_eventos_notificacao
+    registrar_eventos_notificacao()
+    from app.services.pendencias_service import registrar_eventos_pendencias
+    registrar_eventos_pendencias()
+    from app.services.notificacoes_nao_lidas import registrar_eventos_nao_lidas
+    registrar_eventos_nao_lidas()
+    from app.services.filas_tempo_real import registrar_eventos_filas
+    registrar_eventos_filas()
     CORS(app)
     jwt = JWTManager(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    # Com um message queue (Redis) os emits chegam a clientes conectados em qualquer worker
+    socketio.init_app(
+        app,
+        cors_allowed_origins="*",
+        message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or os.getenv('REDIS_URL')
+    )
 
     from flask import jsonify
 
@@ -75,7 +123,7 @@ def create_app():
                                 ordens_servico, conferencias, estoque, separacao, wms, pages,
                                 materiais_base, tabelas_preco, autorizacoes_preco, compras,
                                 fornecedor_tabela_precos, metais, conquistas, assistente, scanner, rh, visitas,
-                                producao, estoque_ativo)
+                                producao, estoque_ativo, importacoes, filas)
         from app.routes import solicitacoes_new as solicitacoes
         from app.routes import lotes_new as lotes
         from app.routes import entradas_new as entradas
@@ -117,6 +165,8 @@ def create_app():
         app.register_blueprint(visitas.bp)
         app.register_blueprint(producao.bp)
         app.register_blueprint(estoque_ativo.bp)
+        app.register_blueprint(importacoes.bp)
+        app.register_blueprint(filas.bp)
 
         def run_hr_migration():
             try:
@@ -179,6 +229,189 @@ def create_app():
                 print(f"Producao migration check: {e}")
         
         run_producao_migration()
+
+        def run_fornecedor_endereco_migration():
+            try:
+                from sqlalchemy import text
+                columns_to_add = [
+                    ("rua_normalizada", "VARCHAR(200)"),
+                    ("numero_normalizado", "VARCHAR(20)"),
+                    ("cidade_normalizada", "VARCHAR(100)"),
+                    ("estado_normalizado", "VARCHAR(2)"),
+                    ("cep_normalizado", "VARCHAR(10)")
+                ]
+                
+                with db.engine.connect() as conn:
+                    result = conn.execute(text("""
+                        SELECT table_name FROM information_schema.tables 
+                        WHERE table_name = 'fornecedores'
+                    """))
+                    
+                    if result.fetchone() is not None:
+                        adicionadas = False
+                        for column_name, column_type in columns_to_add:
+                            result = conn.execute(text(f"""
+                                SELECT column_name 
+                                FROM information_schema.columns 
+                                WHERE table_name = 'fornecedores' AND column_name = '{column_name}'
+                            """))
+                            
+                            if result.fetchone() is None:
+                                conn.execute(text(f"ALTER TABLE fornecedores ADD COLUMN {column_name} {column_type}"))
+                                adicionadas = True
+                                print(f"✓ Added column fornecedores.{column_name}")
+                        
+                        if adicionadas:
+                            conn.execute(text("""
+                                UPDATE fornecedores SET
+                                    rua_normalizada = LOWER(TRIM(COALESCE(rua, ''))),
+                                    numero_normalizado = TRIM(COALESCE(numero, '')),
+                                    cidade_normalizada = LOWER(TRIM(COALESCE(cidade, ''))),
+                                    estado_normalizado = UPPER(TRIM(COALESCE(estado, ''))),
+                                    cep_normalizado = NULLIF(REGEXP_REPLACE(COALESCE(cep, ''), '[^0-9]', '', 'g'), '')
+                            """))
+                            conn.execute(text("""
+                                CREATE INDEX IF NOT EXISTS idx_fornecedor_endereco_normalizado
+                                ON fornecedores(rua_normalizada, numero_normalizado, cidade_normalizada, estado_normalizado)
+                            """))
+                            conn.execute(text("""
+                                CREATE INDEX IF NOT EXISTS idx_fornecedor_cep_numero
+                                ON fornecedores(cep_normalizado, numero_normalizado)
+                            """))
+                            print("✓ Backfill de endereços normalizados de fornecedores concluído")
+                        conn.commit()
+            except Exception as e:
+                print(f"Fornecedor endereco migration check: {e}")
+        
+        run_fornecedor_endereco_migration()
+
+        def run_fornecedor_busca_migration():
+            # Coluna e índice de documento primeiro, em transação própria: o pg_trgm pode
+            # falhar (papel sem permissão para CREATE EXTENSION) sem desfazer a coluna mapeada
+            try:
+                from sqlalchemy import text
+                with db.engine.connect() as conn:
+                    result = conn.execute(text("""
+                        SELECT table_name FROM information_schema.tables 
+                        WHERE table_name = 'fornecedores'
+                    """))
+                    if result.fetchone() is None:
+                        return
+                    
+                    result = conn.execute(text("""
+                        SELECT column_name 
+                        FROM information_schema.columns 
+                        WHERE table_name = 'fornecedores' AND column_name = 'documento_digitos'
+                    """))
+                    if result.fetchone() is None:
+                        conn.execute(text("ALTER TABLE fornecedores ADD COLUMN documento_digitos VARCHAR(14)"))
+                        conn.execute(text("""
+                            UPDATE fornecedores SET documento_digitos = COALESCE(
+                                NULLIF(REGEXP_REPLACE(COALESCE(cnpj, ''), '[^0-9]', '', 'g'), ''),
+                                NULLIF(REGEXP_REPLACE(COALESCE(cpf, ''), '[^0-9]', '', 'g'), '')
+                            )
+                        """))
+                        print("✓ Added column fornecedores.documento_digitos")
+                    
+                    conn.execute(text("""
+                        CREATE INDEX IF NOT EXISTS idx_fornecedor_documento_digitos
+                        ON fornecedores(documento_digitos varchar_pattern_ops)
+                    """))
+                    conn.commit()
+            except Exception as e:
+                print(f"Fornecedor busca migration check: {e}")
+                return
+            
+            try:
+                from sqlalchemy import text
+                with db.engine.connect() as conn:
+                    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    for coluna in ['nome', 'nome_social', 'email']:
+                        conn.execute(text(f"""
+                            CREATE INDEX IF NOT EXISTS idx_fornecedor_{coluna}_trgm
+                            ON fornecedores USING gin ({coluna} gin_trgm_ops)
+                        """))
+                    conn.commit()
+            except Exception as e:
+                # A busca de fornecedores usa LIKE sem o pg_trgm (ver busca_fornecedor_service)
+                print(f"Fornecedor busca pg_trgm indisponível, busca sem trigramas: {e}")
+        
+        run_fornecedor_busca_migration()
+
+        def run_scanner_blobs_migration():
+            try:
+                from sqlalchemy import text
+                columns_to_add = [
+                    ("image_sha256", "VARCHAR(64)"),
+                    ("image_size", "INTEGER"),
+                    ("thumbnail_sha256", "VARCHAR(64)"),
+                    ("batch_id", "INTEGER"),
+                    ("image_phash", "VARCHAR(16)"),
+                    ("source_analysis_id", "INTEGER")
+                ]
+                
+                with db.engine.connect() as conn:
+                    result = conn.execute(text("""
+                        SELECT table_name FROM information_schema.tables 
+                        WHERE table_name = 'scanner_analyses'
+                    """))
+                    if result.fetchone() is None:
+                        return
+                    
+                    for column_name, column_type in columns_to_add:
+                        result = conn.execute(text(f"""
+                            SELECT column_name 
+                            FROM information_schema.columns 
+                            WHERE table_name = 'scanner_analyses' AND column_name = '{column_name}'
+                        """))
+                        if result.fetchone() is None:
+                            conn.execute(text(f"ALTER TABLE scanner_analyses ADD COLUMN {column_name} {column_type}"))
+                            print(f"✓ Added column scanner_analyses.{column_name}")
+                    
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_scanner_analyses_image_sha256 ON scanner_analyses(image_sha256)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_scanner_analyses_thumbnail_sha256 ON scanner_analyses(thumbnail_sha256)"))
+                    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_scanner_analyses_batch_id ON scanner_analyses(batch_id)"))
+                    conn.commit()
+            except Exception as e:
+                print(f"Scanner blobs migration check: {e}")
+        
+        run_scanner_blobs_migration()
+
+        def run_tarefas_fundo_reserva_migration():
+            # Dono e sinal de vida das tarefas de fundo (app/utils/tarefas_fundo.py)
+            try:
+                from sqlalchemy import text
+                tabelas = ['importacoes_arquivo', 'scanner_batches']
+                columns_to_add = [
+                    ("dono", "VARCHAR(32)"),
+                    ("atualizado_em", "TIMESTAMP")
+                ]
+
+                with db.engine.connect() as conn:
+                    for tabela in tabelas:
+                        result = conn.execute(text(f"""
+                            SELECT table_name FROM information_schema.tables
+                            WHERE table_name = '{tabela}'
+                        """))
+                        if result.fetchone() is None:
+                            continue
+
+                        for column_name, column_type in columns_to_add:
+                            result = conn.execute(text(f"""
+                                SELECT column_name
+                                FROM information_schema.columns
+                                WHERE table_name = '{tabela}' AND column_name = '{column_name}'
+                            """))
+                            if result.fetchone() is None:
+                                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {column_name} {column_type}"))
+                                print(f"✓ Added column {tabela}.{column_name}")
+
+                        conn.execute(text(f"CREATE INDEX IF NOT EXISTS idx_{tabela}_status_atualizado ON {tabela}(status, atualizado_em)"))
+                        conn.commit()
+            except Exception as e:
+                print(f"Tarefas de fundo reserva migration check: {e}")
+
+        run_tarefas_fundo_reserva_migration()
         db.create_all()
 
         # Inicializar tabelas de preço
@@ -215,6 +448,14 @@ def create_app():
         from app.auth import criar_admin_padrao
         criar_admin_padrao()
 
+        # Backfill dos resumos mensais do dashboard na primeira subida após a migração
+        from app.models import Lote, Solicitacao, ResumoMensalLote, ResumoMensalSolicitacao
+        if (not ResumoMensalLote.query.first() and Lote.query.first()) or \
+                (not ResumoMensalSolicitacao.query.first() and Solicitacao.query.first()):
+            from app.services.dashboard_service import reconstruir_resumos_mensais
+            resultado = reconstruir_resumos_mensais()
+            print(f"✓ Resumos mensais do dashboard reconstruídos: {resultado}")
+
         from app.models import ClassificacaoGrade
         classificacoes_high_grade = [
             'SUCATA PROCESSADOR CERAMICO A',
@@ -1,7 +1,9 @@
 import bcrypt
 from functools import wraps
-from flask import jsonify, request
+from types import SimpleNamespace
+from flask import jsonify, request, g, current_app
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
+from sqlalchemy.orm import joinedload, defer
 from app.models import db, Usuario, Perfil
 from app.rbac_config import check_rota_api_permitida
 
@@ -12,14 +14,53 @@ def verificar_senha(senha, senha_hash):
     return bcrypt.checkpw(senha.encode('utf-8'), senha_hash.encode('utf-8'))
 
 def get_current_user():
+    """
+    Usuário do token atual, carregado uma única vez por requisição (cache em flask.g)
+    já com o perfil; decorators e handlers da mesma requisição reaproveitam o mesmo objeto.
+    """
     verify_jwt_in_request()
     usuario_id = get_jwt_identity()
-    return Usuario.query.get(usuario_id)
+
+    cache = g.get('_usuario_atual')
+    if cache is None or cache[0] != usuario_id or (cache[1] is not None and cache[1] not in db.session):
+        usuario = db.session.get(
+            Usuario, int(usuario_id),
+            options=[joinedload(Usuario.perfil), defer(Usuario.foto_data)]
+        )
+        g._usuario_atual = (usuario_id, usuario)
+
+    return g._usuario_atual[1]
+
+class _UsuarioDosClaims(SimpleNamespace):
+    """Tipo, perfil e permissões lidos dos claims do JWT (ver get_user_jwt_claims), sem consultar o banco"""
+
+    def has_permission(self, permission: str) -> bool:
+        return permission in self.permissoes if self.perfil else self.tipo == 'admin'
+
+def _usuario_para_autorizacao():
+    """
+    Com AUTORIZACAO_POR_CLAIMS ligado, os decorators decidem só com os claims do token
+    (zero consultas); alterações de perfil passam a valer no próximo login/refresh.
+    Tokens sem os claims (emitidos antes) continuam consultando o usuário.
+    """
+    if current_app.config.get('AUTORIZACAO_POR_CLAIMS'):
+        verify_jwt_in_request()
+        claims = get_jwt()
+        if 'tipo' in claims and 'permissoes' in claims:
+            perfil = SimpleNamespace(nome=claims['perfil']) if claims.get('perfil') else None
+            return _UsuarioDosClaims(
+                id=int(get_jwt_identity()),
+                tipo=claims['tipo'],
+                perfil=perfil,
+                permissoes=set(claims['permissoes'])
+            )
+
+    return get_current_user()
 
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        usuario = get_current_user()
+        usuario = _usuario_para_autorizacao()
 
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado. Apenas administradores podem acessar este recurso.'}), 403
@@ -31,7 +72,7 @@ def permission_required(permission: str):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            usuario = get_current_user()
+            usuario = _usuario_para_autorizacao()
 
             if not usuario:
                 return jsonify({'erro': 'Usuário não autenticado'}), 401
@@ -50,7 +91,7 @@ def perfil_required(*perfis_permitidos):
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            usuario = get_current_user()
+            usuario = _usuario_para_autorizacao()
 
             if not usuario or not usuario.perfil:
                 return jsonify({'erro': 'Usuário sem perfil definido'}), 403
@@ -71,7 +112,7 @@ def admin_ou_auditor_required(fn):
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        usuario = get_current_user()
+        usuario = _usuario_para_autorizacao()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não autenticado'}), 401
@@ -91,7 +132,7 @@ def admin_ou_auditor_required(fn):
 def somente_leitura_ou_admin(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        usuario = get_current_user()
+        usuario = _usuario_para_autorizacao()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não autenticado'}), 401
@@ -153,7 +194,7 @@ def rota_permitida_por_perfil(fn):
     """
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        usuario = get_current_user()
+        usuario = _usuario_para_autorizacao()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não autenticado'}), 401
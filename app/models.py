@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
+import re
 import uuid
 from typing import Any
 
@@ -248,6 +250,12 @@ class FornecedorClassificacaoEstrela(db.Model):  # type: ignore
 
 class Fornecedor(db.Model):  # type: ignore
     __tablename__ = 'fornecedores'
+    __table_args__ = (
+        db.Index('idx_fornecedor_endereco_normalizado', 'rua_normalizada', 'numero_normalizado', 'cidade_normalizada', 'estado_normalizado'),
+        db.Index('idx_fornecedor_cep_numero', 'cep_normalizado', 'numero_normalizado'),
+        db.Index('idx_fornecedor_documento_digitos', 'documento_digitos',
+                 postgresql_ops={'documento_digitos': 'varchar_pattern_ops'}),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(200), nullable=False)
@@ -301,6 +309,14 @@ class Fornecedor(db.Model):  # type: ignore
     tabela_preco_aprovada_em = db.Column(db.DateTime, nullable=True)
     tabela_preco_aprovada_por_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
 
+    # Endereço normalizado para detecção de duplicidade (mantido por normalizar_endereco_fornecedor)
+    rua_normalizada = db.Column(db.String(200), nullable=True)
+    numero_normalizado = db.Column(db.String(20), nullable=True)
+    cidade_normalizada = db.Column(db.String(100), nullable=True)
+    estado_normalizado = db.Column(db.String(2), nullable=True)
+    cep_normalizado = db.Column(db.String(10), nullable=True)
+    documento_digitos = db.Column(db.String(14), nullable=True)  # CNPJ ou CPF só com dígitos (busca por prefixo)
+
     precos = db.relationship('FornecedorTipoLotePreco', backref='fornecedor', lazy=True, cascade='all, delete-orphan')
     solicitacoes = db.relationship('Solicitacao', backref='fornecedor', lazy=True, cascade='all, delete-orphan')
     lotes = db.relationship('Lote', backref='fornecedor', lazy=True)
@@ -366,6 +382,36 @@ class Fornecedor(db.Model):  # type: ignore
             'tabela_preco_aprovada_por_nome': self.tabela_preco_aprovada_por.nome if self.tabela_preco_aprovada_por else None
         }
 
+    @staticmethod
+    def normalizar_endereco(rua, numero, cidade, estado, cep):
+        """Normaliza os campos de endereço usados na verificação de duplicidade"""
+        cep_digitos = re.sub(r'[^\d]', '', cep) if cep else ''
+        return {
+            'rua_normalizada': (rua or '').strip().lower(),
+            'numero_normalizado': str(numero or '').strip(),
+            'cidade_normalizada': (cidade or '').strip().lower(),
+            'estado_normalizado': (estado or '').strip().upper(),
+            'cep_normalizado': cep_digitos or None
+        }
+
+    @staticmethod
+    def digitos_documento(cnpj, cpf):
+        """CNPJ (ou, na falta dele, CPF) somente com dígitos"""
+        for documento in (cnpj, cpf):
+            digitos = re.sub(r'[^\d]', '', documento) if documento else ''
+            if digitos:
+                return digitos
+        return None
+
+@event.listens_for(Fornecedor, 'before_insert')
+@event.listens_for(Fornecedor, 'before_update')
+def normalizar_campos_fornecedor(mapper, connection, fornecedor):
+    for campo, valor in Fornecedor.normalizar_endereco(
+        fornecedor.rua, fornecedor.numero, fornecedor.cidade, fornecedor.estado, fornecedor.cep
+    ).items():
+        setattr(fornecedor, campo, valor)
+    fornecedor.documento_digitos = Fornecedor.digitos_documento(fornecedor.cnpj, fornecedor.cpf)
+
 class FornecedorFuncionarioAtribuicao(db.Model):  # type: ignore
     """Tabela de atribuição de fornecedores a funcionários (admin atribui fornecedores a funcionários)"""
     __tablename__ = 'fornecedor_funcionario_atribuicao'
@@ -582,6 +628,10 @@ class FornecedorTipoLoteClassificacao(db.Model):  # type: ignore
 
 class Solicitacao(db.Model):  # type: ignore
     __tablename__ = 'solicitacoes'
+    __table_args__ = (
+        # Solicitações aprovadas de um funcionário por período (comissões do RH)
+        db.Index('idx_solicitacoes_funcionario_status_envio', 'funcionario_id', 'status', 'data_envio'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     funcionario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
@@ -640,6 +690,10 @@ class Solicitacao(db.Model):  # type: ignore
 
 class ItemSolicitacao(db.Model):  # type: ignore
     __tablename__ = 'itens_solicitacao'
+    __table_args__ = (
+        db.Index('idx_itens_solicitacao_lote', 'lote_id'),
+        db.Index('idx_itens_solicitacao_solicitacao', 'solicitacao_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     solicitacao_id = db.Column(db.Integer, db.ForeignKey('solicitacoes.id'), nullable=False)
@@ -710,6 +764,8 @@ class Lote(db.Model):  # type: ignore
     __table_args__ = (
         db.Index('idx_numero_lote', 'numero_lote'),
         db.Index('idx_fornecedor_tipo_status', 'fornecedor_id', 'tipo_lote_id', 'status'),
+        db.Index('idx_lote_data_criacao_id', 'data_criacao', 'id'),
+        db.Index('idx_lote_pai', 'lote_pai_id'),
         db.UniqueConstraint('conferencia_id', name='uq_lote_conferencia_id'),
     )
 
@@ -775,10 +831,9 @@ class Lote(db.Model):  # type: ignore
     bloqueado_por = db.relationship('Usuario', foreign_keys=[bloqueado_por_id], backref='lotes_bloqueados')
 
     def __init__(self, **kwargs: Any) -> None:
+        # Quem cria o lote passa numero_lote (gerar_numero_lote em app/services/numeracao.py);
+        # sem ele fica o default da coluna, fora da sequência AAAA-NNNNN
         super().__init__(**kwargs)
-        if not kwargs.get('numero_lote'):
-            ano = datetime.now().year
-            self.numero_lote = f"{ano}-{str(uuid.uuid4().hex[:5]).upper()}"
 
     def to_dict(self):
         data = {
@@ -897,6 +952,16 @@ class EntradaEstoque(db.Model):  # type: ignore
 
 class Notificacao(db.Model):  # type: ignore
     __tablename__ = 'notificacoes'
+    __table_args__ = (
+        db.Index('idx_notificacao_usuario_data_id', 'usuario_id', 'data_envio', 'id'),
+        db.Index('idx_notificacao_tipo_usuario', 'tipo', 'usuario_id'),
+        # Só as não lidas: a contagem de /nao-lidas percorre um índice pequeno
+        db.Index(
+            'idx_notificacao_nao_lidas', 'usuario_id',
+            postgresql_where=db.text('lida = false'),
+            sqlite_where=db.text('lida = 0')
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
@@ -1939,8 +2004,17 @@ class ScannerAnalysis(db.Model):  # type: ignore
     confidence = db.Column(db.Float, nullable=True)
     components_count = db.Column(db.Integer, nullable=True)
     density_score = db.Column(db.Float, nullable=True)
-    image_data = db.Column(db.LargeBinary, nullable=True)
+    # Legado: imagens novas vão para o blob store (image_sha256); scripts/migrar_imagens_scanner.py
+    # move as antigas. Adiado para que listagens não tragam os bytes do banco.
+    image_data = db.deferred(db.Column(db.LargeBinary, nullable=True))
     image_mimetype = db.Column(db.String(50), nullable=True)
+    image_sha256 = db.Column(db.String(64), nullable=True, index=True)
+    image_size = db.Column(db.Integer, nullable=True)
+    thumbnail_sha256 = db.Column(db.String(64), nullable=True, index=True)
+    # pHash da foto (pcb_analyzer.perceptual_hash) e, quando o resultado veio do cache, a análise original
+    image_phash = db.Column(db.String(16), nullable=True)
+    source_analysis_id = db.Column(db.Integer, db.ForeignKey('scanner_analyses.id', ondelete='SET NULL'), nullable=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('scanner_batches.id', ondelete='SET NULL'), nullable=True, index=True)
     raw_response = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
@@ -1949,8 +2023,11 @@ class ScannerAnalysis(db.Model):  # type: ignore
     def __init__(self, **kwargs: Any) -> None:
         super().__init__(**kwargs)
 
-    def to_dict(self, include_image: bool = False):
-        result = {
+    def to_dict(self):
+        from app.services.scanner_imagens import url_blob
+        # image_mimetype sempre acompanha a imagem, inclusive nas linhas ainda não migradas
+        has_image = self.image_sha256 is not None or self.image_mimetype is not None
+        return {
             'id': self.id,
             'usuario_id': self.usuario_id,
             'grade': self.grade,
@@ -1959,13 +2036,96 @@ class ScannerAnalysis(db.Model):  # type: ignore
             'confidence': self.confidence,
             'components_count': self.components_count,
             'density_score': self.density_score,
-            'has_image': self.image_data is not None,
+            'has_image': has_image,
+            'image_url': url_blob(self.image_sha256, self.usuario_id),
+            'thumbnail_url': url_blob(self.thumbnail_sha256, self.usuario_id),
+            'batch_id': self.batch_id,
+            'source_analysis_id': self.source_analysis_id,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
-        if include_image and self.image_data:
-            import base64
-            result['image_base64'] = base64.b64encode(self.image_data).decode('utf-8')
-            result['image_mimetype'] = self.image_mimetype
+
+
+class ScannerExplanation(db.Model):  # type: ignore
+    """Explicação gerada pela Perplexity para uma faixa de resultado do scanner (ver scanner_explicacoes)"""
+    __tablename__ = 'scanner_explanations'
+    __table_args__ = (
+        db.UniqueConstraint('grade', 'components_bucket', 'density_bucket', name='uq_scanner_explanation_faixa'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    grade = db.Column(db.String(10), nullable=False)
+    components_bucket = db.Column(db.Integer, nullable=False)
+    density_bucket = db.Column(db.Integer, nullable=False)
+    explanation = db.Column(db.Text, nullable=False)
+    model = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'grade': self.grade,
+            'components_bucket': self.components_bucket,
+            'density_bucket': self.density_bucket,
+            'explanation': self.explanation,
+            'model': self.model,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
+
+class ScannerBatch(db.Model):  # type: ignore
+    """Lote de fotos de placas analisado em segundo plano (ver scanner_lotes)"""
+    __tablename__ = 'scanner_batches'
+    __table_args__ = (
+        db.Index('idx_scanner_batch_usuario_data', 'usuario_id', 'created_at'),
+        db.Index('idx_scanner_batches_status_atualizado', 'status', 'atualizado_em'),
+    )
+
+    STATUS = ['pending', 'processing', 'completed', 'failed']
+
+    id = db.Column(db.Integer, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    total_images = db.Column(db.Integer, nullable=False, default=0)
+    processed_images = db.Column(db.Integer, nullable=False, default=0)
+    detected_boards = db.Column(db.Integer, nullable=False, default=0)
+    # Uma entrada por foto: position, filename, image_sha256, status e, quando pronta, o resultado
+    items = db.Column(db.JSON, nullable=False, default=list)
+    error_message = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    dono = db.Column(db.String(32), nullable=True)  # Execução que detém o lote (app/utils/tarefas_fundo.py)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)  # Último sinal de vida da execução
+
+    usuario = db.relationship('Usuario', backref='scanner_batches')
+
+    def __init__(self, **kwargs: Any) -> None:
+        if 'status' in kwargs and kwargs['status'] not in self.STATUS:
+            raise ValueError(f'Status deve ser: {", ".join(self.STATUS)}')
+        super().__init__(**kwargs)
+
+    def to_dict(self, include_items: bool = True):
+        result = {
+            'id': self.id,
+            'usuario_id': self.usuario_id,
+            'status': self.status,
+            'total_images': self.total_images,
+            'processed_images': self.processed_images,
+            'detected_boards': self.detected_boards,
+            'percent': round(self.processed_images / self.total_images * 100, 1) if self.total_images else 0.0,
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_items:
+            from app.services.scanner_imagens import item_lote_com_url
+            result['items'] = [item_lote_com_url(item, self.usuario_id) for item in self.items or []]
         return result
 
 
@@ -2135,19 +2295,8 @@ class OrdemProducao(db.Model):  # type: ignore
     @staticmethod
     def gerar_numero_op():
         """Gera número único para OP no formato OP-YYYYMMDD-XXXX"""
-        from datetime import datetime
-        hoje = datetime.now().strftime('%Y%m%d')
-        ultima_op = OrdemProducao.query.filter(
-            OrdemProducao.numero_op.like(f'OP-{hoje}-%')
-        ).order_by(OrdemProducao.id.desc()).first()
-        
-        if ultima_op:
-            ultimo_seq = int(ultima_op.numero_op.split('-')[-1])
-            novo_seq = ultimo_seq + 1
-        else:
-            novo_seq = 1
-        
-        return f'OP-{hoje}-{novo_seq:04d}'
+        from app.services.numeracao import gerar_numero_op
+        return gerar_numero_op()
 
     def to_dict(self):
         return {
@@ -2303,18 +2452,8 @@ class BagProducao(db.Model):  # type: ignore
     @staticmethod
     def gerar_codigo_bag(classificacao_nome):
         """Gera código único para Bag no formato BAG-CATEGORIA-XXXX"""
-        categoria_cod = classificacao_nome[:10].upper().replace(' ', '_')
-        ultimo_bag = BagProducao.query.filter(
-            BagProducao.codigo.like(f'BAG-{categoria_cod}-%')
-        ).order_by(BagProducao.id.desc()).first()
-        
-        if ultimo_bag:
-            ultimo_seq = int(ultimo_bag.codigo.split('-')[-1])
-            novo_seq = ultimo_seq + 1
-        else:
-            novo_seq = 1
-        
-        return f'BAG-{categoria_cod}-{novo_seq:04d}'
+        from app.services.numeracao import gerar_codigo_bag
+        return gerar_codigo_bag(classificacao_nome)
 
     @property
     def percentual_ocupacao(self):
@@ -2356,4 +2495,228 @@ class BagProducao(db.Model):  # type: ignore
             'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
             'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None,
             'observacoes': self.observacoes
-        }
\ No newline at end of file
+        }
+class ResumoMensalLote(db.Model):  # type: ignore
+    """Resumo mensal pré-calculado de lotes por fornecedor, tipo de lote e status (alimenta o dashboard)"""
+    __tablename__ = 'resumo_mensal_lotes'
+    __table_args__ = (
+        db.UniqueConstraint('mes', 'fornecedor_id', 'tipo_lote_id', 'status', name='uq_resumo_mensal_lote'),
+        db.Index('idx_resumo_lote_mes_status', 'mes', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.Date, nullable=False)  # Primeiro dia do mês de data_criacao
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedores.id', ondelete='CASCADE'), nullable=False)
+    tipo_lote_id = db.Column(db.Integer, db.ForeignKey('tipos_lote.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    valor_total = db.Column(db.Float, nullable=False, default=0.0)
+    peso_total_kg = db.Column(db.Float, nullable=False, default=0.0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+class ResumoMensalSolicitacao(db.Model):  # type: ignore
+    """Resumo mensal pré-calculado de solicitações por comprador, fornecedor e status (alimenta o dashboard)"""
+    __tablename__ = 'resumo_mensal_solicitacoes'
+    __table_args__ = (
+        db.UniqueConstraint('mes', 'funcionario_id', 'fornecedor_id', 'status', name='uq_resumo_mensal_solicitacao'),
+        db.Index('idx_resumo_solicitacao_mes_status', 'mes', 'status'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    mes = db.Column(db.Date, nullable=False)  # Primeiro dia do mês de data_envio
+    funcionario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), nullable=False)
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedores.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+class ImportacaoArquivo(db.Model):  # type: ignore
+    """Importação de planilha (CSV/XLSX) processada em segundo plano, bloco a bloco"""
+    __tablename__ = 'importacoes_arquivo'
+    __table_args__ = (
+        db.Index('idx_importacao_usuario_data', 'usuario_id', 'data_criacao'),
+        db.Index('idx_importacoes_arquivo_status_atualizado', 'status', 'atualizado_em'),
+    )
+
+    LIMITE_ERROS = 1000
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)  # tabela_precos_fornecedor, tipos_lote
+    status = db.Column(db.String(20), nullable=False, default='pendente')
+    nome_arquivo = db.Column(db.String(255), nullable=False)
+    caminho_arquivo = db.Column(db.String(500), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    fornecedor_id = db.Column(db.Integer, db.ForeignKey('fornecedores.id', ondelete='CASCADE'), nullable=True)
+    total_linhas = db.Column(db.Integer, nullable=True)  # Estimativa feita antes de começar
+    linhas_processadas = db.Column(db.Integer, nullable=False, default=0)
+    sucesso = db.Column(db.Integer, nullable=False, default=0)
+    total_erros = db.Column(db.Integer, nullable=False, default=0)
+    erros = db.Column(db.JSON, nullable=False, default=list)  # Apenas as primeiras LIMITE_ERROS mensagens
+    resultado = db.Column(db.JSON, nullable=True)
+    mensagem_erro = db.Column(db.Text, nullable=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    data_inicio = db.Column(db.DateTime, nullable=True)
+    data_conclusao = db.Column(db.DateTime, nullable=True)
+    dono = db.Column(db.String(32), nullable=True)  # Execução que detém a importação (app/utils/tarefas_fundo.py)
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)  # Último sinal de vida da execução
+
+    usuario = db.relationship('Usuario', backref='importacoes_arquivo')
+
+    def __init__(self, **kwargs: Any) -> None:
+        if 'status' in kwargs and kwargs['status'] not in ['pendente', 'processando', 'concluida', 'erro']:
+            raise ValueError('Status deve ser: pendente, processando, concluida ou erro')
+        super().__init__(**kwargs)
+
+    def registrar_erros(self, mensagens):
+        if not mensagens:
+            return
+        espaco = self.LIMITE_ERROS - len(self.erros or [])
+        if espaco > 0:
+            self.erros = (self.erros or []) + mensagens[:espaco]
+        self.total_erros = (self.total_erros or 0) + len(mensagens)
+
+    def to_dict(self):
+        percentual = None
+        if self.status == 'concluida':
+            percentual = 100.0
+        elif self.total_linhas:
+            percentual = round(min(self.linhas_processadas / self.total_linhas, 1) * 100, 1)
+
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'status': self.status,
+            'nome_arquivo': self.nome_arquivo,
+            'usuario_id': self.usuario_id,
+            'fornecedor_id': self.fornecedor_id,
+            'total_linhas': self.total_linhas,
+            'linhas_processadas': self.linhas_processadas,
+            'percentual': percentual,
+            'sucesso': self.sucesso,
+            'total_erros': self.total_erros,
+            'erros': self.erros or [],
+            'resultado': self.resultado,
+            'mensagem_erro': self.mensagem_erro,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_inicio': self.data_inicio.isoformat() if self.data_inicio else None,
+            'data_conclusao': self.data_conclusao.isoformat() if self.data_conclusao else None
+        }
+
+class ContadorPendencia(db.Model):  # type: ignore
+    """Quantidade atual de itens aguardando ação do admin, por tipo de pendência (ver pendencias_service)"""
+    __tablename__ = 'contadores_pendencias'
+
+    chave = db.Column(db.String(50), primary_key=True)  # Mesmo valor do tipo da notificação-resumo
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    valor_total = db.Column(db.Float, nullable=False, default=0.0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def to_dict(self):
+        return {
+            'chave': self.chave,
+            'quantidade': self.quantidade,
+            'valor_total': self.valor_total,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+        }
+
+class ContadorNotificacoes(db.Model):  # type: ignore
+    """Notificações não lidas por usuário, mantido junto com as gravações (ver notificacoes_nao_lidas)"""
+    __tablename__ = 'contadores_notificacoes'
+
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id', ondelete='CASCADE'), primary_key=True)
+    nao_lidas = db.Column(db.Integer, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def to_dict(self):
+        return {
+            'usuario_id': self.usuario_id,
+            'nao_lidas': self.nao_lidas,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+        }
+
+class CacheCompartilhado(db.Model):  # type: ignore
+    """Valores compartilhados entre os workers quando não há Redis (ver app/utils/cache_compartilhado.py)"""
+    __tablename__ = 'cache_compartilhado'
+
+    chave = db.Column(db.String(100), primary_key=True)
+    valor = db.Column(db.Text, nullable=True)  # JSON
+    data_atualizacao = db.Column(db.DateTime, nullable=True)
+    reservado_ate = db.Column(db.DateTime, nullable=True)  # Reserva de quem está recalculando o valor
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def to_dict(self):
+        return {
+            'chave': self.chave,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None,
+            'reservado_ate': self.reservado_ate.isoformat() if self.reservado_ate else None
+        }
+
+class CotacaoMetal(db.Model):  # type: ignore
+    """Cotações de um metal agregadas por minuto, hora ou dia (ver historico_metais)"""
+    __tablename__ = 'cotacoes_metais'
+    __table_args__ = (
+        db.UniqueConstraint('granularidade', 'simbolo', 'inicio', name='uq_cotacao_metal_periodo'),
+    )
+
+    GRANULARIDADES = ['minuto', 'hora', 'dia']
+
+    id = db.Column(db.Integer, primary_key=True)
+    simbolo = db.Column(db.String(10), nullable=False)
+    granularidade = db.Column(db.String(10), nullable=False)
+    inicio = db.Column(db.DateTime, nullable=False)  # Início do período (UTC)
+    abertura = db.Column(db.Float, nullable=False)  # Preços em USD/oz
+    maxima = db.Column(db.Float, nullable=False)
+    minima = db.Column(db.Float, nullable=False)
+    fechamento = db.Column(db.Float, nullable=False)
+    soma = db.Column(db.Float, nullable=False)  # Soma e quantidade das cotações, para a média
+    quantidade = db.Column(db.Integer, nullable=False)
+    usd_brl = db.Column(db.Float, nullable=True)  # Dólar da última cotação do período
+    fonte = db.Column(db.String(50), nullable=True)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def to_dict(self):
+        return {
+            'inicio': self.inicio.isoformat() if self.inicio else None,
+            'abertura': self.abertura,
+            'maxima': self.maxima,
+            'minima': self.minima,
+            'fechamento': self.fechamento,
+            'media': round(self.soma / self.quantidade, 4) if self.quantidade else None,
+            'quantidade': self.quantidade,
+            'usd_brl': self.usd_brl,
+            'fonte': self.fonte
+        }
+
+class ContadorNumeracao(db.Model):  # type: ignore
+    """Último número emitido por chave, ex.: 'lote-2025' (ver app/services/numeracao.py)"""
+    __tablename__ = 'contadores_numeracao'
+
+    chave = db.Column(db.String(100), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+
+    def to_dict(self):
+        return {
+            'chave': self.chave,
+            'valor': self.valor,
+            'data_atualizacao': self.data_atualizacao.isoformat() if self.data_atualizacao else None
+        }
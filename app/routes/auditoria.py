@@ -2,45 +2,55 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, AuditoriaLog, Usuario
 from app.auth import permission_required, perfil_required
+from app.utils.exportacao import ler_em_blocos, resposta_exportacao
 from datetime import datetime, timedelta
+import json
 
 bp = Blueprint('auditoria', __name__, url_prefix='/api/auditoria')
 
-@bp.route('', methods=['GET'])
-@permission_required('visualizar_auditoria')
-def listar_logs():
+def filtrar_logs(query):
+    """Filtros da listagem (usuario_id, acao, entidade_tipo, data_inicio, data_fim); ValueError em data inválida"""
     usuario_id_filter = request.args.get('usuario_id', type=int)
     acao_filter = request.args.get('acao')
     entidade_tipo_filter = request.args.get('entidade_tipo')
     data_inicio = request.args.get('data_inicio')
     data_fim = request.args.get('data_fim')
-    limit = request.args.get('limit', 100, type=int)
-    offset = request.args.get('offset', 0, type=int)
-    
-    query = AuditoriaLog.query
     
     if usuario_id_filter:
-        query = query.filter_by(usuario_id=usuario_id_filter)
+        query = query.filter(AuditoriaLog.usuario_id == usuario_id_filter)
     
     if acao_filter:
-        query = query.filter_by(acao=acao_filter)
+        query = query.filter(AuditoriaLog.acao == acao_filter)
     
     if entidade_tipo_filter:
-        query = query.filter_by(entidade_tipo=entidade_tipo_filter)
+        query = query.filter(AuditoriaLog.entidade_tipo == entidade_tipo_filter)
     
     if data_inicio:
         try:
             data_inicio_dt = datetime.fromisoformat(data_inicio)
-            query = query.filter(AuditoriaLog.data_acao >= data_inicio_dt)
         except ValueError:
-            return jsonify({'erro': 'Data de início inválida'}), 400
+            raise ValueError('Data de início inválida')
+        query = query.filter(AuditoriaLog.data_acao >= data_inicio_dt)
     
     if data_fim:
         try:
             data_fim_dt = datetime.fromisoformat(data_fim)
-            query = query.filter(AuditoriaLog.data_acao <= data_fim_dt)
         except ValueError:
-            return jsonify({'erro': 'Data de fim inválida'}), 400
+            raise ValueError('Data de fim inválida')
+        query = query.filter(AuditoriaLog.data_acao <= data_fim_dt)
+    
+    return query
+
+@bp.route('', methods=['GET'])
+@permission_required('visualizar_auditoria')
+def listar_logs():
+    limit = request.args.get('limit', 100, type=int)
+    offset = request.args.get('offset', 0, type=int)
+    
+    try:
+        query = filtrar_logs(AuditoriaLog.query)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     
     total = query.count()
     logs = query.order_by(AuditoriaLog.data_acao.desc()).limit(limit).offset(offset).all()
@@ -52,6 +62,42 @@ def listar_logs():
         'logs': [log.to_dict() for log in logs]
     }), 200
 
+@bp.route('/exportar', methods=['GET'])
+@permission_required('visualizar_auditoria')
+def exportar_logs():
+    """Todos os logs dos filtros da listagem, em streaming (formato=csv ou xlsx)"""
+    try:
+        query = filtrar_logs(db.session.query(
+            AuditoriaLog.id,
+            AuditoriaLog.data_acao,
+            AuditoriaLog.usuario_id,
+            Usuario.nome.label('usuario_nome'),
+            AuditoriaLog.acao,
+            AuditoriaLog.entidade_tipo,
+            AuditoriaLog.entidade_id,
+            AuditoriaLog.ip_address,
+            AuditoriaLog.detalhes
+        ).outerjoin(Usuario, Usuario.id == AuditoriaLog.usuario_id))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    linhas = (
+        [
+            log.id,
+            log.data_acao.strftime('%d/%m/%Y %H:%M:%S') if log.data_acao else '',
+            log.usuario_id,
+            log.usuario_nome or '',
+            log.acao,
+            log.entidade_tipo,
+            log.entidade_id,
+            log.ip_address or '',
+            json.dumps(log.detalhes, ensure_ascii=False, default=str) if log.detalhes else ''
+        ]
+        for log in ler_em_blocos(query.order_by(AuditoriaLog.data_acao.desc()))
+    )
+    colunas = ['ID', 'Data', 'Usuário ID', 'Usuário', 'Ação', 'Entidade', 'Entidade ID', 'IP', 'Detalhes']
+    return resposta_exportacao(colunas, linhas, request.args.get('formato', 'xlsx'), 'auditoria', aba='Auditoria')
+
 @bp.route('/usuario/<int:usuario_id>', methods=['GET'])
 @permission_required('visualizar_auditoria')
 def listar_logs_usuario(usuario_id):
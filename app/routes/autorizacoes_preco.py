@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, SolicitacaoAutorizacaoPreco, Fornecedor, MaterialBase, TabelaPreco, Usuario, AuditoriaLog
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 from datetime import datetime
 from app import socketio
 
@@ -12,7 +12,7 @@ bp = Blueprint('autorizacoes_preco', __name__, url_prefix='/api/autorizacoes-pre
 def listar_autorizacoes():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -47,7 +47,7 @@ def listar_autorizacoes():
 def obter_autorizacao(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         autorizacao = SolicitacaoAutorizacaoPreco.query.get(id)
         
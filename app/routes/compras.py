@@ -1,30 +1,11 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.auth import get_current_user
 from app.models import Solicitacao, ItemSolicitacao, Lote, Fornecedor, TipoLote, Usuario, db
-from datetime import datetime
+from app.services.numeracao import gerar_codigo_lote_compra
 
 bp = Blueprint('compras', __name__, url_prefix='/api/compras')
 
-def gerar_codigo_lote():
-    """Gera código de lote no formato AAAAMMDD-SEQ (ex: 20251117-001)"""
-    hoje = datetime.now()
-    data_str = hoje.strftime('%Y%m%d')
-    
-    ultimo_lote = db.session.query(Lote).filter(
-        Lote.numero_lote.like(f'{data_str}-%')
-    ).order_by(Lote.numero_lote.desc()).first()
-    
-    if ultimo_lote:
-        try:
-            ultima_seq = int(ultimo_lote.numero_lote.split('-')[1])
-            proxima_seq = ultima_seq + 1
-        except (IndexError, ValueError):
-            proxima_seq = 1
-    else:
-        proxima_seq = 1
-    
-    return f"{data_str}-{proxima_seq:03d}"
-
 @bp.route('', methods=['POST'])
 @jwt_required()
 def criar_compra():
@@ -51,7 +32,7 @@ def criar_compra():
     """
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -147,7 +128,7 @@ def criar_compra():
             db.session.add(item)
             itens_criados.append(item)
         
-        codigo_lote = gerar_codigo_lote()
+        codigo_lote = gerar_codigo_lote_compra()
         
         lote = Lote(
             numero_lote=codigo_lote,
@@ -194,7 +175,7 @@ def obter_compra(id):
     """Obtém detalhes de uma compra específica"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -223,7 +204,7 @@ def listar_compras():
     """Lista compras do usuário logado ou todas (se admin)"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
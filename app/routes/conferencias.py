@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, ConferenciaRecebimento, OrdemServico, OrdemCompra, Usuario, Notificacao, EntradaEstoque, Lote
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.notificacao_dispatcher import notificar_admins
+from app.services.numeracao import gerar_numero_lote
 from datetime import datetime
 import uuid
 import os
@@ -56,13 +58,7 @@ def criar_lote_apos_conferencia(conferencia, usuario_id, decisao='ACEITAR', perc
         if decisao == 'ACEITAR_COM_DESCONTO' and percentual_desconto:
             peso_liquido = peso_final * (1 - percentual_desconto / 100)
         
-        # WARNING: Race condition - count()+1 pode gerar números duplicados em alta concorrência
-        # TODO: Migrar para sequence do PostgreSQL ou usar UUID para número de lote
-        ano = datetime.now().year
-        numero_sequencial = Lote.query.filter(
-            Lote.numero_lote.like(f"{ano}-%")  # type: ignore
-        ).count() + 1
-        numero_lote = f"{ano}-{str(numero_sequencial).zfill(5)}"
+        numero_lote = gerar_numero_lote()
         
         # Sistema migrado para materiais - usar tipo_lote genérico (ID 1)
         # Tipo de lote genérico criado na migração 017
@@ -200,7 +196,7 @@ def criar_lote_apos_conferencia(conferencia, usuario_id, decisao='ACEITAR', perc
 def listar_conferencias():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -263,7 +259,7 @@ def obter_conferencia(id):
 def iniciar_conferencia(os_id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -334,7 +330,7 @@ def iniciar_conferencia(os_id):
 def registrar_pesagem(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         data = request.get_json()
         
         if not data or not data.get('peso_real'):
@@ -463,17 +459,12 @@ def enviar_para_adm(id):
             device_id=data.get('device_id')
         )
         
-        admins = Usuario.query.filter_by(tipo='admin').all()
-        for admin in admins:
-            notificacao = Notificacao(
-                usuario_id=admin.id,
-                titulo='Divergência em Conferência',
-                mensagem=f'Conferência #{conferencia.id} com divergência de {conferencia.percentual_diferenca:.2f}% precisa de análise',
-                tipo='divergencia_conferencia',
-                url=f'/conferencia.html?id={conferencia.id}',
-                lida=False
-            )
-            db.session.add(notificacao)
+        notificar_admins(
+            titulo='Divergência em Conferência',
+            mensagem=f'Conferência #{conferencia.id} com divergência de {conferencia.percentual_diferenca:.2f}% precisa de análise',
+            tipo='divergencia_conferencia',
+            url=f'/conferencia.html?id={conferencia.id}'
+        )
         
         db.session.commit()
         
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.auth import get_current_user
 from app.models import db, ConfiguracaoPrecoEstrela, Usuario
 
 bp = Blueprint('configuracoes', __name__, url_prefix='/api/configuracoes')
@@ -22,7 +23,7 @@ def obter_configuracao(tipo_placa):
 @jwt_required()
 def criar_ou_atualizar_configuracao():
     usuario_id = get_jwt_identity()
-    usuario = Usuario.query.get(usuario_id)
+    usuario = get_current_user()
     
     if not usuario:
         return jsonify({'error': 'Usuário não encontrado'}), 401
@@ -67,7 +68,7 @@ def criar_ou_atualizar_configuracao():
 @jwt_required()
 def inicializar_configuracoes():
     usuario_id = get_jwt_identity()
-    usuario = Usuario.query.get(usuario_id)
+    usuario = get_current_user()
     
     if not usuario:
         return jsonify({'error': 'Usuário não encontrado'}), 401
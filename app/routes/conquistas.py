@@ -3,7 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 from app.models import db, Conquista, AporteConquista, Usuario
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 
 bp = Blueprint('conquistas', __name__, url_prefix='/api/conquistas')
 
@@ -12,7 +12,7 @@ bp = Blueprint('conquistas', __name__, url_prefix='/api/conquistas')
 def listar_conquistas():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuario nao encontrado'}), 404
@@ -42,7 +42,7 @@ def listar_conquistas():
 def criar_conquista():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -94,7 +94,7 @@ def criar_conquista():
 def obter_conquista(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -117,7 +117,7 @@ def obter_conquista(id):
 def atualizar_conquista(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -168,7 +168,7 @@ def atualizar_conquista(id):
 def excluir_conquista(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -192,7 +192,7 @@ def excluir_conquista(id):
 def listar_aportes(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -214,7 +214,7 @@ def listar_aportes(id):
 def registrar_aporte(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -269,7 +269,7 @@ def registrar_aporte(id):
 def obter_resumo():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -317,7 +317,7 @@ def obter_resumo():
 def obter_recomendacoes():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
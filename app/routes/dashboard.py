@@ -13,115 +13,22 @@ bp = Blueprint('dashboard', __name__, url_prefix='/api/dashboard')
 @admin_ou_auditor_required
 def obter_estatisticas():
     """Retorna estatísticas gerais do sistema"""
-    # Estatísticas de Solicitações/Relatórios
-    total_pendentes = Solicitacao.query.filter_by(status='pendente').count()
-    total_aprovados = Solicitacao.query.filter_by(status='aprovada').count()
-    total_reprovados = Solicitacao.query.filter_by(status='rejeitada').count()
-    
-    # Valor total de lotes aprovados
-    valor_total = db.session.query(func.sum(Lote.valor_total)).filter(
-        Lote.status == 'aprovado'
-    ).scalar() or 0
-    
-    # Quilos por tipo de lote
-    quilos_leve = db.session.query(func.sum(Lote.peso_total_kg)).join(
-        TipoLote, Lote.tipo_lote_id == TipoLote.id
-    ).filter(
-        TipoLote.classificacao == 'leve'
-    ).scalar() or 0
-    
-    quilos_media = db.session.query(func.sum(Lote.peso_total_kg)).join(
-        TipoLote, Lote.tipo_lote_id == TipoLote.id
-    ).filter(
-        TipoLote.classificacao == 'media'
-    ).scalar() or 0
-    
-    quilos_pesada = db.session.query(func.sum(Lote.peso_total_kg)).join(
-        TipoLote, Lote.tipo_lote_id == TipoLote.id
-    ).filter(
-        TipoLote.classificacao == 'pesada'
-    ).scalar() or 0
-    
-    # Ranking de fornecedores (top 10)
-    ranking = db.session.query(
-        Fornecedor.id,
-        Fornecedor.nome,
-        func.count(Solicitacao.id).label('total')
-    ).join(
-        Solicitacao, Solicitacao.fornecedor_id == Fornecedor.id
-    ).filter(
-        Solicitacao.status == 'aprovada'
-    ).group_by(
-        Fornecedor.id, Fornecedor.nome
-    ).order_by(
-        func.count(Solicitacao.id).desc()
-    ).limit(10).all()
-    
-    ranking_empresas = [
-        {
-            'id': r.id,
-            'nome': r.nome,
-            'total': r.total
-        } for r in ranking
-    ]
-    
-    return jsonify({
-        'relatorios': {
-            'pendentes': total_pendentes,
-            'aprovados': total_aprovados,
-            'reprovados': total_reprovados
-        },
-        'valor_total': float(valor_total),
-        'quilos_por_tipo': {
-            'leve': float(quilos_leve),
-            'media': float(quilos_media),
-            'pesada': float(quilos_pesada)
-        },
-        'ranking_empresas': ranking_empresas
-    }), 200
+    from app.services.dashboard_service import calcular_estatisticas_gerais
+
+    return jsonify(calcular_estatisticas_gerais()), 200
 
 @bp.route('/grafico-mensal', methods=['GET'])
 @admin_ou_auditor_required
 def obter_grafico_mensal():
     """Retorna dados de movimentação mensal para gráficos"""
-    from dateutil.relativedelta import relativedelta
-    
-    # Últimos 6 meses
-    hoje = datetime.now()
-    meses = []
-    dados = []
-    
-    # Nome do mês em português
-    nomes_meses = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                  'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    
-    for i in range(5, -1, -1):
-        # Calcular o mês corretamente usando relativedelta
-        mes_data = hoje - relativedelta(months=i)
-        mes_num = mes_data.month
-        ano = mes_data.year
-        
-        meses.append(nomes_meses[mes_num])
-        
-        # Calcular início e fim do mês para filtro correto
-        inicio_mes = datetime(ano, mes_num, 1)
-        if mes_num == 12:
-            fim_mes = datetime(ano + 1, 1, 1)
-        else:
-            fim_mes = datetime(ano, mes_num + 1, 1)
-        
-        # Contar solicitações aprovadas no mês usando range de datas
-        count = Solicitacao.query.filter(
-            Solicitacao.data_envio >= inicio_mes,
-            Solicitacao.data_envio < fim_mes,
-            Solicitacao.status == 'aprovada'
-        ).count()
-        
-        dados.append(count)
-    
+    from app.services.dashboard_service import ultimos_meses, serie_mensal_solicitacoes
+
+    # Últimos 6 meses, lidos do resumo mensal pré-calculado
+    serie = serie_mensal_solicitacoes(ultimos_meses(6))
+
     return jsonify({
-        'labels': meses,
-        'data': dados
+        'labels': [m['mes'] for m in serie],
+        'data': [m['aprovadas'] for m in serie]
     }), 200
 
 @bp.route('/financeiro', methods=['GET'])
@@ -133,72 +40,11 @@ def obter_metricas_financeiras():
     mes_anterior = mes_atual - relativedelta(months=1)
     inicio_semana = hoje - timedelta(days=hoje.weekday())
     
-    compradores = Usuario.query.filter(
-        Usuario.tipo.in_(['admin', 'funcionario']),
-        Usuario.ativo == True
-    ).all()
+    from app.services.dashboard_service import gastos_por_comprador as calcular_gastos_por_comprador
+    gastos_por_comprador = calcular_gastos_por_comprador(mes_atual, inicio_semana)
     
-    gastos_por_comprador = []
-    for comprador in compradores:
-        valor_mes = db.session.query(func.sum(Lote.valor_total)).join(
-            Fornecedor, Lote.fornecedor_id == Fornecedor.id
-        ).filter(
-            Fornecedor.comprador_responsavel_id == comprador.id,
-            Lote.data_criacao >= mes_atual,
-            Lote.status == 'aprovado'
-        ).scalar() or 0
-        
-        valor_semana = db.session.query(func.sum(Lote.valor_total)).join(
-            Fornecedor, Lote.fornecedor_id == Fornecedor.id
-        ).filter(
-            Fornecedor.comprador_responsavel_id == comprador.id,
-            Lote.data_criacao >= inicio_semana,
-            Lote.status == 'aprovado'
-        ).scalar() or 0
-        
-        qtd_compras = db.session.query(func.count(Lote.id)).join(
-            Fornecedor, Lote.fornecedor_id == Fornecedor.id
-        ).filter(
-            Fornecedor.comprador_responsavel_id == comprador.id,
-            Lote.data_criacao >= mes_atual,
-            Lote.status == 'aprovado'
-        ).scalar() or 0
-        
-        ticket_medio = (float(valor_mes) / qtd_compras) if qtd_compras > 0 else 0
-        
-        gastos_por_comprador.append({
-            'nome': comprador.nome,
-            'valor_mes': float(valor_mes),
-            'valor_semana': float(valor_semana),
-            'qtd_compras': qtd_compras,
-            'ticket_medio': ticket_medio
-        })
-    
-    gastos_mensais_ultimos_6_meses = []
-    nomes_meses = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                  'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    
-    for i in range(5, -1, -1):
-        mes_data = hoje - relativedelta(months=i)
-        mes_num = mes_data.month
-        ano = mes_data.year
-        
-        inicio_mes = datetime(ano, mes_num, 1)
-        if mes_num == 12:
-            fim_mes = datetime(ano + 1, 1, 1)
-        else:
-            fim_mes = datetime(ano, mes_num + 1, 1)
-        
-        valor_total = db.session.query(func.sum(Lote.valor_total)).filter(
-            Lote.data_criacao >= inicio_mes,
-            Lote.data_criacao < fim_mes,
-            Lote.status == 'aprovado'
-        ).scalar() or 0
-        
-        gastos_mensais_ultimos_6_meses.append({
-            'mes': nomes_meses[mes_num],
-            'valor': float(valor_total)
-        })
+    from app.services.dashboard_service import ultimos_meses, serie_mensal_lotes_aprovados
+    gastos_mensais_ultimos_6_meses = serie_mensal_lotes_aprovados(ultimos_meses(6))
     
     total_gasto_mes = sum([c['valor_mes'] for c in gastos_por_comprador])
     total_compras_mes = sum([c['qtd_compras'] for c in gastos_por_comprador])
@@ -377,37 +223,8 @@ def obter_metricas_operacionais():
         EntradaEstoque.data_entrada.isnot(None)
     ).scalar() or 0
     
-    nomes_meses = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 
-                  'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
-    
-    solicitacoes_por_mes = []
-    for i in range(5, -1, -1):
-        mes_data = hoje - relativedelta(months=i)
-        mes_num = mes_data.month
-        ano = mes_data.year
-        
-        inicio_mes = datetime(ano, mes_num, 1)
-        if mes_num == 12:
-            fim_mes = datetime(ano + 1, 1, 1)
-        else:
-            fim_mes = datetime(ano, mes_num + 1, 1)
-        
-        total_mes = Solicitacao.query.filter(
-            Solicitacao.data_envio >= inicio_mes,
-            Solicitacao.data_envio < fim_mes
-        ).count()
-        
-        aprovadas_mes = Solicitacao.query.filter(
-            Solicitacao.data_envio >= inicio_mes,
-            Solicitacao.data_envio < fim_mes,
-            Solicitacao.status == 'aprovada'
-        ).count()
-        
-        solicitacoes_por_mes.append({
-            'mes': nomes_meses[mes_num],
-            'total': total_mes,
-            'aprovadas': aprovadas_mes
-        })
+    from app.services.dashboard_service import ultimos_meses, serie_mensal_solicitacoes
+    solicitacoes_por_mes = serie_mensal_solicitacoes(ultimos_meses(6))
     
     return jsonify({
         'total_solicitacoes_mes': total_solicitacoes,
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Lote, MovimentacaoEstoque, Usuario
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 from datetime import datetime
 
 bp = Blueprint('estoque', __name__, url_prefix='/api/estoque')
@@ -186,7 +186,7 @@ def listar_movimentacoes():
 def criar_movimentacao():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         perfil_nome = usuario.perfil.nome if usuario.perfil else None
         if perfil_nome not in ['Conferente / Estoque', 'Administrador'] and usuario.tipo != 'admin':
@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.models import OrdemProducao, BagProducao
+from app.auth import get_current_user
+from app.services.fila_separacao import montar_fila
+from app.services.filas_tempo_real import usuario_pode_acessar, versao_fila
+import logging
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint('filas', __name__, url_prefix='/api/filas')
+
+def _fila_separacao():
+    aguardando, _ = montar_fila('AGUARDANDO_SEPARACAO')
+    em_separacao, _ = montar_fila('EM_SEPARACAO')
+    return {'separacoes': aguardando + em_separacao}
+
+def _fila_producao():
+    ordens = OrdemProducao.query.filter(
+        OrdemProducao.status.in_(['aberta', 'em_separacao'])
+    ).order_by(OrdemProducao.data_abertura.desc()).all()
+    bags = BagProducao.query.filter(
+        BagProducao.status.in_(['aberto', 'cheio'])
+    ).order_by(BagProducao.data_criacao.desc()).all()
+    return {
+        'ordens': [ordem.to_dict() for ordem in ordens],
+        'bags': [bag.to_dict() for bag in bags]
+    }
+
+CONTEUDO_FILAS = {
+    'separacao': _fila_separacao,
+    'producao': _fila_producao,
+}
+
+@bp.route('/<fila>/sincronizar', methods=['GET'])
+@jwt_required()
+def sincronizar_fila(fila):
+    """
+    Ressincronização do tablet ao reconectar no Socket.IO.
+
+    Parâmetro versao: a última versão que o tablet recebeu (evento fila_<fila> ou
+    resposta de entrar_fila). Se a fila não mudou, devolve {'versao', 'alterada': false};
+    senão devolve também o trabalho em aberto da fila (separações aguardando e em
+    andamento, ou OPs abertas/em separação e bags abertos/cheios).
+    """
+    try:
+        usuario = get_current_user()
+        if fila not in CONTEUDO_FILAS:
+            return jsonify({'erro': 'Fila não encontrada'}), 404
+        if not usuario_pode_acessar(usuario, fila):
+            return jsonify({'erro': 'Acesso negado a esta fila'}), 403
+
+        versao_cliente = request.args.get('versao', type=int)
+        # Versão lida antes do conteúdo: se algo mudar no meio, o tablet só recebe uma fila mais nova
+        versao = versao_fila(fila)
+        if versao_cliente == versao:
+            return jsonify({'fila': fila, 'versao': versao, 'alterada': False}), 200
+
+        return jsonify({'fila': fila, 'versao': versao, 'alterada': True, **CONTEUDO_FILAS[fila]()}), 200
+
+    except Exception as e:
+        logger.error(f'Erro ao sincronizar fila {fila}: {str(e)}')
+        return jsonify({'erro': f'Erro ao sincronizar fila: {str(e)}'}), 500
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, FornecedorTabelaPrecos, AuditoriaFornecedorTabelaPrecos, Fornecedor, MaterialBase, Usuario, Notificacao, TabelaPrecoItem, TabelaPreco, FornecedorFuncionarioAtribuicao
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.importacao_tabela_precos import notificar_admins_nova_tabela
+from app.services.importacao_arquivos import iniciar_importacao
 import pandas as pd
 from io import BytesIO
 from datetime import datetime
@@ -47,23 +49,6 @@ def verificar_acesso_fornecedor(fornecedor_id, usuario_id):
     
     return atribuicao is not None
 
-def notificar_admins_nova_tabela(fornecedor, usuario_criador):
-    """Cria notificação para todos os admins sobre nova tabela de preços"""
-    admins = Usuario.query.filter_by(tipo='admin', ativo=True).all()
-    
-    for admin in admins:
-        if admin.id == usuario_criador.id:
-            continue
-            
-        notificacao = Notificacao(
-            usuario_id=admin.id,
-            titulo='Nova Tabela de Preços',
-            mensagem=f'Tabela de preços adicionada para o fornecedor {fornecedor.nome} por {usuario_criador.nome}',
-            tipo='tabela_precos',
-            url='/revisao-tabelas-admin.html'
-        )
-        db.session.add(notificacao)
-
 @bp.route('/fornecedor/<int:fornecedor_id>', methods=['GET'])
 @jwt_required()
 def listar_precos_fornecedor(fornecedor_id):
@@ -109,7 +94,7 @@ def adicionar_preco(fornecedor_id):
     """Adiciona um novo preço para um material do fornecedor"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not verificar_acesso_fornecedor(fornecedor_id, usuario_id):
             return jsonify({'erro': 'Acesso negado a este fornecedor'}), 403
@@ -172,7 +157,7 @@ def adicionar_precos_lote(fornecedor_id):
     """Adiciona múltiplos preços de uma vez (para upload manual ou importação)"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         logger.info(f'🔍 Tentando adicionar preços em lote - Usuário: {usuario_id}, Fornecedor: {fornecedor_id}')
         
@@ -283,10 +268,9 @@ def adicionar_precos_lote(fornecedor_id):
 @bp.route('/fornecedor/<int:fornecedor_id>/upload', methods=['POST'])
 @jwt_required()
 def upload_tabela_precos(fornecedor_id):
-    """Upload de arquivo CSV/XLSX com tabela de preços"""
+    """Upload de arquivo CSV/XLSX com tabela de preços (processado em segundo plano, em blocos)"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
         
         if not verificar_acesso_fornecedor(fornecedor_id, usuario_id):
             return jsonify({'erro': 'Acesso negado a este fornecedor'}), 403
@@ -308,106 +292,12 @@ def upload_tabela_precos(fornecedor_id):
         if extensao not in ['csv', 'xlsx', 'xls']:
             return jsonify({'erro': 'Formato de arquivo inválido. Use CSV ou XLSX'}), 400
         
-        try:
-            if extensao == 'csv':
-                df = pd.read_csv(arquivo, encoding='utf-8')
-            else:
-                df = pd.read_excel(arquivo)
-        except Exception as e:
-            return jsonify({'erro': f'Erro ao ler arquivo: {str(e)}'}), 400
-        
-        colunas_obrigatorias = ['material', 'preco']
-        colunas_arquivo = [col.lower().strip() for col in df.columns]
-        
-        coluna_material = None
-        coluna_preco = None
-        
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            if col_lower in ['material', 'nome_material', 'nome do material', 'material_nome']:
-                coluna_material = col
-            if col_lower in ['preco', 'preco_kg', 'preco por kg', 'preco_fornecedor', 'valor']:
-                coluna_preco = col
-        
-        if not coluna_material or not coluna_preco:
-            return jsonify({
-                'erro': 'Colunas obrigatórias não encontradas. O arquivo deve ter colunas: material, preco'
-            }), 400
-        
-        precos_criados = []
-        erros = []
-        
-        for idx, row in df.iterrows():
-            try:
-                nome_material = str(row[coluna_material]).strip()
-                preco_valor = row[coluna_preco]
-                
-                if pd.isna(nome_material) or nome_material == '':
-                    continue
-                
-                if pd.isna(preco_valor):
-                    erros.append(f'Linha {idx + 2}: Preço inválido para material "{nome_material}"')
-                    continue
-                
-                material = MaterialBase.query.filter(
-                    db.or_(
-                        MaterialBase.nome.ilike(nome_material),
-                        MaterialBase.codigo.ilike(nome_material)
-                    )
-                ).first()
-                
-                if not material:
-                    erros.append(f'Linha {idx + 2}: Material "{nome_material}" não encontrado')
-                    continue
-                
-                try:
-                    preco_float = float(str(preco_valor).replace(',', '.').replace('R$', '').strip())
-                except:
-                    erros.append(f'Linha {idx + 2}: Preço inválido "{preco_valor}"')
-                    continue
-                
-                if preco_float < 0:
-                    erros.append(f'Linha {idx + 2}: Preço não pode ser negativo')
-                    continue
-                
-                preco_existente = FornecedorTabelaPrecos.query.filter_by(
-                    fornecedor_id=fornecedor_id,
-                    material_id=material.id,
-                    status='ativo'
-                ).first()
-                
-                if preco_existente:
-                    preco_existente.status = 'inativo'
-                    preco_existente.updated_by = usuario_id
-                    nova_versao = preco_existente.versao + 1
-                else:
-                    nova_versao = 1
-                
-                novo_preco = FornecedorTabelaPrecos(
-                    fornecedor_id=fornecedor_id,
-                    material_id=material.id,
-                    preco_fornecedor=preco_float,
-                    status='pendente_aprovacao',
-                    versao=nova_versao,
-                    created_by=usuario_id
-                )
-                
-                db.session.add(novo_preco)
-                precos_criados.append(novo_preco)
-                
-            except Exception as e:
-                erros.append(f'Linha {idx + 2}: Erro ao processar - {str(e)}')
-        
-        if precos_criados:
-            notificar_admins_nova_tabela(fornecedor, usuario)
-            db.session.commit()
+        importacao = iniciar_importacao('tabela_precos_fornecedor', arquivo, usuario_id, fornecedor_id=fornecedor_id)
         
         return jsonify({
-            'sucesso': len(precos_criados),
-            'total_linhas': len(df),
-            'erros': erros,
-            'precos': [p.to_dict() for p in precos_criados]
-        }), 201 if precos_criados else 400
+            'mensagem': 'Arquivo recebido. A importação está sendo processada.',
+            'importacao': importacao.to_dict()
+        }), 202
         
     except Exception as e:
         db.session.rollback()
@@ -503,7 +393,7 @@ def reenviar_tabela(fornecedor_id):
         
         fornecedor.tabela_preco_status = 'pendente_aprovacao'
         
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         notificar_admins_nova_tabela(fornecedor, usuario)
         
         db.session.commit()
@@ -869,7 +759,7 @@ def admin_editar_preco(preco_id):
     """Admin edita um preço e notifica o comprador sobre a alteração"""
     try:
         usuario_id = get_jwt_identity()
-        admin = Usuario.query.get(usuario_id)
+        admin = get_current_user()
         
         preco = FornecedorTabelaPrecos.query.get(preco_id)
         if not preco:
@@ -988,7 +878,7 @@ def rejeitar_tabela_completa(fornecedor_id):
     """Rejeita a tabela de preços e solicita reenvio"""
     try:
         usuario_id = get_jwt_identity()
-        admin = Usuario.query.get(usuario_id)
+        admin = get_current_user()
         
         fornecedor = Fornecedor.query.get(fornecedor_id)
         if not fornecedor:
@@ -1055,7 +945,7 @@ def listar_fornecedores_aprovados():
     """Lista apenas fornecedores com tabela de preços aprovada"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
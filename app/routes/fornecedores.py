@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import Fornecedor, FornecedorTipoLotePreco, FornecedorTipoLoteClassificacao, Vendedor, TipoLote, Usuario, FornecedorFuncionarioAtribuicao, db
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.busca_fornecedor_service import aplicar_busca
+from sqlalchemy.orm import joinedload
 import requests
 import re
 import logging
@@ -85,62 +87,61 @@ def verificar_conflito_endereco(rua, numero, cidade, estado, cep, fornecedor_id_
     if not rua or not cidade or not estado:
         return None
     
-    cep_normalizado = re.sub(r'[^\d]', '', cep) if cep else None
-    rua_normalizada = rua.strip().lower() if rua else ''
-    numero_normalizado = str(numero).strip() if numero else ''
-    cidade_normalizada = cidade.strip().lower() if cidade else ''
-    estado_normalizado = estado.strip().upper() if estado else ''
+    endereco = Fornecedor.normalizar_endereco(rua, numero, cidade, estado, cep)
     
-    query = Fornecedor.query.filter(
-        Fornecedor.ativo == True
+    criterio = db.and_(
+        Fornecedor.rua_normalizada == endereco['rua_normalizada'],
+        Fornecedor.numero_normalizado == endereco['numero_normalizado'],
+        Fornecedor.cidade_normalizada == endereco['cidade_normalizada'],
+        Fornecedor.estado_normalizado == endereco['estado_normalizado']
+    )
+    
+    if endereco['cep_normalizado']:
+        criterio = db.or_(
+            criterio,
+            db.and_(
+                Fornecedor.cep_normalizado == endereco['cep_normalizado'],
+                Fornecedor.numero_normalizado == endereco['numero_normalizado']
+            )
+        )
+    
+    query = db.session.query(
+        Fornecedor.id,
+        Fornecedor.nome,
+        Fornecedor.rua,
+        Fornecedor.numero,
+        Fornecedor.cidade,
+        Fornecedor.estado,
+        Usuario.nome.label('comprador_nome')
+    ).outerjoin(
+        Usuario, Usuario.id == Fornecedor.comprador_responsavel_id
+    ).filter(
+        Fornecedor.ativo == True,
+        criterio
     )
     
     if fornecedor_id_excluir:
         query = query.filter(Fornecedor.id != fornecedor_id_excluir)
     
-    fornecedores = query.all()
+    fornecedor = query.order_by(Fornecedor.id).first()
     
-    for fornecedor in fornecedores:
-        fornecedor_rua = (fornecedor.rua or '').strip().lower()
-        fornecedor_numero = str(fornecedor.numero or '').strip()
-        fornecedor_cidade = (fornecedor.cidade or '').strip().lower()
-        fornecedor_estado = (fornecedor.estado or '').strip().upper()
-        fornecedor_cep = re.sub(r'[^\d]', '', fornecedor.cep) if fornecedor.cep else None
-        
-        endereco_igual = (
-            rua_normalizada == fornecedor_rua and
-            numero_normalizado == fornecedor_numero and
-            cidade_normalizada == fornecedor_cidade and
-            estado_normalizado == fornecedor_estado
-        )
-        
-        if cep_normalizado and fornecedor_cep:
-            endereco_igual = endereco_igual or (
-                cep_normalizado == fornecedor_cep and
-                numero_normalizado == fornecedor_numero
-            )
-        
-        if endereco_igual:
-            comprador_nome = 'Não atribuído'
-            if fornecedor.comprador_responsavel_id:
-                comprador = Usuario.query.get(fornecedor.comprador_responsavel_id)
-                if comprador:
-                    comprador_nome = comprador.nome
-            
-            mensagem = f'CNPJ já cadastrado\n'
-            mensagem += f'Fornecedor: {fornecedor.nome}\n'
-            mensagem += f'Comprador Responsável: {comprador_nome}\n'
-            mensagem += f'Endereço: {fornecedor.rua}, {fornecedor.numero} - {fornecedor.cidade}/{fornecedor.estado}'
-            
-            return {
-                'conflito': True,
-                'fornecedor_id': fornecedor.id,
-                'fornecedor_nome': fornecedor.nome,
-                'comprador_responsavel': comprador_nome,
-                'mensagem': mensagem
-            }
+    if not fornecedor:
+        return None
+    
+    comprador_nome = fornecedor.comprador_nome or 'Não atribuído'
     
-    return None
+    mensagem = f'CNPJ já cadastrado\n'
+    mensagem += f'Fornecedor: {fornecedor.nome}\n'
+    mensagem += f'Comprador Responsável: {comprador_nome}\n'
+    mensagem += f'Endereço: {fornecedor.rua}, {fornecedor.numero} - {fornecedor.cidade}/{fornecedor.estado}'
+    
+    return {
+        'conflito': True,
+        'fornecedor_id': fornecedor.id,
+        'fornecedor_nome': fornecedor.nome,
+        'comprador_responsavel': comprador_nome,
+        'mensagem': mensagem
+    }
 
 @bp.route('/verificar-endereco', methods=['POST'])
 @jwt_required()
@@ -235,7 +236,7 @@ def buscar_cep(cep):
 def listar_fornecedores():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -255,17 +256,6 @@ def listar_fornecedores():
                 Fornecedor.comprador_responsavel_id == usuario_id
             )
         
-        if busca:
-            query = query.filter(
-                db.or_(
-                    Fornecedor.nome.ilike(f'%{busca}%'),
-                    Fornecedor.nome_social.ilike(f'%{busca}%'),
-                    Fornecedor.cnpj.ilike(f'%{busca}%'),
-                    Fornecedor.cpf.ilike(f'%{busca}%'),
-                    Fornecedor.email.ilike(f'%{busca}%')
-                )
-            )
-        
         if vendedor_id:
             query = query.filter_by(vendedor_id=vendedor_id)
         
@@ -278,7 +268,27 @@ def listar_fornecedores():
         if condicao_pagamento:
             query = query.filter_by(condicao_pagamento=condicao_pagamento)
         
-        fornecedores = query.order_by(Fornecedor.nome).all()
+        query = aplicar_busca(query, busca).options(
+            joinedload(Fornecedor.vendedor),
+            joinedload(Fornecedor.criado_por),
+            joinedload(Fornecedor.tabela_preco),
+            joinedload(Fornecedor.comprador_responsavel),
+            joinedload(Fornecedor.tabela_preco_aprovada_por)
+        )
+        
+        # Paginação opcional (typeahead): sem 'page' a resposta continua sendo a lista completa
+        if 'page' in request.args:
+            page = request.args.get('page', 1, type=int)
+            per_page = min(request.args.get('per_page', 20, type=int), 100)
+            fornecedores_pag = query.paginate(page=page, per_page=per_page, error_out=False)
+            return jsonify({
+                'fornecedores': [fornecedor.to_dict() for fornecedor in fornecedores_pag.items],
+                'total': fornecedores_pag.total,
+                'pages': fornecedores_pag.pages,
+                'current_page': page
+            }), 200
+        
+        fornecedores = query.all()
         return jsonify([fornecedor.to_dict() for fornecedor in fornecedores]), 200
     
     except Exception as e:
@@ -289,7 +299,7 @@ def listar_fornecedores():
 def obter_fornecedor(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         print(f"\n{'='*60}")
         print(f" ENDPOINT: GET /fornecedores/{id}")
@@ -397,7 +407,7 @@ def criar_fornecedor():
                 return jsonify({'erro': 'E-mail já cadastrado para outro fornecedor'}), 400
         
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -531,7 +541,7 @@ def criar_fornecedor():
 def atualizar_fornecedor(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.auth import get_current_user
+from app.models import ImportacaoArquivo, Usuario
+
+bp = Blueprint('importacoes', __name__, url_prefix='/api/importacoes')
+
+@bp.route('/<int:id>', methods=['GET'])
+@jwt_required()
+def obter_importacao(id):
+    """Andamento de uma importação de planilha em segundo plano"""
+    usuario_id = int(get_jwt_identity())
+    usuario = get_current_user()
+
+    importacao = ImportacaoArquivo.query.get(id)
+    if not importacao:
+        return jsonify({'erro': 'Importação não encontrada'}), 404
+
+    if importacao.usuario_id != usuario_id and (not usuario or usuario.tipo != 'admin'):
+        return jsonify({'erro': 'Acesso negado'}), 403
+
+    return jsonify(importacao.to_dict()), 200
+
+@bp.route('', methods=['GET'])
+@jwt_required()
+def listar_importacoes():
+    """Últimas importações do usuário logado"""
+    usuario_id = int(get_jwt_identity())
+
+    importacoes = ImportacaoArquivo.query.filter_by(
+        usuario_id=usuario_id
+    ).order_by(ImportacaoArquivo.data_criacao.desc()).limit(20).all()
+
+    return jsonify([importacao.to_dict() for importacao in importacoes]), 200
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Lote, ItemSolicitacao, Solicitacao, EntradaEstoque, Usuario, db
+from app.models import Lote, ItemSolicitacao, Solicitacao, EntradaEstoque, Usuario, Fornecedor, TipoLote, db
 from app.auth import admin_required
-from datetime import datetime
+from app.utils.exportacao import ler_em_blocos, resposta_exportacao
+from datetime import datetime, timedelta
 import uuid
 
 bp = Blueprint('lotes', __name__, url_prefix='/api/lotes')
@@ -39,6 +40,70 @@ def listar_lotes():
     except Exception as e:
         return jsonify({'erro': f'Erro ao listar lotes: {str(e)}'}), 500
 
+@bp.route('/exportar', methods=['GET'])
+@jwt_required()
+def exportar_lotes():
+    """Lotes com os filtros da listagem e período de criação (data_inicio/data_fim, AAAA-MM-DD), em streaming"""
+    query = db.session.query(
+        Lote.id,
+        Lote.numero_lote,
+        Lote.data_criacao,
+        Fornecedor.nome.label('fornecedor_nome'),
+        TipoLote.nome.label('tipo_lote_nome'),
+        Lote.status,
+        Lote.peso_total_kg,
+        Lote.peso_liquido,
+        Lote.valor_total,
+        Lote.quantidade_itens,
+        Lote.classificacao_predominante,
+        Lote.localizacao_atual,
+        Lote.oc_id
+    ).outerjoin(
+        Fornecedor, Fornecedor.id == Lote.fornecedor_id
+    ).outerjoin(
+        TipoLote, TipoLote.id == Lote.tipo_lote_id
+    )
+    
+    status = request.args.get('status', '')
+    fornecedor_id = request.args.get('fornecedor_id', type=int)
+    tipo_lote_id = request.args.get('tipo_lote_id', type=int)
+    if status:
+        query = query.filter(Lote.status == status)
+    if fornecedor_id:
+        query = query.filter(Lote.fornecedor_id == fornecedor_id)
+    if tipo_lote_id:
+        query = query.filter(Lote.tipo_lote_id == tipo_lote_id)
+    
+    try:
+        if request.args.get('data_inicio'):
+            query = query.filter(Lote.data_criacao >= datetime.strptime(request.args['data_inicio'], '%Y-%m-%d'))
+        if request.args.get('data_fim'):
+            query = query.filter(Lote.data_criacao < datetime.strptime(request.args['data_fim'], '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        return jsonify({'erro': 'Data inválida (use AAAA-MM-DD)'}), 400
+    
+    linhas = (
+        [
+            lote.id,
+            lote.numero_lote,
+            lote.data_criacao.strftime('%d/%m/%Y %H:%M') if lote.data_criacao else '',
+            lote.fornecedor_nome or '',
+            lote.tipo_lote_nome or '',
+            lote.status,
+            lote.peso_total_kg,
+            lote.peso_liquido,
+            round(lote.valor_total or 0, 2),
+            lote.quantidade_itens,
+            lote.classificacao_predominante or '',
+            lote.localizacao_atual or '',
+            lote.oc_id
+        ]
+        for lote in ler_em_blocos(query.order_by(Lote.data_criacao.desc()))
+    )
+    colunas = ['ID', 'Número', 'Criado em', 'Fornecedor', 'Tipo de Lote', 'Status', 'Peso Total (kg)',
+               'Peso Líquido (kg)', 'Valor Total (R$)', 'Itens', 'Classificação', 'Localização', 'OC']
+    return resposta_exportacao(colunas, linhas, request.args.get('formato', 'xlsx'), 'lotes', aba='Lotes')
+
 @bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
 def obter_lote(id):
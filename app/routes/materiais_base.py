@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, MaterialBase, TabelaPreco, TabelaPrecoItem, Usuario
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 import pandas as pd
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
@@ -57,7 +57,7 @@ def listar_materiais():
     """Lista todos os materiais base ativos - SEM informações de preços para compradores"""
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         materiais = MaterialBase.query.filter_by(ativo=True).order_by(MaterialBase.nome).all()
 
@@ -1,260 +1,21 @@
 from flask import Blueprint, jsonify, request
-import requests
-import os
-from datetime import datetime, timedelta
-from functools import lru_cache
-import time
-import json
-import urllib3
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from datetime import datetime, timedelta, timezone
+from app.services.cotacoes_metais import (
+    METAL_SYMBOLS,
+    USD_BRL_PADRAO,
+    fetch_metals_data
+)
+from app.services.historico_metais import (
+    historico_por_dia,
+    estatisticas_por_simbolo,
+    cotacoes_do_dia,
+    consultar_serie,
+    PERIODOS,
+    LIMITE_PONTOS
+)
 
 bp = Blueprint('metais', __name__, url_prefix='/api/metais')
 
-METALS_CACHE = {
-    'data': None,
-    'timestamp': 0,
-    'history': {}
-}
-CACHE_DURATION = 60
-
-METAL_SYMBOLS = {
-    'XAU': {
-        'name': 'Ouro', 
-        'icon': 'gold', 
-        'color': '#FFD700',
-        'fonte_ewaste': 'Placas de circuito, conectores, processadores, memoria RAM',
-        'concentracao': 'Alta em placas-mae e processadores'
-    },
-    'XAG': {
-        'name': 'Prata', 
-        'icon': 'silver', 
-        'color': '#C0C0C0',
-        'fonte_ewaste': 'Contatos eletricos, soldas, teclas de membrana, paineis solares',
-        'concentracao': 'Media em teclados e interruptores'
-    },
-    'XPT': {
-        'name': 'Platina', 
-        'icon': 'platinum', 
-        'color': '#E5E4E2',
-        'fonte_ewaste': 'Discos rigidos, termopares, sensores',
-        'concentracao': 'Baixa, principalmente em HDDs antigos'
-    },
-    'XPD': {
-        'name': 'Paladio', 
-        'icon': 'palladium', 
-        'color': '#CED0DD',
-        'fonte_ewaste': 'Capacitores ceramicos, conectores, reles',
-        'concentracao': 'Media em capacitores MLCC'
-    },
-    'XCU': {
-        'name': 'Cobre', 
-        'icon': 'copper', 
-        'color': '#B87333',
-        'fonte_ewaste': 'Fios, cabos, trilhas de PCB, motores, transformadores',
-        'concentracao': 'Muito alta em todos os eletronicos'
-    },
-    'SN': {
-        'name': 'Estanho', 
-        'icon': 'tin', 
-        'color': '#D3D3D3',
-        'fonte_ewaste': 'Soldas, revestimentos de componentes',
-        'concentracao': 'Alta em placas soldadas'
-    },
-    'NI': {
-        'name': 'Niquel', 
-        'icon': 'nickel', 
-        'color': '#848482',
-        'fonte_ewaste': 'Baterias NiMH/NiCd, revestimentos, acos inox',
-        'concentracao': 'Alta em baterias recarregaveis'
-    },
-    'CO': {
-        'name': 'Cobalto', 
-        'icon': 'cobalt', 
-        'color': '#0047AB',
-        'fonte_ewaste': 'Baterias de litio-ion, imas permanentes',
-        'concentracao': 'Alta em baterias de celulares e notebooks'
-    },
-    'AL': {
-        'name': 'Aluminio', 
-        'icon': 'aluminum', 
-        'color': '#A9A9A9',
-        'fonte_ewaste': 'Dissipadores de calor, carcacas, capacitores eletroliticos',
-        'concentracao': 'Muito alta em estruturas e refrigeracao'
-    },
-    'TA': {
-        'name': 'Tantalo', 
-        'icon': 'tantalum', 
-        'color': '#4A4A4A',
-        'fonte_ewaste': 'Capacitores de tantalo, celulares, notebooks',
-        'concentracao': 'Media em capacitores SMD'
-    },
-    'IN': {
-        'name': 'Indio', 
-        'icon': 'indium', 
-        'color': '#4B0082',
-        'fonte_ewaste': 'Telas LCD/LED, paineis touch, soldas especiais',
-        'concentracao': 'Media em displays'
-    },
-    'GA': {
-        'name': 'Galio', 
-        'icon': 'gallium', 
-        'color': '#6B8E23',
-        'fonte_ewaste': 'LEDs, semicondutores GaAs, celulares',
-        'concentracao': 'Baixa em chips especializados'
-    }
-}
-
-def get_metals_live_api():
-    try:
-        response = requests.get('https://api.metals.live/v1/spot', timeout=10, verify=False)
-        if response.status_code == 200:
-            data = response.json()
-            if not data or not isinstance(data, list):
-                return None
-            result = {}
-            for item in data:
-                if not item or not isinstance(item, dict):
-                    continue
-                symbol = item.get('symbol', '').upper()
-                if symbol in METAL_SYMBOLS:
-                    result[symbol] = {
-                        'price_usd': float(item.get('price', 0)),
-                        'name': METAL_SYMBOLS[symbol]['name'],
-                        'source': 'metals.live'
-                    }
-            if result:
-                return result
-    except Exception as e:
-        print(f"Erro ao buscar metals.live: {e}")
-    return None
-
-def get_gold_api_free():
-    try:
-        response = requests.get('https://api.goldpricez.com/v1/rates/currency/usd/metal/xau', timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'price_gram_24k' in data:
-                price_per_gram = float(data['price_gram_24k'])
-                price_per_oz = price_per_gram * 31.1035
-                return {
-                    'XAU': {
-                        'price_usd': price_per_oz,
-                        'name': 'Ouro',
-                        'source': 'goldpricez'
-                    }
-                }
-    except Exception as e:
-        print(f"Erro ao buscar goldpricez: {e}")
-    return None
-
-def get_awesome_api_currencies():
-    try:
-        response = requests.get('https://economia.awesomeapi.com.br/json/last/USD-BRL', timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            if 'USDBRL' in data:
-                return float(data['USDBRL']['bid'])
-    except Exception as e:
-        print(f"Erro ao buscar taxa USD/BRL: {e}")
-    return 5.0
-
-def get_simulated_metals_data():
-    import random
-    base_prices = {
-        'XAU': 2650.0,
-        'XAG': 31.5,
-        'XPT': 1020.0,
-        'XPD': 1050.0,
-        'XCU': 4.2,
-        'SN': 28.5,
-        'NI': 8.2,
-        'CO': 14.5,
-        'AL': 1.15,
-        'TA': 180.0,
-        'IN': 250.0,
-        'GA': 280.0
-    }
-    
-    result = {}
-    for symbol, base_price in base_prices.items():
-        if symbol not in METAL_SYMBOLS:
-            continue
-        variation = random.uniform(-0.02, 0.02)
-        price = base_price * (1 + variation)
-        metal_info = METAL_SYMBOLS[symbol]
-        result[symbol] = {
-            'price_usd': round(price, 2),
-            'name': metal_info['name'],
-            'color': metal_info.get('color', '#888888'),
-            'fonte_ewaste': metal_info.get('fonte_ewaste', ''),
-            'concentracao': metal_info.get('concentracao', ''),
-            'source': 'simulated'
-        }
-    return result
-
-def fetch_metals_data():
-    current_time = time.time()
-    
-    if METALS_CACHE['data'] and (current_time - METALS_CACHE['timestamp']) < CACHE_DURATION:
-        return METALS_CACHE['data']
-    
-    metals_data = get_metals_live_api()
-    
-    if not metals_data:
-        metals_data = get_gold_api_free()
-    
-    if not metals_data:
-        metals_data = get_simulated_metals_data()
-    
-    if not metals_data:
-        return {'metals': {}, 'usd_brl': 5.0, 'timestamp': datetime.now().isoformat(), 'source': 'none'}
-    
-    usd_brl = get_awesome_api_currencies()
-    
-    previous_cache = METALS_CACHE.get('previous') or {}
-    
-    for symbol, data in metals_data.items():
-        metal_info = METAL_SYMBOLS.get(symbol, {})
-        data['price_brl'] = round(data['price_usd'] * usd_brl, 2)
-        data['price_oz'] = data['price_usd']
-        data['price_gram_usd'] = round(data['price_usd'] / 31.1035, 4)
-        data['price_gram_brl'] = round(data['price_brl'] / 31.1035, 4)
-        data['price_kg_brl'] = round(data['price_gram_brl'] * 1000, 2)
-        data['symbol'] = symbol
-        data['color'] = metal_info.get('color', '#666')
-        data['fonte_ewaste'] = metal_info.get('fonte_ewaste', '')
-        data['concentracao'] = metal_info.get('concentracao', '')
-        
-        prev_metal = previous_cache.get(symbol) if isinstance(previous_cache, dict) else None
-        prev_price = prev_metal.get('price_usd', data['price_usd']) if isinstance(prev_metal, dict) else data['price_usd']
-        data['variation'] = round(((data['price_usd'] - prev_price) / prev_price) * 100, 2) if prev_price else 0
-        data['variation_absolute'] = round(data['price_usd'] - prev_price, 2)
-    
-    result = {
-        'metals': metals_data,
-        'usd_brl': usd_brl,
-        'timestamp': datetime.now().isoformat(),
-        'source': list(metals_data.values())[0]['source'] if metals_data else 'none'
-    }
-    
-    cached_data = METALS_CACHE.get('data') or {}
-    METALS_CACHE['previous'] = cached_data.get('metals', {}) if isinstance(cached_data, dict) else {}
-    METALS_CACHE['data'] = result
-    METALS_CACHE['timestamp'] = current_time
-    
-    today = datetime.now().strftime('%Y-%m-%d')
-    if today not in METALS_CACHE['history']:
-        METALS_CACHE['history'][today] = []
-    METALS_CACHE['history'][today].append({
-        'time': datetime.now().strftime('%H:%M:%S'),
-        'metals': {k: v['price_usd'] for k, v in metals_data.items()}
-    })
-    
-    if len(METALS_CACHE['history'][today]) > 1440:
-        METALS_CACHE['history'][today] = METALS_CACHE['history'][today][-1440:]
-    
-    return result
-
 def generate_historical_data(days=30):
     import random
     history = {}
@@ -296,6 +57,14 @@ def generate_historical_data(days=30):
     
     return history
 
+def historico_com_simulacao(days):
+    """Histórico gravado (historico_metais); só os dias sem nenhuma cotação gravada ficam simulados"""
+    history = generate_historical_data(days)
+    for date, entries in historico_por_dia(days).items():
+        if entries:
+            history[date] = entries
+    return history
+
 @bp.route('/cotacoes', methods=['GET'])
 def get_cotacoes():
     try:
@@ -312,12 +81,7 @@ def get_historico():
         days = request.args.get('days', 7, type=int)
         days = min(days, 30)
         
-        history = generate_historical_data(days)
-        
-        real_history = METALS_CACHE.get('history') or {}
-        for date, entries in real_history.items():
-            if date in history and entries:
-                history[date] = entries
+        history = historico_com_simulacao(days)
         
         return jsonify({
             'history': history,
@@ -339,9 +103,29 @@ def calcular_combo():
         if not items:
             return jsonify({'error': 'Nenhum item fornecido para calculo'}), 400
         
-        metals_data = fetch_metals_data()
-        metals = metals_data.get('metals', {})
-        usd_brl = metals_data.get('usd_brl', 5.0)
+        data_cotacao = data.get('data')
+        if data_cotacao:
+            # Combo pelo fechamento de um dia do histórico
+            try:
+                dia = datetime.strptime(data_cotacao, '%Y-%m-%d').date()
+            except (ValueError, TypeError):
+                return jsonify({'error': 'Data invalida (use AAAA-MM-DD)'}), 400
+            fechamentos = cotacoes_do_dia(dia)
+            if not fechamentos:
+                return jsonify({'error': 'Nao ha cotacoes gravadas para essa data'}), 404
+            usd_brl = next((f['usd_brl'] for f in fechamentos.values() if f['usd_brl']), USD_BRL_PADRAO)
+            metals = {
+                symbol: {
+                    'name': METAL_SYMBOLS.get(symbol, {}).get('name', symbol),
+                    'price_usd': f['price_usd'],
+                    'price_brl': f['price_usd'] * (f['usd_brl'] or usd_brl)
+                }
+                for symbol, f in fechamentos.items()
+            }
+        else:
+            metals_data = fetch_metals_data()
+            metals = metals_data.get('metals', {})
+            usd_brl = metals_data.get('usd_brl', 5.0)
         
         if not metals:
             return jsonify({'error': 'Nao foi possivel obter cotacoes dos metais'}), 500
@@ -408,6 +192,8 @@ def calcular_combo():
         result['total_oz'] = round(result['total_oz'], 4)
         result['usd_brl'] = usd_brl
         result['timestamp'] = datetime.now().isoformat()
+        if data_cotacao:
+            result['data_cotacao'] = data_cotacao
         
         return jsonify(result)
     except Exception as e:
@@ -451,11 +237,7 @@ def exportar_csv():
             csv_content += f"TOTAL,,,{round(total_usd, 2)},{round(total_brl, 2)}\n"
         elif export_type == 'historico':
             days = data.get('days', 7)
-            history = generate_historical_data(days)
-            real_history = METALS_CACHE.get('history') or {}
-            for date, entries in real_history.items():
-                if date in history and entries:
-                    history[date] = entries
+            history = historico_com_simulacao(days)
             metals_list = list(METAL_SYMBOLS.keys())
             csv_content = "Data,Hora," + ",".join(metals_list) + "\n"
             for date, entries in sorted(history.items()):
@@ -509,10 +291,14 @@ def manage_alertas():
 def get_estatisticas():
     try:
         days = request.args.get('days', 7, type=int)
+        real_stats = estatisticas_por_simbolo(days)
         history = generate_historical_data(days)
         
         stats = {}
         for symbol in METAL_SYMBOLS.keys():
+            if symbol in real_stats:
+                stats[symbol] = {'name': METAL_SYMBOLS[symbol]['name'], **real_stats[symbol]}
+                continue
             prices = []
             for date, entries in history.items():
                 for entry in entries:
@@ -535,3 +321,43 @@ def get_estatisticas():
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+def _data_utc(valor):
+    """Data ISO 8601 como datetime UTC sem fuso (o histórico é gravado em UTC)"""
+    data = datetime.fromisoformat(valor)
+    if data.tzinfo:
+        data = data.astimezone(timezone.utc).replace(tzinfo=None)
+    return data
+
+@bp.route('/serie', methods=['GET'])
+def get_serie():
+    """
+    Cotações gravadas (USD/oz) agregadas por período.
+    Parâmetros: simbolos (ex.: XAU,XAG; padrão todos), inicio e fim (ISO, UTC; padrão as
+    últimas 24 h) e granularidade (minuto, hora ou dia; padrão pela duração do intervalo).
+    Cada símbolo traz até limite_pontos pontos, os mais recentes; `truncado` indica se
+    algum foi cortado e `simbolos_truncados` quais.
+    """
+    try:
+        fim = _data_utc(request.args['fim']) if request.args.get('fim') else datetime.utcnow()
+        inicio = _data_utc(request.args['inicio']) if request.args.get('inicio') else fim - timedelta(days=1)
+    except ValueError:
+        return jsonify({'error': 'Datas invalidas (use ISO 8601)'}), 400
+    if inicio >= fim:
+        return jsonify({'error': 'inicio deve ser anterior a fim'}), 400
+
+    granularidade = request.args.get('granularidade') or None
+    if granularidade and granularidade not in PERIODOS:
+        return jsonify({'error': f'Granularidade invalida: use {", ".join(PERIODOS)}'}), 400
+
+    simbolos = [s.strip().upper() for s in request.args.get('simbolos', '').split(',') if s.strip()]
+    granularidade, serie, truncados = consultar_serie(simbolos, inicio, fim, granularidade)
+    return jsonify({
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'granularidade': granularidade,
+        'series': serie,
+        'limite_pontos': LIMITE_PONTOS,
+        'truncado': bool(truncados),
+        'simbolos_truncados': truncados
+    })
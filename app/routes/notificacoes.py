@@ -1,52 +1,85 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Notificacao, Usuario
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.notificacoes_nao_lidas import obter_nao_lidas, ajustar_nao_lidas
+from sqlalchemy import or_, and_
+from datetime import datetime
+import base64
 
 bp = Blueprint('notificacoes', __name__, url_prefix='/api/notificacoes')
 
+def _codificar_cursor_notificacao(notificacao):
+    bruto = f'{notificacao.data_envio.isoformat()}|{notificacao.id}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+def _decodificar_cursor_notificacao(cursor):
+    data_envio, notificacao_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(data_envio), int(notificacao_id)
+
 @bp.route('', methods=['GET'])
 @jwt_required()
 def listar_notificacoes():
-    usuario_id = get_jwt_identity()
-    usuario = Usuario.query.get(usuario_id)
-    
-    from app.services.notificacao_service import gerar_todas_notificacoes_pendentes
-    try:
-        if usuario.tipo == 'admin':
-            gerar_todas_notificacoes_pendentes()
-    except Exception as e:
-        print(f"Erro ao gerar notificações pendentes: {e}")
-    
-    if usuario.tipo == 'admin':
-        notificacoes = Notificacao.query.filter_by(
-            usuario_id=usuario_id
-        ).order_by(Notificacao.data_envio.desc()).all()
-    else:
-        notificacoes = Notificacao.query.filter_by(
-            usuario_id=usuario_id
-        ).order_by(Notificacao.data_envio.desc()).all()
-    
-    return jsonify([notificacao.to_dict() for notificacao in notificacoes]), 200
+    """
+    Notificações do usuário, mais recentes primeiro.
+
+    Parâmetros opcionais:
+    - limite: ativa a paginação por cursor (keyset em usuario_id, data_envio, id) e devolve
+      {'notificacoes': [...], 'proximo_cursor': ..., 'tem_mais': ..., 'nao_lidas': ...};
+      sem ele a resposta continua sendo a lista completa
+    - cursor: valor de proximo_cursor da página anterior
+    - nao_lidas=true: só as não lidas
+    """
+    usuario_id = int(get_jwt_identity())
+    limite = request.args.get('limite', type=int)
+    cursor = request.args.get('cursor')
+    
+    # As notificações-resumo de pendências dos admins são mantidas por evento
+    # (pendencias_service), então a leitura é só uma consulta no índice (usuario_id, data_envio, id)
+    query = Notificacao.query.filter(Notificacao.usuario_id == usuario_id)
+    
+    if request.args.get('nao_lidas', '').lower() == 'true':
+        query = query.filter(Notificacao.lida == False)
+    
+    if cursor:
+        try:
+            cursor_data, cursor_id = _decodificar_cursor_notificacao(cursor)
+        except Exception:
+            return jsonify({'erro': 'Cursor inválido'}), 400
+        query = query.filter(or_(
+            Notificacao.data_envio < cursor_data,
+            and_(Notificacao.data_envio == cursor_data, Notificacao.id < cursor_id)
+        ))
+    
+    query = query.order_by(Notificacao.data_envio.desc(), Notificacao.id.desc())
+    
+    if not limite:
+        return jsonify([notificacao.to_dict() for notificacao in query.all()]), 200
+    
+    limite = max(1, min(limite, 200))
+    notificacoes = query.limit(limite + 1).all()
+    tem_mais = len(notificacoes) > limite
+    notificacoes = notificacoes[:limite]
+    
+    return jsonify({
+        'notificacoes': [notificacao.to_dict() for notificacao in notificacoes],
+        'proximo_cursor': _codificar_cursor_notificacao(notificacoes[-1]) if tem_mais else None,
+        'tem_mais': tem_mais,
+        'nao_lidas': obter_nao_lidas(usuario_id)
+    }), 200
 
 @bp.route('/nao-lidas', methods=['GET'])
 @jwt_required()
 def contar_nao_lidas():
     usuario_id = get_jwt_identity()
     
-    count = Notificacao.query.filter_by(
-        usuario_id=usuario_id,
-        lida=False
-    ).count()
-    
-    return jsonify({'count': count}), 200
+    return jsonify({'count': obter_nao_lidas(usuario_id)}), 200
 
 @bp.route('/<int:id>/marcar-lida', methods=['PUT'])
 @jwt_required()
 def marcar_como_lida(id):
-    from app.models import Usuario
-    usuario_id = get_jwt_identity()
-    usuario = Usuario.query.get(usuario_id)
+    usuario_id = int(get_jwt_identity())
+    usuario = get_current_user()
     
     notificacao = Notificacao.query.get(id)
     
@@ -57,6 +90,7 @@ def marcar_como_lida(id):
     if notificacao.usuario_id != usuario_id and usuario.tipo != 'admin':
         return jsonify({'erro': 'Acesso negado'}), 403
     
+    # O contador de não lidas é ajustado no flush (ver notificacoes_nao_lidas)
     notificacao.lida = True
     db.session.commit()
     
@@ -65,12 +99,14 @@ def marcar_como_lida(id):
 @bp.route('/marcar-todas-lidas', methods=['PUT'])
 @jwt_required()
 def marcar_todas_como_lidas():
-    usuario_id = get_jwt_identity()
+    usuario_id = int(get_jwt_identity())
     
-    Notificacao.query.filter_by(
+    marcadas = Notificacao.query.filter_by(
         usuario_id=usuario_id,
         lida=False
     ).update({'lida': True})
+    # Desconta só as que este UPDATE marcou: não lidas gravadas ao mesmo tempo continuam contando
+    ajustar_nao_lidas(db.session, {usuario_id: -marcadas})
     
     db.session.commit()
     
@@ -1,19 +1,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import OrdemCompra, AuditoriaOC, Solicitacao, Fornecedor, Usuario, ItemSolicitacao, OrdemServico, db
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 from app.utils.auditoria import registrar_auditoria_oc
+from app.services.numeracao import gerar_numero_os
+from app.utils.exportacao import ler_em_blocos, resposta_exportacao
+from sqlalchemy.orm import aliased
 from datetime import datetime
 
 bp = Blueprint('ordens_compra', __name__, url_prefix='/api/ordens-compra')
 
-def gerar_numero_os():
-    """Gera número único para Ordem de Serviço"""
-    import uuid
-    timestamp = datetime.now().strftime('%Y%m%d')
-    random_str = uuid.uuid4().hex[:6].upper()
-    return f"OS-{timestamp}-{random_str}"
-
 def criar_snapshot_fornecedor(fornecedor):
     """Cria snapshot dos dados do fornecedor para a OS"""
     return {
@@ -50,7 +46,7 @@ def listar_ocs():
         print(f"{'='*60}")
         
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         print(f"   Usuário: {usuario.nome if usuario else 'N/A'} (ID: {usuario_id})")
         
@@ -104,12 +100,73 @@ def listar_ocs():
         traceback.print_exc()
         return jsonify({'erro': f'Erro ao listar ordens de compra: {str(e)}'}), 500
 
+@bp.route('/exportar', methods=['GET'])
+@jwt_required()
+def exportar_ocs():
+    """OCs visíveis ao usuário (mesmas regras e filtro de status da listagem), em streaming"""
+    usuario_id = get_jwt_identity()
+    usuario = get_current_user()
+    if not usuario:
+        return jsonify({'erro': 'Usuário não encontrado'}), 404
+    
+    Funcionario = aliased(Usuario)
+    query = db.session.query(
+        OrdemCompra.id,
+        OrdemCompra.solicitacao_id,
+        OrdemCompra.criado_em,
+        Fornecedor.nome.label('fornecedor_nome'),
+        Funcionario.nome.label('funcionario_nome'),
+        OrdemCompra.valor_total,
+        OrdemCompra.status,
+        OrdemCompra.aprovado_em,
+        Usuario.nome.label('aprovador_nome'),
+        OrdemCompra.observacao
+    ).outerjoin(
+        Fornecedor, Fornecedor.id == OrdemCompra.fornecedor_id
+    ).outerjoin(
+        Solicitacao, Solicitacao.id == OrdemCompra.solicitacao_id
+    ).outerjoin(
+        Funcionario, Funcionario.id == Solicitacao.funcionario_id
+    ).outerjoin(
+        Usuario, Usuario.id == OrdemCompra.aprovado_por
+    )
+    
+    if usuario.tipo != 'admin':
+        perfil_nome = usuario.perfil.nome if usuario.perfil else None
+        if perfil_nome == 'Comprador (PJ)':
+            query = query.filter(Solicitacao.funcionario_id == int(usuario_id))
+        elif perfil_nome not in ['Financeiro', 'Administrador']:
+            return jsonify({'erro': 'Acesso negado'}), 403
+    
+    status = request.args.get('status')
+    if status:
+        query = query.filter(OrdemCompra.status == status)
+    
+    linhas = (
+        [
+            oc.id,
+            oc.solicitacao_id,
+            oc.criado_em.strftime('%d/%m/%Y %H:%M') if oc.criado_em else '',
+            oc.fornecedor_nome or '',
+            oc.funcionario_nome or '',
+            round(oc.valor_total or 0, 2),
+            oc.status,
+            oc.aprovado_em.strftime('%d/%m/%Y %H:%M') if oc.aprovado_em else '',
+            oc.aprovador_nome or '',
+            oc.observacao or ''
+        ]
+        for oc in ler_em_blocos(query.order_by(OrdemCompra.criado_em.desc()))
+    )
+    colunas = ['OC', 'Solicitação', 'Criada em', 'Fornecedor', 'Comprador', 'Valor Total (R$)',
+               'Status', 'Aprovada em', 'Aprovada por', 'Observação']
+    return resposta_exportacao(colunas, linhas, request.args.get('formato', 'xlsx'), 'ordens_compra', aba='Ordens de Compra')
+
 @bp.route('/solicitacao/<int:sc_id>', methods=['POST'])
 @jwt_required()
 def criar_oc(sc_id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -194,7 +251,7 @@ def criar_oc(sc_id):
 def obter_oc(oc_id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -230,7 +287,7 @@ def obter_oc(oc_id):
 def aprovar_oc(oc_id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -355,7 +412,7 @@ def aprovar_oc(oc_id):
 def reprovar_oc(oc_id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -460,7 +517,7 @@ def cancelar_oc(oc_id):
 def obter_estatisticas():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -1,17 +1,13 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, OrdemServico, OrdemCompra, Fornecedor, Motorista, Veiculo, Usuario, Notificacao, GPSLog, ConferenciaRecebimento
-from app.auth import admin_required
+from app.models import db, OrdemServico, OrdemCompra, Fornecedor, Motorista, Veiculo, Notificacao, GPSLog, ConferenciaRecebimento
+from app.auth import admin_required, get_current_user
+from app.services.notificacao_dispatcher import notificar_admins
+from app.services.numeracao import gerar_numero_os
 from datetime import datetime
 
 bp = Blueprint('ordens_servico', __name__)
 
-def gerar_numero_os():
-    import uuid
-    timestamp = datetime.now().strftime('%Y%m%d')
-    random_str = uuid.uuid4().hex[:6].upper()
-    return f"OS-{timestamp}-{random_str}"
-
 def criar_snapshot_fornecedor(fornecedor):
     return {
         'id': fornecedor.id,
@@ -42,7 +38,7 @@ def registrar_auditoria_os(os, acao, usuario_id, detalhes=None):
 def listar_os():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -90,7 +86,7 @@ def listar_os():
 def obter_os(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         os = OrdemServico.query.get(id)
         
@@ -279,7 +275,7 @@ def reagendar_os(id):
 def iniciar_rota(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         data = request.get_json() or {}
         
         if not data.get('gps'):
@@ -331,7 +327,7 @@ def iniciar_rota(id):
 def registrar_evento(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         data = request.get_json()
         
         if not data or not data.get('evento') or not data.get('gps'):
@@ -377,40 +373,20 @@ def registrar_evento(id):
             os.status = 'ENTREGUE'
         elif evento == 'FORNECEDOR_FECHADO':
             os.status = 'IMPEDIDO'
-            admins = Usuario.query.filter(
-                db.or_(
-                    Usuario.tipo == 'admin',
-                    Usuario.perfil.has(nome='Administrador')
-                )
-            ).all()
-            for admin in admins:
-                notificacao = Notificacao(
-                    usuario_id=admin.id,
-                    titulo='Fornecedor Fechado',
-                    mensagem=f'OS {os.numero_os}: Motorista registrou que o fornecedor está fechado. Motivo: {data.get("motivo", "Não informado")}',
-                    tipo='alerta_motorista',
-                    url='/logistica.html',
-                    lida=False
-                )
-                db.session.add(notificacao)
+            notificar_admins(
+                titulo='Fornecedor Fechado',
+                mensagem=f'OS {os.numero_os}: Motorista registrou que o fornecedor está fechado. Motivo: {data.get("motivo", "Não informado")}',
+                tipo='alerta_motorista',
+                url='/logistica.html'
+            )
         elif evento == 'FORNECEDOR_NAO_ENCONTRADO':
             os.status = 'IMPEDIDO'
-            admins = Usuario.query.filter(
-                db.or_(
-                    Usuario.tipo == 'admin',
-                    Usuario.perfil.has(nome='Administrador')
-                )
-            ).all()
-            for admin in admins:
-                notificacao = Notificacao(
-                    usuario_id=admin.id,
-                    titulo='Fornecedor Não Encontrado',
-                    mensagem=f'OS {os.numero_os}: Motorista não conseguiu localizar o fornecedor. Motivo: {data.get("motivo", "Não informado")}',
-                    tipo='alerta_motorista',
-                    url='/logistica.html',
-                    lida=False
-                )
-                db.session.add(notificacao)
+            notificar_admins(
+                titulo='Fornecedor Não Encontrado',
+                mensagem=f'OS {os.numero_os}: Motorista não conseguiu localizar o fornecedor. Motivo: {data.get("motivo", "Não informado")}',
+                tipo='alerta_motorista',
+                url='/logistica.html'
+            )
         elif evento == 'FINALIZEI':
             os.status = 'FINALIZADA'
             
@@ -442,24 +418,15 @@ def registrar_evento(id):
                         }]
                     )
                     db.session.add(conferencia)
+                    db.session.flush()
                     
-                    conferentes = Usuario.query.join(Usuario.perfil).filter(
-                        db.or_(
-                            db.text("perfis.nome = 'Conferente / Estoque'"),
-                            db.text("perfis.nome = 'Administrador'")
-                        )
-                    ).all()
-                    
-                    for conferente in conferentes:
-                        notificacao = Notificacao(
-                            usuario_id=conferente.id,
-                            titulo='Nova Conferência Pendente',
-                            mensagem=f'OS {os.numero_os} foi finalizada. Conferência #{conferencia.id if conferencia.id else "nova"} criada e aguardando processamento.',
-                            tipo='nova_conferencia',
-                            url='/conferencias.html',
-                            lida=False
-                        )
-                        db.session.add(notificacao)
+                    notificar_admins(
+                        titulo='Nova Conferência Pendente',
+                        mensagem=f'OS {os.numero_os} foi finalizada. Conferência #{conferencia.id} criada e aguardando processamento.',
+                        tipo='nova_conferencia',
+                        url='/conferencias.html',
+                        perfis=['Conferente / Estoque']
+                    )
         
         registrar_auditoria_os(os, f'EVENTO_{evento}', usuario_id, {
             'gps': data['gps'],
@@ -685,23 +652,13 @@ def marcar_recebido(id):
             )
             db.session.add(conferencia)
             
-            conferentes = Usuario.query.join(Usuario.perfil).filter(
-                db.or_(
-                    db.text("perfis.nome = 'Conferente / Estoque'"),
-                    db.text("perfis.nome = 'Administrador'")
-                )
-            ).all()
-            
-            for conferente in conferentes:
-                notificacao = Notificacao(
-                    usuario_id=conferente.id,
-                    titulo='Nova Conferência - Entrega do Fornecedor',
-                    mensagem=f'OS {os.numero_os} foi recebida (entrega do fornecedor). Conferência criada e aguardando processamento.',
-                    tipo='nova_conferencia',
-                    url='/conferencias.html',
-                    lida=False
-                )
-                db.session.add(notificacao)
+            notificar_admins(
+                titulo='Nova Conferência - Entrega do Fornecedor',
+                mensagem=f'OS {os.numero_os} foi recebida (entrega do fornecedor). Conferência criada e aguardando processamento.',
+                tipo='nova_conferencia',
+                url='/conferencias.html',
+                perfis=['Conferente / Estoque']
+            )
         
         db.session.commit()
         
@@ -719,7 +676,7 @@ def marcar_recebido(id):
 def obter_estatisticas():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         query = OrdemServico.query
         
@@ -3,8 +3,17 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Usuario, Solicitacao, Fornecedor, AuditoriaLog, Perfil, Motorista
 from app.auth import admin_required, hash_senha
 from app.utils.auditoria import registrar_criacao, registrar_atualizacao, registrar_exclusao
+from app.utils.exportacao import ler_em_blocos, resposta_exportacao
+from app.services.comissoes_service import (
+    periodo,
+    somar_por_funcionario,
+    somar_por_fornecedor,
+    somar_periodo,
+    valores_por_solicitacao
+)
 from datetime import datetime, timedelta
 from sqlalchemy import func, and_
+from sqlalchemy.orm import joinedload
 import os
 import io
 from werkzeug.utils import secure_filename
@@ -380,33 +389,11 @@ def calcular_comissao_usuario(usuario_id):
     if not usuario:
         return jsonify({'erro': 'Usuário não encontrado'}), 404
     
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
+    inicio, fim = periodo(request.args.get('data_inicio'), request.args.get('data_fim'))
     fornecedor_id = request.args.get('fornecedor_id')
+    fornecedor_id = int(fornecedor_id) if fornecedor_id else None
     
-    query = Solicitacao.query.filter(
-        Solicitacao.funcionario_id == usuario_id,
-        Solicitacao.status == 'aprovada'
-    )
-    
-    if data_inicio:
-        try:
-            dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(Solicitacao.data_envio >= dt_inicio)
-        except ValueError:
-            pass
-    
-    if data_fim:
-        try:
-            dt_fim = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(Solicitacao.data_envio < dt_fim)
-        except ValueError:
-            pass
-    
-    if fornecedor_id:
-        query = query.filter(Solicitacao.fornecedor_id == int(fornecedor_id))
-    
-    solicitacoes = query.all()
+    solicitacoes = valores_por_solicitacao(inicio, fim, funcionario_id=usuario_id, fornecedor_id=fornecedor_id).all()
     
     percentual = usuario.percentual_comissao or 0.0
     
@@ -415,14 +402,7 @@ def calcular_comissao_usuario(usuario_id):
     total_comissao = 0.0
     
     for sol in solicitacoes:
-        valor_solicitacao = 0.0
-        if sol.itens:
-            for item in sol.itens:
-                valor_item = item.valor_calculado if item.valor_calculado else 0.0
-                if valor_item == 0 and item.peso_kg and item.preco_por_kg_snapshot:
-                    valor_item = float(item.peso_kg) * float(item.preco_por_kg_snapshot)
-                valor_solicitacao += valor_item
-        
+        valor_solicitacao = float(sol.valor_total)
         comissao = valor_solicitacao * (percentual / 100)
         
         total_valor += valor_solicitacao
@@ -433,64 +413,39 @@ def calcular_comissao_usuario(usuario_id):
             'data_envio': sol.data_envio.isoformat() if sol.data_envio else None,
             'data_confirmacao': sol.data_confirmacao.isoformat() if sol.data_confirmacao else None,
             'fornecedor_id': sol.fornecedor_id,
-            'fornecedor_nome': sol.fornecedor.nome if sol.fornecedor else None,
+            'fornecedor_nome': sol.fornecedor_nome,
             'valor_total': round(valor_solicitacao, 2),
             'comissao': round(comissao, 2),
             'status': sol.status
         })
     
+    por_fornecedor = somar_por_fornecedor(usuario_id, inicio, fim, fornecedor_id=fornecedor_id)
+    for linha in por_fornecedor:
+        linha['comissao'] = round(linha['valor_total'] * (percentual / 100), 2)
+        linha['valor_total'] = round(linha['valor_total'], 2)
+    
     return jsonify({
         'usuario': usuario.to_dict(),
         'percentual_comissao': percentual,
         'total_solicitacoes': len(solicitacoes),
         'total_valor': round(total_valor, 2),
         'total_comissao': round(total_comissao, 2),
-        'solicitacoes': solicitacoes_data
+        'solicitacoes': solicitacoes_data,
+        'por_fornecedor': por_fornecedor
     }), 200
 
 @bp.route('/comissoes/resumo', methods=['GET'])
 @admin_required
 def resumo_comissoes():
-    data_inicio = request.args.get('data_inicio')
-    data_fim = request.args.get('data_fim')
+    inicio, fim = periodo(request.args.get('data_inicio'), request.args.get('data_fim'))
     
-    usuarios = Usuario.query.filter(Usuario.percentual_comissao > 0).all()
+    usuarios = Usuario.query.options(joinedload(Usuario.perfil)).filter(Usuario.percentual_comissao > 0).all()
+    totais = somar_por_funcionario(inicio, fim)
     
     resumo = []
     
     for usuario in usuarios:
-        query = Solicitacao.query.filter(
-            Solicitacao.funcionario_id == usuario.id,
-            Solicitacao.status == 'aprovada'
-        )
-        
-        if data_inicio:
-            try:
-                dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
-                query = query.filter(Solicitacao.data_envio >= dt_inicio)
-            except ValueError:
-                pass
-        
-        if data_fim:
-            try:
-                dt_fim = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)
-                query = query.filter(Solicitacao.data_envio < dt_fim)
-            except ValueError:
-                pass
-        
-        solicitacoes = query.all()
-        
-        total_valor = 0.0
-        for sol in solicitacoes:
-            valor_solicitacao = 0.0
-            if sol.itens:
-                for item in sol.itens:
-                    valor_item = item.valor_calculado if item.valor_calculado else 0.0
-                    if valor_item == 0 and item.peso_kg and item.preco_por_kg_snapshot:
-                        valor_item = float(item.peso_kg) * float(item.preco_por_kg_snapshot)
-                    valor_solicitacao += valor_item
-            total_valor += valor_solicitacao
-        
+        total_solicitacoes, total_valor = totais.get(usuario.id, (0, 0.0))
         comissao = total_valor * (usuario.percentual_comissao / 100)
         
         resumo.append({
@@ -498,7 +453,7 @@ def resumo_comissoes():
             'usuario_nome': usuario.nome,
             'perfil': usuario.perfil.nome if usuario.perfil else None,
             'percentual_comissao': usuario.percentual_comissao,
-            'total_solicitacoes': len(solicitacoes),
+            'total_solicitacoes': total_solicitacoes,
             'total_valor': round(total_valor, 2),
             'total_comissao': round(comissao, 2)
         })
@@ -513,84 +468,33 @@ def resumo_comissoes():
 @bp.route('/comissoes/exportar', methods=['GET'])
 @admin_required
 def exportar_comissoes():
-    try:
-        import pandas as pd
-        from io import BytesIO
-    except ImportError:
-        return jsonify({'erro': 'Biblioteca pandas não disponível'}), 500
-    
     data_inicio = request.args.get('data_inicio')
     data_fim = request.args.get('data_fim')
     usuario_id = request.args.get('usuario_id')
     formato = request.args.get('formato', 'xlsx')
     
-    query = Solicitacao.query.filter(Solicitacao.status == 'aprovada')
-    
-    if usuario_id:
-        query = query.filter(Solicitacao.funcionario_id == int(usuario_id))
-    
-    if data_inicio:
-        try:
-            dt_inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
-            query = query.filter(Solicitacao.data_envio >= dt_inicio)
-        except ValueError:
-            pass
-    
-    if data_fim:
-        try:
-            dt_fim = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)
-            query = query.filter(Solicitacao.data_envio < dt_fim)
-        except ValueError:
-            pass
-    
-    solicitacoes = query.all()
-    
-    dados = []
-    for sol in solicitacoes:
-        usuario = sol.funcionario
-        percentual = usuario.percentual_comissao or 0.0
-        valor_total = 0.0
-        if sol.itens:
-            for item in sol.itens:
-                valor_item = item.valor_calculado if item.valor_calculado else 0.0
-                if valor_item == 0 and item.peso_kg and item.preco_por_kg_snapshot:
-                    valor_item = float(item.peso_kg) * float(item.preco_por_kg_snapshot)
-                valor_total += valor_item
-        comissao = valor_total * (percentual / 100)
-        
-        dados.append({
-            'ID Solicitação': sol.id,
-            'Data': sol.data_envio.strftime('%d/%m/%Y') if sol.data_envio else '',
-            'Funcionário': usuario.nome if usuario else '',
-            'Email': usuario.email if usuario else '',
-            'Perfil': usuario.perfil.nome if usuario and usuario.perfil else '',
-            'Fornecedor': sol.fornecedor.nome if sol.fornecedor else '',
-            'Valor Total (R$)': round(valor_total, 2),
-            '% Comissão': percentual,
-            'Comissão (R$)': round(comissao, 2)
-        })
-    
-    df = pd.DataFrame(dados)
-    
-    output = BytesIO()
-    
-    if formato == 'csv':
-        df.to_csv(output, index=False, encoding='utf-8-sig')
-        output.seek(0)
-        mimetype = 'text/csv'
-        filename = f'relatorio_comissoes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-    else:
-        df.to_excel(output, index=False, engine='openpyxl')
-        output.seek(0)
-        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        filename = f'relatorio_comissoes_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    
-    return send_file(
-        output,
-        mimetype=mimetype,
-        as_attachment=True,
-        download_name=filename
-    )
+    inicio, fim = periodo(data_inicio, data_fim)
+    consulta = valores_por_solicitacao(inicio, fim, funcionario_id=int(usuario_id) if usuario_id else None)
+    
+    def linhas():
+        for sol in ler_em_blocos(consulta):
+            percentual = sol.percentual_comissao or 0.0
+            valor_total = float(sol.valor_total)
+            yield [
+                sol.id,
+                sol.data_envio.strftime('%d/%m/%Y') if sol.data_envio else '',
+                sol.funcionario_nome or '',
+                sol.funcionario_email or '',
+                sol.perfil_nome or '',
+                sol.fornecedor_nome or '',
+                round(valor_total, 2),
+                percentual,
+                round(valor_total * (percentual / 100), 2)
+            ]
+    
+    colunas = ['ID Solicitação', 'Data', 'Funcionário', 'Email', 'Perfil', 'Fornecedor',
+               'Valor Total (R$)', '% Comissão', 'Comissão (R$)']
+    return resposta_exportacao(colunas, linhas(), formato, 'relatorio_comissoes', aba='Comissões')
 
 @bp.route('/auditoria/usuarios', methods=['GET'])
 @admin_required
@@ -748,26 +652,7 @@ def dashboard_rh():
     mes_atual = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     proximo_mes = (mes_atual + timedelta(days=32)).replace(day=1)
     
-    solicitacoes_mes = Solicitacao.query.filter(
-        Solicitacao.status == 'aprovada',
-        Solicitacao.data_envio >= mes_atual,
-        Solicitacao.data_envio < proximo_mes
-    ).all()
-    
-    total_valor_mes = 0.0
-    total_comissao_mes = 0.0
-    
-    for sol in solicitacoes_mes:
-        valor = 0.0
-        if sol.itens:
-            for item in sol.itens:
-                valor_item = item.valor_calculado if item.valor_calculado else 0.0
-                if valor_item == 0 and item.peso_kg and item.preco_por_kg_snapshot:
-                    valor_item = float(item.peso_kg) * float(item.preco_por_kg_snapshot)
-                valor += valor_item
-        total_valor_mes += valor
-        if sol.funcionario and sol.funcionario.percentual_comissao:
-            total_comissao_mes += valor * (sol.funcionario.percentual_comissao / 100)
+    solicitacoes_mes, total_valor_mes, total_comissao_mes = somar_periodo(mes_atual, proximo_mes)
     
     por_perfil = db.session.query(
         Perfil.nome,
@@ -781,6 +666,6 @@ def dashboard_rh():
         'usuarios_com_comissao': usuarios_com_comissao,
         'total_valor_mes': round(total_valor_mes, 2),
         'total_comissao_mes': round(total_comissao_mes, 2),
-        'solicitacoes_aprovadas_mes': len(solicitacoes_mes),
+        'solicitacoes_aprovadas_mes': solicitacoes_mes,
         'usuarios_por_perfil': [{'perfil': p[0], 'quantidade': p[1]} for p in por_perfil]
     }), 200
@@ -1,19 +1,23 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, send_file, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Usuario, ScannerConfig, ScannerAnalysis
-from app.services.pcb_analyzer import (
-    analyze_pcb_image as opencv_analyze_pcb,
-    get_type_guess_from_analysis,
-    generate_local_explanation
+from app.models import db, Usuario, ScannerConfig, ScannerAnalysis, ScannerBatch
+from app.services.perplexity_formatter import is_perplexity_configured
+from app.services.scanner_analise import analisar_imagem, completar_analise, registrar_analise
+from app.services.scanner_cache import guardar_resultado, estatisticas_cache
+from app.services.scanner_lotes import criar_lote, LIMITE_IMAGENS_PADRAO
+from app.services.scanner_imagens import (
+    armazenar_imagem_analise,
+    ler_imagem_analise,
+    mimetype_do_blob,
+    analise_referencia_blob,
+    assinatura_blob_valida
 )
-from app.services.perplexity_formatter import (
-    build_explanation_with_perplexity,
-    is_perplexity_configured
-)
-from app.auth import admin_required
+from app.utils.blob_store import obter_armazenamento, hash_valido
+from app.auth import admin_required, get_current_user
 from datetime import datetime
 import base64
 import os
+import time
 
 bp = Blueprint('scanner', __name__)
 
@@ -72,12 +76,14 @@ def analyze_pcb():
         if not image_data:
             return jsonify({'erro': 'Imagem nao fornecida. Por favor, envie uma imagem da placa para analise.'}), 400
         
-        analysis_result = opencv_analyze_pcb(image_data)
+        analise = analisar_imagem(image_bytes)
+        acerto = analise['acerto']
+        analysis_result = analise['analysis_result']
         
-        if 'error' in analysis_result:
+        if acerto is None and 'error' in analysis_result:
             return jsonify({'erro': analysis_result['error']}), 400
         
-        board_detected = analysis_result.get('board_detected', False)
+        board_detected = acerto is not None or analysis_result.get('board_detected', False)
         
         if not board_detected:
             return jsonify({
@@ -93,53 +99,59 @@ def analyze_pcb():
                 'perplexity_used': False
             }), 200
         
-        grade = analysis_result['grade']
-        components_count = analysis_result['components_count']
-        density_score = analysis_result['density_score']
-        
-        type_guess = get_type_guess_from_analysis(analysis_result)
-        
-        explanation = build_explanation_with_perplexity(grade, components_count, density_score)
-        
-        if not explanation:
-            explanation = generate_local_explanation(grade, components_count, density_score, board_detected)
-        
-        confidence = min(0.95, 0.5 + (min(density_score * 10000, 0.3)) + (min(components_count, 50) / 100))
+        if acerto:
+            # Mesma foto ou mesma placa já analisada: reaproveita nota e explicação
+            resultado = acerto['resultado']
+            analysis_result = {'cache': {k: acerto[k] for k in ('match', 'distance', 'analysis_id')}}
+        else:
+            resultado = completar_analise(analysis_result)
         
         analysis_id = None
         try:
-            analysis = ScannerAnalysis(
-                usuario_id=int(usuario_id),
-                grade=grade,
-                type_guess=type_guess,
-                explanation=explanation,
-                confidence=confidence,
-                components_count=components_count,
-                density_score=density_score,
-                image_data=image_bytes,
-                image_mimetype=image_mimetype,
-                raw_response=str(analysis_result)
+            if acerto and acerto['match'] == 'exact':
+                campos_imagem = {
+                    'image_sha256': analise['image_sha256'],
+                    'image_size': len(image_bytes),
+                    'thumbnail_sha256': acerto['thumbnail_sha256']
+                }
+            else:
+                campos_imagem = armazenar_imagem_analise(image_bytes)
+            campos_imagem['image_phash'] = analise['image_phash'] or (acerto['image_phash'] if acerto else None)
+            analysis = registrar_analise(
+                usuario_id,
+                analysis_result,
+                resultado,
+                campos_imagem,
+                image_mimetype,
+                source_analysis_id=acerto['analysis_id'] if acerto else None
             )
-            db.session.add(analysis)
             db.session.commit()
             analysis_id = analysis.id
+            guardar_resultado(analysis, origem=acerto)
         except Exception as e:
             print(f'Erro ao salvar analise: {e}')
             db.session.rollback()
         
         response = {
             'id': analysis_id,
-            'grade': grade,
-            'components_count': components_count,
-            'density_score': density_score,
+            'grade': resultado['grade'],
+            'components_count': resultado['components_count'],
+            'density_score': resultado['density_score'],
             'board_detected': True,
-            'type_guess': type_guess,
-            'explanation': explanation,
-            'confidence': round(confidence, 2),
+            'type_guess': resultado['type_guess'],
+            'explanation': resultado['explanation'],
+            'confidence': round(resultado['confidence'], 2),
             'timestamp': datetime.now().isoformat(),
-            'analysis_method': 'opencv',
-            'perplexity_used': is_perplexity_configured()
+            'analysis_method': 'cache' if acerto else 'opencv',
+            'perplexity_used': False if acerto else is_perplexity_configured(),
+            'cached': acerto is not None
         }
+        if acerto:
+            response['cache'] = {
+                'match': acerto['match'],
+                'distance': acerto['distance'],
+                'analysis_id': acerto['analysis_id']
+            }
         
         return jsonify(response), 200
         
@@ -147,12 +159,103 @@ def analyze_pcb():
         print(f'Erro no scanner: {e}')
         return jsonify({'erro': str(e)}), 500
 
+def _imagens_do_lote():
+    """(nome, bytes, mimetype) de cada foto: multipart 'images' ou JSON 'images_base64'"""
+    imagens = []
+    for image_file in request.files.getlist('images'):
+        dados = image_file.read()
+        if dados:
+            imagens.append((image_file.filename, dados, image_file.mimetype or 'image/jpeg'))
+    
+    if request.is_json:
+        data = request.get_json() or {}
+        for posicao, base64_str in enumerate(data.get('images_base64') or []):
+            image_mimetype = 'image/jpeg'
+            if base64_str.startswith('data:image') and ',' in base64_str:
+                header, base64_str = base64_str.split(',', 1)
+                image_mimetype = header.split(':')[1].split(';')[0] if ':' in header else 'image/jpeg'
+            imagens.append((f'imagem_{posicao + 1}', base64.b64decode(base64_str), image_mimetype))
+    
+    return imagens
+
+@bp.route('/api/scanner/batch', methods=['POST'])
+@jwt_required()
+def analyze_pcb_batch():
+    """
+    Recebe várias fotos de placas e responde na hora com o lote (202).
+    Os resultados chegam pelo Socket.IO ('scanner_lote_item' / 'scanner_lote_status')
+    ou por GET /api/scanner/batch/<id>.
+    """
+    try:
+        usuario_id = get_jwt_identity()
+        config = get_scanner_config()
+        
+        if not config.enabled:
+            return jsonify({'erro': 'Scanner desativado pelo administrador'}), 403
+        
+        imagens = _imagens_do_lote()
+        if not imagens:
+            return jsonify({'erro': 'Nenhuma imagem fornecida. Envie as fotos no campo images.'}), 400
+        
+        limite = int(current_app.config.get('SCANNER_LOTE_MAX_IMAGENS', LIMITE_IMAGENS_PADRAO))
+        if len(imagens) > limite:
+            return jsonify({'erro': f'Máximo de {limite} imagens por lote'}), 400
+        
+        lote = criar_lote(current_app._get_current_object(), usuario_id, imagens)
+        
+        return jsonify({
+            'mensagem': f'{len(imagens)} imagem(ns) recebida(s). A análise está em andamento.',
+            'batch': lote.to_dict()
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        print(f'Erro ao criar lote do scanner: {e}')
+        return jsonify({'erro': str(e)}), 500
+
+@bp.route('/api/scanner/batch/<int:batch_id>', methods=['GET'])
+@jwt_required()
+def get_batch(batch_id):
+    try:
+        usuario_id = get_jwt_identity()
+        
+        lote = ScannerBatch.query.filter_by(
+            id=batch_id,
+            usuario_id=int(usuario_id)
+        ).first()
+        
+        if not lote:
+            return jsonify({'erro': 'Lote nao encontrado'}), 404
+        
+        return jsonify(lote.to_dict()), 200
+        
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
+@bp.route('/api/scanner/batches', methods=['GET'])
+@jwt_required()
+def list_batches():
+    try:
+        usuario_id = get_jwt_identity()
+        limit = request.args.get('limit', 20, type=int)
+        
+        lotes = ScannerBatch.query.filter_by(
+            usuario_id=int(usuario_id)
+        ).order_by(
+            ScannerBatch.created_at.desc()
+        ).limit(limit).all()
+        
+        return jsonify([lote.to_dict(include_items=False) for lote in lotes]), 200
+        
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
 @bp.route('/api/scanner/config', methods=['GET'])
 @jwt_required()
 def get_config():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -168,7 +271,7 @@ def get_config():
 def get_admin_config():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -184,7 +287,7 @@ def get_admin_config():
 def update_admin_config():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario or usuario.tipo != 'admin':
             return jsonify({'erro': 'Acesso negado'}), 403
@@ -220,11 +323,21 @@ def scanner_status():
             'api_configured': True,
             'ready': config.enabled,
             'model': 'opencv+perplexity',
-            'perplexity_configured': perplexity_configured
+            'perplexity_configured': perplexity_configured,
+            'cache': estatisticas_cache()
         }), 200
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+def _analise_com_imagem(analysis):
+    """to_dict com a imagem em base64 (compatibilidade; prefira image_url/thumbnail_url)"""
+    result = analysis.to_dict()
+    dados = ler_imagem_analise(analysis) if result['has_image'] else None
+    if dados:
+        result['image_base64'] = base64.b64encode(dados).decode('utf-8')
+        result['image_mimetype'] = analysis.image_mimetype
+    return result
+
 @bp.route('/api/scanner/history', methods=['GET'])
 @jwt_required()
 def scanner_history():
@@ -239,7 +352,9 @@ def scanner_history():
             ScannerAnalysis.created_at.desc()
         ).limit(limit).all()
         
-        return jsonify([a.to_dict(include_image=include_images) for a in analyses]), 200
+        if include_images:
+            return jsonify([_analise_com_imagem(a) for a in analyses]), 200
+        return jsonify([a.to_dict() for a in analyses]), 200
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
@@ -259,11 +374,59 @@ def get_analysis(analysis_id):
         if not analysis:
             return jsonify({'erro': 'Analise nao encontrada'}), 404
         
-        return jsonify(analysis.to_dict(include_image=include_image)), 200
+        if include_image:
+            return jsonify(_analise_com_imagem(analysis)), 200
+        return jsonify(analysis.to_dict()), 200
         
     except Exception as e:
         return jsonify({'erro': str(e)}), 500
 
+def _enviar_blob(chave, mimetype=None, max_age=31536000):
+    """Envia o blob com ETag = hash, suporte a Range e cache privado por `max_age` s (o conteúdo nunca muda)"""
+    armazenamento = obter_armazenamento()
+    if not armazenamento.existe(chave):
+        return jsonify({'erro': 'Imagem nao encontrada'}), 404
+    
+    # Backend em disco: send_file usa o caminho (sendfile, Range); os demais entregam um arquivo aberto
+    if hasattr(armazenamento, 'caminho_local'):
+        origem = armazenamento.caminho_local(chave)
+    else:
+        origem = armazenamento.abrir(chave)
+    if mimetype is None:
+        mimetype = mimetype_do_blob(origem)
+        if not isinstance(origem, str):
+            origem.seek(0)
+    
+    response = send_file(
+        origem,
+        mimetype=mimetype,
+        etag=chave,
+        conditional=True,
+        max_age=max_age
+    )
+    response.cache_control.immutable = True
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
+@bp.route('/api/scanner/blobs/<chave>', methods=['GET'])
+def get_scanner_blob(chave):
+    """
+    Imagem ou miniatura de análise pelo SHA-256. Sem JWT para funcionar em <img src>:
+    exige a assinatura de image_url/thumbnail_url (usuário u, expiração exp, sig) e
+    que o blob seja de uma análise desse usuário. Fica em cache só até expirar.
+    """
+    try:
+        usuario_id = request.args.get('u')
+        expira = request.args.get('exp')
+        if not assinatura_blob_valida(chave, usuario_id, expira, request.args.get('sig')):
+            return jsonify({'erro': 'Link da imagem invalido ou expirado'}), 403
+        if not analise_referencia_blob(chave, usuario_id):
+            return jsonify({'erro': 'Imagem nao encontrada'}), 404
+        return _enviar_blob(chave, max_age=max(int(expira) - int(time.time()), 0))
+    except Exception as e:
+        return jsonify({'erro': str(e)}), 500
+
 @bp.route('/api/scanner/analysis/<int:analysis_id>/image', methods=['GET'])
 @jwt_required()
 def get_analysis_image(analysis_id):
@@ -275,9 +438,15 @@ def get_analysis_image(analysis_id):
             usuario_id=int(usuario_id)
         ).first()
         
-        if not analysis or not analysis.image_data:
+        if not analysis or not (analysis.image_sha256 or analysis.image_mimetype):
             return jsonify({'erro': 'Imagem nao encontrada'}), 404
         
+        if hash_valido(analysis.image_sha256):
+            return _enviar_blob(analysis.image_sha256, analysis.image_mimetype)
+        
+        # Linha ainda não migrada para o blob store
+        if not analysis.image_data:
+            return jsonify({'erro': 'Imagem nao encontrada'}), 404
         from flask import Response
         return Response(
             analysis.image_data,
@@ -1,7 +1,11 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Lote, LoteSeparacao, Residuo, Usuario, Notificacao, MovimentacaoEstoque
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.notificacao_dispatcher import notificar_admins
+from app.services.fila_separacao import LIMITE_MAXIMO, montar_fila
+from app.services.filas_tempo_real import versao_fila
+from app.services.numeracao import gerar_numero_lote
 from datetime import datetime
 from decimal import Decimal
 
@@ -26,9 +30,20 @@ def registrar_auditoria_separacao(separacao, acao, usuario_id, detalhes=None, gp
 @bp.route('/fila', methods=['GET'])
 @jwt_required()
 def obter_fila_separacao():
+    """
+    Fila de separação no status (padrão AGUARDANDO_SEPARACAO).
+
+    Parâmetros opcionais:
+    - limite: ativa a paginação por cursor (id) e devolve
+      {'separacoes': [...], 'proximo_cursor': ..., 'tem_mais': ...}; sem ele a resposta
+      continua sendo a lista completa
+    - cursor: valor de proximo_cursor da página anterior
+
+    A resposta tem ETag pela versão da fila: com If-None-Match igual, devolve 304.
+    """
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -38,50 +53,29 @@ def obter_fila_separacao():
             return jsonify({'erro': 'Acesso negado. Apenas operadores de separação podem acessar a fila'}), 403
 
         status_filtro = request.args.get('status', 'AGUARDANDO_SEPARACAO')
-
-        query = LoteSeparacao.query.filter_by(status=status_filtro)
-
-        separacoes = query.order_by(LoteSeparacao.id).all()
-
-        resultado = []
-        for separacao in separacoes:
-            separacao_dict = separacao.to_dict()
-
-            if separacao.lote:
-                # Incluir informações dos materiais/itens do lote
-                itens_info = []
-                for item in separacao.lote.itens:
-                    item_info = {
-                        'id': item.id,
-                        'peso_kg': item.peso_kg,
-                        'material_id': item.material_id,
-                        'material_nome': item.material.nome if item.material else None,
-                        'material_codigo': item.material.codigo if item.material else None,
-                        'tipo_lote_id': item.tipo_lote_id,
-                        'tipo_lote_nome': item.tipo_lote.nome if item.tipo_lote else None,
-                        'estrelas_final': item.estrelas_final,
-                        'classificacao': item.classificacao if item.classificacao else (item.material.classificacao if item.material else None)
-                    }
-                    itens_info.append(item_info)
-                
-                separacao_dict['lote_detalhes'] = {
-                    'id': separacao.lote.id,
-                    'numero_lote': separacao.lote.numero_lote,
-                    'peso_total_kg': separacao.lote.peso_total_kg,
-                    'peso_bruto_recebido': separacao.lote.peso_bruto_recebido,
-                    'peso_liquido': separacao.lote.peso_liquido,
-                    'qualidade_recebida': separacao.lote.qualidade_recebida,
-                    'fornecedor_nome': separacao.lote.fornecedor.nome if separacao.lote.fornecedor else None,
-                    'tipo_lote_nome': separacao.lote.tipo_lote.nome if separacao.lote.tipo_lote else None,
-                    'conferente_nome': separacao.lote.conferente.nome if separacao.lote.conferente else None,
-                    'data_criacao': separacao.lote.data_criacao.isoformat() if separacao.lote.data_criacao else None,
-                    'anexos': separacao.lote.anexos,
-                    'itens_info': itens_info
-                }
-
-            resultado.append(separacao_dict)
-
-        return jsonify(resultado), 200
+        limite = request.args.get('limite', type=int)
+        cursor = request.args.get('cursor', type=int)
+        if limite is not None:
+            limite = max(1, min(limite, LIMITE_MAXIMO))
+
+        # Versão lida antes da fila: uma alteração no meio só pode deixar a resposta mais nova que o ETag
+        etag = f'fila-separacao-{versao_fila("separacao")}-{status_filtro}-{limite or ""}-{cursor or ""}'
+        if request.if_none_match.contains(etag):
+            resposta = Response(status=304)
+        else:
+            separacoes, tem_mais = montar_fila(status_filtro, limite, cursor)
+            if limite is None:
+                resposta = jsonify(separacoes)
+            else:
+                resposta = jsonify({
+                    'separacoes': separacoes,
+                    'proximo_cursor': separacoes[-1]['id'] if tem_mais else None,
+                    'tem_mais': tem_mais
+                })
+        resposta.set_etag(etag)
+        resposta.cache_control.private = True
+        resposta.cache_control.no_cache = True
+        return resposta
 
     except Exception as e:
         return jsonify({'erro': f'Erro ao obter fila de separação: {str(e)}'}), 500
@@ -91,7 +85,7 @@ def obter_fila_separacao():
 def iniciar_separacao(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -145,7 +139,7 @@ def iniciar_separacao(id):
 def criar_sublote(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario_atual = Usuario.query.get(usuario_id)
+        usuario_atual = get_current_user()
 
         if not usuario_atual:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -193,11 +187,7 @@ def criar_sublote(id):
         # LOG DE DEBUG - MUITO IMPORTANTE
         print(f"DEBUG VALOR SUBLOTE: peso_sublote={peso_sublote}, peso_pai={peso_lote_pai}, valor_pai={valor_total_pai}, RESULTADO={valor_sublote}")
 
-        ano = datetime.now().year
-        numero_sequencial = Lote.query.filter(
-            Lote.numero_lote.like(f"{ano}-%")  # type: ignore
-        ).count() + 1
-        numero_lote = f"{ano}-{str(numero_sequencial).zfill(5)}"
+        numero_lote = gerar_numero_lote()
 
         tipo_lote_id = data.get('tipo_lote_id')
         tipo_lote_nome = data.get('tipo_lote_nome')
@@ -306,7 +296,7 @@ def criar_sublote(id):
 def criar_residuo(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario_atual = Usuario.query.get(usuario_id)
+        usuario_atual = get_current_user()
 
         if not usuario_atual:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -370,17 +360,12 @@ def criar_residuo(id):
             device_id=data.get('device_id') or separacao.device_id
         )
 
-        admins = Usuario.query.filter_by(tipo='admin').all()
-        for admin in admins:
-            notificacao = Notificacao(
-                usuario_id=admin.id,
-                titulo='Novo Resíduo Aguardando Aprovação',
-                mensagem=f'Resíduo de {data["peso"]}kg ({data["material"]}) precisa de aprovação para descarte',
-                tipo='residuo_aprovacao',
-                url='/residuos-aprovacao.html',
-                lida=False
-            )
-            db.session.add(notificacao)
+        notificar_admins(
+            titulo='Novo Resíduo Aguardando Aprovação',
+            mensagem=f'Resíduo de {data["peso"]}kg ({data["material"]}) precisa de aprovação para descarte',
+            tipo='residuo_aprovacao',
+            url='/residuos-aprovacao.html'
+        )
 
         db.session.commit()
 
@@ -398,7 +383,7 @@ def criar_residuo(id):
 def finalizar_separacao(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario_atual = Usuario.query.get(usuario_id)
+        usuario_atual = get_current_user()
 
         if not usuario_atual:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -5,6 +5,7 @@ from app.models import (
     FornecedorTipoLoteClassificacao, TipoLotePreco, Usuario, Configuracao, Lote, EntradaEstoque
 )
 from app.auth import admin_required
+from app.services.numeracao import gerar_numero_lote
 from datetime import datetime
 import os
 import base64
@@ -522,6 +523,7 @@ def registrar_entrada(id):
         return jsonify({'erro': 'Solicitação sem itens'}), 400
     
     lote = Lote(
+        numero_lote=gerar_numero_lote(),
         fornecedor_id=solicitacao.fornecedor_id,
         tipo_lote_id=primeiro_item.tipo_lote_id,
         solicitacao_origem_id=solicitacao.id,
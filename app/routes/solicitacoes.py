@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import Fornecedor, Notificacao, Solicitacao, ItemSolicitacao, Usuario, TipoLote, FornecedorTipoLotePreco, FornecedorTipoLoteClassificacao, Lote, OrdemCompra, AuditoriaOC, Perfil, db
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.notificacao_dispatcher import notificar_admins
+from app.services.numeracao import gerar_numero_lote
 from app.utils.auditoria import registrar_auditoria_oc
 from app import socketio
 from datetime import datetime
@@ -12,7 +14,7 @@ bp = Blueprint('solicitacoes', __name__, url_prefix='/api/solicitacoes')
 @jwt_required()
 def listar_solicitacoes():
     usuario_id = get_jwt_identity()
-    usuario = Usuario.query.get(usuario_id)
+    usuario = get_current_user()
     
     status = request.args.get('status')
     fornecedor_id = request.args.get('fornecedor_id', type=int)
@@ -46,7 +48,7 @@ def listar_solicitacoes():
 def obter_solicitacao(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         solicitacao = Solicitacao.query.get(id)
         
@@ -68,7 +70,7 @@ def obter_solicitacao(id):
 def criar_solicitacao():
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if usuario.tipo != 'funcionario':
             return jsonify({'erro': 'Apenas funcionários podem criar solicitações'}), 403
@@ -202,15 +204,11 @@ def criar_solicitacao():
             
             db.session.commit()
         
-        admins = Usuario.query.filter_by(tipo='admin').all()
-        for admin in admins:
-            notificacao = Notificacao(
-                usuario_id=admin.id,
-                titulo='Nova Solicitação Criada',
-                mensagem=f'{usuario.nome} criou uma nova solicitação para o fornecedor {fornecedor.nome}.',
-                url=f'/solicitacoes.html?id={solicitacao.id}'
-            )
-            db.session.add(notificacao)
+        notificar_admins(
+            titulo='Nova Solicitação Criada',
+            mensagem=f'{usuario.nome} criou uma nova solicitação para o fornecedor {fornecedor.nome}.',
+            url=f'/solicitacoes.html?id={solicitacao.id}'
+        )
         
         db.session.commit()
         
@@ -329,6 +327,7 @@ def aprovar_solicitacao(id):
             estrelas_media = sum((item.estrelas_final or 3) for item in itens) / len(itens)
             
             lote = Lote(
+                numero_lote=gerar_numero_lote(),
                 fornecedor_id=solicitacao.fornecedor_id,
                 tipo_lote_id=tipo_lote_id,
                 solicitacao_origem_id=solicitacao.id,
@@ -394,29 +393,15 @@ def aprovar_solicitacao(id):
         print(f"    Notificação para funcionário criada")
         
         # Buscar usuários do financeiro e administradores
-        usuarios_financeiro = Usuario.query.filter(
-            db.and_(
-                Usuario.ativo == True,
-                db.or_(
-                    Usuario.tipo == 'admin',
-                    Usuario.perfil.has(Perfil.nome.in_(['Administrador', 'Financeiro']))
-                )
-            )
-        ).all()
-        
-        usuarios_ids_notificados = set()
-        for usuario_fin in usuarios_financeiro:
-            if usuario_fin.id not in usuarios_ids_notificados and usuario_fin.id != solicitacao.funcionario_id:
-                notificacao_financeiro = Notificacao(
-                    usuario_id=usuario_fin.id,
-                    titulo='Nova Ordem de Compra - Aprovação Pendente',
-                    mensagem=f'OC #{oc.id} gerada (R$ {oc.valor_total:.2f}) da Solicitação #{solicitacao.id} - Fornecedor: {solicitacao.fornecedor.nome}. Aguardando sua aprovação!',
-                    url='/compras.html'
-                )
-                db.session.add(notificacao_financeiro)
-                usuarios_ids_notificados.add(usuario_fin.id)
+        notificar_admins(
+            titulo='Nova Ordem de Compra - Aprovação Pendente',
+            mensagem=f'OC #{oc.id} gerada (R$ {oc.valor_total:.2f}) da Solicitação #{solicitacao.id} - Fornecedor: {solicitacao.fornecedor.nome}. Aguardando sua aprovação!',
+            url='/compras.html',
+            perfis=['Financeiro'],
+            excluir_usuario_id=solicitacao.funcionario_id
+        )
         
-        print(f"    {len(usuarios_ids_notificados)} notificações para financeiro/admin criadas")
+        print(f"    Notificações para financeiro/admin agendadas")
         
         # COMMIT da transação
         db.session.commit()
@@ -520,7 +505,7 @@ def rejeitar_solicitacao(id):
 def deletar_solicitacao(id):
     try:
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         solicitacao = Solicitacao.query.get(id)
         
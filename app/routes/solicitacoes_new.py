@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import Solicitacao, ItemSolicitacao, Fornecedor, TipoLote, FornecedorTipoLotePreco, FornecedorTipoLoteClassificacao, db, Usuario, Lote, OrdemCompra, Notificacao, Perfil, MaterialBase, TabelaPreco, TabelaPrecoItem
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
+from app.services.notificacao_dispatcher import notificar_admins
+from app.services.numeracao import gerar_numero_lote
 from app.utils.auditoria import registrar_auditoria_oc
 from app import socketio
 from datetime import datetime
@@ -101,6 +103,7 @@ def _criar_oc_e_lotes(solicitacao, usuario_id, data_request=None):
             print(f"    Criando lote para tipo_lote_id: {tipo_lote_id}")
         
         lote = Lote(
+            numero_lote=gerar_numero_lote(),
             fornecedor_id=solicitacao.fornecedor_id,
             tipo_lote_id=tipo_lote_id,
             solicitacao_origem_id=solicitacao.id,
@@ -306,7 +309,7 @@ def calcular_valor_item(fornecedor_id, tipo_lote_id, classificacao, estrelas_fro
 def listar_solicitacoes():
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         status = request.args.get('status', '')
         fornecedor_id = request.args.get('fornecedor_id', type=int)
@@ -357,7 +360,7 @@ def obter_solicitacao(id):
 def criar_solicitacao():
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -704,29 +707,15 @@ def aprovar_solicitacao(id):
         db.session.add(notificacao_funcionario)
         print(f"    Notificação para funcionário criada")
         
-        usuarios_financeiro = Usuario.query.filter(
-            db.and_(
-                Usuario.ativo == True,
-                db.or_(
-                    Usuario.tipo == 'admin',
-                    Usuario.perfil.has(Perfil.nome.in_(['Administrador', 'Financeiro']))
-                )
-            )
-        ).all()
-        
-        usuarios_ids_notificados = set()
-        for usuario_fin in usuarios_financeiro:
-            if usuario_fin.id not in usuarios_ids_notificados and usuario_fin.id != solicitacao.funcionario_id:
-                notificacao_financeiro = Notificacao(
-                    usuario_id=usuario_fin.id,
-                    titulo='Nova Ordem de Compra - Aprovação Pendente',
-                    mensagem=f'OC #{oc.id} gerada (R$ {oc.valor_total:.2f}) da Solicitação #{solicitacao.id} - Fornecedor: {solicitacao.fornecedor.nome}. Aguardando sua aprovação!',
-                    url='/compras.html'
-                )
-                db.session.add(notificacao_financeiro)
-                usuarios_ids_notificados.add(usuario_fin.id)
+        notificar_admins(
+            titulo='Nova Ordem de Compra - Aprovação Pendente',
+            mensagem=f'OC #{oc.id} gerada (R$ {oc.valor_total:.2f}) da Solicitação #{solicitacao.id} - Fornecedor: {solicitacao.fornecedor.nome}. Aguardando sua aprovação!',
+            url='/compras.html',
+            perfis=['Financeiro'],
+            excluir_usuario_id=solicitacao.funcionario_id
+        )
         
-        print(f"    {len(usuarios_ids_notificados)} notificações para financeiro/admin criadas")
+        print(f"    Notificações para financeiro/admin agendadas")
         
         db.session.commit()
         print(f"\n Transação commitada com sucesso!")
@@ -893,6 +882,7 @@ def aprovar_e_promover_solicitacao(id):
             valor_total = sum(item.valor_calculado for item in itens)
             
             lote = Lote(
+                numero_lote=gerar_numero_lote(),
                 fornecedor_id=solicitacao.fornecedor_id,
                 tipo_lote_id=itens[0].tipo_lote_id if itens[0].tipo_lote_id else 1,
                 solicitacao_origem_id=id,
@@ -986,7 +976,7 @@ def rejeitar_solicitacao(id):
 def deletar_solicitacao(id):
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         solicitacao = Solicitacao.query.get(id)
 
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify, send_file
-from flask_jwt_extended import jwt_required
+from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import TipoLote, TipoLotePreco, db, FornecedorTipoLoteClassificacao, Fornecedor
 from app.auth import admin_required
 from app.utils.excel_template import criar_modelo_importacao_tipos_lote
-import pandas as pd
+from app.services.importacao_tipos_lote import gerar_codigo_automatico
+from app.services.importacao_arquivos import iniciar_importacao
 import io
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment
@@ -11,18 +12,6 @@ from datetime import datetime
 
 bp = Blueprint('tipos_lote', __name__, url_prefix='/api/tipos-lote')
 
-def gerar_codigo_automatico():
-    ultimo_tipo = TipoLote.query.order_by(TipoLote.id.desc()).first()
-    if ultimo_tipo and ultimo_tipo.codigo:
-        try:
-            numero = int(ultimo_tipo.codigo.replace('TL', ''))
-            return f'TL{numero + 1:03d}'
-        except:
-            pass
-    
-    proximo_id = TipoLote.query.count() + 1
-    return f'TL{proximo_id:03d}'
-
 @bp.route('', methods=['GET'])
 @jwt_required()
 def listar_tipos_lote():
@@ -248,125 +237,12 @@ def importar_excel():
         if not arquivo.filename.endswith(('.xlsx', '.xls')):
             return jsonify({'erro': 'Formato de arquivo inválido. Use .xlsx ou .xls'}), 400
         
-        total_tipos = TipoLote.query.count()
-        
-        arquivo_bytes = arquivo.read()
-        df_tipos = pd.read_excel(io.BytesIO(arquivo_bytes), sheet_name='Tipos de Lote', header=1) if 'Tipos de Lote' in pd.ExcelFile(io.BytesIO(arquivo_bytes)).sheet_names else pd.read_excel(io.BytesIO(arquivo_bytes), header=1)
-        
-        colunas_requeridas = ['Nome', 'Descrição']
-        colunas_faltando = [col for col in colunas_requeridas if col not in df_tipos.columns]
-        
-        if colunas_faltando:
-            return jsonify({'erro': f'Colunas obrigatórias faltando: {", ".join(colunas_faltando)}'}), 400
-        
-        tipos_criados = 0
-        tipos_atualizados = 0
-        precos_criados = 0
-        erros = []
-        
-        for idx, (index, row) in enumerate(df_tipos.iterrows()):
-            linha_num = idx + 3
-            try:
-                nome = str(row['Nome']).strip()
-                if not nome or nome == 'nan' or pd.isna(row['Nome']):
-                    continue
-                
-                if total_tipos + tipos_criados >= 150:
-                    erros.append(f'Linha {linha_num}: Limite máximo de 150 tipos de lote atingido')
-                    break
-                
-                descricao = str(row.get('Descrição', '')).strip()
-                if descricao == 'nan' or pd.isna(row.get('Descrição')):
-                    descricao = ''
-                
-                tipo_existente = TipoLote.query.filter_by(nome=nome).first()
-                
-                if tipo_existente:
-                    tipo_existente.descricao = descricao if descricao else tipo_existente.descricao
-                    tipo = tipo_existente
-                    tipos_atualizados += 1
-                    TipoLotePreco.query.filter_by(tipo_lote_id=tipo.id).delete()
-                else:
-                    codigo = gerar_codigo_automatico()
-                    novo_tipo = TipoLote(
-                        nome=nome,
-                        codigo=codigo,
-                        descricao=descricao,
-                        ativo=True
-                    )
-                    db.session.add(novo_tipo)
-                    db.session.flush()
-                    tipo = novo_tipo
-                    tipos_criados += 1
-                
-                colunas_leve = ['1 Estrela', '2 Estrelas', '3 Estrelas', '4 Estrelas', '5 Estrelas']
-                colunas_medio = ['1 Estrela', '2 Estrelas', '3 Estrelas', '4 Estrelas', '5 Estrelas']
-                colunas_pesado = ['1 Estrela', '2 Estrelas', '3 Estrelas', '4 Estrelas', '5 Estrelas']
-                
-                col_offset_leve = 2
-                col_offset_medio = 7
-                col_offset_pesado = 12
-                
-                for estrela in range(1, 6):
-                    col_idx_leve = col_offset_leve + (estrela - 1)
-                    col_idx_medio = col_offset_medio + (estrela - 1)
-                    col_idx_pesado = col_offset_pesado + (estrela - 1)
-                    
-                    try:
-                        preco_leve = row.iloc[col_idx_leve] if col_idx_leve < len(row) else None
-                        if preco_leve is not None and not pd.isna(preco_leve) and float(preco_leve) > 0:
-                            preco_obj = TipoLotePreco(
-                                tipo_lote_id=tipo.id,
-                                classificacao='leve',
-                                estrelas=estrela,
-                                preco_por_kg=float(preco_leve)
-                            )
-                            db.session.add(preco_obj)
-                            precos_criados += 1
-                    except:
-                        pass
-                    
-                    try:
-                        preco_medio = row.iloc[col_idx_medio] if col_idx_medio < len(row) else None
-                        if preco_medio is not None and not pd.isna(preco_medio) and float(preco_medio) > 0:
-                            preco_obj = TipoLotePreco(
-                                tipo_lote_id=tipo.id,
-                                classificacao='medio',
-                                estrelas=estrela,
-                                preco_por_kg=float(preco_medio)
-                            )
-                            db.session.add(preco_obj)
-                            precos_criados += 1
-                    except:
-                        pass
-                    
-                    try:
-                        preco_pesado = row.iloc[col_idx_pesado] if col_idx_pesado < len(row) else None
-                        if preco_pesado is not None and not pd.isna(preco_pesado) and float(preco_pesado) > 0:
-                            preco_obj = TipoLotePreco(
-                                tipo_lote_id=tipo.id,
-                                classificacao='pesado',
-                                estrelas=estrela,
-                                preco_por_kg=float(preco_pesado)
-                            )
-                            db.session.add(preco_obj)
-                            precos_criados += 1
-                    except:
-                        pass
-            
-            except Exception as e:
-                erros.append(f'Linha {linha_num}: {str(e)}')
-                continue
-        
-        db.session.commit()
+        importacao = iniciar_importacao('tipos_lote', arquivo, get_jwt_identity())
         
         return jsonify({
-            'mensagem': 'Importação concluída com sucesso',
-            'tipos_criados': tipos_criados,
-            'tipos_atualizados': tipos_atualizados,
-            'precos_criados': precos_criados,
-            'erros': erros
-        }), 200
+            'mensagem': 'Arquivo recebido. A importação está sendo processada.',
+            'importacao': importacao.to_dict()
+        }), 202
     
     except Exception as e:
         db.session.rollback()
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import VisitaFornecedor, Fornecedor, Usuario, db
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 from datetime import datetime
 import logging
 
@@ -16,7 +16,7 @@ def listar_visitas():
     """Lista todas as visitas do usuário ou todas (admin)"""
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -111,7 +111,7 @@ def obter_visita(id):
     """Obtém detalhes de uma visita"""
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -137,7 +137,7 @@ def atualizar_visita(id):
     """Atualiza todos os dados de uma visita"""
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -208,7 +208,7 @@ def atualizar_status_visita(id):
     """Atualiza o status de uma visita"""
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -246,7 +246,7 @@ def associar_fornecedor(id):
     """Associa um fornecedor criado a uma visita"""
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -313,7 +313,7 @@ def estatisticas_visitas():
     """Retorna estatísticas das visitas"""
     try:
         usuario_id = int(get_jwt_identity())
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
         
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -1,18 +1,133 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Lote, ItemSolicitacao, Fornecedor, TipoLote, MovimentacaoEstoque, MaterialBase, Usuario, Inventario, InventarioContagem
-from app.auth import admin_required
+from app.auth import admin_required, get_current_user
 from datetime import datetime
-from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.orm import joinedload, selectinload, load_only, aliased
+import base64
 import json
 
 bp = Blueprint('wms', __name__, url_prefix='/api/wms')
 
 # ==================== LOTES WMS ====================
 
+def _nome_material_manual(lote):
+    """Nome de material digitado manualmente, gravado nas observações como 'MATERIAL_MANUAL: nome | ...'"""
+    if lote.observacoes and lote.observacoes.startswith('MATERIAL_MANUAL:'):
+        try:
+            return lote.observacoes.split('|')[0].replace('MATERIAL_MANUAL:', '').strip()
+        except:
+            pass
+    return None
+
+def _resumo_solicitacao_origem(lote):
+    sol = lote.solicitacao_origem
+    if not sol:
+        return None
+    return {
+        'id': sol.id,
+        'funcionario_id': sol.funcionario_id,
+        'funcionario_nome': sol.funcionario.nome if sol.funcionario else None,
+        'fornecedor_id': sol.fornecedor_id,
+        'fornecedor_nome': sol.fornecedor.nome if sol.fornecedor else None
+    }
+
+# Campos da listagem WMS que dependem de relacionamentos:
+# nome -> (colunas necessárias, caminhos de relacionamento a carregar, função de serialização)
+CAMPOS_DERIVADOS_LOTE_WMS = {
+    'tipo_lote_nome': (
+        ['tipo_lote_id', 'observacoes'], [('tipo_lote',)],
+        lambda l: _nome_material_manual(l) or (l.tipo_lote.nome if l.tipo_lote else None)
+    ),
+    'tipo_lote': (
+        ['tipo_lote_id'], [('tipo_lote',)],
+        lambda l: {'id': l.tipo_lote.id, 'nome': l.tipo_lote.nome} if l.tipo_lote else None
+    ),
+    'fornecedor_nome': (
+        ['fornecedor_id'], [('fornecedor',)],
+        lambda l: l.fornecedor.nome if l.fornecedor else None
+    ),
+    'fornecedor': (
+        ['fornecedor_id'], [('fornecedor',)],
+        lambda l: {'id': l.fornecedor.id, 'nome': l.fornecedor.nome, 'cnpj': l.fornecedor.cnpj} if l.fornecedor else None
+    ),
+    'reservado_por_nome': (
+        ['reservado_por_id'], [('reservado_por',)],
+        lambda l: l.reservado_por.nome if l.reservado_por else None
+    ),
+    'bloqueado_por_nome': (
+        ['bloqueado_por_id'], [('bloqueado_por',)],
+        lambda l: l.bloqueado_por.nome if l.bloqueado_por else None
+    ),
+    'conferente_nome': (
+        ['conferente_id'], [('conferente',)],
+        lambda l: l.conferente.nome if l.conferente else None
+    ),
+    'solicitacao_origem': (
+        ['solicitacao_origem_id'],
+        [('solicitacao_origem', 'funcionario'), ('solicitacao_origem', 'fornecedor')],
+        _resumo_solicitacao_origem
+    ),
+}
+
+# Contadores calculados por subconsulta correlacionada (índices em itens_solicitacao.lote_id
+# e lotes.lote_pai_id), sem carregar as coleções filhas
+SUBLOTE = aliased(Lote)
+CONTADORES_LOTE_WMS = {
+    'itens_count': select(func.count(ItemSolicitacao.id)).where(
+        ItemSolicitacao.lote_id == Lote.id
+    ).correlate(Lote).scalar_subquery(),
+    'sublotes_count': select(func.count(SUBLOTE.id)).where(
+        SUBLOTE.lote_pai_id == Lote.id
+    ).correlate(Lote).scalar_subquery(),
+}
+
+# Relacionamentos tocados por Lote.to_dict() e pela listagem completa
+RELACIONAMENTOS_LOTE_WMS_COMPLETO = [
+    ('tipo_lote',), ('fornecedor',), ('reservado_por',), ('bloqueado_por',), ('conferente',),
+    ('solicitacao_origem', 'funcionario'), ('solicitacao_origem', 'fornecedor'),
+]
+
+def _opcao_carregamento(caminho):
+    """Eager loading para um caminho de relacionamentos: joinedload para N:1, selectinload para coleções"""
+    entidade, opcao = Lote, None
+    for nome in caminho:
+        relacionamento = getattr(entidade, nome)
+        carregador = selectinload if relacionamento.property.uselist else joinedload
+        opcao = carregador(relacionamento) if opcao is None else getattr(opcao, carregador.__name__)(relacionamento)
+        entidade = relacionamento.property.mapper.class_
+    return opcao
+
+def _serializar_coluna_lote(lote, campo):
+    valor = getattr(lote, campo)
+    if campo == 'valor_total':
+        return float(valor) if valor else 0.0
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+def _codificar_cursor_lote(lote):
+    bruto = f'{lote.data_criacao.isoformat()}|{lote.id}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+def _decodificar_cursor_lote(cursor):
+    data_criacao, lote_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(data_criacao), int(lote_id)
+
 @bp.route('/lotes', methods=['GET'])
 @jwt_required()
 def listar_lotes_wms():
+    """
+    Lista lotes do WMS.
+
+    Parâmetros opcionais:
+    - limite: ativa a paginação por cursor (keyset em data_criacao, id) e devolve
+      {'lotes': [...], 'proximo_cursor': ..., 'tem_mais': ...}; sem ele a resposta
+      continua sendo a lista completa
+    - cursor: valor de proximo_cursor da página anterior
+    - fields: campos separados por vírgula; só os relacionamentos necessários são carregados
+    """
     try:
         status = request.args.get('status')
         fornecedor_id = request.args.get('fornecedor_id', type=int)
@@ -21,6 +136,17 @@ def listar_lotes_wms():
         bloqueado = request.args.get('bloqueado')
         reservado = request.args.get('reservado')
         divergente = request.args.get('divergente')
+        limite = request.args.get('limite', type=int)
+        cursor = request.args.get('cursor')
+        fields = request.args.get('fields')
+
+        colunas_lote = Lote.__table__.columns.keys()
+        campos = None
+        if fields:
+            campos = [c.strip() for c in fields.split(',') if c.strip()]
+            invalidos = [c for c in campos if c not in colunas_lote and c not in CAMPOS_DERIVADOS_LOTE_WMS and c not in CONTADORES_LOTE_WMS]
+            if invalidos:
+                return jsonify({'erro': f'Campos inválidos: {", ".join(invalidos)}'}), 400
 
         query = Lote.query
 
@@ -43,28 +169,72 @@ def listar_lotes_wms():
                     db.cast(Lote.divergencias, db.String) != '[]'
                 )
 
-        lotes = query.order_by(Lote.data_criacao.desc()).all()
+        if cursor:
+            try:
+                cursor_data, cursor_id = _decodificar_cursor_lote(cursor)
+            except Exception:
+                return jsonify({'erro': 'Cursor inválido'}), 400
+            query = query.filter(or_(
+                Lote.data_criacao < cursor_data,
+                and_(Lote.data_criacao == cursor_data, Lote.id < cursor_id)
+            ))
+
+        if campos is None:
+            contadores = list(CONTADORES_LOTE_WMS)
+            query = query.options(*[_opcao_carregamento(c) for c in RELACIONAMENTOS_LOTE_WMS_COMPLETO])
+        else:
+            colunas = {'id', 'data_criacao'} | {c for c in campos if c in colunas_lote}
+            opcoes = []
+            for campo in campos:
+                if campo in CAMPOS_DERIVADOS_LOTE_WMS:
+                    colunas_necessarias, caminhos, _ = CAMPOS_DERIVADOS_LOTE_WMS[campo]
+                    colunas.update(colunas_necessarias)
+                    opcoes.extend(_opcao_carregamento(c) for c in caminhos)
+            query = query.options(load_only(*[getattr(Lote, c) for c in colunas]), *opcoes)
+            contadores = [c for c in CONTADORES_LOTE_WMS if c in campos]
+
+        query = query.add_columns(*[CONTADORES_LOTE_WMS[c].label(c) for c in contadores])
+        query = query.order_by(Lote.data_criacao.desc(), Lote.id.desc())
+        if limite:
+            limite = max(1, min(limite, 500))
+            linhas = query.limit(limite + 1).all()
+            tem_mais = len(linhas) > limite
+            linhas = linhas[:limite]
+        else:
+            linhas = query.all()
+        if not contadores:
+            # Sem contadores, add_columns não acrescenta nada e cada linha é o próprio Lote
+            linhas = [(lote,) for lote in linhas]
 
         resultado = []
-        for lote in lotes:
-            lote_dict = lote.to_dict()
-            
-            # Lógica para priorizar nome manual se existir
-            nome_material = None
-            if lote.observacoes and lote.observacoes.startswith('MATERIAL_MANUAL:'):
-                try:
-                    nome_material = lote.observacoes.split('|')[0].replace('MATERIAL_MANUAL:', '').strip()
-                except:
-                    pass
-            
-            lote_dict['tipo_lote_nome'] = nome_material or (lote.tipo_lote.nome if lote.tipo_lote else None)
-            lote_dict['fornecedor_nome'] = lote.fornecedor.nome if lote.fornecedor else None
-            lote_dict['itens_count'] = len(lote.itens) if lote.itens else 0
-            lote_dict['sublotes_count'] = len(lote.sublotes)
-            lote_dict['lote_pai_id'] = lote.lote_pai_id  # Garantir que o campo seja retornado
+        for lote, *valores_contadores in linhas:
+            valores_contadores = dict(zip(contadores, valores_contadores))
+            if campos is None:
+                lote_dict = lote.to_dict()
+                lote_dict['tipo_lote_nome'] = _nome_material_manual(lote) or (lote.tipo_lote.nome if lote.tipo_lote else None)
+                lote_dict['fornecedor_nome'] = lote.fornecedor.nome if lote.fornecedor else None
+                lote_dict['itens_count'] = valores_contadores['itens_count']
+                lote_dict['sublotes_count'] = valores_contadores['sublotes_count']
+                lote_dict['lote_pai_id'] = lote.lote_pai_id  # Garantir que o campo seja retornado
+            else:
+                lote_dict = {}
+                for campo in campos:
+                    if campo in CONTADORES_LOTE_WMS:
+                        lote_dict[campo] = valores_contadores[campo]
+                    elif campo in CAMPOS_DERIVADOS_LOTE_WMS:
+                        lote_dict[campo] = CAMPOS_DERIVADOS_LOTE_WMS[campo][2](lote)
+                    else:
+                        lote_dict[campo] = _serializar_coluna_lote(lote, campo)
             resultado.append(lote_dict)
 
-        return jsonify(resultado), 200
+        if not limite:
+            return jsonify(resultado), 200
+
+        return jsonify({
+            'lotes': resultado,
+            'proximo_cursor': _codificar_cursor_lote(linhas[-1][0]) if tem_mais else None,
+            'tem_mais': tem_mais
+        }), 200
 
     except Exception as e:
         return jsonify({'erro': f'Erro ao listar lotes: {str(e)}'}), 500
@@ -248,7 +418,7 @@ def bloquear_lote(lote_id):
         motivo = data.get('motivo', '')
 
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -297,7 +467,7 @@ def desbloquear_lote(lote_id):
             return jsonify({'erro': 'Lote não está bloqueado'}), 400
 
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -350,7 +520,7 @@ def reservar_lote(lote_id):
         reservado_para = data.get('reservado_para', '')
 
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -397,7 +567,7 @@ def liberar_reserva_lote(lote_id):
             return jsonify({'erro': 'Lote não está reservado'}), 400
 
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -458,7 +628,7 @@ def movimentar_lote(lote_id):
             return jsonify({'erro': 'Localização destino é obrigatória'}), 400
 
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
@@ -559,7 +729,7 @@ def reverter_movimentacao(mov_id):
         motivo = data.get('motivo', '')
 
         usuario_id = get_jwt_identity()
-        usuario = Usuario.query.get(usuario_id)
+        usuario = get_current_user()
 
         if not usuario:
             return jsonify({'erro': 'Usuário não encontrado'}), 404
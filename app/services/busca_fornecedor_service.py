@@ -0,0 +1,70 @@
+from app.models import db, Fornecedor
+from sqlalchemy import func, case, or_, text
+import re
+
+# URL do banco -> pg_trgm instalado; consultado uma vez por processo
+_trigramas_por_banco = {}
+
+def usa_trigramas():
+    """
+    No PostgreSQL com a extensão pg_trgm a busca usa similarity (e os índices GIN);
+    sem ela (ex.: papel sem permissão para CREATE EXTENSION) ou no SQLite, cai no LIKE simples
+    """
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        return False
+    chave = str(engine.url)
+    if chave not in _trigramas_por_banco:
+        try:
+            with engine.connect() as conn:
+                _trigramas_por_banco[chave] = conn.execute(
+                    text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                ).first() is not None
+        except Exception:
+            return False
+    return _trigramas_por_banco[chave]
+
+def escapar_like(termo):
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def aplicar_busca(query, busca):
+    """
+    Filtra e ordena uma query de Fornecedor pelo termo de busca.
+
+    - nome, nome_social e email: ILIKE '%termo%' (acelerado pelos índices GIN de trigramas)
+    - CNPJ/CPF: termo só com dígitos e pontuação vira busca por prefixo em documento_digitos
+    - ordenação por relevância: documento que casa, similaridade do nome e depois nome
+    """
+    termo = (busca or '').strip()
+    if not termo:
+        return query.order_by(Fornecedor.nome)
+
+    padrao = f'%{escapar_like(termo)}%'
+    condicoes = [
+        Fornecedor.nome.ilike(padrao, escape='\\'),
+        Fornecedor.nome_social.ilike(padrao, escape='\\'),
+        Fornecedor.email.ilike(padrao, escape='\\')
+    ]
+    ordem = []
+
+    digitos = re.sub(r'[^\d]', '', termo)
+    if digitos and re.fullmatch(r'[\d.\-/\s]+', termo):
+        prefixo_documento = Fornecedor.documento_digitos.like(f'{digitos}%')
+        condicoes.append(prefixo_documento)
+        ordem.append(case((prefixo_documento, 1), else_=0).desc())
+
+    if usa_trigramas():
+        relevancia = func.greatest(
+            func.similarity(func.coalesce(Fornecedor.nome, ''), termo),
+            func.similarity(func.coalesce(Fornecedor.nome_social, ''), termo),
+            func.similarity(func.coalesce(Fornecedor.email, ''), termo)
+        )
+    else:
+        relevancia = case(
+            (Fornecedor.nome.ilike(f'{escapar_like(termo)}%', escape='\\'), 2),
+            (Fornecedor.nome.ilike(padrao, escape='\\'), 1),
+            else_=0
+        )
+    ordem.extend([relevancia.desc(), Fornecedor.nome])
+
+    return query.filter(or_(*condicoes)).order_by(*ordem)
@@ -0,0 +1,141 @@
+"""
+Comissões dos relatórios de RH calculadas no banco.
+
+O valor de um item é valor_calculado e, quando ele é zero (ou nulo), peso_kg x
+preco_por_kg_snapshot (valor_item). As somas por solicitação, por funcionário e por
+fornecedor são um único SELECT agregado sobre solicitações aprovadas, com o período
+filtrado na própria consulta (índice idx_solicitacoes_funcionario_status_envio). A
+comissão é o valor vezes o percentual_comissao do funcionário.
+
+scripts/verificar_comissoes.py compara os totais com o cálculo antigo, item a item em Python.
+"""
+from app.models import db, Usuario, Solicitacao, ItemSolicitacao, Fornecedor, Perfil
+from sqlalchemy import func, case, and_
+from datetime import datetime, timedelta
+
+def valor_item():
+    """Valor do item em SQL, com a mesma regra do cálculo em Python"""
+    return case(
+        (and_(ItemSolicitacao.valor_calculado.isnot(None), ItemSolicitacao.valor_calculado != 0),
+         ItemSolicitacao.valor_calculado),
+        (and_(
+            ItemSolicitacao.peso_kg.isnot(None), ItemSolicitacao.peso_kg != 0,
+            ItemSolicitacao.preco_por_kg_snapshot.isnot(None), ItemSolicitacao.preco_por_kg_snapshot != 0
+        ), ItemSolicitacao.peso_kg * ItemSolicitacao.preco_por_kg_snapshot),
+        else_=0.0
+    )
+
+def periodo(data_inicio=None, data_fim=None):
+    """
+    Datas 'AAAA-MM-DD' dos filtros (data_fim inclusiva) como intervalo [inicio, fim).
+    Datas inválidas são ignoradas, como nos relatórios.
+    """
+    inicio, fim = None, None
+    if data_inicio:
+        try:
+            inicio = datetime.strptime(data_inicio, '%Y-%m-%d')
+        except ValueError:
+            pass
+    if data_fim:
+        try:
+            fim = datetime.strptime(data_fim, '%Y-%m-%d') + timedelta(days=1)
+        except ValueError:
+            pass
+    return inicio, fim
+
+def _aprovadas(consulta, inicio=None, fim=None, funcionario_id=None, fornecedor_id=None):
+    """Solicitações aprovadas do período com os itens (também as sem itens, com valor 0)"""
+    consulta = consulta.select_from(Solicitacao).outerjoin(
+        ItemSolicitacao, ItemSolicitacao.solicitacao_id == Solicitacao.id
+    ).filter(Solicitacao.status == 'aprovada')
+    if funcionario_id is not None:
+        consulta = consulta.filter(Solicitacao.funcionario_id == funcionario_id)
+    if fornecedor_id is not None:
+        consulta = consulta.filter(Solicitacao.fornecedor_id == fornecedor_id)
+    if inicio:
+        consulta = consulta.filter(Solicitacao.data_envio >= inicio)
+    if fim:
+        consulta = consulta.filter(Solicitacao.data_envio < fim)
+    return consulta
+
+def _valor_total():
+    return func.coalesce(func.sum(valor_item()), 0.0).label('valor_total')
+
+def somar_por_funcionario(inicio=None, fim=None, apenas_comissionados=True):
+    """{funcionario_id: (total de solicitações, valor total)}"""
+    consulta = _aprovadas(db.session.query(
+        Solicitacao.funcionario_id,
+        func.count(func.distinct(Solicitacao.id)).label('total_solicitacoes'),
+        _valor_total()
+    ), inicio, fim)
+    if apenas_comissionados:
+        consulta = consulta.join(Usuario, Usuario.id == Solicitacao.funcionario_id).filter(
+            Usuario.percentual_comissao > 0
+        )
+    return {
+        linha.funcionario_id: (linha.total_solicitacoes, float(linha.valor_total))
+        for linha in consulta.group_by(Solicitacao.funcionario_id)
+    }
+
+def somar_por_fornecedor(funcionario_id, inicio=None, fim=None, fornecedor_id=None):
+    """Valor total e número de solicitações aprovadas do funcionário por fornecedor, maior valor primeiro"""
+    consulta = _aprovadas(db.session.query(
+        Solicitacao.fornecedor_id,
+        Fornecedor.nome.label('fornecedor_nome'),
+        func.count(func.distinct(Solicitacao.id)).label('total_solicitacoes'),
+        _valor_total()
+    ), inicio, fim, funcionario_id=funcionario_id, fornecedor_id=fornecedor_id).outerjoin(
+        Fornecedor, Fornecedor.id == Solicitacao.fornecedor_id
+    ).group_by(Solicitacao.fornecedor_id, Fornecedor.nome)
+
+    linhas = [
+        {
+            'fornecedor_id': linha.fornecedor_id,
+            'fornecedor_nome': linha.fornecedor_nome,
+            'total_solicitacoes': linha.total_solicitacoes,
+            'valor_total': float(linha.valor_total)
+        }
+        for linha in consulta
+    ]
+    linhas.sort(key=lambda linha: linha['valor_total'], reverse=True)
+    return linhas
+
+def valores_por_solicitacao(inicio=None, fim=None, funcionario_id=None, fornecedor_id=None):
+    """
+    Consulta com uma linha por solicitação aprovada: valor total, fornecedor e funcionário
+    (nome, email, perfil e percentual), em ordem de id.
+    """
+    return _aprovadas(db.session.query(
+        Solicitacao.id,
+        Solicitacao.data_envio,
+        Solicitacao.data_confirmacao,
+        Solicitacao.status,
+        Solicitacao.fornecedor_id,
+        Fornecedor.nome.label('fornecedor_nome'),
+        Solicitacao.funcionario_id,
+        Usuario.nome.label('funcionario_nome'),
+        Usuario.email.label('funcionario_email'),
+        Perfil.nome.label('perfil_nome'),
+        Usuario.percentual_comissao,
+        _valor_total()
+    ), inicio, fim, funcionario_id=funcionario_id, fornecedor_id=fornecedor_id).outerjoin(
+        Fornecedor, Fornecedor.id == Solicitacao.fornecedor_id
+    ).outerjoin(
+        Usuario, Usuario.id == Solicitacao.funcionario_id
+    ).outerjoin(
+        Perfil, Perfil.id == Usuario.perfil_id
+    ).group_by(
+        Solicitacao.id, Fornecedor.id, Usuario.id, Perfil.id
+    ).order_by(Solicitacao.id)
+
+def somar_periodo(inicio=None, fim=None):
+    """(solicitações aprovadas, valor total, comissão total) do período, em uma consulta"""
+    percentual = func.coalesce(Usuario.percentual_comissao, 0.0)
+    linha = _aprovadas(db.session.query(
+        func.count(func.distinct(Solicitacao.id)).label('total_solicitacoes'),
+        _valor_total(),
+        func.coalesce(func.sum(valor_item() * percentual / 100), 0.0).label('total_comissao')
+    ), inicio, fim).outerjoin(
+        Usuario, Usuario.id == Solicitacao.funcionario_id
+    ).one()
+    return linha.total_solicitacoes, float(linha.valor_total), float(linha.total_comissao)
@@ -0,0 +1,346 @@
+"""
+Cotações de metais compartilhadas entre os workers (stale-while-revalidate).
+
+As cotações ficam no cache compartilhado (app/utils/cache_compartilhado.py) e são
+renovadas por um laço em segundo plano (iniciar_atualizador_cotacoes). A reserva do
+cache garante que só um processo consulta as APIs por vez. fetch_metals_data nunca espera
+as APIs: devolve a última cotação gravada, mesmo vencida (com mais de CACHE_DURATION
+segundos), e nesse caso dispara a renovação em segundo plano. Antes da primeira
+cotação gravada, devolve a simulada.
+
+metals.live, goldpricez e awesomeapi são consultadas ao mesmo tempo, com prazo total de
+COTACOES_METAIS_PRAZO_SEGUNDOS; a que não responder nesse prazo fica de fora. Cada
+renovação também entra no histórico (historico_metais).
+"""
+from app import socketio
+from app.models import db
+from app.services.historico_metais import registrar_cotacoes
+from app.utils.cache_compartilhado import obter_cache_compartilhado
+from flask import current_app
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import logging
+import random
+import requests
+import threading
+import time
+import urllib3
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+logger = logging.getLogger(__name__)
+
+CHAVE_COTACOES = 'cotacoes_metais'
+CACHE_DURATION = 60
+PRAZO_PADRAO = 4
+INTERVALO_PADRAO = 30
+USD_BRL_PADRAO = 5.0
+
+METAL_SYMBOLS = {
+    'XAU': {
+        'name': 'Ouro', 
+        'icon': 'gold', 
+        'color': '#FFD700',
+        'fonte_ewaste': 'Placas de circuito, conectores, processadores, memoria RAM',
+        'concentracao': 'Alta em placas-mae e processadores'
+    },
+    'XAG': {
+        'name': 'Prata', 
+        'icon': 'silver', 
+        'color': '#C0C0C0',
+        'fonte_ewaste': 'Contatos eletricos, soldas, teclas de membrana, paineis solares',
+        'concentracao': 'Media em teclados e interruptores'
+    },
+    'XPT': {
+        'name': 'Platina', 
+        'icon': 'platinum', 
+        'color': '#E5E4E2',
+        'fonte_ewaste': 'Discos rigidos, termopares, sensores',
+        'concentracao': 'Baixa, principalmente em HDDs antigos'
+    },
+    'XPD': {
+        'name': 'Paladio', 
+        'icon': 'palladium', 
+        'color': '#CED0DD',
+        'fonte_ewaste': 'Capacitores ceramicos, conectores, reles',
+        'concentracao': 'Media em capacitores MLCC'
+    },
+    'XCU': {
+        'name': 'Cobre', 
+        'icon': 'copper', 
+        'color': '#B87333',
+        'fonte_ewaste': 'Fios, cabos, trilhas de PCB, motores, transformadores',
+        'concentracao': 'Muito alta em todos os eletronicos'
+    },
+    'SN': {
+        'name': 'Estanho', 
+        'icon': 'tin', 
+        'color': '#D3D3D3',
+        'fonte_ewaste': 'Soldas, revestimentos de componentes',
+        'concentracao': 'Alta em placas soldadas'
+    },
+    'NI': {
+        'name': 'Niquel', 
+        'icon': 'nickel', 
+        'color': '#848482',
+        'fonte_ewaste': 'Baterias NiMH/NiCd, revestimentos, acos inox',
+        'concentracao': 'Alta em baterias recarregaveis'
+    },
+    'CO': {
+        'name': 'Cobalto', 
+        'icon': 'cobalt', 
+        'color': '#0047AB',
+        'fonte_ewaste': 'Baterias de litio-ion, imas permanentes',
+        'concentracao': 'Alta em baterias de celulares e notebooks'
+    },
+    'AL': {
+        'name': 'Aluminio', 
+        'icon': 'aluminum', 
+        'color': '#A9A9A9',
+        'fonte_ewaste': 'Dissipadores de calor, carcacas, capacitores eletroliticos',
+        'concentracao': 'Muito alta em estruturas e refrigeracao'
+    },
+    'TA': {
+        'name': 'Tantalo', 
+        'icon': 'tantalum', 
+        'color': '#4A4A4A',
+        'fonte_ewaste': 'Capacitores de tantalo, celulares, notebooks',
+        'concentracao': 'Media em capacitores SMD'
+    },
+    'IN': {
+        'name': 'Indio', 
+        'icon': 'indium', 
+        'color': '#4B0082',
+        'fonte_ewaste': 'Telas LCD/LED, paineis touch, soldas especiais',
+        'concentracao': 'Media em displays'
+    },
+    'GA': {
+        'name': 'Galio', 
+        'icon': 'gallium', 
+        'color': '#6B8E23',
+        'fonte_ewaste': 'LEDs, semicondutores GaAs, celulares',
+        'concentracao': 'Baixa em chips especializados'
+    }
+}
+
+_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='cotacoes')
+_revalidando = threading.Event()
+_atualizador_iniciado = False
+
+def get_metals_live_api(timeout=10):
+    try:
+        response = requests.get('https://api.metals.live/v1/spot', timeout=timeout, verify=False)
+        if response.status_code == 200:
+            data = response.json()
+            if not data or not isinstance(data, list):
+                return None
+            result = {}
+            for item in data:
+                if not item or not isinstance(item, dict):
+                    continue
+                symbol = item.get('symbol', '').upper()
+                if symbol in METAL_SYMBOLS:
+                    result[symbol] = {
+                        'price_usd': float(item.get('price', 0)),
+                        'name': METAL_SYMBOLS[symbol]['name'],
+                        'source': 'metals.live'
+                    }
+            if result:
+                return result
+    except Exception as e:
+        print(f"Erro ao buscar metals.live: {e}")
+    return None
+
+def get_gold_api_free(timeout=10):
+    try:
+        response = requests.get('https://api.goldpricez.com/v1/rates/currency/usd/metal/xau', timeout=timeout)
+        if response.status_code == 200:
+            data = response.json()
+            if 'price_gram_24k' in data:
+                price_per_gram = float(data['price_gram_24k'])
+                price_per_oz = price_per_gram * 31.1035
+                return {
+                    'XAU': {
+                        'price_usd': price_per_oz,
+                        'name': 'Ouro',
+                        'source': 'goldpricez'
+                    }
+                }
+    except Exception as e:
+        print(f"Erro ao buscar goldpricez: {e}")
+    return None
+
+def get_awesome_api_currencies(timeout=10, default=USD_BRL_PADRAO):
+    try:
+        response = requests.get('https://economia.awesomeapi.com.br/json/last/USD-BRL', timeout=timeout)
+        if response.status_code == 200:
+            data = response.json()
+            if 'USDBRL' in data:
+                return float(data['USDBRL']['bid'])
+    except Exception as e:
+        print(f"Erro ao buscar taxa USD/BRL: {e}")
+    return default
+
+def get_simulated_metals_data():
+    base_prices = {
+        'XAU': 2650.0,
+        'XAG': 31.5,
+        'XPT': 1020.0,
+        'XPD': 1050.0,
+        'XCU': 4.2,
+        'SN': 28.5,
+        'NI': 8.2,
+        'CO': 14.5,
+        'AL': 1.15,
+        'TA': 180.0,
+        'IN': 250.0,
+        'GA': 280.0
+    }
+    
+    result = {}
+    for symbol, base_price in base_prices.items():
+        if symbol not in METAL_SYMBOLS:
+            continue
+        variation = random.uniform(-0.02, 0.02)
+        price = base_price * (1 + variation)
+        metal_info = METAL_SYMBOLS[symbol]
+        result[symbol] = {
+            'price_usd': round(price, 2),
+            'name': metal_info['name'],
+            'color': metal_info.get('color', '#888888'),
+            'fonte_ewaste': metal_info.get('fonte_ewaste', ''),
+            'concentracao': metal_info.get('concentracao', ''),
+            'source': 'simulated'
+        }
+    return result
+
+def montar_cotacoes(metals_data, usd_brl, previous_metals=None):
+    """Preços derivados (BRL, grama, kg) e variação em relação às cotações anteriores"""
+    previous_metals = previous_metals or {}
+    
+    for symbol, data in metals_data.items():
+        metal_info = METAL_SYMBOLS.get(symbol, {})
+        data['price_brl'] = round(data['price_usd'] * usd_brl, 2)
+        data['price_oz'] = data['price_usd']
+        data['price_gram_usd'] = round(data['price_usd'] / 31.1035, 4)
+        data['price_gram_brl'] = round(data['price_brl'] / 31.1035, 4)
+        data['price_kg_brl'] = round(data['price_gram_brl'] * 1000, 2)
+        data['symbol'] = symbol
+        data['color'] = metal_info.get('color', '#666')
+        data['fonte_ewaste'] = metal_info.get('fonte_ewaste', '')
+        data['concentracao'] = metal_info.get('concentracao', '')
+        
+        prev_metal = previous_metals.get(symbol) if isinstance(previous_metals, dict) else None
+        prev_price = prev_metal.get('price_usd', data['price_usd']) if isinstance(prev_metal, dict) else data['price_usd']
+        data['variation'] = round(((data['price_usd'] - prev_price) / prev_price) * 100, 2) if prev_price else 0
+        data['variation_absolute'] = round(data['price_usd'] - prev_price, 2)
+    
+    return {
+        'metals': metals_data,
+        'usd_brl': usd_brl,
+        'timestamp': datetime.now().isoformat(),
+        'source': list(metals_data.values())[0]['source'] if metals_data else 'none'
+    }
+
+def _resultado(futuro):
+    if not futuro.done() or futuro.exception():
+        return None
+    return futuro.result()
+
+def buscar_cotacoes(prazo, anterior=None):
+    """
+    Consulta as APIs ao mesmo tempo e espera no máximo `prazo` segundos no total.
+    Prioridade: metals.live, goldpricez e, sem nenhuma das duas, a simulada. Sem
+    awesomeapi, o dólar fica o da cotação anterior.
+    """
+    anterior = anterior or {}
+    usd_brl_anterior = anterior.get('usd_brl') or USD_BRL_PADRAO
+    metals_live = _executor.submit(get_metals_live_api, prazo)
+    goldpricez = _executor.submit(get_gold_api_free, prazo)
+    cambio = _executor.submit(get_awesome_api_currencies, prazo, usd_brl_anterior)
+    wait([metals_live, goldpricez, cambio], timeout=prazo)
+
+    metals_data = _resultado(metals_live) or _resultado(goldpricez) or get_simulated_metals_data()
+    usd_brl = _resultado(cambio) or usd_brl_anterior
+    return montar_cotacoes(metals_data, usd_brl, anterior.get('metals'))
+
+def atualizar_cotacoes():
+    """
+    Renova as cotações do cache compartilhado, se nenhum outro processo estiver
+    renovando. Retorna True quando gravou cotações novas.
+    """
+    cache = obter_cache_compartilhado()
+    prazo = current_app.config.get('COTACOES_METAIS_PRAZO_SEGUNDOS', PRAZO_PADRAO)
+    # A reserva expira sozinha se o processo morrer no meio da consulta
+    if not cache.reservar(CHAVE_COTACOES, int(prazo * 3) + 1):
+        return False
+    try:
+        entrada = cache.ler(CHAVE_COTACOES) or {}
+        cotacoes = buscar_cotacoes(prazo, entrada.get('dados'))
+        cache.gravar(CHAVE_COTACOES, {'dados': cotacoes, 'atualizado_em': time.time()})
+        # Ainda com a reserva: um só processo grava o histórico
+        try:
+            registrar_cotacoes(cotacoes)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f'Erro ao gravar histórico das cotações de metais: {e}')
+    finally:
+        cache.liberar(CHAVE_COTACOES)
+    return True
+
+def _revalidar(app):
+    try:
+        with app.app_context():
+            try:
+                atualizar_cotacoes()
+            except Exception as e:
+                logger.warning(f'Erro ao atualizar cotações de metais: {e}')
+            finally:
+                db.session.remove()
+    finally:
+        _revalidando.clear()
+
+def _revalidar_em_segundo_plano():
+    # Uma renovação por processo; entre processos, a reserva do cache
+    if _revalidando.is_set():
+        return
+    _revalidando.set()
+    socketio.start_background_task(_revalidar, current_app._get_current_object())
+
+def fetch_metals_data():
+    """Últimas cotações gravadas, sem esperar as APIs (ver docstring do módulo)"""
+    try:
+        entrada = obter_cache_compartilhado().ler(CHAVE_COTACOES)
+    except Exception as e:
+        logger.warning(f'Erro ao ler cotações de metais do cache: {e}')
+        entrada = None
+
+    if entrada is None or time.time() - entrada['atualizado_em'] >= CACHE_DURATION:
+        _revalidar_em_segundo_plano()
+    if entrada is None:
+        return montar_cotacoes(get_simulated_metals_data(), USD_BRL_PADRAO)
+    return entrada['dados']
+
+def iniciar_atualizador_cotacoes(app):
+    """Dispara o laço de atualização das cotações em segundo plano (uma vez por processo)"""
+    global _atualizador_iniciado
+    intervalo = int(app.config.get('COTACOES_METAIS_SEGUNDOS', INTERVALO_PADRAO))
+    if _atualizador_iniciado or intervalo <= 0:
+        return
+    _atualizador_iniciado = True
+    socketio.start_background_task(_laco_atualizacao, app, intervalo)
+
+def _laco_atualizacao(app, intervalo):
+    while True:
+        with app.app_context():
+            try:
+                entrada = obter_cache_compartilhado().ler(CHAVE_COTACOES)
+                # Renova a partir da metade da validade: as requisições quase nunca veem cotação vencida
+                if entrada is None or time.time() - entrada['atualizado_em'] >= CACHE_DURATION / 2:
+                    atualizar_cotacoes()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Erro ao atualizar cotações de metais: {e}', exc_info=True)
+            finally:
+                db.session.remove()
+        socketio.sleep(intervalo)
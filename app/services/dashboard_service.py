@@ -0,0 +1,357 @@
+from app.models import db, Usuario, Fornecedor, Solicitacao, Lote, TipoLote, ResumoMensalLote, ResumoMensalSolicitacao
+from sqlalchemy import func, case, and_, event, extract, inspect, select, delete, insert
+from datetime import date, datetime
+from dateutil.relativedelta import relativedelta
+
+NOMES_MESES = ['', 'Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
+               'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+
+# Campos que definem o grupo do resumo e campos cujo valor entra nas somas
+CAMPOS_GRUPO_LOTE = ('data_criacao', 'fornecedor_id', 'tipo_lote_id')
+CAMPOS_RESUMO_LOTE = CAMPOS_GRUPO_LOTE + ('status', 'valor_total', 'peso_total_kg')
+CAMPOS_GRUPO_SOLICITACAO = ('data_envio', 'funcionario_id', 'fornecedor_id')
+CAMPOS_RESUMO_SOLICITACAO = CAMPOS_GRUPO_SOLICITACAO + ('status',)
+
+def contar_solicitacoes_por_status():
+    """Conta solicitações pendentes, aprovadas e rejeitadas em uma única consulta"""
+    resultado = db.session.query(
+        func.count(case((Solicitacao.status == 'pendente', Solicitacao.id))).label('pendentes'),
+        func.count(case((Solicitacao.status == 'aprovada', Solicitacao.id))).label('aprovados'),
+        func.count(case((Solicitacao.status == 'rejeitada', Solicitacao.id))).label('reprovados')
+    ).filter(
+        Solicitacao.status.in_(['pendente', 'aprovada', 'rejeitada'])
+    ).one()
+
+    return {
+        'pendentes': resultado.pendentes or 0,
+        'aprovados': resultado.aprovados or 0,
+        'reprovados': resultado.reprovados or 0
+    }
+
+def somar_lotes():
+    """Soma o valor dos lotes aprovados e o peso por classificação do tipo de lote em uma única varredura"""
+    resultado = db.session.query(
+        func.sum(case((Lote.status == 'aprovado', Lote.valor_total), else_=0)).label('valor_total'),
+        func.sum(case((TipoLote.classificacao == 'leve', Lote.peso_total_kg), else_=0)).label('quilos_leve'),
+        func.sum(case((TipoLote.classificacao == 'media', Lote.peso_total_kg), else_=0)).label('quilos_media'),
+        func.sum(case((TipoLote.classificacao == 'pesada', Lote.peso_total_kg), else_=0)).label('quilos_pesada')
+    ).outerjoin(
+        TipoLote, Lote.tipo_lote_id == TipoLote.id
+    ).one()
+
+    return {
+        'valor_total': float(resultado.valor_total or 0),
+        'quilos_por_tipo': {
+            'leve': float(resultado.quilos_leve or 0),
+            'media': float(resultado.quilos_media or 0),
+            'pesada': float(resultado.quilos_pesada or 0)
+        }
+    }
+
+def ranking_fornecedores(limite=10):
+    """Top fornecedores por número de solicitações aprovadas"""
+    total = func.count(Solicitacao.id).label('total')
+    ranking = db.session.query(
+        Fornecedor.id,
+        Fornecedor.nome,
+        total
+    ).join(
+        Solicitacao, Solicitacao.fornecedor_id == Fornecedor.id
+    ).filter(
+        Solicitacao.status == 'aprovada'
+    ).group_by(
+        Fornecedor.id, Fornecedor.nome
+    ).order_by(
+        total.desc()
+    ).limit(limite).all()
+
+    return [
+        {
+            'id': r.id,
+            'nome': r.nome,
+            'total': r.total
+        } for r in ranking
+    ]
+
+def gastos_por_comprador(mes_atual, inicio_semana):
+    """
+    Valor do mês, valor da semana e quantidade de lotes aprovados por comprador
+    ativo, em uma única consulta agrupada (Usuario → Fornecedor → Lote)
+    """
+    no_mes = Lote.data_criacao >= mes_atual
+    na_semana = Lote.data_criacao >= inicio_semana
+
+    linhas = db.session.query(
+        Usuario.id,
+        Usuario.nome,
+        func.sum(case((no_mes, Lote.valor_total), else_=0)).label('valor_mes'),
+        func.sum(case((na_semana, Lote.valor_total), else_=0)).label('valor_semana'),
+        func.count(case((no_mes, Lote.id))).label('qtd_compras')
+    ).outerjoin(
+        Fornecedor, Fornecedor.comprador_responsavel_id == Usuario.id
+    ).outerjoin(
+        Lote, and_(
+            Lote.fornecedor_id == Fornecedor.id,
+            Lote.status == 'aprovado',
+            Lote.data_criacao >= min(mes_atual, inicio_semana)
+        )
+    ).filter(
+        Usuario.tipo.in_(['admin', 'funcionario']),
+        Usuario.ativo == True
+    ).group_by(
+        Usuario.id, Usuario.nome
+    ).order_by(
+        Usuario.id
+    ).all()
+
+    gastos = []
+    for linha in linhas:
+        valor_mes = float(linha.valor_mes or 0)
+        qtd_compras = linha.qtd_compras or 0
+        gastos.append({
+            'nome': linha.nome,
+            'valor_mes': valor_mes,
+            'valor_semana': float(linha.valor_semana or 0),
+            'qtd_compras': qtd_compras,
+            'ticket_medio': (valor_mes / qtd_compras) if qtd_compras > 0 else 0
+        })
+    return gastos
+
+def calcular_estatisticas_gerais():
+    """
+    Monta o payload de /api/dashboard/stats com três consultas fixas
+    (solicitações, lotes e ranking), independente do volume de dados
+    """
+    lotes = somar_lotes()
+
+    return {
+        'relatorios': contar_solicitacoes_por_status(),
+        'valor_total': lotes['valor_total'],
+        'quilos_por_tipo': lotes['quilos_por_tipo'],
+        'ranking_empresas': ranking_fornecedores()
+    }
+
+def inicio_mes(data):
+    return date(data.year, data.month, 1)
+
+def ultimos_meses(quantidade=6, hoje=None):
+    """Lista com o primeiro dia de cada um dos últimos meses, do mais antigo ao atual"""
+    hoje = hoje or datetime.now()
+    return [inicio_mes(hoje - relativedelta(months=i)) for i in range(quantidade - 1, -1, -1)]
+
+def serie_mensal_solicitacoes(meses):
+    """Total e aprovadas por mês, lidos de resumo_mensal_solicitacoes"""
+    linhas = db.session.query(
+        ResumoMensalSolicitacao.mes,
+        func.sum(ResumoMensalSolicitacao.quantidade).label('total'),
+        func.sum(case((ResumoMensalSolicitacao.status == 'aprovada', ResumoMensalSolicitacao.quantidade), else_=0)).label('aprovadas')
+    ).filter(
+        ResumoMensalSolicitacao.mes >= meses[0],
+        ResumoMensalSolicitacao.mes <= meses[-1]
+    ).group_by(
+        ResumoMensalSolicitacao.mes
+    ).all()
+
+    por_mes = {linha.mes: linha for linha in linhas}
+    return [
+        {
+            'mes': NOMES_MESES[mes.month],
+            'total': int(por_mes[mes].total or 0) if mes in por_mes else 0,
+            'aprovadas': int(por_mes[mes].aprovadas or 0) if mes in por_mes else 0
+        } for mes in meses
+    ]
+
+def serie_mensal_lotes_aprovados(meses):
+    """Valor de lotes aprovados por mês, lido de resumo_mensal_lotes"""
+    linhas = db.session.query(
+        ResumoMensalLote.mes,
+        func.sum(ResumoMensalLote.valor_total).label('valor')
+    ).filter(
+        ResumoMensalLote.mes >= meses[0],
+        ResumoMensalLote.mes <= meses[-1],
+        ResumoMensalLote.status == 'aprovado'
+    ).group_by(
+        ResumoMensalLote.mes
+    ).all()
+
+    por_mes = {linha.mes: float(linha.valor or 0) for linha in linhas}
+    return [
+        {
+            'mes': NOMES_MESES[mes.month],
+            'valor': por_mes.get(mes, 0.0)
+        } for mes in meses
+    ]
+
+def _chaves_grupo(obj, campos):
+    """Valores atuais e, se alterados nesta transação, anteriores dos campos de grupo"""
+    estado = inspect(obj)
+    atual = tuple(getattr(obj, campo) for campo in campos)
+    anterior = tuple(
+        estado.attrs[campo].history.deleted[0] if estado.attrs[campo].history.deleted else valor
+        for campo, valor in zip(campos, atual)
+    )
+    chaves = set()
+    for data, *ids in {atual, anterior}:
+        if data is not None and all(i is not None for i in ids):
+            chaves.add((inicio_mes(data), *ids))
+    return chaves
+
+def _foi_alterado(obj, campos):
+    estado = inspect(obj)
+    return any(estado.attrs[campo].history.has_changes() for campo in campos)
+
+def _registrar_grupos(session, objetos):
+    grupos = session.info.setdefault('resumo_mensal_grupos', {'lotes': set(), 'solicitacoes': set()})
+    for obj, alterado_somente in objetos:
+        if isinstance(obj, Lote):
+            if not alterado_somente or _foi_alterado(obj, CAMPOS_RESUMO_LOTE):
+                grupos['lotes'] |= _chaves_grupo(obj, CAMPOS_GRUPO_LOTE)
+        elif isinstance(obj, Solicitacao):
+            if not alterado_somente or _foi_alterado(obj, CAMPOS_RESUMO_SOLICITACAO):
+                grupos['solicitacoes'] |= _chaves_grupo(obj, CAMPOS_GRUPO_SOLICITACAO)
+
+def _antes_flush(session, flush_context, instances):
+    # Alterados e removidos são lidos antes do flush, enquanto ainda podem ser carregados do banco
+    with session.no_autoflush:
+        _registrar_grupos(session, [(obj, True) for obj in session.dirty] + [(obj, False) for obj in session.deleted])
+
+def _depois_flush(session, flush_context):
+    # Novos são lidos depois do flush, quando os defaults (data_criacao/data_envio) já foram aplicados
+    _registrar_grupos(session, [(obj, False) for obj in session.new])
+
+    grupos = session.info.pop('resumo_mensal_grupos', None)
+    if not grupos or not (grupos['lotes'] or grupos['solicitacoes']):
+        return
+
+    conexao = session.connection()
+    try:
+        with conexao.begin_nested():
+            for mes, fornecedor_id, tipo_lote_id in grupos['lotes']:
+                _recalcular_grupo_lotes(conexao, mes, fornecedor_id, tipo_lote_id)
+            for mes, funcionario_id, fornecedor_id in grupos['solicitacoes']:
+                _recalcular_grupo_solicitacoes(conexao, mes, funcionario_id, fornecedor_id)
+    except Exception as e:
+        # Resumo desatualizado não deve derrubar a operação principal; o rebuild corrige
+        print(f'⚠️ Erro ao atualizar resumo mensal do dashboard: {e}')
+
+def _recalcular_grupo_lotes(conexao, mes, fornecedor_id, tipo_lote_id):
+    inicio = datetime(mes.year, mes.month, 1)
+    linhas = conexao.execute(
+        select(
+            Lote.status,
+            func.count(Lote.id),
+            func.coalesce(func.sum(Lote.valor_total), 0),
+            func.coalesce(func.sum(Lote.peso_total_kg), 0)
+        ).where(
+            Lote.fornecedor_id == fornecedor_id,
+            Lote.tipo_lote_id == tipo_lote_id,
+            Lote.data_criacao >= inicio,
+            Lote.data_criacao < inicio + relativedelta(months=1)
+        ).group_by(Lote.status)
+    ).all()
+
+    conexao.execute(delete(ResumoMensalLote).where(
+        ResumoMensalLote.mes == mes,
+        ResumoMensalLote.fornecedor_id == fornecedor_id,
+        ResumoMensalLote.tipo_lote_id == tipo_lote_id
+    ))
+    if linhas:
+        conexao.execute(insert(ResumoMensalLote), [
+            {
+                'mes': mes,
+                'fornecedor_id': fornecedor_id,
+                'tipo_lote_id': tipo_lote_id,
+                'status': status,
+                'quantidade': quantidade,
+                'valor_total': float(valor),
+                'peso_total_kg': float(peso)
+            } for status, quantidade, valor, peso in linhas
+        ])
+
+def _recalcular_grupo_solicitacoes(conexao, mes, funcionario_id, fornecedor_id):
+    inicio = datetime(mes.year, mes.month, 1)
+    linhas = conexao.execute(
+        select(
+            Solicitacao.status,
+            func.count(Solicitacao.id)
+        ).where(
+            Solicitacao.funcionario_id == funcionario_id,
+            Solicitacao.fornecedor_id == fornecedor_id,
+            Solicitacao.data_envio >= inicio,
+            Solicitacao.data_envio < inicio + relativedelta(months=1)
+        ).group_by(Solicitacao.status)
+    ).all()
+
+    conexao.execute(delete(ResumoMensalSolicitacao).where(
+        ResumoMensalSolicitacao.mes == mes,
+        ResumoMensalSolicitacao.funcionario_id == funcionario_id,
+        ResumoMensalSolicitacao.fornecedor_id == fornecedor_id
+    ))
+    if linhas:
+        conexao.execute(insert(ResumoMensalSolicitacao), [
+            {
+                'mes': mes,
+                'funcionario_id': funcionario_id,
+                'fornecedor_id': fornecedor_id,
+                'status': status,
+                'quantidade': quantidade
+            } for status, quantidade in linhas
+        ])
+
+def registrar_eventos_resumo_mensal():
+    """Mantém os resumos mensais atualizados a cada flush que altere Lote ou Solicitacao"""
+    if not event.contains(db.session, 'before_flush', _antes_flush):
+        event.listen(db.session, 'before_flush', _antes_flush)
+        event.listen(db.session, 'after_flush', _depois_flush)
+
+def reconstruir_resumos_mensais():
+    """Recalcula todos os resumos mensais a partir de lotes e solicitações (backfill)"""
+    ano_lote = extract('year', Lote.data_criacao)
+    mes_lote = extract('month', Lote.data_criacao)
+    linhas_lotes = db.session.query(
+        ano_lote, mes_lote, Lote.fornecedor_id, Lote.tipo_lote_id, Lote.status,
+        func.count(Lote.id), func.sum(Lote.valor_total), func.sum(Lote.peso_total_kg)
+    ).group_by(
+        ano_lote, mes_lote, Lote.fornecedor_id, Lote.tipo_lote_id, Lote.status
+    ).all()
+
+    ano_sol = extract('year', Solicitacao.data_envio)
+    mes_sol = extract('month', Solicitacao.data_envio)
+    linhas_solicitacoes = db.session.query(
+        ano_sol, mes_sol, Solicitacao.funcionario_id, Solicitacao.fornecedor_id, Solicitacao.status,
+        func.count(Solicitacao.id)
+    ).group_by(
+        ano_sol, mes_sol, Solicitacao.funcionario_id, Solicitacao.fornecedor_id, Solicitacao.status
+    ).all()
+
+    db.session.execute(delete(ResumoMensalLote))
+    db.session.execute(delete(ResumoMensalSolicitacao))
+
+    if linhas_lotes:
+        db.session.execute(insert(ResumoMensalLote), [
+            {
+                'mes': date(int(ano), int(mes), 1),
+                'fornecedor_id': fornecedor_id,
+                'tipo_lote_id': tipo_lote_id,
+                'status': status,
+                'quantidade': quantidade,
+                'valor_total': float(valor or 0),
+                'peso_total_kg': float(peso or 0)
+            } for ano, mes, fornecedor_id, tipo_lote_id, status, quantidade, valor, peso in linhas_lotes
+        ])
+    if linhas_solicitacoes:
+        db.session.execute(insert(ResumoMensalSolicitacao), [
+            {
+                'mes': date(int(ano), int(mes), 1),
+                'funcionario_id': funcionario_id,
+                'fornecedor_id': fornecedor_id,
+                'status': status,
+                'quantidade': quantidade
+            } for ano, mes, funcionario_id, fornecedor_id, status, quantidade in linhas_solicitacoes
+        ])
+    db.session.commit()
+
+    return {
+        'resumos_lotes': len(linhas_lotes),
+        'resumos_solicitacoes': len(linhas_solicitacoes)
+    }
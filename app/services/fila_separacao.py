@@ -0,0 +1,108 @@
+"""
+Fila de separação (/api/separacao/fila) com versão para respostas condicionais.
+
+A fila é montada com os relacionamentos carregados em lote (selectinload/joinedload)
+e só as colunas exibidas nas telas: são poucas consultas qualquer que seja o número de
+separações e itens, em vez de uma por lote, item, material e tipo.
+
+A versão da fila (ver filas_tempo_real) vai no ETag da rota: os tablets que consultam a
+fila a cada poucos segundos recebem 304 sem que a fila seja montada. Nomes de
+fornecedor, tipo, material e usuário alterados depois não mudam a versão.
+"""
+from app.models import LoteSeparacao, Lote, ItemSolicitacao, Usuario, Fornecedor, TipoLote, MaterialBase
+from sqlalchemy.orm import joinedload, selectinload, load_only
+
+LIMITE_MAXIMO = 200
+
+def montar_fila(status, limite=None, cursor=None):
+    """
+    Separações no status, em ordem de id, com os detalhes do lote e dos itens.
+    Com `limite`, devolve só as separações com id > `cursor`; retorna (separacoes, tem_mais).
+    """
+    consulta = LoteSeparacao.query.options(
+        load_only(
+            LoteSeparacao.id, LoteSeparacao.lote_id, LoteSeparacao.status, LoteSeparacao.operador_id,
+            LoteSeparacao.data_inicio, LoteSeparacao.data_finalizacao, LoteSeparacao.percentual_aproveitamento,
+            LoteSeparacao.peso_total_sublotes, LoteSeparacao.peso_total_residuos, LoteSeparacao.observacoes
+        ),
+        joinedload(LoteSeparacao.operador).load_only(Usuario.nome),
+        selectinload(LoteSeparacao.lote).options(
+            load_only(
+                Lote.id, Lote.numero_lote, Lote.peso_total_kg, Lote.peso_bruto_recebido, Lote.peso_liquido,
+                Lote.qualidade_recebida, Lote.data_criacao, Lote.anexos,
+                Lote.fornecedor_id, Lote.tipo_lote_id, Lote.conferente_id
+            ),
+            joinedload(Lote.fornecedor).load_only(Fornecedor.nome),
+            joinedload(Lote.tipo_lote).load_only(TipoLote.nome),
+            joinedload(Lote.conferente).load_only(Usuario.nome),
+            selectinload(Lote.itens).options(
+                load_only(
+                    ItemSolicitacao.id, ItemSolicitacao.lote_id, ItemSolicitacao.peso_kg, ItemSolicitacao.material_id,
+                    ItemSolicitacao.tipo_lote_id, ItemSolicitacao.estrelas_final, ItemSolicitacao.classificacao
+                ),
+                joinedload(ItemSolicitacao.material).load_only(
+                    MaterialBase.nome, MaterialBase.codigo, MaterialBase.classificacao
+                ),
+                joinedload(ItemSolicitacao.tipo_lote).load_only(TipoLote.nome)
+            )
+        )
+    ).filter(LoteSeparacao.status == status)
+
+    if cursor:
+        consulta = consulta.filter(LoteSeparacao.id > cursor)
+    consulta = consulta.order_by(LoteSeparacao.id)
+
+    tem_mais = False
+    if limite:
+        separacoes = consulta.limit(limite + 1).all()
+        tem_mais = len(separacoes) > limite
+        separacoes = separacoes[:limite]
+    else:
+        separacoes = consulta.all()
+    return [_separacao_fila(separacao) for separacao in separacoes], tem_mais
+
+def _separacao_fila(separacao):
+    lote = separacao.lote
+    dados = {
+        'id': separacao.id,
+        'lote_id': separacao.lote_id,
+        'lote_numero': lote.numero_lote if lote else None,
+        'status': separacao.status,
+        'operador_id': separacao.operador_id,
+        'operador_nome': separacao.operador.nome if separacao.operador else None,
+        'data_inicio': separacao.data_inicio.isoformat() if separacao.data_inicio else None,
+        'data_finalizacao': separacao.data_finalizacao.isoformat() if separacao.data_finalizacao else None,
+        'percentual_aproveitamento': separacao.percentual_aproveitamento,
+        'peso_total_sublotes': separacao.peso_total_sublotes,
+        'peso_total_residuos': separacao.peso_total_residuos,
+        'observacoes': separacao.observacoes
+    }
+    if lote:
+        dados['lote_detalhes'] = {
+            'id': lote.id,
+            'numero_lote': lote.numero_lote,
+            'peso_total_kg': lote.peso_total_kg,
+            'peso_bruto_recebido': lote.peso_bruto_recebido,
+            'peso_liquido': lote.peso_liquido,
+            'qualidade_recebida': lote.qualidade_recebida,
+            'fornecedor_nome': lote.fornecedor.nome if lote.fornecedor else None,
+            'tipo_lote_nome': lote.tipo_lote.nome if lote.tipo_lote else None,
+            'conferente_nome': lote.conferente.nome if lote.conferente else None,
+            'data_criacao': lote.data_criacao.isoformat() if lote.data_criacao else None,
+            'anexos': lote.anexos,
+            'itens_info': [
+                {
+                    'id': item.id,
+                    'peso_kg': item.peso_kg,
+                    'material_id': item.material_id,
+                    'material_nome': item.material.nome if item.material else None,
+                    'material_codigo': item.material.codigo if item.material else None,
+                    'tipo_lote_id': item.tipo_lote_id,
+                    'tipo_lote_nome': item.tipo_lote.nome if item.tipo_lote else None,
+                    'estrelas_final': item.estrelas_final,
+                    'classificacao': item.classificacao if item.classificacao else (item.material.classificacao if item.material else None)
+                }
+                for item in lote.itens
+            ]
+        }
+    return dados
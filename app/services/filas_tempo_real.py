@@ -0,0 +1,225 @@
+"""
+Filas de trabalho do chão de fábrica (separação e produção) com versão e avisos em tempo real.
+
+Cada fila tem uma versão no contador 'fila-<nome>' de contadores_numeracao. Os flushes
+só anotam na sessão quais filas a transação alterou; a versão de cada uma é incrementada
+uma vez, logo antes do commit (before_commit), para que o lock da linha do contador
+dure só até o commit e não a transação inteira. Alteram a fila:
+
+- separacao: LoteSeparacao criada, alterada ou removida, ou lote com separação aberta
+  (AGUARDANDO_SEPARACAO ou EM_SEPARACAO), ou um item dele, alterado
+- producao: OrdemProducao ou BagProducao criada, alterada ou removida
+
+Depois do commit, os clientes na sala fila_<nome> do Socket.IO recebem o evento
+fila_<nome> com a nova versão e as mudanças de status, em forma compacta:
+
+    {'fila': 'separacao', 'versao': 42, 'eventos': [
+        {'tipo': 'separacao', 'id': 7, 'acao': 'iniciado', 'status': 'EM_SEPARACAO',
+         'status_anterior': 'AGUARDANDO_SEPARACAO', 'lote_id': 15}
+    ]}
+
+`acao` é adicionado, iniciado, finalizado, alterado ou removido; status_anterior vem
+nulo quando o objeto não estava carregado antes da alteração. Sem mudança de status
+(ex.: peso de um sublote), `eventos` vem vazio e só a versão avança.
+
+O tablet entra na sala com o evento 'entrar_fila' ({'fila': 'separacao'}) e recebe a
+versão atual; ao reconectar, GET /api/filas/<fila>/sincronizar?versao=N diz se perdeu
+alguma mudança e devolve a fila atual nesse caso.
+"""
+from flask import session as sessao_socket
+from flask_socketio import join_room, leave_room
+from app import socketio
+from app.models import db, ContadorNumeracao, LoteSeparacao, Lote, ItemSolicitacao, OrdemProducao, BagProducao, Usuario
+from sqlalchemy import event, inspect, select, insert, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHAVE_SESSAO = 'filas_alteradas'
+STATUS_SEPARACAO_ABERTA = ['AGUARDANDO_SEPARACAO', 'EM_SEPARACAO']
+
+def _acesso_separacao(usuario):
+    perfil_nome = usuario.perfil.nome if usuario.perfil else None
+    return perfil_nome in ['Separação', 'Administrador'] or usuario.tipo == 'admin'
+
+FILAS = {
+    'separacao': {'acesso': _acesso_separacao},
+    # As rotas de produção são liberadas a qualquer usuário autenticado
+    'producao': {'acesso': lambda usuario: True},
+}
+
+ENTIDADES = {
+    LoteSeparacao: {
+        'fila': 'separacao',
+        'tipo': 'separacao',
+        'acoes': {'AGUARDANDO_SEPARACAO': 'adicionado', 'EM_SEPARACAO': 'iniciado', 'FINALIZADA': 'finalizado'},
+        'campos': lambda obj: {'lote_id': obj.lote_id},
+    },
+    OrdemProducao: {
+        'fila': 'producao',
+        'tipo': 'ordem',
+        'acoes': {'aberta': 'adicionado', 'em_separacao': 'iniciado', 'finalizada': 'finalizado', 'cancelada': 'finalizado'},
+        'campos': lambda obj: {'numero_op': obj.numero_op},
+    },
+    BagProducao: {
+        'fila': 'producao',
+        'tipo': 'bag',
+        'acoes': {'aberto': 'adicionado', 'cheio': 'finalizado', 'enviado_refinaria': 'finalizado', 'devolvido_estoque': 'finalizado'},
+        'campos': lambda obj: {'codigo': obj.codigo},
+    },
+}
+
+def versao_fila(fila):
+    """Versão atual da fila (0 antes da primeira alteração)"""
+    versao = db.session.execute(
+        select(ContadorNumeracao.valor).where(ContadorNumeracao.chave == f'fila-{fila}')
+    ).scalar()
+    return versao or 0
+
+def incrementar_versao(conexao, fila):
+    """Soma 1 à versão da fila pela conexão da transação atual e devolve a nova versão"""
+    tabela = ContadorNumeracao.__table__
+    chave = f'fila-{fila}'
+    incremento = update(tabela).where(tabela.c.chave == chave).values(
+        valor=tabela.c.valor + 1, data_atualizacao=datetime.utcnow()
+    )
+    if not conexao.execute(incremento).rowcount:
+        try:
+            with conexao.begin_nested():
+                conexao.execute(insert(tabela).values(chave=chave, valor=1, data_atualizacao=datetime.utcnow()))
+            return 1
+        except IntegrityError:
+            # Outra transação criou o contador ao mesmo tempo
+            conexao.execute(incremento)
+    return conexao.execute(select(tabela.c.valor).where(tabela.c.chave == chave)).scalar_one()
+
+def _evento(obj, acao, status_anterior=None):
+    entidade = ENTIDADES[type(obj)]
+    return {
+        'tipo': entidade['tipo'],
+        'id': obj.id,
+        'acao': acao,
+        'status': obj.status,
+        'status_anterior': status_anterior,
+        **entidade['campos'](obj)
+    }
+
+def _lotes_em_separacao(session, lote_ids):
+    tabela = LoteSeparacao.__table__
+    return session.connection().execute(
+        select(tabela.c.id).where(
+            tabela.c.lote_id.in_(lote_ids), tabela.c.status.in_(STATUS_SEPARACAO_ABERTA)
+        ).limit(1)
+    ).first() is not None
+
+def _alteracoes(session):
+    """(filas alteradas, {fila: [eventos de status]}) do flush; new/dirty/deleted ainda estão como antes dele"""
+    alteradas = set()
+    eventos = {}
+    lote_ids = set()
+    for obj in session.new:
+        if type(obj) in ENTIDADES:
+            fila = ENTIDADES[type(obj)]['fila']
+            alteradas.add(fila)
+            eventos.setdefault(fila, []).append(_evento(obj, 'adicionado'))
+    for obj in session.deleted:
+        if type(obj) in ENTIDADES:
+            fila = ENTIDADES[type(obj)]['fila']
+            alteradas.add(fila)
+            eventos.setdefault(fila, []).append(_evento(obj, 'removido'))
+        elif isinstance(obj, ItemSolicitacao) and obj.lote_id is not None:
+            lote_ids.add(obj.lote_id)
+    for obj in session.dirty:
+        if not session.is_modified(obj, include_collections=False):
+            continue
+        if type(obj) in ENTIDADES:
+            entidade = ENTIDADES[type(obj)]
+            alteradas.add(entidade['fila'])
+            historico = inspect(obj).attrs.status.history
+            if historico.has_changes():
+                anterior = historico.deleted[0] if historico.deleted else None
+                acao = entidade['acoes'].get(obj.status, 'alterado')
+                eventos.setdefault(entidade['fila'], []).append(_evento(obj, acao, anterior))
+        elif isinstance(obj, Lote):
+            lote_ids.add(obj.id)
+        elif isinstance(obj, ItemSolicitacao) and obj.lote_id is not None:
+            lote_ids.add(obj.lote_id)
+
+    # Lotes e itens só mudam a fila de separação quando o lote está em uma separação aberta
+    if 'separacao' not in alteradas and lote_ids and _lotes_em_separacao(session, lote_ids):
+        alteradas.add('separacao')
+    return alteradas, eventos
+
+def _depois_flush(session, flush_context):
+    try:
+        alteradas, eventos = _alteracoes(session)
+        pendentes = session.info.setdefault(CHAVE_SESSAO, {})
+        for fila in alteradas:
+            pendentes.setdefault(fila, {'versao': None, 'eventos': []})['eventos'].extend(eventos.get(fila, []))
+    except Exception as e:
+        logger.warning(f'Erro ao anotar as alterações das filas: {e}')
+
+def _antes_commit(session):
+    if session.in_nested_transaction():
+        return
+    # O commit só faz o último flush depois deste evento; sem isso, o que ainda está
+    # pendente não entraria na versão
+    session.flush()
+    pendentes = session.info.get(CHAVE_SESSAO)
+    if not pendentes:
+        return
+    try:
+        conexao = session.connection()
+        with conexao.begin_nested():
+            # Sempre na mesma ordem, para duas transações não travarem uma à outra
+            for fila in sorted(pendentes):
+                pendentes[fila]['versao'] = incrementar_versao(conexao, fila)
+    except Exception as e:
+        session.info.pop(CHAVE_SESSAO, None)
+        logger.warning(f'Erro ao atualizar a versão das filas: {e}')
+
+def _apos_commit(session):
+    if session.in_nested_transaction():
+        return
+    pendentes = session.info.pop(CHAVE_SESSAO, None)
+    if not pendentes:
+        return
+    for fila, pendente in pendentes.items():
+        try:
+            socketio.emit(f'fila_{fila}', {'fila': fila, **pendente}, room=f'fila_{fila}')
+        except Exception as e:
+            logger.warning(f'Erro ao avisar a fila {fila}: {e}')
+
+def _apos_rollback(session, transacao_anterior):
+    if not transacao_anterior.nested:
+        session.info.pop(CHAVE_SESSAO, None)
+
+def usuario_pode_acessar(usuario, fila):
+    return fila in FILAS and usuario is not None and FILAS[fila]['acesso'](usuario)
+
+def _entrar_fila(dados):
+    """Socket.IO 'entrar_fila': entra na sala da fila e responde {'fila', 'versao'} (ou {'erro'})"""
+    fila = (dados or {}).get('fila')
+    usuario_id = sessao_socket.get('usuario_id')
+    usuario = db.session.get(Usuario, int(usuario_id)) if usuario_id else None
+    if not usuario_pode_acessar(usuario, fila):
+        return {'erro': 'Fila inexistente ou acesso negado'}
+    join_room(f'fila_{fila}')
+    return {'fila': fila, 'versao': versao_fila(fila)}
+
+def _sair_fila(dados):
+    fila = (dados or {}).get('fila')
+    if fila in FILAS:
+        leave_room(f'fila_{fila}')
+
+def registrar_eventos_filas():
+    """Versões e avisos das filas a cada flush/commit, e os eventos de Socket.IO das salas"""
+    if not event.contains(db.session, 'after_flush', _depois_flush):
+        event.listen(db.session, 'after_flush', _depois_flush)
+        event.listen(db.session, 'before_commit', _antes_commit)
+        event.listen(db.session, 'after_commit', _apos_commit)
+        event.listen(db.session, 'after_soft_rollback', _apos_rollback)
+    socketio.on_event('entrar_fila', _entrar_fila)
+    socketio.on_event('sair_fila', _sair_fila)
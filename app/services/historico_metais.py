@@ -0,0 +1,213 @@
+"""
+Histórico das cotações de metais, agregado por minuto, hora e dia.
+
+Cada cotação real gravada pelo atualizador (cotacoes_metais.atualizar_cotacoes) entra no
+agregado do minuto, da hora e do dia em que foi obtida (abertura, máxima, mínima,
+fechamento, soma e quantidade) na tabela cotacoes_metais. Só o processo com a reserva
+das cotações grava, então não há duas escritas no mesmo período. Cotações simuladas
+não entram. Gráficos, estatísticas e combos leem os agregados já prontos, na
+granularidade adequada ao intervalo.
+
+Os agregados por minuto ficam COTACOES_HISTORICO_MINUTOS_DIAS dias e os por hora
+COTACOES_HISTORICO_HORAS_DIAS dias; os por dia não são apagados. Horários em UTC.
+"""
+from app.models import db, CotacaoMetal
+from flask import current_app
+from sqlalchemy import and_, or_, func
+from datetime import datetime, timedelta
+
+MINUTOS_DIAS_PADRAO = 2
+HORAS_DIAS_PADRAO = 365
+LIMITE_PONTOS = 5000  # Por símbolo, em consultar_serie
+
+PERIODOS = {
+    'minuto': lambda momento: momento.replace(second=0, microsecond=0),
+    'hora': lambda momento: momento.replace(minute=0, second=0, microsecond=0),
+    'dia': lambda momento: momento.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+DURACOES = {
+    'minuto': timedelta(minutes=1),
+    'hora': timedelta(hours=1),
+    'dia': timedelta(days=1),
+}
+
+def registrar_cotacoes(cotacoes, momento=None):
+    """Acrescenta as cotações aos agregados e apaga os vencidos (sem commit); retorna quantos metais entraram"""
+    momento = momento or datetime.utcnow()
+    metais = {
+        simbolo: metal for simbolo, metal in cotacoes.get('metals', {}).items()
+        if metal.get('source') != 'simulated' and metal.get('price_usd')
+    }
+    if not metais:
+        return 0
+
+    inicios = {granularidade: periodo(momento) for granularidade, periodo in PERIODOS.items()}
+    existentes = {
+        (agregado.granularidade, agregado.simbolo): agregado
+        for agregado in CotacaoMetal.query.filter(
+            CotacaoMetal.simbolo.in_(list(metais)),
+            or_(*[
+                and_(CotacaoMetal.granularidade == granularidade, CotacaoMetal.inicio == inicio)
+                for granularidade, inicio in inicios.items()
+            ])
+        )
+    }
+
+    usd_brl = cotacoes.get('usd_brl')
+    for granularidade, inicio in inicios.items():
+        for simbolo, metal in metais.items():
+            preco = metal['price_usd']
+            agregado = existentes.get((granularidade, simbolo))
+            if agregado is None:
+                db.session.add(CotacaoMetal(
+                    simbolo=simbolo,
+                    granularidade=granularidade,
+                    inicio=inicio,
+                    abertura=preco,
+                    maxima=preco,
+                    minima=preco,
+                    fechamento=preco,
+                    soma=preco,
+                    quantidade=1,
+                    usd_brl=usd_brl,
+                    fonte=metal.get('source')
+                ))
+                continue
+            agregado.maxima = max(agregado.maxima, preco)
+            agregado.minima = min(agregado.minima, preco)
+            agregado.fechamento = preco
+            agregado.soma += preco
+            agregado.quantidade += 1
+            agregado.usd_brl = usd_brl
+            agregado.fonte = metal.get('source')
+
+    _apagar_vencidos(momento)
+    return len(metais)
+
+def _apagar_vencidos(momento):
+    config = current_app.config
+    retencao = {
+        'minuto': int(config.get('COTACOES_HISTORICO_MINUTOS_DIAS', MINUTOS_DIAS_PADRAO)),
+        'hora': int(config.get('COTACOES_HISTORICO_HORAS_DIAS', HORAS_DIAS_PADRAO)),
+    }
+    for granularidade, dias in retencao.items():
+        if dias > 0:
+            CotacaoMetal.query.filter(
+                CotacaoMetal.granularidade == granularidade,
+                CotacaoMetal.inicio < momento - timedelta(days=dias)
+            ).delete(synchronize_session=False)
+
+def granularidade_para(inicio, fim):
+    """Menor granularidade que cobre o intervalo com poucos pontos por metal"""
+    duracao = fim - inicio
+    if duracao <= timedelta(days=1):
+        return 'minuto'
+    if duracao <= timedelta(days=31):
+        return 'hora'
+    return 'dia'
+
+def consultar_serie(simbolos, inicio, fim, granularidade=None, limite=LIMITE_PONTOS):
+    """
+    Agregados de [inicio, fim) por símbolo, em ordem de tempo.
+    Retorna (granularidade, {simbolo: [CotacaoMetal.to_dict()]}, símbolos truncados).
+
+    Cada símbolo traz no máximo `limite` pontos, os mais recentes; os que tinham mais
+    vão na lista de truncados. Sem granularidade pedida, usa a de granularidade_para ou
+    uma mais grossa, se o intervalo passaria de `limite` pontos por símbolo.
+    """
+    if not granularidade:
+        granularidade = granularidade_para(inicio, fim)
+        while granularidade != 'dia' and (fim - inicio) / DURACOES[granularidade] > limite:
+            granularidade = CotacaoMetal.GRANULARIDADES[CotacaoMetal.GRANULARIDADES.index(granularidade) + 1]
+
+    # Numera os pontos de cada símbolo do mais recente para o mais antigo e busca um a mais
+    # que o limite, para saber se o símbolo foi cortado
+    ordem = func.row_number().over(
+        partition_by=CotacaoMetal.simbolo, order_by=CotacaoMetal.inicio.desc()
+    ).label('ordem')
+    numerados = db.session.query(CotacaoMetal.id.label('id'), ordem).filter(
+        CotacaoMetal.granularidade == granularidade,
+        CotacaoMetal.inicio >= PERIODOS[granularidade](inicio),
+        CotacaoMetal.inicio < fim
+    )
+    if simbolos:
+        numerados = numerados.filter(CotacaoMetal.simbolo.in_(simbolos))
+    numerados = numerados.subquery()
+
+    consulta = CotacaoMetal.query.join(numerados, numerados.c.id == CotacaoMetal.id).filter(
+        numerados.c.ordem <= limite + 1
+    ).order_by(CotacaoMetal.simbolo, CotacaoMetal.inicio)
+
+    serie = {}
+    for agregado in consulta:
+        serie.setdefault(agregado.simbolo, []).append(agregado.to_dict())
+    truncados = sorted(simbolo for simbolo, pontos in serie.items() if len(pontos) > limite)
+    for simbolo in truncados:
+        # O ponto a mais é o mais antigo
+        del serie[simbolo][0]
+    return granularidade, serie, truncados
+
+def historico_por_dia(dias):
+    """
+    Fechamentos dos últimos `dias` dias no formato de /api/metais/historico:
+    {data: [{'time', 'metals': {simbolo: preço}}]}. Por minuto em um dia, senão por hora.
+    """
+    agora = datetime.utcnow()
+    inicio = PERIODOS['dia'](agora - timedelta(days=dias))
+    granularidade = 'minuto' if dias <= 1 else 'hora'
+    # Só as colunas usadas: um dia por minuto são milhares de linhas
+    linhas = db.session.query(
+        CotacaoMetal.inicio, CotacaoMetal.simbolo, CotacaoMetal.fechamento
+    ).filter(
+        CotacaoMetal.granularidade == granularidade,
+        CotacaoMetal.inicio >= inicio
+    ).order_by(CotacaoMetal.inicio)
+
+    historico = {}
+    pontos = {}
+    for momento, simbolo, fechamento in linhas:
+        ponto = pontos.get(momento)
+        if ponto is None:
+            ponto = {'time': momento.strftime('%H:%M:%S'), 'metals': {}}
+            pontos[momento] = ponto
+            historico.setdefault(momento.strftime('%Y-%m-%d'), []).append(ponto)
+        ponto['metals'][simbolo] = fechamento
+    return historico
+
+def estatisticas_por_simbolo(dias):
+    """Mínima, máxima, média, atual e variação dos últimos `dias` dias, pelos agregados diários"""
+    inicio = PERIODOS['dia'](datetime.utcnow() - timedelta(days=dias))
+    agregados = CotacaoMetal.query.filter(
+        CotacaoMetal.granularidade == 'dia',
+        CotacaoMetal.inicio >= inicio
+    ).order_by(CotacaoMetal.simbolo, CotacaoMetal.inicio)
+
+    por_simbolo = {}
+    for agregado in agregados:
+        por_simbolo.setdefault(agregado.simbolo, []).append(agregado)
+
+    stats = {}
+    for simbolo, dias_simbolo in por_simbolo.items():
+        primeiro, ultimo = dias_simbolo[0], dias_simbolo[-1]
+        quantidade = sum(agregado.quantidade for agregado in dias_simbolo)
+        stats[simbolo] = {
+            'min': round(min(agregado.minima for agregado in dias_simbolo), 2),
+            'max': round(max(agregado.maxima for agregado in dias_simbolo), 2),
+            'avg': round(sum(agregado.soma for agregado in dias_simbolo) / quantidade, 2),
+            'current': ultimo.fechamento,
+            'variation': round(((ultimo.fechamento - primeiro.abertura) / primeiro.abertura) * 100, 2) if primeiro.abertura else 0
+        }
+    return stats
+
+def cotacoes_do_dia(data):
+    """Fechamento de cada metal no dia (date) com o dólar do fechamento: {simbolo: {'price_usd', 'usd_brl'}}"""
+    inicio = datetime.combine(data, datetime.min.time())
+    agregados = CotacaoMetal.query.filter(
+        CotacaoMetal.granularidade == 'dia',
+        CotacaoMetal.inicio == inicio
+    )
+    return {
+        agregado.simbolo: {'price_usd': agregado.fechamento, 'usd_brl': agregado.usd_brl}
+        for agregado in agregados
+    }
@@ -0,0 +1,193 @@
+from flask import current_app
+from app import socketio
+from app.models import db, ImportacaoArquivo
+from app.utils.tarefas_fundo import ReservaPerdida, abandonadas, corte, novo_dono, renovar, reservar
+from app.utils.planilhas import ler_planilha_em_blocos, estimar_total_linhas
+from app.services.importacao_tabela_precos import processar_importacao_tabela_precos
+from app.services.importacao_tipos_lote import processar_importacao_tipos_lote, ABA_TIPOS_LOTE, LINHA_CABECALHO
+from datetime import datetime
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_recuperador_iniciado = False
+
+# Sem sinal de vida por mais que isso, a importação é dada como abandonada
+EXPIRACAO_PADRAO = 600
+
+# tipo -> (processador, opções de leitura da planilha)
+PROCESSADORES = {
+    'tabela_precos_fornecedor': (processar_importacao_tabela_precos, {}),
+    'tipos_lote': (processar_importacao_tipos_lote, {'linha_cabecalho': LINHA_CABECALHO, 'aba': ABA_TIPOS_LOTE}),
+}
+
+def _extensao(nome_arquivo):
+    return nome_arquivo.rsplit('.', 1)[-1].lower()
+
+def iniciar_importacao(tipo, arquivo, usuario_id, fornecedor_id=None):
+    """
+    Salva o upload em disco, registra a importação e dispara o processamento em segundo plano.
+    A requisição responde na hora; o andamento fica em GET /api/importacoes/<id>.
+    """
+    pasta = os.path.join(current_app.config['UPLOAD_FOLDER'], 'importacoes')
+    os.makedirs(pasta, exist_ok=True)
+    caminho = os.path.join(pasta, f'{uuid.uuid4().hex}.{_extensao(arquivo.filename)}')
+    arquivo.save(caminho)
+
+    importacao = ImportacaoArquivo(
+        tipo=tipo,
+        status='pendente',
+        nome_arquivo=arquivo.filename,
+        caminho_arquivo=caminho,
+        usuario_id=int(usuario_id),
+        fornecedor_id=fornecedor_id,
+        erros=[]
+    )
+    db.session.add(importacao)
+    db.session.commit()
+
+    socketio.start_background_task(executar_importacao, current_app._get_current_object(), importacao.id)
+    return importacao
+
+def iniciar_recuperador_importacoes(app):
+    """Dispara o laço que retoma importações abandonadas (uma vez por processo)"""
+    global _recuperador_iniciado
+    expiracao = int(app.config.get('IMPORTACAO_EXPIRACAO_SEGUNDOS', EXPIRACAO_PADRAO))
+    if _recuperador_iniciado or expiracao <= 0:
+        return
+    _recuperador_iniciado = True
+    socketio.start_background_task(_laco_recuperacao, app, expiracao)
+
+def _laco_recuperacao(app, expiracao):
+    while True:
+        recuperar_importacoes_interrompidas(app, expiracao)
+        socketio.sleep(max(expiracao // 2, 1))
+
+def recuperar_importacoes_interrompidas(app, expiracao=EXPIRACAO_PADRAO):
+    """
+    Trata as importações cuja execução parou (reinício, deploy, worker morto): as que estão
+    em 'pendente' ou 'processando' sem sinal de vida há mais de `expiracao` segundos. Cada
+    uma é assumida com um UPDATE condicional ao status e ao sinal vencido, então com vários
+    workers só um deles fica com ela; as que ainda estão vivas em outro worker não são tocadas.
+    - 'processando': os blocos já confirmados ficam, mas não dá para continuar do ponto
+      em que parou; vira 'erro' e o arquivo é apagado, para ser enviado de novo
+    - 'pendente' com o arquivo ainda em disco: nada foi gravado; volta a ser processada
+    Retorna {'falhas': [ids], 'retomadas': [ids]}.
+    """
+    falhas, retomadas = [], []
+    with app.app_context():
+        try:
+            limite = corte(expiracao)
+            for importacao_id in abandonadas(ImportacaoArquivo, ['pendente', 'processando'], limite):
+                importacao = db.session.get(ImportacaoArquivo, importacao_id)
+                if importacao.status == 'pendente' and os.path.exists(importacao.caminho_arquivo):
+                    # A execução retomada assume a importação no início (executar_importacao)
+                    retomadas.append(importacao_id)
+                    continue
+                assumida = reservar(
+                    ImportacaoArquivo, importacao_id, [importacao.status], novo_dono(), limite,
+                    status='erro',
+                    mensagem_erro=(
+                        f'Importação interrompida pelo reinício do servidor após '
+                        f'{importacao.linhas_processadas or 0} linha(s). Envie o arquivo novamente.'
+                    ),
+                    data_conclusao=datetime.utcnow()
+                )
+                db.session.commit()
+                if assumida:
+                    falhas.append(importacao_id)
+                    try:
+                        os.remove(importacao.caminho_arquivo)
+                    except OSError:
+                        pass
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Erro ao recuperar importações interrompidas: {e}', exc_info=True)
+            return {'falhas': [], 'retomadas': []}
+        finally:
+            db.session.remove()
+
+    for importacao_id in falhas:
+        logger.warning(f'Importação {importacao_id} interrompida marcada como erro')
+    for importacao_id in retomadas:
+        logger.warning(f'Retomando importação {importacao_id} pendente')
+        socketio.start_background_task(executar_importacao, app, importacao_id, expiracao)
+    return {'falhas': falhas, 'retomadas': retomadas}
+
+def executar_importacao(app, importacao_id, expiracao=None):
+    """
+    Processa a planilha bloco a bloco, confirmando cada bloco, e registra o resultado final.
+    Começa assumindo a importação ('pendente' -> 'processando'); com `expiracao` (retomada),
+    só se ela continua sem sinal de vida. Cada bloco confirmado renova o sinal; se outro
+    processo assumiu a importação, para sem gravar mais nada e sem apagar o arquivo.
+    """
+    dono = novo_dono()
+    with app.app_context():
+        try:
+            limite = corte(expiracao) if expiracao else None
+            assumida = reservar(
+                ImportacaoArquivo, importacao_id, ['pendente'], dono, limite,
+                status='processando', data_inicio=datetime.utcnow()
+            )
+            db.session.commit()
+            if not assumida:
+                return
+        except Exception as e:
+            db.session.rollback()
+            db.session.remove()
+            logger.error(f'Erro ao iniciar a importação {importacao_id}: {str(e)}', exc_info=True)
+            return
+
+        importacao = db.session.get(ImportacaoArquivo, importacao_id)
+        processador, opcoes = PROCESSADORES[importacao.tipo]
+        extensao = _extensao(importacao.caminho_arquivo)
+        apagar_arquivo = True
+
+        try:
+            importacao.total_linhas = estimar_total_linhas(importacao.caminho_arquivo, extensao, **opcoes)
+            renovar(ImportacaoArquivo, importacao_id, dono)
+            db.session.commit()
+
+            def registrar_progresso(linhas, sucesso, erros):
+                importacao.linhas_processadas += linhas
+                importacao.sucesso += sucesso
+                importacao.registrar_erros(erros)
+                renovar(ImportacaoArquivo, importacao_id, dono)
+                db.session.commit()
+                # Devolve o controle ao servidor (eventlet) entre um bloco e outro
+                socketio.sleep(0)
+
+            blocos = ler_planilha_em_blocos(importacao.caminho_arquivo, extensao, **opcoes)
+            resultado = processador(importacao, blocos, registrar_progresso)
+
+            importacao.resultado = resultado
+            importacao.status = 'concluida'
+            importacao.data_conclusao = datetime.utcnow()
+            renovar(ImportacaoArquivo, importacao_id, dono)
+            db.session.commit()
+        except ReservaPerdida as e:
+            db.session.rollback()
+            apagar_arquivo = False
+            logger.warning(f'Importação {importacao_id} abandonada: {e}')
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Erro na importação {importacao_id}: {str(e)}', exc_info=True)
+            try:
+                renovar(ImportacaoArquivo, importacao_id, dono)
+                importacao = db.session.get(ImportacaoArquivo, importacao_id)
+                importacao.status = 'erro'
+                importacao.mensagem_erro = str(e)
+                importacao.data_conclusao = datetime.utcnow()
+                db.session.commit()
+            except ReservaPerdida:
+                db.session.rollback()
+                apagar_arquivo = False
+        finally:
+            if apagar_arquivo:
+                try:
+                    os.remove(importacao.caminho_arquivo)
+                except OSError:
+                    pass
+            db.session.remove()
@@ -0,0 +1,212 @@
+from app.models import db, FornecedorTabelaPrecos, MaterialBase, Fornecedor, Usuario
+from app.services.notificacao_dispatcher import notificar_admins
+from sqlalchemy import func, insert, update, or_
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
+import pandas as pd
+
+ALIASES_COLUNA_MATERIAL = ['material', 'nome_material', 'nome do material', 'material_nome']
+ALIASES_COLUNA_PRECO = ['preco', 'preco_kg', 'preco por kg', 'preco_fornecedor', 'valor']
+
+def notificar_admins_nova_tabela(fornecedor, usuario_criador):
+    """Agenda notificação para os admins (exceto quem criou) sobre nova tabela de preços"""
+    notificar_admins(
+        titulo='Nova Tabela de Preços',
+        mensagem=f'Tabela de preços adicionada para o fornecedor {fornecedor.nome} por {usuario_criador.nome}',
+        tipo='tabela_precos',
+        url='/revisao-tabelas-admin.html',
+        excluir_usuario_id=usuario_criador.id
+    )
+
+def localizar_colunas(df):
+    """Retorna (coluna_material, coluna_preco) do arquivo; None quando a coluna não existe"""
+    coluna_material = None
+    coluna_preco = None
+
+    for col in df.columns:
+        col_lower = str(col).lower().strip()
+        if col_lower in ALIASES_COLUNA_MATERIAL:
+            coluna_material = col
+        if col_lower in ALIASES_COLUNA_PRECO:
+            coluna_preco = col
+
+    return coluna_material, coluna_preco
+
+def converter_precos(serie):
+    """Converte a coluna de preços de uma vez só: aceita vírgula decimal e prefixo R$; inválidos viram NaN"""
+    if pd.api.types.is_numeric_dtype(serie):
+        return pd.to_numeric(serie, errors='coerce')
+
+    texto = serie.astype(str).str.replace(',', '.', regex=False).str.replace('R$', '', regex=False).str.strip()
+    return pd.to_numeric(texto, errors='coerce')
+
+def mapear_materiais(nomes):
+    """
+    Resolve todos os nomes/códigos do arquivo em uma única consulta.
+    Retorna {texto em minúsculas: MaterialBase}; o nome tem prioridade sobre o código.
+    """
+    chaves = list({nome.lower() for nome in nomes})
+    if not chaves:
+        return {}
+
+    materiais = MaterialBase.query.filter(
+        or_(
+            func.lower(MaterialBase.nome).in_(chaves),
+            func.lower(MaterialBase.codigo).in_(chaves)
+        )
+    ).all()
+
+    mapa = {}
+    for material in materiais:
+        mapa.setdefault(material.codigo.lower(), material)
+    for material in materiais:
+        mapa[material.nome.lower()] = material
+    return mapa
+
+def versoes_atuais(fornecedor_id, material_ids):
+    """Maior versão já gravada por material do fornecedor (qualquer status), em uma consulta"""
+    if not material_ids:
+        return {}
+
+    linhas = db.session.query(
+        FornecedorTabelaPrecos.material_id,
+        func.max(FornecedorTabelaPrecos.versao)
+    ).filter(
+        FornecedorTabelaPrecos.fornecedor_id == fornecedor_id,
+        FornecedorTabelaPrecos.material_id.in_(material_ids)
+    ).group_by(FornecedorTabelaPrecos.material_id).all()
+
+    return {material_id: versao for material_id, versao in linhas}
+
+def _registrar_erros(erros_por_linha, mascara, formato):
+    for indice in mascara[mascara].index:
+        erros_por_linha[indice] = formato(indice)
+
+def importar_precos_dataframe(df, coluna_material, coluna_preco, fornecedor_id, usuario_id, primeira_linha=2, materiais_importados=None):
+    """
+    Importa uma tabela de preços já lida pelo pandas.
+
+    - validação e conversão de preços vetorizadas (sem iterrows)
+    - materiais resolvidos por nome ou código em uma consulta
+    - versões antigas desativadas com um UPDATE e novas versões gravadas com um INSERT em lote
+
+    `primeira_linha` é o número (na planilha) da primeira linha de dados do df, usado nas mensagens.
+    `materiais_importados` ({material_id: linha}) acumula o que já foi gravado em blocos anteriores
+    do mesmo arquivo, para que material repetido entre blocos também seja apontado.
+    Retorna (precos_criados, erros); não faz commit.
+    """
+    numero_linha = pd.Series(range(primeira_linha, primeira_linha + len(df)), index=df.index)
+
+    bruto = df[coluna_material]
+    nomes = bruto.where(bruto.notna(), '').astype(str).str.strip()
+    precos_brutos = df[coluna_preco]
+    precos = converter_precos(precos_brutos)
+
+    preenchidas = nomes != ''
+    mapa = mapear_materiais(nomes[preenchidas].unique())
+    material_ids = nomes.str.lower().map(lambda chave: mapa[chave].id if chave in mapa else None)
+
+    sem_preco = preenchidas & precos_brutos.isna()
+    nao_encontrado = preenchidas & ~sem_preco & material_ids.isna()
+    preco_invalido = preenchidas & ~sem_preco & ~nao_encontrado & precos.isna()
+    negativo = preenchidas & ~sem_preco & ~nao_encontrado & ~preco_invalido & (precos < 0)
+    validas = preenchidas & ~sem_preco & ~nao_encontrado & ~preco_invalido & ~negativo
+
+    if materiais_importados is None:
+        materiais_importados = {}
+
+    # O mesmo material duas vezes no arquivo geraria duas linhas com a mesma versão
+    repetido = validas & (material_ids.duplicated(keep='first') | material_ids.isin(list(materiais_importados)))
+    validas = validas & ~repetido
+    primeira_ocorrencia = dict(materiais_importados)
+    primeira_ocorrencia.update(numero_linha[validas].groupby(material_ids[validas]).first().to_dict())
+
+    erros_por_linha = {}
+    _registrar_erros(erros_por_linha, sem_preco, lambda i: f'Linha {numero_linha[i]}: Preço inválido para material "{nomes[i]}"')
+    _registrar_erros(erros_por_linha, nao_encontrado, lambda i: f'Linha {numero_linha[i]}: Material "{nomes[i]}" não encontrado')
+    _registrar_erros(erros_por_linha, preco_invalido, lambda i: f'Linha {numero_linha[i]}: Preço inválido "{precos_brutos[i]}"')
+    _registrar_erros(erros_por_linha, negativo, lambda i: f'Linha {numero_linha[i]}: Preço não pode ser negativo')
+    _registrar_erros(
+        erros_por_linha, repetido,
+        lambda i: f'Linha {numero_linha[i]}: Material "{nomes[i]}" repetido no arquivo (já informado na linha {primeira_ocorrencia[material_ids[i]]})'
+    )
+    erros = [erros_por_linha[indice] for indice in sorted(erros_por_linha, key=lambda indice: numero_linha[indice])]
+
+    if not validas.any():
+        return [], erros
+
+    novos = pd.DataFrame({
+        'material_id': material_ids[validas].astype(int),
+        'preco_fornecedor': precos[validas].round(2)
+    })
+    ids = novos['material_id'].tolist()
+    materiais_importados.update(zip(ids, numero_linha[validas].tolist()))
+    versoes = versoes_atuais(fornecedor_id, ids)
+    agora = datetime.utcnow()
+
+    db.session.execute(
+        update(FornecedorTabelaPrecos).where(
+            FornecedorTabelaPrecos.fornecedor_id == fornecedor_id,
+            FornecedorTabelaPrecos.material_id.in_(ids),
+            FornecedorTabelaPrecos.status == 'ativo'
+        ).values(status='inativo', updated_by=usuario_id, updated_at=agora),
+        execution_options={'synchronize_session': False}
+    )
+
+    registros = [
+        {
+            'fornecedor_id': fornecedor_id,
+            'material_id': material_id,
+            'preco_fornecedor': preco,
+            'status': 'pendente_aprovacao',
+            'versao': versoes.get(material_id, 0) + 1,
+            'created_by': usuario_id,
+            'created_at': agora,
+            'updated_at': agora
+        }
+        for material_id, preco in zip(ids, novos['preco_fornecedor'].tolist())
+    ]
+
+    # RETURNING devolve os objetos já persistidos; o material resolvido é anexado sem
+    # marcar alteração, e fornecedor/criador já estão na sessão, então to_dict() não consulta o banco
+    precos_criados = db.session.scalars(
+        insert(FornecedorTabelaPrecos).returning(FornecedorTabelaPrecos),
+        registros
+    ).all()
+    materiais_por_id = {material.id: material for material in mapa.values()}
+    for preco in precos_criados:
+        set_committed_value(preco, 'material', materiais_por_id[preco.material_id])
+
+    return precos_criados, erros
+
+def processar_importacao_tabela_precos(importacao, blocos, registrar_progresso):
+    """
+    Processador da importação em segundo plano (ver importacao_arquivos).
+    Cada bloco é validado e gravado com importar_precos_dataframe e confirmado em registrar_progresso.
+    """
+    fornecedor = Fornecedor.query.get(importacao.fornecedor_id)
+    usuario = Usuario.query.get(importacao.usuario_id)
+    if not fornecedor:
+        raise ValueError('Fornecedor não encontrado')
+
+    materiais_importados = {}
+    coluna_material = coluna_preco = None
+    total_linhas = 0
+
+    for df, primeira_linha in blocos:
+        if coluna_material is None:
+            coluna_material, coluna_preco = localizar_colunas(df)
+            if not coluna_material or not coluna_preco:
+                raise ValueError('Colunas obrigatórias não encontradas. O arquivo deve ter colunas: material, preco')
+
+        precos_criados, erros = importar_precos_dataframe(
+            df, coluna_material, coluna_preco, fornecedor.id, usuario.id,
+            primeira_linha=primeira_linha, materiais_importados=materiais_importados
+        )
+        total_linhas += len(df)
+        registrar_progresso(len(df), len(precos_criados), erros)
+
+    if materiais_importados:
+        notificar_admins_nova_tabela(fornecedor, usuario)
+
+    return {'sucesso': len(materiais_importados), 'total_linhas': total_linhas}
@@ -0,0 +1,137 @@
+from app.models import db, TipoLote, TipoLotePreco
+from sqlalchemy import insert
+import pandas as pd
+
+LIMITE_TIPOS_LOTE = 150
+ABA_TIPOS_LOTE = 'Tipos de Lote'
+LINHA_CABECALHO = 2
+
+# Posição da coluna "1 Estrela" de cada classificação no modelo de importação
+COLUNAS_PRECOS = [('leve', 2), ('medio', 7), ('pesado', 12)]
+
+def gerar_codigo_automatico():
+    ultimo_tipo = TipoLote.query.order_by(TipoLote.id.desc()).first()
+    if ultimo_tipo and ultimo_tipo.codigo:
+        try:
+            numero = int(ultimo_tipo.codigo.replace('TL', ''))
+            return f'TL{numero + 1:03d}'
+        except:
+            pass
+
+    proximo_id = TipoLote.query.count() + 1
+    return f'TL{proximo_id:03d}'
+
+def _precos_da_linha(valores):
+    """Lista (classificacao, estrelas, preco) com os preços positivos preenchidos na linha"""
+    precos = []
+    for classificacao, coluna_inicial in COLUNAS_PRECOS:
+        for estrela in range(1, 6):
+            coluna = coluna_inicial + estrela - 1
+            if coluna >= len(valores):
+                continue
+            try:
+                preco = valores[coluna]
+                if preco is not None and not pd.isna(preco) and float(preco) > 0:
+                    precos.append((classificacao, estrela, float(preco)))
+            except (TypeError, ValueError):
+                pass
+    return precos
+
+def processar_importacao_tipos_lote(importacao, blocos, registrar_progresso):
+    """
+    Processador da importação de tipos de lote em segundo plano (ver importacao_arquivos).
+
+    Por bloco: tipos existentes buscados em uma consulta, preços antigos removidos
+    com um DELETE e preços novos gravados com um INSERT em lote.
+    """
+    total_tipos = TipoLote.query.count()
+    tipos_criados = 0
+    tipos_atualizados = 0
+    precos_criados = 0
+    limite_atingido = False
+
+    for df, primeira_linha in blocos:
+        if limite_atingido:
+            registrar_progresso(len(df), 0, [])
+            continue
+
+        colunas_faltando = [col for col in ['Nome', 'Descrição'] if col not in df.columns]
+        if colunas_faltando:
+            raise ValueError(f'Colunas obrigatórias faltando: {", ".join(colunas_faltando)}')
+
+        nomes = df['Nome'].where(df['Nome'].notna(), '').astype(str).str.strip()
+        existentes = {
+            tipo.nome: tipo
+            for tipo in TipoLote.query.filter(TipoLote.nome.in_(nomes[nomes != ''].unique().tolist())).all()
+        }
+
+        erros = []
+        sucesso_bloco = 0
+        tipos_com_precos = []
+
+        for posicao, valores in enumerate(df.itertuples(index=False, name=None)):
+            linha_num = primeira_linha + posicao
+            nome = nomes.iat[posicao]
+            if not nome or nome == 'nan':
+                continue
+
+            if total_tipos + tipos_criados >= LIMITE_TIPOS_LOTE:
+                erros.append(f'Linha {linha_num}: Limite máximo de {LIMITE_TIPOS_LOTE} tipos de lote atingido')
+                limite_atingido = True
+                break
+
+            try:
+                descricao = df['Descrição'].iat[posicao]
+                descricao = '' if descricao is None or pd.isna(descricao) else str(descricao).strip()
+
+                tipo = existentes.get(nome)
+                if tipo:
+                    tipo.descricao = descricao if descricao else tipo.descricao
+                    tipos_atualizados += 1
+                else:
+                    tipo = TipoLote(
+                        nome=nome,
+                        codigo=gerar_codigo_automatico(),
+                        descricao=descricao,
+                        ativo=True
+                    )
+                    db.session.add(tipo)
+                    db.session.flush()
+                    existentes[nome] = tipo
+                    tipos_criados += 1
+
+                tipos_com_precos.append((tipo, _precos_da_linha(valores)))
+                sucesso_bloco += 1
+            except Exception as e:
+                erros.append(f'Linha {linha_num}: {str(e)}')
+
+        # A última linha de um tipo repetido no arquivo é a que vale, como antes
+        precos_por_tipo = {tipo.id: precos for tipo, precos in tipos_com_precos}
+        if precos_por_tipo:
+            TipoLotePreco.query.filter(
+                TipoLotePreco.tipo_lote_id.in_(list(precos_por_tipo))
+            ).delete(synchronize_session=False)
+
+            registros = [
+                {
+                    'tipo_lote_id': tipo_lote_id,
+                    'classificacao': classificacao,
+                    'estrelas': estrelas,
+                    'preco_por_kg': preco,
+                    'ativo': True
+                }
+                for tipo_lote_id, precos in precos_por_tipo.items()
+                for classificacao, estrelas, preco in precos
+            ]
+            if registros:
+                db.session.execute(insert(TipoLotePreco), registros)
+            precos_criados += len(registros)
+
+        registrar_progresso(len(df), sucesso_bloco, erros)
+
+    return {
+        'mensagem': 'Importação concluída com sucesso',
+        'tipos_criados': tipos_criados,
+        'tipos_atualizados': tipos_atualizados,
+        'precos_criados': precos_criados
+    }
@@ -0,0 +1,177 @@
+"""
+Despacho de notificações fora da requisição.
+
+Os handlers só registram o evento (notificar_usuarios / notificar_admins). Depois do
+commit da sessão o evento vai para uma fila em memória, consumida por uma tarefa em
+segundo plano que:
+
+- resolve os destinatários (admins, perfis) em uma consulta
+- grava todas as linhas de Notificacao em um único INSERT (e soma aos contadores de não lidas)
+- avisa cada destinatário pela sala user_<id> do Socket.IO
+
+Com SOCKETIO_MESSAGE_QUEUE (ou REDIS_URL) configurado, o socketio.emit passa pelo
+Redis e chega a clientes conectados em qualquer worker. Sem ele, o emit é local ao
+processo. Com NOTIFICACOES_ASSINCRONAS desligado (scripts, testes), o despacho roda
+na hora, logo após o commit.
+"""
+from flask import current_app
+from app import socketio
+from app.models import db, Notificacao, Usuario, Perfil
+from app.services.notificacoes_nao_lidas import ajustar_nao_lidas
+from sqlalchemy import event, insert, select, or_
+from collections import Counter
+from datetime import datetime
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+CHAVE_SESSAO = 'notificacoes_pendentes'
+TAMANHO_LOTE = 500
+
+_fila = queue.Queue()
+_trabalhador_iniciado = False
+_trava = threading.Lock()
+
+def notificar_usuarios(usuario_ids, titulo, mensagem, tipo=None, url=None, evento_socket='nova_notificacao'):
+    """Agenda uma notificação para os usuários informados (enviada após o commit)"""
+    _agendar({
+        'usuario_ids': sorted({int(usuario_id) for usuario_id in usuario_ids}),
+        'titulo': titulo,
+        'mensagem': mensagem,
+        'tipo': tipo,
+        'url': url,
+        'evento_socket': evento_socket
+    })
+
+def notificar_admins(titulo, mensagem, tipo=None, url=None, perfis=(), excluir_usuario_id=None, evento_socket='nova_notificacao'):
+    """
+    Agenda uma notificação para os administradores ativos (tipo admin ou perfil Administrador)
+    e, opcionalmente, para usuários de outros `perfis`. Os destinatários são resolvidos no despacho.
+    """
+    _agendar({
+        'usuario_ids': None,
+        'perfis': ['Administrador', *perfis],
+        'excluir_usuario_id': int(excluir_usuario_id) if excluir_usuario_id else None,
+        'titulo': titulo,
+        'mensagem': mensagem,
+        'tipo': tipo,
+        'url': url,
+        'evento_socket': evento_socket
+    })
+
+def _agendar(evento):
+    """Guarda o evento na sessão: só é despachado se a transação da requisição for confirmada"""
+    evento['data_envio'] = datetime.utcnow()
+    sessao = db.session()
+    if not sessao.in_transaction():
+        # Garante uma transação aberta para que commit/rollback disparem os eventos da sessão
+        sessao.begin()
+    sessao.info.setdefault(CHAVE_SESSAO, []).append(evento)
+
+def _apos_commit(session):
+    eventos = session.info.pop(CHAVE_SESSAO, None)
+    if not eventos:
+        return
+
+    if current_app.config.get('NOTIFICACOES_ASSINCRONAS', True):
+        _iniciar_trabalhador(current_app._get_current_object())
+        for evento in eventos:
+            _fila.put(evento)
+    else:
+        despachar(eventos)
+
+def _apos_rollback(session, transacao_anterior):
+    # Rollback de savepoint (begin_nested) não descarta o que a requisição já agendou
+    if not transacao_anterior.nested:
+        session.info.pop(CHAVE_SESSAO, None)
+
+def registrar_eventos_notificacao():
+    event.listen(db.session, 'after_commit', _apos_commit)
+    event.listen(db.session, 'after_soft_rollback', _apos_rollback)
+
+def _iniciar_trabalhador(app):
+    global _trabalhador_iniciado
+    with _trava:
+        if _trabalhador_iniciado:
+            return
+        _trabalhador_iniciado = True
+    socketio.start_background_task(_consumir_fila, app)
+
+def _consumir_fila(app):
+    with app.app_context():
+        while True:
+            eventos = [_fila.get()]
+            while len(eventos) < TAMANHO_LOTE:
+                try:
+                    eventos.append(_fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                despachar(eventos)
+            except Exception as e:
+                logger.error(f'Erro ao despachar {len(eventos)} notificação(ões): {str(e)}', exc_info=True)
+
+def _ids_por_perfis(conexao, perfis_grupos):
+    """{tupla de perfis: [ids]} para cada grupo de perfis, numa consulta por grupo distinto"""
+    resultado = {}
+    for perfis in perfis_grupos:
+        resultado[perfis] = conexao.execute(
+            select(Usuario.id).where(
+                Usuario.ativo == True,
+                or_(
+                    Usuario.tipo == 'admin',
+                    Usuario.perfil.has(Perfil.nome.in_(perfis))
+                )
+            ).order_by(Usuario.id)
+        ).scalars().all()
+    return resultado
+
+def despachar(eventos):
+    """
+    Grava as notificações de todos os eventos em um INSERT e emite para cada destinatário.
+    Usa uma conexão própria, então pode rodar tanto na tarefa de fundo quanto logo após um commit.
+    """
+    grupos = {tuple(evento['perfis']) for evento in eventos if evento['usuario_ids'] is None}
+
+    with db.engine.begin() as conexao:
+        ids_por_perfis = _ids_por_perfis(conexao, grupos)
+        linhas, envios = _montar_linhas(eventos, ids_por_perfis)
+        if linhas:
+            conexao.execute(insert(Notificacao.__table__), linhas)
+            ajustar_nao_lidas(conexao, Counter(linha['usuario_id'] for linha in linhas))
+
+    for evento, destinatarios in envios:
+        payload = {'tipo': evento['tipo'], 'titulo': evento['titulo'], 'url': evento['url']}
+        for usuario_id in destinatarios:
+            socketio.emit(evento['evento_socket'], payload, room=f'user_{usuario_id}')
+
+    return len(linhas)
+
+def _montar_linhas(eventos, ids_por_perfis):
+    linhas = []
+    envios = []
+    for evento in eventos:
+        if evento['usuario_ids'] is None:
+            destinatarios = [
+                usuario_id for usuario_id in ids_por_perfis[tuple(evento['perfis'])]
+                if usuario_id != evento['excluir_usuario_id']
+            ]
+        else:
+            destinatarios = evento['usuario_ids']
+
+        for usuario_id in destinatarios:
+            linhas.append({
+                'usuario_id': usuario_id,
+                'titulo': evento['titulo'],
+                'mensagem': evento['mensagem'],
+                'tipo': evento['tipo'],
+                'url': evento['url'],
+                'lida': False,
+                'data_envio': evento['data_envio']
+            })
+        envios.append((evento, destinatarios))
+
+    return linhas, envios
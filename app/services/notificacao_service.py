@@ -1,4 +1,7 @@
 from app.models import db, Notificacao, Usuario, Fornecedor, OrdemCompra
+from sqlalchemy import select, insert, update, delete
+from app.services.notificacoes_nao_lidas import ajustar_nao_lidas, deltas_remocao
+from collections import Counter
 from datetime import datetime, timedelta
 
 def obter_admins():
@@ -7,42 +10,84 @@ def obter_admins():
         Usuario.ativo == True
     ).all()
 
-def criar_notificacao_admin(titulo, mensagem, tipo, url):
-    admins = obter_admins()
-    notificacoes_criadas = []
-    
-    for admin in admins:
-        notificacoes_existentes = Notificacao.query.filter(
-            Notificacao.usuario_id == admin.id,
-            Notificacao.tipo == tipo
-        ).all()
-        
-        if notificacoes_existentes:
-            notificacao_principal = notificacoes_existentes[0]
-            notificacao_principal.titulo = titulo
-            notificacao_principal.mensagem = mensagem
-            notificacao_principal.url = url
-            notificacao_principal.lida = False
-            notificacao_principal.data_envio = datetime.utcnow()
-            
-            for duplicada in notificacoes_existentes[1:]:
-                db.session.delete(duplicada)
-        else:
-            notificacao = Notificacao(
-                usuario_id=admin.id,
-                titulo=titulo,
-                mensagem=mensagem,
-                tipo=tipo,
-                url=url
+def sincronizar_notificacao_admins(executor, titulo, mensagem, tipo, url):
+    """
+    Mantém uma única notificação do `tipo` por admin ativo, em instruções em lote
+    (um SELECT de admins, um de notificações, e no máximo um UPDATE, um DELETE e um INSERT).
+
+    Só reescreve (e marca como não lida) a notificação cujo conteúdo mudou; admins sem a
+    notificação ganham uma nova. `executor` é a sessão ou uma conexão já em transação.
+    O contador de não lidas de cada admin é ajustado na mesma transação.
+    Retorna a lista de notificações criadas.
+    """
+    tabela = Notificacao.__table__
+    admin_ids = executor.execute(
+        select(Usuario.id).where(Usuario.tipo == 'admin', Usuario.ativo == True)
+    ).scalars().all()
+    if not admin_ids:
+        return []
+
+    existentes = executor.execute(
+        select(tabela.c.id, tabela.c.usuario_id, tabela.c.titulo, tabela.c.mensagem, tabela.c.url, tabela.c.lida).where(
+            tabela.c.usuario_id.in_(admin_ids),
+            tabela.c.tipo == tipo
+        ).order_by(tabela.c.id)
+    ).all()
+
+    principais = {}
+    desatualizadas = []
+    duplicadas = []
+    nao_lidas = Counter()
+    for existente in existentes:
+        if existente.usuario_id in principais:
+            duplicadas.append(existente.id)
+            if not existente.lida:
+                nao_lidas[existente.usuario_id] -= 1
+            continue
+        principais[existente.usuario_id] = existente.id
+        if (existente.titulo, existente.mensagem, existente.url) != (titulo, mensagem, url):
+            desatualizadas.append(existente.id)
+            if existente.lida:
+                nao_lidas[existente.usuario_id] += 1
+
+    agora = datetime.utcnow()
+
+    if desatualizadas:
+        executor.execute(
+            update(tabela).where(tabela.c.id.in_(desatualizadas)).values(
+                titulo=titulo, mensagem=mensagem, url=url, lida=False, data_envio=agora
             )
-            db.session.add(notificacao)
-            notificacoes_criadas.append(notificacao)
-    
+        )
+
+    if duplicadas:
+        executor.execute(delete(tabela).where(tabela.c.id.in_(duplicadas)))
+
+    notificacoes_criadas = [
+        {
+            'usuario_id': admin_id,
+            'titulo': titulo,
+            'mensagem': mensagem,
+            'tipo': tipo,
+            'url': url,
+            'lida': False,
+            'data_envio': agora
+        }
+        for admin_id in admin_ids if admin_id not in principais
+    ]
+    if notificacoes_criadas:
+        executor.execute(insert(tabela), notificacoes_criadas)
+        nao_lidas.update(notificacao['usuario_id'] for notificacao in notificacoes_criadas)
+
+    ajustar_nao_lidas(executor, nao_lidas)
+    return notificacoes_criadas
+
+def criar_notificacao_admin(titulo, mensagem, tipo, url):
+    notificacoes_criadas = sincronizar_notificacao_admins(db.session, titulo, mensagem, tipo, url)
     db.session.commit()
-    
     return notificacoes_criadas
 
 def remover_notificacao_por_tipo(tipo):
+    ajustar_nao_lidas(db.session, deltas_remocao(db.session, Notificacao.tipo == tipo))
     Notificacao.query.filter(
         Notificacao.tipo == tipo
     ).delete()
@@ -176,63 +221,31 @@ def verificar_autorizacoes_preco_pendentes():
         return {'total_pendentes': 0, 'notificacoes_criadas': 0, 'erro': str(e)}
 
 def gerar_todas_notificacoes_pendentes():
-    resultados = {
-        'fornecedores': verificar_fornecedores_pendentes(),
-        'ordens_compra': verificar_ordens_compra_pendentes(),
-        'solicitacoes': verificar_solicitacoes_pendentes(),
-        'autorizacoes_preco': verificar_autorizacoes_preco_pendentes(),
-        'conferencias': verificar_conferencias_pendentes()
-    }
-    
-    total_pendentes = sum([
-        resultados['fornecedores'].get('total_pendentes', 0),
-        resultados['ordens_compra'].get('total_pendentes', 0),
-        resultados['solicitacoes'].get('total_pendentes', 0),
-        resultados['autorizacoes_preco'].get('total_pendentes', 0),
-        resultados['conferencias'].get('total_pendentes', 0)
-    ])
-    
-    total_notificacoes = sum([
-        resultados['fornecedores'].get('notificacoes_criadas', 0),
-        resultados['ordens_compra'].get('notificacoes_criadas', 0),
-        resultados['solicitacoes'].get('notificacoes_criadas', 0),
-        resultados['autorizacoes_preco'].get('notificacoes_criadas', 0),
-        resultados['conferencias'].get('notificacoes_criadas', 0)
-    ])
-    
+    """
+    Reconcilia agora todos os contadores de pendências (normalmente feito por evento e
+    pelo reconciliador periódico, ver pendencias_service) e ressincroniza as notificações-resumo.
+    """
+    from app.services.pendencias_service import PENDENCIAS, reconciliar_pendencias
+
+    reconciliados = reconciliar_pendencias()
+    resultados = {PENDENCIAS[chave]['detalhe']: resultado for chave, resultado in reconciliados.items()}
+    # Não há modelo Conferencia; mantido no retorno para quem já lê essa chave
+    resultados['conferencias'] = {'total_pendentes': 0, 'notificacoes_criadas': 0}
+
     return {
-        'total_pendentes': total_pendentes,
-        'total_notificacoes_criadas': total_notificacoes,
+        'total_pendentes': sum(resultado.get('total_pendentes', 0) for resultado in resultados.values()),
+        'total_notificacoes_criadas': sum(resultado.get('notificacoes_criadas', 0) for resultado in resultados.values()),
         'detalhes': resultados
     }
 
 def obter_resumo_pendencias():
-    fornecedores_pendentes = Fornecedor.query.filter(
-        Fornecedor.tabela_preco_status == 'pendente',
-        Fornecedor.ativo == True
-    ).count()
-    
-    ocs_pendentes = OrdemCompra.query.filter(
-        OrdemCompra.status == 'em_analise'
-    ).count()
-    
-    from app.models import Solicitacao
-    solicitacoes_pendentes = Solicitacao.query.filter(
-        Solicitacao.status == 'pendente'
-    ).count()
-    
-    try:
-        from app.models import SolicitacaoAutorizacaoPreco
-        autorizacoes_pendentes = SolicitacaoAutorizacaoPreco.query.filter(
-            SolicitacaoAutorizacaoPreco.status == 'pendente'
-        ).count()
-    except:
-        autorizacoes_pendentes = 0
-    
-    return {
-        'fornecedores_tabela_pendente': fornecedores_pendentes,
-        'ordens_compra_pendentes': ocs_pendentes,
-        'solicitacoes_pendentes': solicitacoes_pendentes,
-        'autorizacoes_preco_pendentes': autorizacoes_pendentes,
-        'total': fornecedores_pendentes + ocs_pendentes + solicitacoes_pendentes + autorizacoes_pendentes
+    """Lido dos contadores mantidos por pendencias_service, sem varrer as tabelas"""
+    from app.services.pendencias_service import PENDENCIAS, obter_contadores
+
+    contadores = obter_contadores()
+    resumo = {
+        pendencia['resumo']: contadores[chave].quantidade
+        for chave, pendencia in PENDENCIAS.items()
     }
+    resumo['total'] = sum(resumo.values())
+    return resumo
@@ -0,0 +1,168 @@
+"""
+Contador de notificações não lidas por usuário (contadores_notificacoes).
+
+O contador é criado na primeira leitura, com a contagem exata pelo índice parcial de
+não lidas, e a partir daí só recebe incrementos/decrementos na mesma transação que
+grava as notificações:
+
+- objetos Notificacao criados, removidos ou com `lida` alterada pelo ORM: eventos da sessão
+- gravações em lote (despacho de notificações, resumo de pendências, marcar todas como lidas):
+  chamam ajustar_nao_lidas diretamente, com o número de linhas afetadas
+
+Usuário sem contador não é atualizado; a próxima leitura recalcula. Um reconciliador
+em segundo plano (RECONCILIAR_NAO_LIDAS_SEGUNDOS) reconta os contadores que divergirem,
+cobrindo notificações gravadas fora do ORM e as que chegaram enquanto o contador era criado.
+"""
+from app import socketio
+from app.models import db, Notificacao, ContadorNotificacoes
+from sqlalchemy import event, inspect, select, insert, update, func, case, literal
+from sqlalchemy.exc import IntegrityError
+from collections import Counter, defaultdict
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHAVE_SESSAO = 'notificacoes_nao_lidas_deltas'
+INTERVALO_RECONCILIACAO_PADRAO = 600
+
+_reconciliador_iniciado = False
+
+def ajustar_nao_lidas(executor, deltas):
+    """Soma {usuario_id: delta} aos contadores existentes, um UPDATE por valor de delta distinto"""
+    tabela = ContadorNotificacoes.__table__
+    por_delta = defaultdict(list)
+    for usuario_id, delta in deltas.items():
+        if delta:
+            por_delta[delta].append(int(usuario_id))
+
+    agora = datetime.utcnow()
+    for delta, usuario_ids in por_delta.items():
+        novo_valor = tabela.c.nao_lidas + delta
+        executor.execute(
+            update(tabela).where(tabela.c.usuario_id.in_(usuario_ids)).values(
+                nao_lidas=case((novo_valor < 0, 0), else_=novo_valor),
+                data_atualizacao=agora
+            )
+        )
+
+def deltas_remocao(executor, *condicoes):
+    """{usuario_id: -n} das não lidas que casam com as condições; chamar antes do DELETE"""
+    tabela = Notificacao.__table__
+    linhas = executor.execute(
+        select(tabela.c.usuario_id, func.count()).where(
+            tabela.c.lida == False, *condicoes
+        ).group_by(tabela.c.usuario_id)
+    ).all()
+    return {usuario_id: -quantidade for usuario_id, quantidade in linhas}
+
+def _contagem(usuario_id):
+    """Subconsulta escalar das não lidas de `usuario_id` (valor ou coluna)"""
+    tabela = Notificacao.__table__
+    return select(func.count()).select_from(tabela).where(
+        tabela.c.usuario_id == usuario_id,
+        tabela.c.lida == False
+    ).scalar_subquery()
+
+def contar_nao_lidas(executor, usuario_id):
+    return executor.execute(select(_contagem(int(usuario_id)))).scalar()
+
+def obter_nao_lidas(usuario_id):
+    """Lê o contador do usuário; na primeira vez cria o contador já com a contagem, num só INSERT ... SELECT"""
+    contador = db.session.get(ContadorNotificacoes, int(usuario_id))
+    if contador is not None:
+        return contador.nao_lidas
+
+    tabela = ContadorNotificacoes.__table__
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(tabela).from_select(
+                ['usuario_id', 'nao_lidas', 'data_atualizacao'],
+                select(literal(int(usuario_id)), _contagem(int(usuario_id)), literal(datetime.utcnow()))
+            ))
+        db.session.commit()
+    except IntegrityError:
+        # Outra requisição criou o contador ao mesmo tempo
+        pass
+    return db.session.execute(
+        select(tabela.c.nao_lidas).where(tabela.c.usuario_id == int(usuario_id))
+    ).scalar()
+
+def reconciliar_nao_lidas():
+    """Reconta os contadores que divergem das notificações não lidas; faz commit e devolve quantos corrigiu"""
+    tabela = ContadorNotificacoes.__table__
+    contagem = _contagem(tabela.c.usuario_id)
+    resultado = db.session.execute(
+        update(tabela).where(tabela.c.nao_lidas != contagem).values(
+            nao_lidas=contagem, data_atualizacao=datetime.utcnow()
+        )
+    )
+    db.session.commit()
+    return resultado.rowcount
+
+def iniciar_reconciliador_nao_lidas(app):
+    """Dispara o laço de reconciliação em segundo plano (uma vez por processo)"""
+    global _reconciliador_iniciado
+    intervalo = int(app.config.get('RECONCILIAR_NAO_LIDAS_SEGUNDOS', INTERVALO_RECONCILIACAO_PADRAO))
+    if _reconciliador_iniciado or intervalo <= 0:
+        return
+    _reconciliador_iniciado = True
+    socketio.start_background_task(_laco_reconciliacao, app, intervalo)
+
+def _laco_reconciliacao(app, intervalo):
+    while True:
+        socketio.sleep(intervalo)
+        with app.app_context():
+            try:
+                corrigidos = reconciliar_nao_lidas()
+                if corrigidos:
+                    logger.info(f'{corrigidos} contador(es) de notificações não lidas corrigido(s)')
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Erro ao reconciliar notificações não lidas: {e}', exc_info=True)
+            finally:
+                db.session.remove()
+
+def _antes_flush(session, flush_context, instances):
+    # Alteradas e removidas são lidas antes do flush, enquanto o valor anterior de `lida` é conhecido
+    deltas = session.info.setdefault(CHAVE_SESSAO, Counter())
+    for obj in session.dirty:
+        if not isinstance(obj, Notificacao):
+            continue
+        historico = inspect(obj).attrs.lida.history
+        if historico.has_changes():
+            anterior = historico.deleted[0] if historico.deleted else None
+            if bool(anterior) != bool(obj.lida):
+                deltas[obj.usuario_id] += -1 if obj.lida else 1
+    for obj in session.deleted:
+        if isinstance(obj, Notificacao):
+            historico = inspect(obj).attrs.lida.history
+            lida = historico.deleted[0] if historico.deleted else obj.lida
+            if not lida:
+                deltas[obj.usuario_id] -= 1
+
+def _depois_flush(session, flush_context):
+    # Novas são lidas depois do flush, quando usuario_id e o default de `lida` já foram aplicados
+    deltas = session.info.pop(CHAVE_SESSAO, None) or Counter()
+    for obj in session.new:
+        if isinstance(obj, Notificacao) and not obj.lida:
+            deltas[obj.usuario_id] += 1
+
+    if not any(deltas.values()):
+        return
+
+    conexao = session.connection()
+    try:
+        with conexao.begin_nested():
+            ajustar_nao_lidas(conexao, deltas)
+    except Exception as e:
+        logger.warning(f'Erro ao atualizar contadores de notificações não lidas: {e}')
+
+def _apos_rollback(session, transacao_anterior):
+    if not transacao_anterior.nested:
+        session.info.pop(CHAVE_SESSAO, None)
+
+def registrar_eventos_nao_lidas():
+    event.listen(db.session, 'before_flush', _antes_flush)
+    event.listen(db.session, 'after_flush', _depois_flush)
+    event.listen(db.session, 'after_soft_rollback', _apos_rollback)
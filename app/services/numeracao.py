@@ -0,0 +1,83 @@
+"""
+Números sequenciais de lotes, OS, OPs e bags sem colisão entre requisições simultâneas.
+
+Cada sequência tem um contador na tabela contadores_numeracao, com o período na chave
+('lote-2025', 'os-20250131'). O próximo número é um UPDATE valor = valor + 1 seguido
+da leitura do valor, na transação de quem cria o registro: o UPDATE trava a linha
+(no SQLite, o banco) até o commit, então duas transações nunca recebem o mesmo número,
+e um rollback devolve o número. Substitui o count() + 1 sobre LIKE 'AAAA-%', que lia
+todos os lotes do ano a cada criação e repetia números em acessos simultâneos.
+
+Na primeira vez que uma chave é usada, o contador parte do maior número já gravado
+com o mesmo prefixo, para continuar a numeração existente.
+"""
+from app.models import db, ContadorNumeracao, Lote, OrdemServico, OrdemProducao, BagProducao
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+
+def ultimo_sufixo(coluna, prefixo, digitos=None):
+    """Maior sufixo numérico dos valores de `coluna` que começam com `prefixo` (0 se não houver)"""
+    maior = 0
+    for (valor,) in db.session.query(coluna).filter(coluna.like(f'{prefixo}%')):
+        sufixo = valor[len(prefixo):]
+        # '_' do prefixo é curinga no LIKE: confere o prefixo exato
+        if valor.startswith(prefixo) and sufixo.isdigit() and (digitos is None or len(sufixo) == digitos):
+            maior = max(maior, int(sufixo))
+    return maior
+
+def proximo_numero(chave, ultimo_existente=None):
+    """
+    Próximo número (1, 2, ...) da sequência `chave`, reservado até o fim da transação
+    atual. `ultimo_existente` é chamado só quando o contador ainda não existe e devolve
+    o último número já usado fora dele.
+    """
+    agora = datetime.utcnow()
+    incremento = update(ContadorNumeracao).where(ContadorNumeracao.chave == chave).values(
+        valor=ContadorNumeracao.valor + 1, data_atualizacao=agora
+    )
+    if not db.session.execute(incremento).rowcount:
+        inicial = (ultimo_existente() if ultimo_existente else 0) + 1
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(ContadorNumeracao).values(
+                    chave=chave, valor=inicial, data_atualizacao=agora
+                ))
+            return inicial
+        except IntegrityError:
+            # Outra transação criou o contador ao mesmo tempo: incrementa o dela
+            db.session.execute(incremento)
+    return db.session.execute(
+        select(ContadorNumeracao.valor).where(ContadorNumeracao.chave == chave)
+    ).scalar_one()
+
+def gerar_numero_lote(momento=None):
+    """Número de lote no formato AAAA-NNNNN, sequencial por ano"""
+    ano = (momento or datetime.now()).year
+    numero = proximo_numero(f'lote-{ano}', lambda: ultimo_sufixo(Lote.numero_lote, f'{ano}-', 5))
+    return f'{ano}-{numero:05d}'
+
+def gerar_codigo_lote_compra(momento=None):
+    """Código do lote de compra no formato AAAAMMDD-NNN, sequencial por dia"""
+    data_str = (momento or datetime.now()).strftime('%Y%m%d')
+    numero = proximo_numero(f'lote-compra-{data_str}', lambda: ultimo_sufixo(Lote.numero_lote, f'{data_str}-'))
+    return f'{data_str}-{numero:03d}'
+
+def gerar_numero_os(momento=None):
+    """Número da OS no formato OS-AAAAMMDD-NNNN, sequencial por dia"""
+    data_str = (momento or datetime.now()).strftime('%Y%m%d')
+    # Números antigos têm sufixo hexadecimal aleatório de 6 caracteres e não entram na sequência
+    numero = proximo_numero(f'os-{data_str}', lambda: ultimo_sufixo(OrdemServico.numero_os, f'OS-{data_str}-', 4))
+    return f'OS-{data_str}-{numero:04d}'
+
+def gerar_numero_op(momento=None):
+    """Número da OP no formato OP-AAAAMMDD-NNNN, sequencial por dia"""
+    data_str = (momento or datetime.now()).strftime('%Y%m%d')
+    numero = proximo_numero(f'op-{data_str}', lambda: ultimo_sufixo(OrdemProducao.numero_op, f'OP-{data_str}-'))
+    return f'OP-{data_str}-{numero:04d}'
+
+def gerar_codigo_bag(classificacao_nome):
+    """Código da bag no formato BAG-CATEGORIA-NNNN, sequencial por categoria"""
+    categoria_cod = classificacao_nome[:10].upper().replace(' ', '_')
+    numero = proximo_numero(f'bag-{categoria_cod}', lambda: ultimo_sufixo(BagProducao.codigo, f'BAG-{categoria_cod}-'))
+    return f'BAG-{categoria_cod}-{numero:04d}'
@@ -1,14 +1,157 @@
 import cv2
 import numpy as np
 import base64
+import io
+from PIL import Image
 
 LOW_DENSITY_THRESHOLD = 0.00002
 HIGH_DENSITY_THRESHOLD = 0.00008
 
 MIN_BOARD_RATIO = 0.05
 
+# Áreas e raios em pixels da foto original; a análise converte para a resolução de trabalho
 MIN_COMPONENT_AREA = 30
 MAX_COMPONENT_AREA = 80000
+LARGE_COMPONENT_AREA = 1000
+
+BOARD_CLOSE_RADIUS = 4
+BOARD_OPEN_RADIUS = 2
+COMPONENT_OPEN_RADIUS = 2
+COMPONENT_CLOSE_RADIUS = 2
+COMPONENT_BLUR_RADIUS = 2
+
+# Maior lado da imagem analisada; fotos maiores são reduzidas antes da análise
+WORKING_MAX_SIDE = 1600
+
+# JPEG pode ser decodificado direto em 1/2, 1/4 ou 1/8 do tamanho, bem mais rápido que decodificar e reduzir
+JPEG_REDUCED_READ_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Faixas HSV (OpenCV: H 0-179) das cores de placa: verdes, marrom/fenolite, azul, amarelo e vermelhos
+BOARD_HSV_RANGES = [
+    ((35, 20, 20), (90, 255, 255)),
+    ((70, 15, 15), (100, 255, 255)),
+    ((8, 20, 20), (35, 255, 220)),
+    ((95, 20, 20), (135, 255, 255)),
+    ((15, 40, 40), (40, 255, 255)),
+    ((0, 30, 30), (10, 255, 255)),
+    ((160, 30, 30), (180, 255, 255)),
+]
+
+
+def _build_hsv_lut(ranges):
+    """
+    Tabela 1x256x3 para cv2.LUT: o bit i de cada canal indica se o valor está na faixa i.
+    Um pixel é placa quando algum bit está ligado nos três canais ao mesmo tempo.
+    """
+    lut = np.zeros((1, 256, 3), np.uint8)
+    for bit, (lower, upper) in enumerate(ranges):
+        for channel in range(3):
+            lut[0, lower[channel]:upper[channel] + 1, channel] |= 1 << bit
+    return lut
+
+
+BOARD_HSV_LUT = _build_hsv_lut(BOARD_HSV_RANGES)
+
+
+def board_mask(hsv):
+    """Máscara (0/255) dos pixels com cor de placa, com uma consulta à tabela por pixel"""
+    bits = cv2.LUT(hsv, BOARD_HSV_LUT)
+    hue, saturation, value = cv2.split(bits)
+    matched = cv2.bitwise_and(cv2.bitwise_and(hue, saturation), value)
+    return cv2.compare(matched, 0, cv2.CMP_GT)
+
+
+def fill_holes(mask):
+    """
+    Preenche os buracos das regiões da máscara. Cada região passa a ocupar toda a área do
+    seu contorno externo, e o que estava dentro de um buraco deixa de ser região própria,
+    como em findContours com RETR_EXTERNAL.
+    """
+    height, width = mask.shape[:2]
+    outside = np.zeros((height + 2, width + 2), np.uint8)
+    outside[1:-1, 1:-1] = mask
+    # Alcançável pela borda sem atravessar a máscara = fora de todas as regiões
+    cv2.floodFill(outside, None, (0, 0), 255)
+    return cv2.bitwise_or(mask, cv2.bitwise_not(outside[1:-1, 1:-1]))
+
+
+def _scaled_radius(radius, scale):
+    return int(round(radius * scale))
+
+
+def _morph(mask, operation, radius, scale):
+    """Uma operação com kernel (2r+1)x(2r+1), r convertido para a resolução de trabalho (r=0: nada)"""
+    r = _scaled_radius(radius, scale)
+    if r <= 0:
+        return mask
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * r + 1, 2 * r + 1))
+    return cv2.morphologyEx(mask, operation, kernel)
+
+
+def _image_bytes(image_data):
+    if isinstance(image_data, bytes):
+        return image_data
+    if isinstance(image_data, str):
+        if image_data.startswith('data:image'):
+            base64_data = image_data.split(',')[1] if ',' in image_data else image_data
+            return base64.b64decode(base64_data)
+        return base64.b64decode(image_data)
+    return None
+
+
+def _jpeg_size(image_bytes):
+    """(largura, altura) lidos só do cabeçalho, ou None se não for JPEG"""
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as header:
+            return header.size if header.format == 'JPEG' else None
+    except Exception:
+        return None
+
+
+def decode_image(image_data, max_side=None):
+    """
+    Decodifica bytes, base64 ou data URL em uma imagem BGR; retorna (img, (largura, altura) originais, erro).
+    Com `max_side`, um JPEG grande é decodificado já reduzido (1/2, 1/4 ou 1/8), sem ficar menor que `max_side`.
+    """
+    image_bytes = _image_bytes(image_data)
+    if image_bytes is None:
+        return None, None, 'Formato de imagem inválido'
+
+    flags = cv2.IMREAD_COLOR
+    original_size = _jpeg_size(image_bytes) if max_side else None
+    if original_size:
+        for factor, reduced_flags in JPEG_REDUCED_READ_FLAGS:
+            if max(original_size) / factor >= max_side:
+                flags = reduced_flags
+                break
+
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    img = cv2.imdecode(nparr, flags)
+    if img is None:
+        return None, None, 'Não foi possível decodificar a imagem'
+
+    height, width = img.shape[:2]
+    if original_size is None:
+        original_size = (width, height)
+    elif (width > height) != (original_size[0] > original_size[1]):
+        # imdecode aplica a orientação EXIF; o cabeçalho traz o tamanho antes da rotação
+        original_size = (original_size[1], original_size[0])
+    return img, original_size, None
+
+
+def _error_result(message):
+    return {
+        'components_count': 0,
+        'density_score': 0.0,
+        'grade': None,
+        'board_detected': False,
+        'error': message
+    }
+
 
 def analyze_pcb_image(image_data) -> dict:
     """
@@ -21,82 +164,48 @@ def analyze_pcb_image(image_data) -> dict:
       - debug: campos auxiliares para depuração
     """
     try:
-        if isinstance(image_data, bytes):
-            image_bytes = image_data
-        elif isinstance(image_data, str):
-            if image_data.startswith('data:image'):
-                base64_data = image_data.split(',')[1] if ',' in image_data else image_data
-                image_bytes = base64.b64decode(base64_data)
-            else:
-                image_bytes = base64.b64decode(image_data)
-        else:
-            return {
-                'components_count': 0,
-                'density_score': 0.0,
-                'grade': None,
-                'board_detected': False,
-                'error': 'Formato de imagem inválido'
-            }
-        
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img is None:
-            return {
-                'components_count': 0,
-                'density_score': 0.0,
-                'grade': None,
-                'board_detected': False,
-                'error': 'Não foi possível decodificar a imagem'
-            }
-        
+        img, original_size, error = decode_image(image_data, max_side=WORKING_MAX_SIDE)
+        if error:
+            return _error_result(error)
+        return analyze_decoded_image(img, original_size=original_size)
+    except Exception as e:
+        return _error_result(str(e))
+
+
+def analyze_decoded_image(img, max_side=WORKING_MAX_SIDE, original_size=None) -> dict:
+    """
+    Mesma análise de analyze_pcb_image, para uma imagem BGR já decodificada
+    (`original_size`: tamanho da foto original, se ela foi decodificada reduzida).
+
+    A análise roda com no máximo `max_side` px no maior lado (None: tamanho recebido).
+    Áreas, raios e densidade continuam na escala da foto original: os limites em pixels
+    são convertidos para a resolução de trabalho e a área da placa volta para a escala
+    original, então os limiares de LOW/MEDIUM/HIGH valem para qualquer tamanho de foto.
+    """
+    try:
         height, width = img.shape[:2]
-        total_pixels = height * width
-        
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        lower_green1 = np.array([35, 20, 20])
-        upper_green1 = np.array([90, 255, 255])
-        
-        lower_green2 = np.array([70, 15, 15])
-        upper_green2 = np.array([100, 255, 255])
-        
-        lower_brown = np.array([8, 20, 20])
-        upper_brown = np.array([35, 255, 220])
-        
-        lower_blue = np.array([95, 20, 20])
-        upper_blue = np.array([135, 255, 255])
-        
-        lower_yellow = np.array([15, 40, 40])
-        upper_yellow = np.array([40, 255, 255])
-        
-        lower_red1 = np.array([0, 30, 30])
-        upper_red1 = np.array([10, 255, 255])
-        lower_red2 = np.array([160, 30, 30])
-        upper_red2 = np.array([180, 255, 255])
-        
-        mask_green1 = cv2.inRange(hsv, lower_green1, upper_green1)
-        mask_green2 = cv2.inRange(hsv, lower_green2, upper_green2)
-        mask_brown = cv2.inRange(hsv, lower_brown, upper_brown)
-        mask_blue = cv2.inRange(hsv, lower_blue, upper_blue)
-        mask_yellow = cv2.inRange(hsv, lower_yellow, upper_yellow)
-        mask_red1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask_red2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        
-        pcb_mask = cv2.bitwise_or(mask_green1, mask_green2)
-        pcb_mask = cv2.bitwise_or(pcb_mask, mask_brown)
-        pcb_mask = cv2.bitwise_or(pcb_mask, mask_blue)
-        pcb_mask = cv2.bitwise_or(pcb_mask, mask_yellow)
-        pcb_mask = cv2.bitwise_or(pcb_mask, mask_red1)
-        pcb_mask = cv2.bitwise_or(pcb_mask, mask_red2)
-        
-        kernel = np.ones((5, 5), np.uint8)
-        pcb_mask = cv2.morphologyEx(pcb_mask, cv2.MORPH_CLOSE, kernel, iterations=2)
-        pcb_mask = cv2.morphologyEx(pcb_mask, cv2.MORPH_OPEN, kernel, iterations=1)
-        
-        board_pixels = float(np.sum(pcb_mask) / 255)
-        board_ratio = board_pixels / max(total_pixels, 1)
-        
+        original_width, original_height = original_size or (width, height)
+        total_pixels = original_width * original_height
+
+        if max_side and max(height, width) > max_side:
+            factor = max_side / max(height, width)
+            # Depois da decodificação reduzida falta menos de 2x, e INTER_LINEAR basta;
+            # INTER_AREA, bem mais lento em fator não inteiro, só para reduções maiores
+            interpolation = cv2.INTER_AREA if factor < 0.5 else cv2.INTER_LINEAR
+            img = cv2.resize(img, (max(1, round(width * factor)), max(1, round(height * factor))), interpolation=interpolation)
+        work_height, work_width = img.shape[:2]
+        work_pixels = work_height * work_width
+        scale = work_width / max(original_width, 1)
+        # Pixels da foto original por pixel da imagem de trabalho
+        area_factor = total_pixels / max(work_pixels, 1)
+
+        pcb_mask = board_mask(cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+        pcb_mask = _morph(pcb_mask, cv2.MORPH_CLOSE, BOARD_CLOSE_RADIUS, scale)
+        pcb_mask = _morph(pcb_mask, cv2.MORPH_OPEN, BOARD_OPEN_RADIUS, scale)
+
+        board_ratio = cv2.countNonZero(pcb_mask) / max(work_pixels, 1)
+        board_pixels = board_ratio * total_pixels
+
         if board_ratio < MIN_BOARD_RATIO:
             return {
                 'grade': None,
@@ -108,58 +217,61 @@ def analyze_pcb_image(image_data) -> dict:
                     'board_pixels': int(board_pixels),
                     'total_pixels': total_pixels,
                     'min_board_ratio': MIN_BOARD_RATIO,
-                    'image_size': f'{width}x{height}'
+                    'image_size': f'{original_width}x{original_height}',
+                    'working_size': f'{work_width}x{work_height}'
                 }
             }
-        
+
         components_mask = cv2.bitwise_not(pcb_mask)
-        
-        kernel_small = np.ones((3, 3), np.uint8)
-        components_mask = cv2.morphologyEx(components_mask, cv2.MORPH_OPEN, kernel_small, iterations=2)
-        components_mask = cv2.morphologyEx(components_mask, cv2.MORPH_CLOSE, kernel_small, iterations=2)
-        
-        blurred = cv2.GaussianBlur(components_mask, (5, 5), 0)
-        
-        contours, _ = cv2.findContours(blurred, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        valid_contours = []
-        total_component_area = 0
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if MIN_COMPONENT_AREA <= area <= MAX_COMPONENT_AREA:
-                valid_contours.append(contour)
-                total_component_area += area
-        
-        components_count = len(valid_contours)
-        
+        components_mask = _morph(components_mask, cv2.MORPH_OPEN, COMPONENT_OPEN_RADIUS, scale)
+        components_mask = _morph(components_mask, cv2.MORPH_CLOSE, COMPONENT_CLOSE_RADIUS, scale)
+
+        blur_radius = _scaled_radius(COMPONENT_BLUR_RADIUS, scale)
+        if blur_radius > 0:
+            components_mask = cv2.GaussianBlur(components_mask, (2 * blur_radius + 1, 2 * blur_radius + 1), 0)
+
+        # Uma passada rotula todas as regiões e já devolve área e caixa de cada uma (rótulo 0 é o fundo)
+        total_regions, _, stats, _ = cv2.connectedComponentsWithStats(fill_holes(components_mask), connectivity=8)
+        stats = stats[1:]
+        # Área do contorno externo (como cv2.contourArea) na escala da foto original:
+        # os pixels da região menos meia borda, que numa caixa w x h é (w - 1) * (h - 1)
+        areas = (
+            stats[:, cv2.CC_STAT_AREA] * area_factor
+            - (stats[:, cv2.CC_STAT_WIDTH] + stats[:, cv2.CC_STAT_HEIGHT]) / scale
+            + 1
+        )
+
+        valid_areas = areas[(areas >= MIN_COMPONENT_AREA) & (areas <= MAX_COMPONENT_AREA)]
+        components_count = int(valid_areas.size)
+        total_component_area = float(valid_areas.sum())
+
         board_area = max(board_pixels, 1.0)
         density = components_count / board_area
-        
+
         if density < LOW_DENSITY_THRESHOLD:
             grade = 'LOW'
         elif density < HIGH_DENSITY_THRESHOLD:
             grade = 'MEDIUM'
         else:
             grade = 'HIGH'
-        
-        large_components = sum(1 for c in valid_contours if cv2.contourArea(c) > 1000)
-        small_components = sum(1 for c in valid_contours if cv2.contourArea(c) <= 1000)
-        
+
+        large_components = int(np.count_nonzero(valid_areas > LARGE_COMPONENT_AREA))
+
         return {
             'grade': grade,
-            'components_count': int(components_count),
+            'components_count': components_count,
             'density_score': float(density),
             'board_detected': True,
             'debug': {
                 'board_ratio': round(board_ratio, 4),
                 'board_pixels': int(board_pixels),
                 'total_pixels': total_pixels,
-                'image_size': f'{width}x{height}',
-                'total_contours': len(contours),
+                'image_size': f'{original_width}x{original_height}',
+                'working_size': f'{work_width}x{work_height}',
+                'total_contours': int(total_regions - 1),
                 'valid_contours': components_count,
                 'large_components': large_components,
-                'small_components': small_components,
+                'small_components': components_count - large_components,
                 'component_area_ratio': round(total_component_area / total_pixels, 4) if total_pixels > 0 else 0,
                 'thresholds': {
                     'low_density': LOW_DENSITY_THRESHOLD,
@@ -167,15 +279,55 @@ def analyze_pcb_image(image_data) -> dict:
                 }
             }
         }
-        
+
     except Exception as e:
-        return {
-            'components_count': 0,
-            'density_score': 0.0,
-            'grade': None,
-            'board_detected': False,
-            'error': str(e)
-        }
+        return _error_result(str(e))
+
+
+def perceptual_hash(img) -> str:
+    """
+    pHash de 64 bits (16 caracteres hex) da imagem BGR: sinal das frequências baixas (8x8)
+    da DCT da imagem em 32x32 tons de cinza. Fotos da mesma placa com outro tamanho,
+    compressão ou pequena diferença de luz ficam a poucos bits de distância.
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_frequencies = cv2.dct(small)[:8, :8].flatten()
+    # O termo DC (brilho médio) fica fora da mediana para não puxar o limiar
+    bits = low_frequencies > np.median(low_frequencies[1:])
+    return np.packbits(bits).tobytes().hex()
+
+
+def configure_worker_process():
+    """Inicializador dos processos de análise em lote: um thread de OpenCV por processo"""
+    cv2.setNumThreads(1)
+
+
+def analyze_for_batch(image_bytes: bytes, thumbnail_size: int = 320) -> dict:
+    """
+    Análise usada pelo lote (roda em um processo do pool): decodifica a imagem uma vez,
+    analisa e devolve também o pHash em 'phash' e a miniatura JPEG em 'thumbnail'
+    (None se não decodificou).
+    """
+    try:
+        img, original_size, error = decode_image(image_bytes, max_side=WORKING_MAX_SIDE)
+        if error:
+            result = _error_result(error)
+            result['thumbnail'] = None
+            return result
+
+        result = analyze_decoded_image(img, original_size=original_size)
+        result['phash'] = perceptual_hash(img)
+        height, width = img.shape[:2]
+        scale = min(1.0, thumbnail_size / max(height, width))
+        small = cv2.resize(img, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.jpg', small, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        result['thumbnail'] = encoded.tobytes() if ok else None
+        return result
+    except Exception as e:
+        result = _error_result(str(e))
+        result['thumbnail'] = None
+        return result
 
 
 def get_type_guess_from_analysis(analysis: dict) -> str:
@@ -0,0 +1,213 @@
+"""
+Contadores de pendências dos admins, mantidos por evento.
+
+Cada pendência (tabelas de fornecedor, OCs em análise, pedidos de compra, autorizações
+de preço) tem um registro em contadores_pendencias. Quando um flush cria, remove ou
+altera os campos observados de um objeto do modelo da pendência, a contagem daquela
+pendência é recalculada na mesma transação e, se mudou, a notificação-resumo dos
+admins é sincronizada. Assim a leitura das notificações não precisa varrer nada.
+
+Um reconciliador em segundo plano recalcula tudo de tempos em tempos
+(RECONCILIAR_PENDENCIAS_SEGUNDOS), cobrindo alterações feitas fora do ORM e
+transações concorrentes que gravaram contagens a partir de snapshots diferentes.
+"""
+from app import socketio
+from app.models import db, ContadorPendencia, Notificacao, Fornecedor, OrdemCompra, Solicitacao, SolicitacaoAutorizacaoPreco
+from app.services.notificacao_service import sincronizar_notificacao_admins
+from app.services.notificacoes_nao_lidas import ajustar_nao_lidas, deltas_remocao
+from sqlalchemy import event, inspect, select, insert, update, delete, func
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHAVE_SESSAO = 'pendencias_alteradas'
+INTERVALO_RECONCILIACAO_PADRAO = 300
+
+PENDENCIAS = {
+    'fornecedor_tabela_pendente': {
+        'modelo': Fornecedor,
+        'campos': ('tabela_preco_status', 'ativo'),
+        'filtro': lambda: [Fornecedor.tabela_preco_status == 'pendente', Fornecedor.ativo == True],
+        'soma': None,
+        'titulo': 'Tabelas de Preço Pendentes',
+        'mensagem': lambda quantidade, valor: f'Existem {quantidade} fornecedor(es) com tabela de preços aguardando aprovação.',
+        'url': '/revisao-tabelas-admin.html',
+        'detalhe': 'fornecedores',
+        'resumo': 'fornecedores_tabela_pendente'
+    },
+    'ordem_compra_pendente': {
+        'modelo': OrdemCompra,
+        'campos': ('status', 'valor_total'),
+        'filtro': lambda: [OrdemCompra.status == 'em_analise'],
+        'soma': lambda: OrdemCompra.valor_total,
+        'titulo': 'Ordens de Compra Pendentes',
+        'mensagem': lambda quantidade, valor: f'Existem {quantidade} OC(s) aguardando aprovação. Valor total: R$ {valor:.2f}',
+        'url': '/solicitacoes.html?tab=ordens-compra&status=em_analise',
+        'detalhe': 'ordens_compra',
+        'resumo': 'ordens_compra_pendentes'
+    },
+    'solicitacao_pendente': {
+        'modelo': Solicitacao,
+        'campos': ('status',),
+        'filtro': lambda: [Solicitacao.status == 'pendente'],
+        'soma': None,
+        'titulo': 'Pedidos de Compra Pendentes',
+        'mensagem': lambda quantidade, valor: f'Existem {quantidade} pedido(s) de compra aguardando análise.',
+        'url': '/solicitacoes.html?status=pendente',
+        'detalhe': 'solicitacoes',
+        'resumo': 'solicitacoes_pendentes'
+    },
+    'autorizacao_preco_pendente': {
+        'modelo': SolicitacaoAutorizacaoPreco,
+        'campos': ('status',),
+        'filtro': lambda: [SolicitacaoAutorizacaoPreco.status == 'pendente'],
+        'soma': None,
+        'titulo': 'Autorizações de Preço Pendentes',
+        'mensagem': lambda quantidade, valor: f'Existem {quantidade} autorização(ões) de preço aguardando aprovação.',
+        'url': '/autorizacoes-preco.html',
+        'detalhe': 'autorizacoes_preco',
+        'resumo': 'autorizacoes_preco_pendentes'
+    },
+}
+
+_reconciliador_iniciado = False
+
+def _chaves_afetadas(obj, somente_alterado):
+    for chave, pendencia in PENDENCIAS.items():
+        if not isinstance(obj, pendencia['modelo']):
+            continue
+        if not somente_alterado:
+            yield chave
+            continue
+        estado = inspect(obj)
+        if any(estado.attrs[campo].history.has_changes() for campo in pendencia['campos']):
+            yield chave
+
+def _antes_flush(session, flush_context, instances):
+    chaves = session.info.setdefault(CHAVE_SESSAO, set())
+    with session.no_autoflush:
+        for obj in session.new:
+            chaves.update(_chaves_afetadas(obj, False))
+        for obj in session.deleted:
+            chaves.update(_chaves_afetadas(obj, False))
+        for obj in session.dirty:
+            chaves.update(_chaves_afetadas(obj, True))
+
+def _depois_flush(session, flush_context):
+    chaves = session.info.pop(CHAVE_SESSAO, None)
+    if not chaves:
+        return
+
+    conexao = session.connection()
+    try:
+        with conexao.begin_nested():
+            for chave in sorted(chaves):
+                atualizar_pendencia(conexao, chave)
+    except Exception as e:
+        # Contador desatualizado não deve derrubar a operação principal; o reconciliador corrige
+        logger.warning(f'Erro ao atualizar contadores de pendências {sorted(chaves)}: {e}')
+
+def _apos_rollback(session, transacao_anterior):
+    if not transacao_anterior.nested:
+        session.info.pop(CHAVE_SESSAO, None)
+
+def registrar_eventos_pendencias():
+    event.listen(db.session, 'before_flush', _antes_flush)
+    event.listen(db.session, 'after_flush', _depois_flush)
+    event.listen(db.session, 'after_soft_rollback', _apos_rollback)
+
+def contar_pendencia(conexao, chave):
+    """(quantidade, valor_total) atuais da pendência, em uma consulta agregada"""
+    pendencia = PENDENCIAS[chave]
+    soma = pendencia['soma']() if pendencia['soma'] else None
+    colunas = [func.count()]
+    if soma is not None:
+        colunas.append(func.coalesce(func.sum(soma), 0))
+
+    linha = conexao.execute(
+        select(*colunas).select_from(pendencia['modelo']).where(*pendencia['filtro']())
+    ).one()
+    return int(linha[0]), float(linha[1]) if soma is not None else 0.0
+
+def atualizar_pendencia(conexao, chave, forcar_notificacao=False):
+    """
+    Recalcula o contador da pendência e grava em contadores_pendencias.
+    A notificação-resumo dos admins só é tocada quando o valor mudou (ou com forcar_notificacao).
+    Retorna (quantidade, notificações criadas).
+    """
+    pendencia = PENDENCIAS[chave]
+    quantidade, valor_total = contar_pendencia(conexao, chave)
+    tabela = ContadorPendencia.__table__
+
+    anterior = conexao.execute(
+        select(tabela.c.quantidade, tabela.c.valor_total).where(tabela.c.chave == chave)
+    ).first()
+    agora = datetime.utcnow()
+
+    if anterior is None:
+        conexao.execute(insert(tabela).values(
+            chave=chave, quantidade=quantidade, valor_total=valor_total, data_atualizacao=agora
+        ))
+    elif (anterior.quantidade, round(anterior.valor_total, 2)) != (quantidade, round(valor_total, 2)):
+        conexao.execute(update(tabela).where(tabela.c.chave == chave).values(
+            quantidade=quantidade, valor_total=valor_total, data_atualizacao=agora
+        ))
+    elif not forcar_notificacao:
+        return quantidade, []
+
+    return quantidade, _sincronizar_notificacao(conexao, chave, pendencia, quantidade, valor_total)
+
+def _sincronizar_notificacao(conexao, chave, pendencia, quantidade, valor_total):
+    if quantidade == 0:
+        condicao = Notificacao.__table__.c.tipo == chave
+        ajustar_nao_lidas(conexao, deltas_remocao(conexao, condicao))
+        conexao.execute(delete(Notificacao.__table__).where(condicao))
+        return []
+
+    return sincronizar_notificacao_admins(
+        conexao,
+        pendencia['titulo'],
+        pendencia['mensagem'](quantidade, valor_total),
+        chave,
+        pendencia['url']
+    )
+
+def reconciliar_pendencias():
+    """Recalcula todos os contadores e ressincroniza as notificações-resumo; faz commit"""
+    conexao = db.session.connection()
+    resultados = {}
+    for chave in PENDENCIAS:
+        quantidade, notificacoes = atualizar_pendencia(conexao, chave, forcar_notificacao=True)
+        resultados[chave] = {'total_pendentes': quantidade, 'notificacoes_criadas': len(notificacoes)}
+    db.session.commit()
+    return resultados
+
+def obter_contadores():
+    """{chave: ContadorPendencia}; reconcilia antes se algum contador ainda não existe"""
+    contadores = {contador.chave: contador for contador in ContadorPendencia.query.all()}
+    if set(PENDENCIAS) - set(contadores):
+        reconciliar_pendencias()
+        contadores = {contador.chave: contador for contador in ContadorPendencia.query.all()}
+    return contadores
+
+def iniciar_reconciliador_pendencias(app):
+    """Dispara o laço de reconciliação em segundo plano (uma vez por processo)"""
+    global _reconciliador_iniciado
+    intervalo = int(app.config.get('RECONCILIAR_PENDENCIAS_SEGUNDOS', INTERVALO_RECONCILIACAO_PADRAO))
+    if _reconciliador_iniciado or intervalo <= 0:
+        return
+    _reconciliador_iniciado = True
+    socketio.start_background_task(_laco_reconciliacao, app, intervalo)
+
+def _laco_reconciliacao(app, intervalo):
+    while True:
+        with app.app_context():
+            try:
+                reconciliar_pendencias()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f'Erro ao reconciliar pendências: {e}', exc_info=True)
+            finally:
+                db.session.remove()
+        socketio.sleep(intervalo)
@@ -7,10 +7,13 @@ PERPLEXITY_API_URL = 'https://api.perplexity.ai/chat/completions'
 PERPLEXITY_MODEL = 'llama-3.1-sonar-small-128k-online'
 
 
-def build_explanation_with_perplexity(grade: str, components_count: int, density_score: float) -> Optional[str]:
+def build_explanation_with_perplexity(grade: str, components_count: int, density_score: float,
+                                      components_label: Optional[str] = None) -> Optional[str]:
     """
     Usa a API do Perplexity para gerar um parágrafo curto explicando o resultado
     da análise de PCB. Não recebe imagem, apenas dados numéricos.
+    `components_label` (ex.: 'entre 35 e 59') substitui a contagem exata no prompt,
+    para que o texto sirva a qualquer placa da mesma faixa.
     
     Retorna None se a API não estiver configurada ou falhar.
     """
@@ -30,10 +33,12 @@ Seja conciso (máximo 3-4 frases) e foque nos aspectos práticos da classificaç
     
     user_prompt = f"""Dados da análise da placa:
 - Classificação: {grade} ({grade_context.get(grade, '')})
-- Componentes detectados: {components_count}
+- Componentes detectados: {components_label or components_count}
 - Score de densidade: {density_score:.2f} (0 a 1)
 
 Explique em poucas frases, em português simples e acessível, por que essa placa foi classificada assim e qual seu potencial para reciclagem de metais preciosos como ouro."""
+    if components_label:
+        user_prompt += '\nNão cite um número exato de componentes; fale da faixa.'
 
     try:
         headers = {
@@ -0,0 +1,83 @@
+"""
+Etapas da análise de placa comuns à análise avulsa (POST /api/scanner/analyze)
+e ao lote (scanner_lotes): completar o resultado do OpenCV e gravar o histórico.
+"""
+from app.models import db, ScannerAnalysis
+from app.services.pcb_analyzer import (
+    get_type_guess_from_analysis,
+    decode_image,
+    analyze_decoded_image,
+    perceptual_hash,
+    WORKING_MAX_SIDE
+)
+from app.services.scanner_cache import buscar_resultado
+from app.services.scanner_explicacoes import obter_explicacao
+from app.utils.blob_store import calcular_hash
+
+def calcular_confianca(components_count, density_score):
+    return min(0.95, 0.5 + (min(density_score * 10000, 0.3)) + (min(components_count, 50) / 100))
+
+def completar_analise(analysis_result):
+    """Tipo provável, explicação (da faixa, da Perplexity ou local; ver scanner_explicacoes) e confiança"""
+    grade = analysis_result['grade']
+    components_count = analysis_result['components_count']
+    density_score = analysis_result['density_score']
+
+    explanation = obter_explicacao(grade, components_count, density_score)
+
+    return {
+        'grade': grade,
+        'components_count': components_count,
+        'density_score': density_score,
+        'type_guess': get_type_guess_from_analysis(analysis_result),
+        'explanation': explanation,
+        'confidence': calcular_confianca(components_count, density_score)
+    }
+
+def analisar_imagem(image_bytes):
+    """
+    OpenCV da foto avulsa, consultando antes o cache de resultados (scanner_cache).
+    Retorna {'image_sha256', 'image_phash', 'analysis_result', 'acerto'}: com acerto
+    (mesma foto ou foto da mesma placa já analisada) o OpenCV não roda e analysis_result
+    é None; sem acerto, analysis_result é o resultado de analyze_pcb_image.
+    """
+    analise = {
+        'image_sha256': calcular_hash(image_bytes),
+        'image_phash': None,
+        'analysis_result': None,
+        'acerto': None
+    }
+    analise['acerto'] = buscar_resultado(analise['image_sha256'])
+    if analise['acerto']:
+        return analise
+
+    img, original_size, error = decode_image(image_bytes, max_side=WORKING_MAX_SIDE)
+    if error:
+        analise['analysis_result'] = {'error': error, 'board_detected': False}
+        return analise
+
+    analise['image_phash'] = perceptual_hash(img)
+    analise['acerto'] = buscar_resultado(analise['image_sha256'], analise['image_phash'])
+    if not analise['acerto']:
+        analise['analysis_result'] = analyze_decoded_image(img, original_size=original_size)
+    return analise
+
+def registrar_analise(usuario_id, analysis_result, resultado, campos_imagem, image_mimetype, batch_id=None, source_analysis_id=None):
+    """Adiciona a ScannerAnalysis na sessão (sem commit) e a retorna"""
+    debug = {chave: valor for chave, valor in analysis_result.items() if chave != 'thumbnail'}
+    analysis = ScannerAnalysis(
+        usuario_id=int(usuario_id),
+        grade=resultado['grade'],
+        type_guess=resultado['type_guess'],
+        explanation=resultado['explanation'],
+        confidence=resultado['confidence'],
+        components_count=resultado['components_count'],
+        density_score=resultado['density_score'],
+        image_mimetype=image_mimetype,
+        raw_response=str(debug),
+        batch_id=batch_id,
+        source_analysis_id=source_analysis_id,
+        **campos_imagem
+    )
+    db.session.add(analysis)
+    return analysis
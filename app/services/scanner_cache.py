@@ -0,0 +1,176 @@
+"""
+Cache de resultados do scanner de placas por foto.
+
+Cada análise com placa detectada entra no cache pelo SHA-256 dos bytes da foto e pelo
+pHash da imagem decodificada (pcb_analyzer.perceptual_hash). A mesma foto enviada de
+novo, ou outra foto da mesma placa (pHash a no máximo SCANNER_CACHE_LIMIAR bits de
+distância), recebe a nota e a explicação já gravadas, sem rodar o OpenCV nem consultar
+a Perplexity.
+
+O cache fica na memória do processo. Guarda no máximo SCANNER_CACHE_TAMANHO entradas
+(a usada há mais tempo sai primeiro), e cada uma vale SCANNER_CACHE_TTL_SEGUNDOS a
+partir da análise original. Na primeira consulta ele é carregado com as análises
+recentes. Uma foto idêntica que não estiver na memória ainda é procurada pelo índice
+de image_sha256. Análises que reaproveitaram um resultado (source_analysis_id) não
+servem de origem: o prazo conta sempre da análise que rodou de fato.
+"""
+from app.models import ScannerAnalysis
+from flask import current_app
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import threading
+
+TAMANHO_PADRAO = 1024
+TTL_PADRAO = 7 * 24 * 3600
+LIMIAR_PADRAO = 6
+
+CAMPOS_RESULTADO = ('grade', 'components_count', 'density_score', 'type_guess', 'explanation', 'confidence')
+
+_entradas = OrderedDict()
+_carregado = False
+_trava = threading.Lock()
+_estatisticas = {'exatos': 0, 'semelhantes': 0, 'falhas': 0}
+
+def _config():
+    config = current_app.config
+    return (
+        int(config.get('SCANNER_CACHE_TAMANHO', TAMANHO_PADRAO)),
+        int(config.get('SCANNER_CACHE_TTL_SEGUNDOS', TTL_PADRAO)),
+        int(config.get('SCANNER_CACHE_LIMIAR', LIMIAR_PADRAO))
+    )
+
+def distancia(phash_a, phash_b):
+    """Bits diferentes entre dois pHashes (inteiros)"""
+    return (phash_a ^ phash_b).bit_count()
+
+def _entrada(analysis, ttl, origem=None):
+    return {
+        'analysis_id': origem['analysis_id'] if origem else analysis.id,
+        'image_sha256': analysis.image_sha256,
+        'thumbnail_sha256': analysis.thumbnail_sha256,
+        'image_phash': analysis.image_phash,
+        'phash': int(analysis.image_phash, 16) if analysis.image_phash else None,
+        'resultado': dict(origem['resultado']) if origem else {campo: getattr(analysis, campo) for campo in CAMPOS_RESULTADO},
+        'expira_em': origem['expira_em'] if origem else analysis.created_at + timedelta(seconds=ttl)
+    }
+
+def _inserir(entrada, tamanho):
+    _entradas[entrada['image_sha256']] = entrada
+    _entradas.move_to_end(entrada['image_sha256'])
+    while len(_entradas) > tamanho:
+        _entradas.popitem(last=False)
+
+def _consulta_origens(ttl):
+    return ScannerAnalysis.query.filter(
+        ScannerAnalysis.grade.isnot(None),
+        ScannerAnalysis.image_sha256.isnot(None),
+        ScannerAnalysis.source_analysis_id.is_(None),
+        ScannerAnalysis.created_at >= datetime.utcnow() - timedelta(seconds=ttl)
+    )
+
+def _carregar(tamanho, ttl):
+    """Primeira consulta do processo: as análises recentes com pHash, mais antigas primeiro (LRU)"""
+    global _carregado
+    recentes = _consulta_origens(ttl).filter(
+        ScannerAnalysis.image_phash.isnot(None)
+    ).order_by(ScannerAnalysis.created_at.desc()).limit(tamanho).all()
+    with _trava:
+        if not _carregado:
+            for analysis in reversed(recentes):
+                _inserir(_entrada(analysis, ttl), tamanho)
+            _carregado = True
+
+def _acerto(entrada, tipo, distancia_bits):
+    resultado = dict(entrada)
+    resultado.update({'match': tipo, 'distance': distancia_bits})
+    return resultado
+
+def buscar_resultado(image_sha256, phash=None):
+    """
+    Resultado já analisado para a foto: pelo SHA-256 e, com `phash` (hex), pela foto mais
+    parecida dentro do limiar. Retorna a entrada com 'match' ('exact' ou 'perceptual') e
+    'distance', ou None.
+    """
+    tamanho, ttl, limiar = _config()
+    if tamanho <= 0:
+        return None
+    if not _carregado:
+        _carregar(tamanho, ttl)
+
+    agora = datetime.utcnow()
+    with _trava:
+        entrada = _entradas.get(image_sha256)
+        if entrada and entrada['expira_em'] <= agora:
+            del _entradas[image_sha256]
+            entrada = None
+        if entrada:
+            _entradas.move_to_end(image_sha256)
+            _estatisticas['exatos'] += 1
+            return _acerto(entrada, 'exact', 0)
+
+    if phash is None:
+        # Fora da memória: a mesma foto ainda pode ter sido analisada (outro processo, cache cheio)
+        analysis = _consulta_origens(ttl).filter(
+            ScannerAnalysis.image_sha256 == image_sha256
+        ).order_by(ScannerAnalysis.created_at.desc()).first()
+        if analysis is None:
+            return None
+        entrada = _entrada(analysis, ttl)
+        with _trava:
+            _inserir(entrada, tamanho)
+            _estatisticas['exatos'] += 1
+        return _acerto(entrada, 'exact', 0)
+
+    if limiar < 0:
+        with _trava:
+            _estatisticas['falhas'] += 1
+        return None
+
+    alvo = int(phash, 16)
+    melhor, melhor_distancia = None, limiar + 1
+    with _trava:
+        for chave, entrada in list(_entradas.items()):
+            if entrada['expira_em'] <= agora:
+                del _entradas[chave]
+                continue
+            if entrada['phash'] is None:
+                continue
+            bits = distancia(alvo, entrada['phash'])
+            if bits < melhor_distancia:
+                melhor, melhor_distancia = entrada, bits
+        if melhor is None:
+            _estatisticas['falhas'] += 1
+            return None
+        _entradas.move_to_end(melhor['image_sha256'])
+        _estatisticas['semelhantes'] += 1
+        return _acerto(melhor, 'perceptual', melhor_distancia)
+
+def guardar_resultado(analysis, origem=None):
+    """
+    Coloca no cache uma análise já gravada. `origem` é o acerto de onde ela copiou o
+    resultado: a entrada aponta para a análise original e expira junto com ela.
+    """
+    tamanho, ttl, _ = _config()
+    if tamanho <= 0 or not analysis.image_sha256 or analysis.grade is None:
+        return
+    entrada = _entrada(analysis, ttl, origem)
+    with _trava:
+        _inserir(entrada, tamanho)
+
+def limpar_cache():
+    """Esvazia o cache (a próxima consulta recarrega do banco)"""
+    global _carregado
+    with _trava:
+        _entradas.clear()
+        _carregado = False
+
+def estatisticas_cache():
+    tamanho, ttl, limiar = _config()
+    with _trava:
+        return {
+            'entradas': len(_entradas),
+            'tamanho_maximo': tamanho,
+            'ttl_segundos': ttl,
+            'limiar_bits': limiar,
+            **_estatisticas
+        }
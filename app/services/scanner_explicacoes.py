@@ -0,0 +1,145 @@
+"""
+Explicações do scanner de placas reaproveitadas por faixa de resultado.
+
+A explicação só depende da nota, da quantidade de componentes e da densidade. Por
+isso a Perplexity é consultada uma vez por faixa (nota, faixa de componentes, faixa
+de densidade), e o texto fica em scanner_explanations por SCANNER_EXPLICACAO_TTL_SEGUNDOS.
+
+Sem explicação guardada, a análise espera a Perplexity no máximo
+SCANNER_EXPLICACAO_ORCAMENTO_MS e, passado esse tempo, usa a explicação local
+(generate_local_explanation). A chamada continua em segundo plano e grava a faixa
+para as próximas análises. Análises simultâneas da mesma faixa compartilham uma
+única chamada.
+"""
+from app import socketio
+from app.models import db, ScannerExplanation
+from app.services.pcb_analyzer import generate_local_explanation, LOW_DENSITY_THRESHOLD
+from app.services.perplexity_formatter import (
+    build_explanation_with_perplexity,
+    is_perplexity_configured,
+    PERPLEXITY_MODEL
+)
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from bisect import bisect_right
+from datetime import datetime, timedelta
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+TTL_PADRAO = 30 * 24 * 3600
+ORCAMENTO_PADRAO_MS = 1000
+
+# Início de cada faixa de componentes
+FAIXAS_COMPONENTES = (0, 10, 20, 35, 60, 100, 200, 400, 800)
+# Faixas de densidade em potências de 2 do limiar LOW: as fronteiras de nota (LOW e 4x LOW) caem entre faixas
+FAIXA_DENSIDADE_MIN = -4
+FAIXA_DENSIDADE_MAX = 4
+
+_gerando = {}
+_trava = threading.Lock()
+
+def faixa_componentes(components_count):
+    return bisect_right(FAIXAS_COMPONENTES, max(int(components_count or 0), 0)) - 1
+
+def descrever_faixa_componentes(faixa):
+    inicio = FAIXAS_COMPONENTES[faixa]
+    if faixa + 1 >= len(FAIXAS_COMPONENTES):
+        return f'{inicio} ou mais'
+    return f'entre {inicio} e {FAIXAS_COMPONENTES[faixa + 1] - 1}'
+
+def faixa_densidade(density_score):
+    if not density_score or density_score <= 0:
+        return FAIXA_DENSIDADE_MIN
+    faixa = math.floor(math.log2(density_score / LOW_DENSITY_THRESHOLD))
+    return max(FAIXA_DENSIDADE_MIN, min(FAIXA_DENSIDADE_MAX, faixa))
+
+def chave_explicacao(grade, components_count, density_score):
+    return (grade, faixa_componentes(components_count), faixa_densidade(density_score))
+
+def _config():
+    config = current_app.config
+    return (
+        int(config.get('SCANNER_EXPLICACAO_TTL_SEGUNDOS', TTL_PADRAO)),
+        int(config.get('SCANNER_EXPLICACAO_ORCAMENTO_MS', ORCAMENTO_PADRAO_MS)) / 1000
+    )
+
+def explicacao_guardada(chave):
+    grade, components_bucket, density_bucket = chave
+    registro = ScannerExplanation.query.filter(
+        ScannerExplanation.grade == grade,
+        ScannerExplanation.components_bucket == components_bucket,
+        ScannerExplanation.density_bucket == density_bucket,
+        ScannerExplanation.expires_at > datetime.utcnow()
+    ).first()
+    return registro.explanation if registro else None
+
+def guardar_explicacao(chave, texto, ttl):
+    grade, components_bucket, density_bucket = chave
+    agora = datetime.utcnow()
+    registro = ScannerExplanation.query.filter_by(
+        grade=grade, components_bucket=components_bucket, density_bucket=density_bucket
+    ).first()
+    if registro is None:
+        registro = ScannerExplanation(grade=grade, components_bucket=components_bucket, density_bucket=density_bucket)
+        db.session.add(registro)
+    registro.explanation = texto
+    registro.model = PERPLEXITY_MODEL
+    registro.created_at = agora
+    registro.expires_at = agora + timedelta(seconds=ttl)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outro processo gravou a mesma faixa ao mesmo tempo
+        db.session.rollback()
+
+def _gerar(app, chave, geracao, ttl):
+    grade, components_bucket, density_bucket = chave
+    try:
+        texto = build_explanation_with_perplexity(
+            grade,
+            FAIXAS_COMPONENTES[components_bucket],
+            LOW_DENSITY_THRESHOLD * 2 ** density_bucket,
+            components_label=descrever_faixa_componentes(components_bucket)
+        )
+        if texto:
+            geracao['texto'] = texto
+            with app.app_context():
+                try:
+                    guardar_explicacao(chave, texto, ttl)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f'Erro ao guardar explicação do scanner {chave}: {e}')
+                finally:
+                    db.session.remove()
+    finally:
+        with _trava:
+            _gerando.pop(chave, None)
+        geracao['pronto'].set()
+
+def _iniciar_geracao(chave, ttl):
+    """Geração em andamento da faixa, iniciando uma se ainda não houver"""
+    with _trava:
+        geracao = _gerando.get(chave)
+        if geracao is None:
+            geracao = {'pronto': threading.Event(), 'texto': None}
+            _gerando[chave] = geracao
+            socketio.start_background_task(_gerar, current_app._get_current_object(), chave, geracao, ttl)
+    return geracao
+
+def obter_explicacao(grade, components_count, density_score):
+    """Explicação guardada da faixa, ou da Perplexity dentro do orçamento de tempo, ou a local"""
+    chave = chave_explicacao(grade, components_count, density_score)
+    texto = explicacao_guardada(chave)
+    if texto:
+        return texto
+
+    if is_perplexity_configured():
+        ttl, orcamento = _config()
+        geracao = _iniciar_geracao(chave, ttl)
+        if geracao['pronto'].wait(orcamento) and geracao['texto']:
+            return geracao['texto']
+
+    return generate_local_explanation(grade, components_count, density_score, True)
@@ -0,0 +1,151 @@
+"""
+Imagens das análises do scanner de placas no blob store (app/utils/blob_store.py).
+
+Cada foto é gravada uma vez por conteúdo (SHA-256) junto com uma miniatura JPEG
+usada no histórico. As linhas antigas, com os bytes em scanner_analyses.image_data,
+são movidas por migrar_imagens_legadas (scripts/migrar_imagens_scanner.py).
+
+As URLs entregues ao navegador (image_url, thumbnail_url) são assinadas para o dono da
+análise: /api/scanner/blobs/<hash>?u=<usuario>&exp=<unix>&sig=<HMAC-SHA256 com a
+SECRET_KEY>, válidas por SCANNER_URL_VALIDADE_SEGUNDOS. Funcionam em <img src> sem JWT,
+mas não servem para outro usuário nem depois de expirar.
+"""
+from app.models import db, ScannerAnalysis
+from app.utils.blob_store import obter_armazenamento, salvar_blob, ler_blob, calcular_hash, hash_valido
+from flask import current_app
+from PIL import Image, ImageOps
+from sqlalchemy import select, update
+import hashlib
+import hmac
+import io
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_MINIATURA = 320
+QUALIDADE_MINIATURA = 80
+VALIDADE_URL_PADRAO = 3600
+
+def gerar_miniatura(dados, tamanho=TAMANHO_MINIATURA):
+    """JPEG com o maior lado em `tamanho` px, respeitando a orientação EXIF; None se não for imagem"""
+    try:
+        with Image.open(io.BytesIO(dados)) as imagem:
+            imagem = ImageOps.exif_transpose(imagem).convert('RGB')
+            imagem.thumbnail((tamanho, tamanho))
+            saida = io.BytesIO()
+            imagem.save(saida, format='JPEG', quality=QUALIDADE_MINIATURA, optimize=True)
+            return saida.getvalue()
+    except Exception as e:
+        logger.warning(f'Não foi possível gerar miniatura: {e}')
+        return None
+
+def armazenar_imagem_analise(dados, armazenamento=None):
+    """Grava imagem e miniatura; retorna os campos de ScannerAnalysis que apontam para elas"""
+    armazenamento = armazenamento or obter_armazenamento()
+    miniatura = gerar_miniatura(dados)
+    return {
+        'image_sha256': salvar_blob(dados, armazenamento),
+        'image_size': len(dados),
+        'thumbnail_sha256': salvar_blob(miniatura, armazenamento) if miniatura else None
+    }
+
+def ler_imagem_analise(analysis):
+    """Bytes da imagem da análise, do blob store ou (linhas não migradas) da coluna legada"""
+    if analysis.image_sha256:
+        try:
+            return ler_blob(analysis.image_sha256)
+        except FileNotFoundError:
+            logger.error(f'Blob {analysis.image_sha256} da análise {analysis.id} não encontrado')
+            return None
+    return analysis.image_data
+
+def mimetype_do_blob(caminho_ou_arquivo):
+    """Formato pelo cabeçalho do arquivo (só os primeiros bytes são lidos)"""
+    try:
+        with Image.open(caminho_ou_arquivo) as imagem:
+            return Image.MIME.get(imagem.format, 'application/octet-stream')
+    except Exception:
+        return 'application/octet-stream'
+
+def analise_referencia_blob(chave, usuario_id=None):
+    """True se alguma análise (do usuário, se informado) usa o blob como imagem ou miniatura"""
+    if not hash_valido(chave):
+        return False
+    consulta = select(ScannerAnalysis.id).where(
+        (ScannerAnalysis.image_sha256 == chave) | (ScannerAnalysis.thumbnail_sha256 == chave)
+    )
+    if usuario_id is not None:
+        consulta = consulta.where(ScannerAnalysis.usuario_id == int(usuario_id))
+    return db.session.execute(consulta.limit(1)).first() is not None
+
+def _assinatura(chave, usuario_id, expira):
+    segredo = current_app.config['SECRET_KEY'].encode('utf-8')
+    return hmac.new(segredo, f'{chave}:{int(usuario_id)}:{int(expira)}'.encode('utf-8'), hashlib.sha256).hexdigest()
+
+def url_blob(chave, usuario_id):
+    """URL assinada do blob para o usuário (None sem blob)"""
+    if not hash_valido(chave) or usuario_id is None:
+        return None
+    validade = int(current_app.config.get('SCANNER_URL_VALIDADE_SEGUNDOS', VALIDADE_URL_PADRAO))
+    # Expiração arredondada para cima em quartos da validade: a mesma URL se repete por um
+    # tempo e o navegador reaproveita a imagem em cache
+    janela = max(validade // 4, 1)
+    expira = (int(time.time()) + validade + janela - 1) // janela * janela
+    return f'/api/scanner/blobs/{chave}?u={int(usuario_id)}&exp={expira}&sig={_assinatura(chave, usuario_id, expira)}'
+
+def assinatura_blob_valida(chave, usuario_id, expira, assinatura):
+    """True se a assinatura da URL confere e não expirou"""
+    try:
+        usuario_id, expira = int(usuario_id), int(expira)
+    except (TypeError, ValueError):
+        return False
+    if expira < time.time() or not assinatura:
+        return False
+    return hmac.compare_digest(_assinatura(chave, usuario_id, expira), assinatura)
+
+def item_lote_com_url(item, usuario_id):
+    """Item de ScannerBatch.items com thumbnail_url assinada (itens antigos guardavam só a URL)"""
+    chave = item.get('thumbnail_sha256') or (item.get('thumbnail_url') or '').rsplit('/', 1)[-1]
+    return {**item, 'thumbnail_url': url_blob(chave, usuario_id)}
+
+def migrar_imagens_legadas(tamanho_lote=100, manter_dados=False):
+    """
+    Move as imagens de scanner_analyses.image_data para o blob store, em lotes por id.
+    Cada lote é confirmado separadamente, então a migração pode ser interrompida e retomada.
+    Retorna {'migradas', 'bytes', 'blobs_reaproveitados'}.
+    """
+    armazenamento = obter_armazenamento()
+    ultimo_id = 0
+    migradas = 0
+    total_bytes = 0
+    reaproveitados = 0
+
+    while True:
+        linhas = db.session.execute(
+            select(ScannerAnalysis.id, ScannerAnalysis.image_data).where(
+                ScannerAnalysis.id > ultimo_id,
+                ScannerAnalysis.image_data.isnot(None),
+                ScannerAnalysis.image_sha256.is_(None)
+            ).order_by(ScannerAnalysis.id).limit(tamanho_lote)
+        ).all()
+        if not linhas:
+            break
+
+        for analise_id, dados in linhas:
+            dados = bytes(dados)
+            ja_existia = armazenamento.existe(calcular_hash(dados))
+            campos = armazenar_imagem_analise(dados, armazenamento)
+            if not manter_dados:
+                campos['image_data'] = None
+            db.session.execute(
+                update(ScannerAnalysis).where(ScannerAnalysis.id == analise_id).values(**campos)
+            )
+            migradas += 1
+            total_bytes += len(dados)
+            reaproveitados += 1 if ja_existia else 0
+
+        ultimo_id = linhas[-1][0]
+        db.session.commit()
+
+    return {'migradas': migradas, 'bytes': total_bytes, 'blobs_reaproveitados': reaproveitados}
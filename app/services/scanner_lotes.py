@@ -0,0 +1,329 @@
+"""
+Análise de placas em lote (todas as fotos de uma bag no recebimento).
+
+A requisição só grava as fotos no blob store e cria o ScannerBatch; a análise roda
+em uma tarefa de fundo que manda a etapa OpenCV (pcb_analyzer.analyze_for_batch, que
+também gera a miniatura) para um pool de processos, fora do processo do servidor.
+Cada foto concluída é gravada e avisada ao dono do lote pela sala user_<id> do
+Socket.IO ('scanner_lote_item'); o andamento também fica em GET /api/scanner/batch/<id>.
+Fotos já analisadas (scanner_cache) não vão para o pool: a idêntica é resolvida antes
+de enviar e a da mesma placa (pelo pHash que o processo devolve) não consulta a Perplexity.
+
+SCANNER_PROCESSOS define o tamanho do pool (padrão: até 4, pelo número de CPUs);
+0 roda o OpenCV na própria tarefa de fundo, sem pool.
+
+Cada execução assume o lote com um dono e renova o sinal de vida a cada foto confirmada
+(app/utils/tarefas_fundo.py). Lotes interrompidos (reinício, deploy, worker morto)
+ficariam em 'pending'/'processing' para sempre: o laço de iniciar_recuperador_lotes
+retoma os que estão sem sinal de vida há mais de SCANNER_LOTE_EXPIRACAO_SEGUNDOS, a
+partir das fotos ainda pendentes. Com vários workers, só um deles assume cada lote.
+"""
+from app import socketio
+from app.models import db, ScannerBatch
+from app.services.pcb_analyzer import analyze_for_batch, configure_worker_process
+from app.services.scanner_analise import completar_analise, registrar_analise
+from app.services.scanner_cache import buscar_resultado, guardar_resultado
+from app.services.scanner_imagens import item_lote_com_url
+from app.utils.blob_store import obter_armazenamento, salvar_blob, ler_blob
+from app.utils.tarefas_fundo import ReservaPerdida, abandonadas, corte, novo_dono, renovar, reservar
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import defaultdict
+from datetime import datetime
+import logging
+import multiprocessing
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+LIMITE_IMAGENS_PADRAO = 100
+INTERVALO_VERIFICACAO = 0.05
+# Sem sinal de vida por mais que isso, o lote é dado como abandonado
+EXPIRACAO_PADRAO = 600
+
+_pool = None
+_trava = threading.Lock()
+_recuperador_iniciado = False
+
+def numero_processos(config):
+    valor = config.get('SCANNER_PROCESSOS')
+    if valor is None or valor == '':
+        return min(4, os.cpu_count() or 1)
+    return int(valor)
+
+def _obter_pool(processos):
+    global _pool
+    with _trava:
+        if _pool is None:
+            # spawn: o processo do servidor tem threads (e eventlet); fork herdaria esse estado
+            _pool = ProcessPoolExecutor(
+                max_workers=processos,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=configure_worker_process
+            )
+        return _pool
+
+def _descartar_pool():
+    global _pool
+    with _trava:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def criar_lote(app, usuario_id, imagens):
+    """
+    imagens: lista de (nome do arquivo, bytes, mimetype).
+    Grava as fotos no blob store, cria o lote e dispara o processamento; retorna o ScannerBatch.
+    """
+    armazenamento = obter_armazenamento()
+    items = [
+        {
+            'position': posicao,
+            'filename': nome,
+            'image_sha256': salvar_blob(dados, armazenamento),
+            'image_size': len(dados),
+            'mimetype': mimetype,
+            'status': 'pending'
+        }
+        for posicao, (nome, dados, mimetype) in enumerate(imagens)
+    ]
+
+    lote = ScannerBatch(
+        usuario_id=int(usuario_id),
+        status='pending',
+        total_images=len(items),
+        items=items
+    )
+    db.session.add(lote)
+    db.session.commit()
+
+    socketio.start_background_task(executar_lote, app, lote.id)
+    return lote
+
+def iniciar_recuperador_lotes(app):
+    """Dispara o laço que retoma lotes abandonados (uma vez por processo)"""
+    global _recuperador_iniciado
+    expiracao = int(app.config.get('SCANNER_LOTE_EXPIRACAO_SEGUNDOS', EXPIRACAO_PADRAO))
+    if _recuperador_iniciado or expiracao <= 0:
+        return
+    _recuperador_iniciado = True
+    socketio.start_background_task(_laco_recuperacao, app, expiracao)
+
+def _laco_recuperacao(app, expiracao):
+    while True:
+        retomar_lotes_interrompidos(app, expiracao)
+        socketio.sleep(max(expiracao // 2, 1))
+
+def retomar_lotes_interrompidos(app, expiracao=EXPIRACAO_PADRAO):
+    """
+    Volta a processar os lotes em 'pending' ou 'processing' sem sinal de vida há mais de
+    `expiracao` segundos. Quem assume cada lote é executar_lote, com um UPDATE condicional
+    ao status e ao sinal vencido; lotes vivos em outro worker não são tocados.
+    """
+    with app.app_context():
+        try:
+            lote_ids = abandonadas(ScannerBatch, ['pending', 'processing'], corte(expiracao))
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Erro ao procurar lotes de análise interrompidos: {e}', exc_info=True)
+            return []
+        finally:
+            db.session.remove()
+    for lote_id in lote_ids:
+        logger.warning(f'Retomando lote de análise {lote_id} interrompido')
+        socketio.start_background_task(executar_lote, app, lote_id, expiracao)
+    return lote_ids
+
+def _submeter(processos, dados):
+    if processos <= 0:
+        futuro = Future()
+        futuro.set_result(analyze_for_batch(dados))
+        return futuro
+    return _obter_pool(processos).submit(analyze_for_batch, dados)
+
+def executar_lote(app, lote_id, expiracao=None):
+    """
+    Analisa as fotos pendentes do lote. Começa assumindo o lote: recém-criado ('pending'),
+    ou, com `expiracao` (retomada), 'pending'/'processing' ainda sem sinal de vida. Cada
+    foto confirmada renova o sinal; se outro processo assumiu o lote, para sem gravar mais nada.
+    """
+    dono = novo_dono()
+    with app.app_context():
+        try:
+            status_atuais = ['pending', 'processing'] if expiracao else ['pending']
+            assumido = reservar(
+                ScannerBatch, lote_id, status_atuais, dono, corte(expiracao) if expiracao else None,
+                status='processing'
+            )
+            db.session.commit()
+            if not assumido:
+                db.session.remove()
+                return
+        except Exception as e:
+            db.session.rollback()
+            db.session.remove()
+            logger.error(f'Erro ao iniciar o lote de análise {lote_id}: {str(e)}', exc_info=True)
+            return
+
+        lote = db.session.get(ScannerBatch, lote_id)
+        sala = f'user_{lote.usuario_id}'
+
+        try:
+            lote.started_at = lote.started_at or datetime.utcnow()
+            renovar(ScannerBatch, lote_id, dono)
+            db.session.commit()
+            socketio.emit('scanner_lote_status', lote.to_dict(include_items=False), room=sala)
+
+            processos = numero_processos(app.config)
+            armazenamento = obter_armazenamento()
+
+            # A mesma foto repetida no lote é analisada uma vez só; num lote retomado,
+            # as fotos já concluídas ficam como estão
+            posicoes_por_hash = defaultdict(list)
+            for item in lote.items:
+                if item.get('status', 'pending') == 'pending':
+                    posicoes_por_hash[item['image_sha256']].append(item['position'])
+            pendentes = list(posicoes_por_hash)
+            em_andamento = {}
+            limite_em_andamento = max(processos, 1) * 2
+
+            while pendentes or em_andamento:
+                while pendentes and len(em_andamento) < limite_em_andamento:
+                    chave = pendentes.pop(0)
+                    acerto = buscar_resultado(chave)
+                    if acerto:
+                        resultado_cv = {'board_detected': True, 'cache': {k: acerto[k] for k in ('match', 'distance', 'analysis_id')}}
+                        _concluir_foto(lote, dono, sala, posicoes_por_hash[chave], resultado_cv, armazenamento, acerto)
+                        continue
+                    em_andamento[_submeter(processos, ler_blob(chave, armazenamento))] = chave
+
+                if not em_andamento:
+                    continue
+
+                prontos = [futuro for futuro in em_andamento if futuro.done()]
+                if not prontos:
+                    socketio.sleep(INTERVALO_VERIFICACAO)
+                    continue
+
+                for futuro in prontos:
+                    chave = em_andamento.pop(futuro)
+                    try:
+                        resultado_cv = futuro.result()
+                    except BrokenProcessPool as e:
+                        _descartar_pool()
+                        resultado_cv = {'error': f'Processo de análise interrompido: {e}', 'board_detected': False, 'thumbnail': None}
+                    except Exception as e:
+                        resultado_cv = {'error': str(e), 'board_detected': False, 'thumbnail': None}
+
+                    _concluir_foto(lote, dono, sala, posicoes_por_hash[chave], resultado_cv, armazenamento)
+
+            lote.status = 'completed'
+            lote.finished_at = datetime.utcnow()
+            renovar(ScannerBatch, lote_id, dono)
+            db.session.commit()
+            socketio.emit('scanner_lote_status', lote.to_dict(include_items=False), room=sala)
+
+        except ReservaPerdida as e:
+            db.session.rollback()
+            logger.warning(f'Lote de análise {lote_id} abandonado: {e}')
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Erro no lote de análise {lote_id}: {str(e)}', exc_info=True)
+            try:
+                renovar(ScannerBatch, lote_id, dono)
+                lote = db.session.get(ScannerBatch, lote_id)
+                lote.status = 'failed'
+                lote.error_message = str(e)
+                lote.finished_at = datetime.utcnow()
+                db.session.commit()
+                socketio.emit('scanner_lote_status', lote.to_dict(include_items=False), room=sala)
+            except ReservaPerdida:
+                db.session.rollback()
+        finally:
+            db.session.remove()
+
+def _concluir_foto(lote, dono, sala, posicoes, resultado_cv, armazenamento, acerto=None):
+    """
+    Grava e confirma o resultado de uma foto junto com o sinal de vida do lote, coloca no
+    cache e avisa o dono do lote. ReservaPerdida se outro processo assumiu o lote.
+    """
+    itens_atualizados, analises, acerto = _registrar_resultado(lote, posicoes, resultado_cv, armazenamento, acerto)
+    renovar(ScannerBatch, lote.id, dono)
+    db.session.commit()
+    for analysis in analises:
+        guardar_resultado(analysis, origem=acerto)
+    for item in itens_atualizados:
+        socketio.emit('scanner_lote_item', {
+            'batch_id': lote.id,
+            'item': item_lote_com_url(item, lote.usuario_id),
+            'processed_images': lote.processed_images,
+            'total_images': lote.total_images
+        }, room=sala)
+
+def _registrar_resultado(lote, posicoes, resultado_cv, armazenamento, acerto=None):
+    """
+    Grava o resultado de uma foto (e das posições repetidas).
+    Retorna (itens atualizados, análises criadas, acerto do cache usado ou None).
+    """
+    miniatura = resultado_cv.pop('thumbnail', None)
+    thumbnail_sha256 = salvar_blob(miniatura, armazenamento) if miniatura else None
+    if acerto and acerto['match'] == 'exact':
+        thumbnail_sha256 = acerto['thumbnail_sha256']
+
+    items = [dict(item) for item in lote.items]
+    atualizados = []
+    analises = []
+    resultado = None
+    if not resultado_cv.get('error') and resultado_cv.get('board_detected'):
+        if acerto is None and resultado_cv.get('phash'):
+            acerto = buscar_resultado(items[posicoes[0]]['image_sha256'], resultado_cv['phash'])
+        resultado = acerto['resultado'] if acerto else completar_analise(resultado_cv)
+    image_phash = resultado_cv.get('phash') or (acerto['image_phash'] if acerto else None)
+
+    for posicao in posicoes:
+        item = items[posicao]
+        # A URL é assinada a cada entrega (item_lote_com_url), não gravada no lote
+        item['thumbnail_sha256'] = thumbnail_sha256
+
+        if resultado_cv.get('error'):
+            item['status'] = 'error'
+            item['error'] = resultado_cv['error']
+        elif resultado is None:
+            item['status'] = 'no_board'
+            item['board_detected'] = False
+        else:
+            analysis = registrar_analise(
+                lote.usuario_id,
+                resultado_cv,
+                resultado,
+                {
+                    'image_sha256': item['image_sha256'],
+                    'image_size': item['image_size'],
+                    'thumbnail_sha256': thumbnail_sha256,
+                    'image_phash': image_phash
+                },
+                item['mimetype'],
+                batch_id=lote.id,
+                source_analysis_id=acerto['analysis_id'] if acerto else None
+            )
+            db.session.flush()
+            analises.append(analysis)
+            item.update({
+                'status': 'done',
+                'board_detected': True,
+                'analysis_id': analysis.id,
+                'grade': resultado['grade'],
+                'components_count': resultado['components_count'],
+                'density_score': resultado['density_score'],
+                'type_guess': resultado['type_guess'],
+                'explanation': resultado['explanation'],
+                'confidence': round(resultado['confidence'], 2),
+                'cached': acerto is not None
+            })
+            lote.detected_boards += 1
+        atualizados.append(item)
+
+    lote.items = items
+    lote.processed_images += len(posicoes)
+    return atualizados, analises, acerto
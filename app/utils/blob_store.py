@@ -0,0 +1,87 @@
+"""
+Armazenamento de arquivos endereçado por conteúdo (SHA-256).
+
+O mesmo conteúdo gravado duas vezes vira um único arquivo, e o hash serve de chave,
+de nome e de ETag. O backend é escolhido por BLOB_STORAGE_BACKEND (padrão 'local',
+em BLOB_STORAGE_PATH ou UPLOAD_FOLDER/blobs); outro backend só precisa implementar
+a mesma interface de ArmazenamentoLocal e ser registrado em BACKENDS.
+"""
+from flask import current_app
+import hashlib
+import os
+import re
+import tempfile
+
+PADRAO_HASH = re.compile(r'^[0-9a-f]{64}$')
+
+def calcular_hash(dados: bytes) -> str:
+    return hashlib.sha256(dados).hexdigest()
+
+def hash_valido(chave: str) -> bool:
+    return bool(chave) and PADRAO_HASH.match(chave) is not None
+
+class ArmazenamentoLocal:
+    """Blobs em disco, em <raiz>/ab/cd/<hash> para não acumular milhares de arquivos por pasta"""
+
+    def __init__(self, raiz: str):
+        # Absoluto: send_file resolveria um caminho relativo a partir da pasta do app
+        self.raiz = os.path.abspath(raiz)
+
+    def caminho_local(self, chave: str) -> str:
+        return os.path.join(self.raiz, chave[:2], chave[2:4], chave)
+
+    def existe(self, chave: str) -> bool:
+        return os.path.exists(self.caminho_local(chave))
+
+    def gravar(self, chave: str, dados: bytes) -> None:
+        destino = self.caminho_local(chave)
+        pasta = os.path.dirname(destino)
+        os.makedirs(pasta, exist_ok=True)
+        # Grava em arquivo temporário e renomeia: leitores nunca veem um blob pela metade
+        descritor, temporario = tempfile.mkstemp(dir=pasta, prefix='.tmp-')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, destino)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+    def abrir(self, chave: str):
+        return open(self.caminho_local(chave), 'rb')
+
+    def tamanho(self, chave: str) -> int:
+        return os.path.getsize(self.caminho_local(chave))
+
+    def remover(self, chave: str) -> None:
+        try:
+            os.remove(self.caminho_local(chave))
+        except FileNotFoundError:
+            pass
+
+BACKENDS = {
+    'local': lambda config: ArmazenamentoLocal(
+        config.get('BLOB_STORAGE_PATH') or os.path.join(config['UPLOAD_FOLDER'], 'blobs')
+    ),
+}
+
+def obter_armazenamento():
+    config = current_app.config
+    backend = config.get('BLOB_STORAGE_BACKEND', 'local')
+    if backend not in BACKENDS:
+        raise ValueError(f'Backend de blobs desconhecido: {backend}')
+    return BACKENDS[backend](config)
+
+def salvar_blob(dados: bytes, armazenamento=None) -> str:
+    """Grava o conteúdo (se ainda não existir) e retorna o SHA-256 que o identifica"""
+    armazenamento = armazenamento or obter_armazenamento()
+    chave = calcular_hash(dados)
+    if not armazenamento.existe(chave):
+        armazenamento.gravar(chave, dados)
+    return chave
+
+def ler_blob(chave: str, armazenamento=None) -> bytes:
+    armazenamento = armazenamento or obter_armazenamento()
+    with armazenamento.abrir(chave) as arquivo:
+        return arquivo.read()
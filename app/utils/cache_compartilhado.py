@@ -0,0 +1,138 @@
+"""
+Cache de valores compartilhado entre os workers do gunicorn.
+
+Guarda valores JSON por chave e oferece uma reserva com prazo (reservar/liberar), para
+que só um processo recalcule um valor por vez. O backend é escolhido por
+CACHE_COMPARTILHADO_BACKEND: 'redis' (em REDIS_URL; padrão quando REDIS_URL existe),
+'banco' (tabela cache_compartilhado; padrão sem Redis) ou 'memoria' (só o processo
+atual, para desenvolvimento). Outro backend só precisa implementar a mesma interface
+de CacheMemoria e ser registrado em BACKENDS.
+"""
+from app.models import db, CacheCompartilhado
+from flask import current_app
+from sqlalchemy import insert, select, update, or_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
+import json
+import threading
+import time
+
+class CacheMemoria:
+    """Valores no próprio processo: cada worker tem o seu"""
+
+    def __init__(self):
+        self._valores = {}
+        self._reservas = {}
+        self._trava = threading.Lock()
+
+    def ler(self, chave: str):
+        with self._trava:
+            return self._valores.get(chave)
+
+    def gravar(self, chave: str, valor) -> None:
+        # Cópia via JSON: o mesmo comportamento dos outros backends
+        dados = json.loads(json.dumps(valor))
+        with self._trava:
+            self._valores[chave] = dados
+
+    def reservar(self, chave: str, segundos: int) -> bool:
+        agora = time.monotonic()
+        with self._trava:
+            if self._reservas.get(chave, 0) > agora:
+                return False
+            self._reservas[chave] = agora + segundos
+            return True
+
+    def liberar(self, chave: str) -> None:
+        with self._trava:
+            self._reservas.pop(chave, None)
+
+class CacheBanco:
+    """
+    Valores na tabela cache_compartilhado. Usa conexões próprias (fora da db.session),
+    então pode ser chamado no meio de uma requisição sem afetar a transação dela.
+    """
+
+    def ler(self, chave: str):
+        with db.engine.connect() as conexao:
+            valor = conexao.execute(
+                select(CacheCompartilhado.valor).where(CacheCompartilhado.chave == chave)
+            ).scalar()
+        return json.loads(valor) if valor else None
+
+    def gravar(self, chave: str, valor) -> None:
+        campos = {'valor': json.dumps(valor), 'data_atualizacao': datetime.utcnow()}
+        with db.engine.begin() as conexao:
+            alterados = conexao.execute(
+                update(CacheCompartilhado).where(CacheCompartilhado.chave == chave).values(**campos)
+            ).rowcount
+            if not alterados:
+                conexao.execute(insert(CacheCompartilhado).values(chave=chave, **campos))
+
+    def reservar(self, chave: str, segundos: int) -> bool:
+        agora = datetime.utcnow()
+        fim = agora + timedelta(seconds=segundos)
+        try:
+            with db.engine.begin() as conexao:
+                # UPDATE condicional: entre processos concorrentes, só um altera a linha
+                alterados = conexao.execute(
+                    update(CacheCompartilhado).where(
+                        CacheCompartilhado.chave == chave,
+                        or_(CacheCompartilhado.reservado_ate.is_(None), CacheCompartilhado.reservado_ate <= agora)
+                    ).values(reservado_ate=fim)
+                ).rowcount
+                if alterados:
+                    return True
+                existe = conexao.execute(
+                    select(CacheCompartilhado.chave).where(CacheCompartilhado.chave == chave)
+                ).scalar()
+                if existe:
+                    return False
+                conexao.execute(insert(CacheCompartilhado).values(chave=chave, reservado_ate=fim))
+                return True
+        except IntegrityError:
+            # Outro processo criou a linha ao mesmo tempo e ficou com a reserva
+            return False
+
+    def liberar(self, chave: str) -> None:
+        with db.engine.begin() as conexao:
+            conexao.execute(
+                update(CacheCompartilhado).where(CacheCompartilhado.chave == chave).values(reservado_ate=None)
+            )
+
+class CacheRedis:
+    """Valores no Redis; a reserva é uma chave auxiliar com SET NX e expiração"""
+
+    def __init__(self, url: str):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def ler(self, chave: str):
+        valor = self._redis.get(chave)
+        return json.loads(valor) if valor else None
+
+    def gravar(self, chave: str, valor) -> None:
+        self._redis.set(chave, json.dumps(valor))
+
+    def reservar(self, chave: str, segundos: int) -> bool:
+        return bool(self._redis.set(f'{chave}:reserva', '1', nx=True, ex=max(int(segundos), 1)))
+
+    def liberar(self, chave: str) -> None:
+        self._redis.delete(f'{chave}:reserva')
+
+BACKENDS = {
+    'memoria': lambda config: CacheMemoria(),
+    'banco': lambda config: CacheBanco(),
+    'redis': lambda config: CacheRedis(config['REDIS_URL']),
+}
+
+def obter_cache_compartilhado():
+    """Instância do backend configurado, criada uma vez por aplicação"""
+    extensoes = current_app.extensions
+    if 'cache_compartilhado' not in extensoes:
+        config = current_app.config
+        backend = config.get('CACHE_COMPARTILHADO_BACKEND') or ('redis' if config.get('REDIS_URL') else 'banco')
+        if backend not in BACKENDS:
+            raise ValueError(f'Backend de cache compartilhado desconhecido: {backend}')
+        extensoes['cache_compartilhado'] = BACKENDS[backend](config)
+    return extensoes['cache_compartilhado']
@@ -0,0 +1,103 @@
+"""
+Exportação de listagens em CSV ou XLSX com memória constante.
+
+A consulta é lida em blocos por um cursor do lado do servidor (yield_per) e a
+resposta é gerada enquanto é enviada: o CSV sai em pedaços por um gerador, e o XLSX é
+montado por um workbook write-only do openpyxl (que grava as linhas em disco, não na
+memória; bem mais rápido com lxml instalado) e depois enviado em pedaços. Exportar um
+ano inteiro não acumula as linhas nem o arquivo na memória do worker.
+
+Uso numa rota:
+
+    consulta = db.session.query(Modelo.id, Modelo.nome).filter(...).order_by(Modelo.id)
+    linhas = ([linha.id, linha.nome] for linha in ler_em_blocos(consulta))
+    return resposta_exportacao(['ID', 'Nome'], linhas, request.args.get('formato'), 'modelos')
+"""
+from app import socketio
+from flask import Response, stream_with_context
+from openpyxl import Workbook
+from datetime import datetime
+import csv
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_BLOCO = 1000
+TAMANHO_PEDACO = 64 * 1024
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+def ler_em_blocos(consulta, tamanho=TAMANHO_BLOCO):
+    """Linhas da consulta buscadas `tamanho` por vez (cursor do servidor no PostgreSQL)"""
+    return consulta.yield_per(tamanho)
+
+def gerar_csv(colunas, linhas, linhas_por_pedaco=500):
+    """Pedaços (bytes UTF-8 com BOM, para o Excel) do CSV, sem montar o arquivo inteiro"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(colunas)
+    pendentes = 0
+    for linha in linhas:
+        escritor.writerow(linha)
+        pendentes += 1
+        if pendentes >= linhas_por_pedaco:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pendentes = 0
+    yield buffer.getvalue().encode('utf-8')
+
+def gerar_xlsx(colunas, linhas, aba='Dados'):
+    """Pedaços do XLSX: o workbook write-only vai para um arquivo temporário, enviado e apagado"""
+    workbook = Workbook(write_only=True)
+    planilha = workbook.create_sheet(title=aba[:31])
+    planilha.append(colunas)
+    for numero, linha in enumerate(linhas, 1):
+        planilha.append(list(linha))
+        if numero % TAMANHO_BLOCO == 0:
+            # O arquivo só sai depois de montado: cede a vez às outras requisições do worker (eventlet)
+            socketio.sleep(0)
+
+    descritor, caminho = tempfile.mkstemp(suffix='.xlsx', prefix='exportacao-')
+    os.close(descritor)
+    try:
+        workbook.save(caminho)
+        with open(caminho, 'rb') as arquivo:
+            for pedaco in iter(lambda: arquivo.read(TAMANHO_PEDACO), b''):
+                yield pedaco
+    finally:
+        os.remove(caminho)
+
+def resposta_exportacao(colunas, linhas, formato='xlsx', nome='exportacao', aba='Dados'):
+    """
+    Response em streaming com o arquivo `nome_AAAAMMDD_HHMMSS.<formato>`.
+    `linhas` é um iterável de listas/tuplas na ordem de `colunas` (de preferência um
+    gerador sobre ler_em_blocos, consumido só durante o envio).
+    """
+    formato = formato if formato in FORMATOS else 'xlsx'
+    if formato == 'csv':
+        conteudo = gerar_csv(colunas, linhas)
+    else:
+        conteudo = gerar_xlsx(colunas, linhas, aba)
+
+    def enviar():
+        try:
+            yield from conteudo
+        except Exception as e:
+            # Os cabeçalhos já foram enviados: resta registrar e interromper o download
+            logger.error(f'Erro ao gerar exportação {nome}.{formato}: {e}', exc_info=True)
+            raise
+
+    nome_arquivo = f'{nome}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
+    return Response(
+        stream_with_context(enviar()),
+        mimetype=FORMATOS[formato],
+        headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+    )
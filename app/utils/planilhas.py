@@ -0,0 +1,89 @@
+from openpyxl import load_workbook
+import pandas as pd
+
+TAMANHO_BLOCO_PADRAO = 5000
+
+def _nomes_colunas(cabecalho):
+    """Mesmos nomes que o pandas daria: vazios viram 'Unnamed: i' e repetidos ganham sufixo .1, .2..."""
+    nomes = []
+    vistos = {}
+    for indice, valor in enumerate(cabecalho):
+        nome = f'Unnamed: {indice}' if valor is None or str(valor).strip() == '' else valor
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f'{nome}.{vistos[nome]}'
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+def _abrir_aba(workbook, aba):
+    if aba and aba in workbook.sheetnames:
+        return workbook[aba]
+    return workbook.worksheets[0]
+
+def estimar_total_linhas(caminho, extensao, linha_cabecalho=1, aba=None):
+    """Quantidade aproximada de linhas de dados, sem carregar o arquivo na memória"""
+    if extensao == 'csv':
+        with open(caminho, 'rb') as arquivo:
+            linhas = sum(bloco.count(b'\n') for bloco in iter(lambda: arquivo.read(1024 * 1024), b''))
+        return max(linhas - linha_cabecalho + 1, 0)
+
+    if extensao == 'xlsx':
+        workbook = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            max_row = _abrir_aba(workbook, aba).max_row
+        finally:
+            workbook.close()
+        return max((max_row or 0) - linha_cabecalho, 0) if max_row else None
+
+    return None
+
+def ler_planilha_em_blocos(caminho, extensao, tamanho_bloco=TAMANHO_BLOCO_PADRAO, linha_cabecalho=1, aba=None):
+    """
+    Lê CSV/XLSX em blocos de `tamanho_bloco` linhas, sem carregar o arquivo inteiro.
+
+    Gera tuplas (df, primeira_linha), em que primeira_linha é o número da linha
+    na planilha (1-based) da primeira linha de dados do bloco.
+
+    - CSV: pandas com chunksize
+    - XLSX: openpyxl em modo read_only (linha a linha)
+    - XLS (formato antigo): não tem leitura em streaming, cai no pd.read_excel
+    """
+    primeira_linha = linha_cabecalho + 1
+
+    if extensao == 'csv':
+        leitor = pd.read_csv(caminho, encoding='utf-8', chunksize=tamanho_bloco, header=linha_cabecalho - 1)
+        for df in leitor:
+            yield df.reset_index(drop=True), primeira_linha
+            primeira_linha += len(df)
+        return
+
+    if extensao == 'xlsx':
+        workbook = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            linhas = _abrir_aba(workbook, aba).iter_rows(min_row=linha_cabecalho, values_only=True)
+            cabecalho = next(linhas, None)
+            if cabecalho is None:
+                return
+            colunas = _nomes_colunas(cabecalho)
+
+            bloco = []
+            for valores in linhas:
+                valores = valores[:len(colunas)]
+                bloco.append(valores + (None,) * (len(colunas) - len(valores)))
+                if len(bloco) >= tamanho_bloco:
+                    yield pd.DataFrame(bloco, columns=colunas), primeira_linha
+                    primeira_linha += len(bloco)
+                    bloco = []
+            if bloco:
+                yield pd.DataFrame(bloco, columns=colunas), primeira_linha
+        finally:
+            workbook.close()
+        return
+
+    planilhas = pd.ExcelFile(caminho)
+    nome_aba = aba if aba in planilhas.sheet_names else 0
+    df = pd.read_excel(planilhas, sheet_name=nome_aba, header=linha_cabecalho - 1)
+    for inicio in range(0, len(df), tamanho_bloco):
+        yield df.iloc[inicio:inicio + tamanho_bloco].reset_index(drop=True), primeira_linha + inicio
@@ -0,0 +1,60 @@
+"""
+Reserva (lease) das tarefas de fundo gravadas em tabela: importações de planilha e
+lotes do scanner.
+
+A linha da tarefa guarda quem a executa (`dono`, um identificador por execução) e o
+último sinal de vida (`atualizado_em`). A execução renova o sinal a cada etapa
+confirmada, na mesma transação da etapa. Se o sinal passou do prazo, o processo que a
+executava parou (reinício, deploy, worker morto) e outro processo pode assumi-la.
+Assumir é um UPDATE condicional ao status e ao sinal vencido, que só um processo
+consegue. Uma execução que perdeu a reserva percebe na renovação seguinte
+(ReservaPerdida) e para sem gravar mais nada.
+
+O modelo precisa das colunas `status`, `dono` e `atualizado_em`.
+"""
+from app.models import db
+from sqlalchemy import select, update, or_
+from datetime import datetime, timedelta
+import uuid
+
+class ReservaPerdida(Exception):
+    """Outro processo assumiu a tarefa"""
+
+def novo_dono():
+    return uuid.uuid4().hex
+
+def corte(segundos):
+    """Sinais de vida anteriores a este momento estão vencidos"""
+    return datetime.utcnow() - timedelta(seconds=segundos)
+
+def _vencida(modelo, limite):
+    return or_(modelo.atualizado_em.is_(None), modelo.atualizado_em < limite)
+
+def abandonadas(modelo, status, limite):
+    """Ids das tarefas nos status com o sinal de vida vencido"""
+    return list(db.session.execute(
+        select(modelo.id).where(modelo.status.in_(status), _vencida(modelo, limite)).order_by(modelo.id)
+    ).scalars())
+
+def reservar(modelo, tarefa_id, status_atuais, dono, limite=None, **valores):
+    """
+    Passa a tarefa para `dono` se ela está num dos `status_atuais` e (com `limite`) com o sinal
+    vencido; grava também `valores`. Não faz commit. Retorna True se conseguiu.
+    """
+    condicoes = [modelo.id == tarefa_id, modelo.status.in_(status_atuais)]
+    if limite is not None:
+        condicoes.append(_vencida(modelo, limite))
+    resultado = db.session.execute(
+        update(modelo).where(*condicoes).values(dono=dono, atualizado_em=datetime.utcnow(), **valores)
+        .execution_options(synchronize_session=False)
+    )
+    return resultado.rowcount == 1
+
+def renovar(modelo, tarefa_id, dono):
+    """Renova o sinal de vida na transação atual; ReservaPerdida se a tarefa mudou de dono"""
+    resultado = db.session.execute(
+        update(modelo).where(modelo.id == tarefa_id, modelo.dono == dono).values(atualizado_em=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != 1:
+        raise ReservaPerdida(f'{modelo.__tablename__} {tarefa_id} assumida por outro processo')
@@ -0,0 +1,31 @@
+-- Migration: 022_add_resumos_mensais_dashboard.sql
+-- Descrição: Cria tabelas de resumo mensal usadas pelas séries temporais do dashboard
+-- Após criar as tabelas, rode scripts/reconstruir_resumos_dashboard.py para o backfill
+
+CREATE TABLE IF NOT EXISTS resumo_mensal_lotes (
+    id SERIAL PRIMARY KEY,
+    mes DATE NOT NULL,
+    fornecedor_id INTEGER NOT NULL REFERENCES fornecedores(id) ON DELETE CASCADE,
+    tipo_lote_id INTEGER NOT NULL REFERENCES tipos_lote(id) ON DELETE CASCADE,
+    status VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    valor_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    peso_total_kg DOUBLE PRECISION NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_resumo_mensal_lote UNIQUE (mes, fornecedor_id, tipo_lote_id, status)
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumo_lote_mes_status ON resumo_mensal_lotes(mes, status);
+
+CREATE TABLE IF NOT EXISTS resumo_mensal_solicitacoes (
+    id SERIAL PRIMARY KEY,
+    mes DATE NOT NULL,
+    funcionario_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+    fornecedor_id INTEGER NOT NULL REFERENCES fornecedores(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_resumo_mensal_solicitacao UNIQUE (mes, funcionario_id, fornecedor_id, status)
+);
+
+CREATE INDEX IF NOT EXISTS idx_resumo_solicitacao_mes_status ON resumo_mensal_solicitacoes(mes, status);
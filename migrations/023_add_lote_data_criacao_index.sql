@@ -0,0 +1,4 @@
+-- Migration: 023_add_lote_data_criacao_index.sql
+-- Descrição: Índice para a paginação por cursor (data_criacao, id) da listagem de lotes do WMS
+
+CREATE INDEX IF NOT EXISTS idx_lote_data_criacao_id ON lotes(data_criacao, id);
@@ -0,0 +1,5 @@
+-- Migration: 024_add_lote_children_indexes.sql
+-- Descrição: Índices usados pelas contagens de itens e sublotes na listagem de lotes do WMS
+
+CREATE INDEX IF NOT EXISTS idx_itens_solicitacao_lote ON itens_solicitacao(lote_id);
+CREATE INDEX IF NOT EXISTS idx_lote_pai ON lotes(lote_pai_id);
@@ -0,0 +1,21 @@
+-- Migration: 025_add_fornecedor_endereco_normalizado.sql
+-- Descrição: Colunas de endereço normalizado para a verificação de duplicidade de fornecedores
+-- (as mesmas regras de Fornecedor.normalizar_endereco), com backfill e índices
+
+ALTER TABLE fornecedores ADD COLUMN IF NOT EXISTS rua_normalizada VARCHAR(200);
+ALTER TABLE fornecedores ADD COLUMN IF NOT EXISTS numero_normalizado VARCHAR(20);
+ALTER TABLE fornecedores ADD COLUMN IF NOT EXISTS cidade_normalizada VARCHAR(100);
+ALTER TABLE fornecedores ADD COLUMN IF NOT EXISTS estado_normalizado VARCHAR(2);
+ALTER TABLE fornecedores ADD COLUMN IF NOT EXISTS cep_normalizado VARCHAR(10);
+
+UPDATE fornecedores SET
+    rua_normalizada = LOWER(TRIM(COALESCE(rua, ''))),
+    numero_normalizado = TRIM(COALESCE(numero, '')),
+    cidade_normalizada = LOWER(TRIM(COALESCE(cidade, ''))),
+    estado_normalizado = UPPER(TRIM(COALESCE(estado, ''))),
+    cep_normalizado = NULLIF(REGEXP_REPLACE(COALESCE(cep, ''), '[^0-9]', '', 'g'), '');
+
+CREATE INDEX IF NOT EXISTS idx_fornecedor_endereco_normalizado
+    ON fornecedores(rua_normalizada, numero_normalizado, cidade_normalizada, estado_normalizado);
+CREATE INDEX IF NOT EXISTS idx_fornecedor_cep_numero
+    ON fornecedores(cep_normalizado, numero_normalizado);
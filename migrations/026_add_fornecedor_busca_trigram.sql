@@ -0,0 +1,20 @@
+-- Migration: 026_add_fornecedor_busca_trigram.sql
+-- Descrição: Busca de fornecedores com pg_trgm (nome, nome social, email)
+-- e índice de prefixo para CNPJ/CPF somente com dígitos
+-- A coluna vem antes da extensão: sem permissão para CREATE EXTENSION, só os índices
+-- de trigramas falham e a busca usa LIKE (ver busca_fornecedor_service.usa_trigramas)
+
+ALTER TABLE fornecedores ADD COLUMN IF NOT EXISTS documento_digitos VARCHAR(14);
+
+UPDATE fornecedores SET documento_digitos = COALESCE(
+    NULLIF(REGEXP_REPLACE(COALESCE(cnpj, ''), '[^0-9]', '', 'g'), ''),
+    NULLIF(REGEXP_REPLACE(COALESCE(cpf, ''), '[^0-9]', '', 'g'), '')
+);
+
+CREATE INDEX IF NOT EXISTS idx_fornecedor_documento_digitos ON fornecedores(documento_digitos varchar_pattern_ops);
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_fornecedor_nome_trgm ON fornecedores USING gin (nome gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_fornecedor_nome_social_trgm ON fornecedores USING gin (nome_social gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_fornecedor_email_trgm ON fornecedores USING gin (email gin_trgm_ops);
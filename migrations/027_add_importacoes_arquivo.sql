@@ -0,0 +1,25 @@
+-- Migration: 027_add_importacoes_arquivo.sql
+-- Descrição: Importações de planilhas (tabela de preços do fornecedor, tipos de lote)
+-- processadas em segundo plano, em blocos, com andamento consultável
+
+CREATE TABLE IF NOT EXISTS importacoes_arquivo (
+    id SERIAL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    nome_arquivo VARCHAR(255) NOT NULL,
+    caminho_arquivo VARCHAR(500) NOT NULL,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    fornecedor_id INTEGER REFERENCES fornecedores(id) ON DELETE CASCADE,
+    total_linhas INTEGER,
+    linhas_processadas INTEGER NOT NULL DEFAULT 0,
+    sucesso INTEGER NOT NULL DEFAULT 0,
+    total_erros INTEGER NOT NULL DEFAULT 0,
+    erros JSON NOT NULL DEFAULT '[]',
+    resultado JSON,
+    mensagem_erro TEXT,
+    data_criacao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    data_inicio TIMESTAMP,
+    data_conclusao TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_importacao_usuario_data ON importacoes_arquivo(usuario_id, data_criacao);
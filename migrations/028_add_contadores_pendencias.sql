@@ -0,0 +1,13 @@
+-- Migration: 028_add_contadores_pendencias.sql
+-- Descrição: Contadores de pendências dos admins mantidos por evento (ver pendencias_service)
+-- e índices para a leitura das notificações sem varredura
+
+CREATE TABLE IF NOT EXISTS contadores_pendencias (
+    chave VARCHAR(50) PRIMARY KEY,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    valor_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notificacao_usuario_data ON notificacoes(usuario_id, data_envio);
+CREATE INDEX IF NOT EXISTS idx_notificacao_tipo_usuario ON notificacoes(tipo, usuario_id);
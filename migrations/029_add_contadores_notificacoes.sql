@@ -0,0 +1,22 @@
+-- Migration: 029_add_contadores_notificacoes.sql
+-- Descrição: Caixa de notificações paginada por cursor (usuario_id, data_envio, id),
+-- índice parcial das não lidas e contador de não lidas por usuário
+
+CREATE TABLE IF NOT EXISTS contadores_notificacoes (
+    usuario_id INTEGER PRIMARY KEY REFERENCES usuarios(id) ON DELETE CASCADE,
+    nao_lidas INTEGER NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notificacao_usuario_data_id ON notificacoes(usuario_id, data_envio, id);
+DROP INDEX IF EXISTS idx_notificacao_usuario_data;
+
+CREATE INDEX IF NOT EXISTS idx_notificacao_nao_lidas ON notificacoes(usuario_id) WHERE lida = false;
+
+-- Contadores são criados na primeira leitura; preencher aqui evita a contagem inicial
+INSERT INTO contadores_notificacoes (usuario_id, nao_lidas)
+SELECT u.id, COUNT(n.id)
+FROM usuarios u
+LEFT JOIN notificacoes n ON n.usuario_id = u.id AND n.lida = false
+GROUP BY u.id
+ON CONFLICT (usuario_id) DO NOTHING;
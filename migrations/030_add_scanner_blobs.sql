@@ -0,0 +1,10 @@
+-- Migration: 030_add_scanner_blobs.sql
+-- Descrição: Imagens do scanner de placas no blob store endereçado por SHA-256.
+-- As imagens já gravadas em image_data são movidas com scripts/migrar_imagens_scanner.py
+
+ALTER TABLE scanner_analyses ADD COLUMN IF NOT EXISTS image_sha256 VARCHAR(64);
+ALTER TABLE scanner_analyses ADD COLUMN IF NOT EXISTS image_size INTEGER;
+ALTER TABLE scanner_analyses ADD COLUMN IF NOT EXISTS thumbnail_sha256 VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS ix_scanner_analyses_image_sha256 ON scanner_analyses(image_sha256);
+CREATE INDEX IF NOT EXISTS ix_scanner_analyses_thumbnail_sha256 ON scanner_analyses(thumbnail_sha256);
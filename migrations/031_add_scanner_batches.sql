@@ -0,0 +1,21 @@
+-- Migration: 031_add_scanner_batches.sql
+-- Descrição: Lotes de fotos de placas analisados em segundo plano (POST /api/scanner/batch)
+
+CREATE TABLE IF NOT EXISTS scanner_batches (
+    id SERIAL PRIMARY KEY,
+    usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    total_images INTEGER NOT NULL DEFAULT 0,
+    processed_images INTEGER NOT NULL DEFAULT 0,
+    detected_boards INTEGER NOT NULL DEFAULT 0,
+    items JSON NOT NULL DEFAULT '[]',
+    error_message TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_scanner_batch_usuario_data ON scanner_batches(usuario_id, created_at);
+
+ALTER TABLE scanner_analyses ADD COLUMN IF NOT EXISTS batch_id INTEGER REFERENCES scanner_batches(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_scanner_analyses_batch_id ON scanner_analyses(batch_id);
@@ -0,0 +1,5 @@
+-- Migration: 032_add_scanner_cache.sql
+-- Descrição: pHash das fotos do scanner e origem dos resultados reaproveitados do cache (ver scanner_cache)
+
+ALTER TABLE scanner_analyses ADD COLUMN IF NOT EXISTS image_phash VARCHAR(16);
+ALTER TABLE scanner_analyses ADD COLUMN IF NOT EXISTS source_analysis_id INTEGER REFERENCES scanner_analyses(id) ON DELETE SET NULL;
@@ -0,0 +1,14 @@
+-- Migration: 033_add_scanner_explanations.sql
+-- Descrição: Explicações da Perplexity guardadas por faixa de resultado do scanner (ver scanner_explicacoes)
+
+CREATE TABLE IF NOT EXISTS scanner_explanations (
+    id SERIAL PRIMARY KEY,
+    grade VARCHAR(10) NOT NULL,
+    components_bucket INTEGER NOT NULL,
+    density_bucket INTEGER NOT NULL,
+    explanation TEXT NOT NULL,
+    model VARCHAR(100),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    CONSTRAINT uq_scanner_explanation_faixa UNIQUE (grade, components_bucket, density_bucket)
+);
@@ -0,0 +1,9 @@
+-- Migration: 034_add_cache_compartilhado.sql
+-- Descrição: Valores compartilhados entre workers sem Redis, ex.: cotações de metais (ver app/utils/cache_compartilhado.py)
+
+CREATE TABLE IF NOT EXISTS cache_compartilhado (
+    chave VARCHAR(100) PRIMARY KEY,
+    valor TEXT,
+    data_atualizacao TIMESTAMP,
+    reservado_ate TIMESTAMP
+);
@@ -0,0 +1,18 @@
+-- Migration: 035_add_cotacoes_metais.sql
+-- Descrição: Histórico das cotações de metais agregado por minuto, hora e dia (ver historico_metais)
+
+CREATE TABLE IF NOT EXISTS cotacoes_metais (
+    id SERIAL PRIMARY KEY,
+    simbolo VARCHAR(10) NOT NULL,
+    granularidade VARCHAR(10) NOT NULL,
+    inicio TIMESTAMP NOT NULL,
+    abertura DOUBLE PRECISION NOT NULL,
+    maxima DOUBLE PRECISION NOT NULL,
+    minima DOUBLE PRECISION NOT NULL,
+    fechamento DOUBLE PRECISION NOT NULL,
+    soma DOUBLE PRECISION NOT NULL,
+    quantidade INTEGER NOT NULL,
+    usd_brl DOUBLE PRECISION,
+    fonte VARCHAR(50),
+    CONSTRAINT uq_cotacao_metal_periodo UNIQUE (granularidade, simbolo, inicio)
+);
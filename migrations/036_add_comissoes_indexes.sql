@@ -0,0 +1,6 @@
+-- Migration: 036_add_comissoes_indexes.sql
+-- Descrição: Índices das somas de comissões do RH (ver comissoes_service): solicitações
+-- aprovadas por funcionário e período, e os itens de cada solicitação
+
+CREATE INDEX IF NOT EXISTS idx_solicitacoes_funcionario_status_envio ON solicitacoes(funcionario_id, status, data_envio);
+CREATE INDEX IF NOT EXISTS idx_itens_solicitacao_solicitacao ON itens_solicitacao(solicitacao_id);
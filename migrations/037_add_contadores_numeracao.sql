@@ -0,0 +1,8 @@
+-- Migration: 037_add_contadores_numeracao.sql
+-- Descrição: Contadores dos números de lote, OS e OP, um por chave e período (ver app/services/numeracao.py)
+
+CREATE TABLE IF NOT EXISTS contadores_numeracao (
+    chave VARCHAR(100) PRIMARY KEY,
+    valor INTEGER NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP
+);
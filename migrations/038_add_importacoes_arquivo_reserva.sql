@@ -0,0 +1,11 @@
+-- Migration: 038_add_importacoes_arquivo_reserva.sql
+-- Descrição: Dono e sinal de vida das importações em segundo plano, para que só um
+-- processo execute cada importação e as abandonadas sejam retomadas por outro
+-- (ver app/utils/tarefas_fundo.py)
+
+ALTER TABLE importacoes_arquivo ADD COLUMN IF NOT EXISTS dono VARCHAR(32);
+ALTER TABLE importacoes_arquivo ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP;
+
+UPDATE importacoes_arquivo SET atualizado_em = COALESCE(data_inicio, data_criacao) WHERE atualizado_em IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_importacoes_arquivo_status_atualizado ON importacoes_arquivo(status, atualizado_em);
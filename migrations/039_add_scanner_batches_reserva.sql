@@ -0,0 +1,11 @@
+-- Migration: 039_add_scanner_batches_reserva.sql
+-- Descrição: Dono e sinal de vida dos lotes de análise do scanner, para que só um
+-- processo execute cada lote e os abandonados sejam retomados por outro
+-- (ver app/utils/tarefas_fundo.py)
+
+ALTER TABLE scanner_batches ADD COLUMN IF NOT EXISTS dono VARCHAR(32);
+ALTER TABLE scanner_batches ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP;
+
+UPDATE scanner_batches SET atualizado_em = COALESCE(started_at, created_at) WHERE atualizado_em IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_scanner_batches_status_atualizado ON scanner_batches(status, atualizado_em);
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Benchmark de /api/dashboard/stats: compara a implementação antiga
+(uma consulta por indicador) com o motor agregado de dashboard_service.
+
+Uso:
+    python scripts/benchmark_dashboard_stats.py                 # só mede
+    python scripts/benchmark_dashboard_stats.py --seed 1000000  # popula lotes antes de medir
+
+ATENÇÃO: o --seed insere dados no banco configurado em DATABASE_URL.
+Nunca rode contra produção.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, insert
+from app import create_app
+from app.models import db, Fornecedor, Solicitacao, Lote, TipoLote, Usuario
+from app.services.dashboard_service import calcular_estatisticas_gerais
+
+def estatisticas_legado():
+    """Cópia fiel da implementação anterior de obter_estatisticas"""
+    total_pendentes = Solicitacao.query.filter_by(status='pendente').count()
+    total_aprovados = Solicitacao.query.filter_by(status='aprovada').count()
+    total_reprovados = Solicitacao.query.filter_by(status='rejeitada').count()
+
+    valor_total = db.session.query(func.sum(Lote.valor_total)).filter(
+        Lote.status == 'aprovado'
+    ).scalar() or 0
+
+    quilos = {}
+    for classificacao in ['leve', 'media', 'pesada']:
+        quilos[classificacao] = float(db.session.query(func.sum(Lote.peso_total_kg)).join(
+            TipoLote, Lote.tipo_lote_id == TipoLote.id
+        ).filter(
+            TipoLote.classificacao == classificacao
+        ).scalar() or 0)
+
+    ranking = db.session.query(
+        Fornecedor.id,
+        Fornecedor.nome,
+        func.count(Solicitacao.id).label('total')
+    ).join(
+        Solicitacao, Solicitacao.fornecedor_id == Fornecedor.id
+    ).filter(
+        Solicitacao.status == 'aprovada'
+    ).group_by(
+        Fornecedor.id, Fornecedor.nome
+    ).order_by(
+        func.count(Solicitacao.id).desc()
+    ).limit(10).all()
+
+    return {
+        'relatorios': {
+            'pendentes': total_pendentes,
+            'aprovados': total_aprovados,
+            'reprovados': total_reprovados
+        },
+        'valor_total': float(valor_total),
+        'quilos_por_tipo': quilos,
+        'ranking_empresas': [{'id': r.id, 'nome': r.nome, 'total': r.total} for r in ranking]
+    }
+
+def popular_lotes(total, lote_tamanho=10000):
+    """Insere fornecedores, tipos de lote e lotes em lote (executemany)"""
+    admin = Usuario.query.filter_by(tipo='admin').first()
+
+    tipos = []
+    for classificacao in ['leve', 'media', 'pesada']:
+        tipo = TipoLote.query.filter_by(nome=f'BENCH {classificacao}').first()
+        if not tipo:
+            tipo = TipoLote(nome=f'BENCH {classificacao}', classificacao=classificacao)
+            db.session.add(tipo)
+        tipos.append(tipo)
+
+    fornecedores = []
+    for i in range(50):
+        fornecedor = Fornecedor(nome=f'BENCH Fornecedor {i}')
+        db.session.add(fornecedor)
+        fornecedores.append(fornecedor)
+    db.session.commit()
+
+    db.session.execute(insert(Solicitacao), [
+        {
+            'funcionario_id': admin.id,
+            'fornecedor_id': random.choice(fornecedores).id,
+            'status': random.choice(['pendente', 'aprovada', 'rejeitada']),
+            'data_envio': datetime.utcnow()
+        } for _ in range(min(total, 50000))
+    ])
+
+    inicio = datetime.utcnow() - timedelta(days=365)
+    inseridos = 0
+    while inseridos < total:
+        quantidade = min(lote_tamanho, total - inseridos)
+        db.session.execute(insert(Lote), [
+            {
+                'numero_lote': f'BENCH-{inseridos + i}',
+                'fornecedor_id': random.choice(fornecedores).id,
+                'tipo_lote_id': random.choice(tipos).id,
+                'peso_total_kg': random.uniform(1, 500),
+                'valor_total': random.uniform(10, 5000),
+                'status': random.choice(['aberto', 'aprovado', 'em_estoque']),
+                'data_criacao': inicio + timedelta(minutes=inseridos + i),
+                'reservado': False,
+                'bloqueado': False
+            } for i in range(quantidade)
+        ])
+        db.session.commit()
+        inseridos += quantidade
+        print(f'  {inseridos}/{total} lotes inseridos')
+
+def medir(nome, funcao, repeticoes):
+    contador = {'consultas': 0}
+
+    def contar(*args, **kwargs):
+        contador['consultas'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            resultado = funcao()
+        duracao = (time.perf_counter() - inicio) / repeticoes
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+    print(f'{nome:<10} consultas/req: {contador["consultas"] // repeticoes:>3}   latência média: {duracao * 1000:9.1f} ms')
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seed', type=int, default=0, help='quantidade de lotes a inserir antes da medição')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.seed:
+            print(f'Populando {args.seed} lotes...')
+            popular_lotes(args.seed)
+
+        print(f'Lotes no banco: {Lote.query.count()}')
+        legado = medir('legado', estatisticas_legado, args.repeticoes)
+        agregado = medir('agregado', calcular_estatisticas_gerais, args.repeticoes)
+
+        iguais = (
+            legado['relatorios'] == agregado['relatorios']
+            and abs(legado['valor_total'] - agregado['valor_total']) < 0.01
+            and all(abs(legado['quilos_por_tipo'][k] - agregado['quilos_por_tipo'][k]) < 0.01 for k in legado['quilos_por_tipo'])
+            and [r['total'] for r in legado['ranking_empresas']] == [r['total'] for r in agregado['ranking_empresas']]
+        )
+        print('Resultados idênticos' if iguais else 'ATENÇÃO: resultados divergentes')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark do classificador OpenCV de placas (pcb_analyzer): compara a implementação
+antiga (sete máscaras inRange e findContours na resolução da câmera) com a atual
+(decodificação e análise em resolução de trabalho limitada, tabela HSV única e
+connectedComponentsWithStats).
+
+Os tempos são da foto em JPEG até a nota, como na rota de análise. Mostra, por foto,
+a nota e os componentes das duas versões e o tempo de cada uma, e no final a
+concordância das notas e o ganho de velocidade.
+
+Uso:
+    python scripts/benchmark_pcb_analyzer.py                    # fotos sintéticas
+    python scripts/benchmark_pcb_analyzer.py --pasta fotos/     # fotos reais (jpg/png)
+    python scripts/benchmark_pcb_analyzer.py --lado 2048        # outra resolução de trabalho
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import cv2
+import numpy as np
+from app.services.pcb_analyzer import (
+    analyze_decoded_image, decode_image, WORKING_MAX_SIDE, MIN_BOARD_RATIO,
+    LOW_DENSITY_THRESHOLD, HIGH_DENSITY_THRESHOLD, MIN_COMPONENT_AREA, MAX_COMPONENT_AREA
+)
+
+EXTENSOES = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def analise_legado(image_bytes):
+    """Cópia fiel da implementação anterior de analyze_pcb_image (só o que define a nota)"""
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return {'grade': None, 'components_count': 0, 'density_score': 0.0}
+    height, width = img.shape[:2]
+    total_pixels = height * width
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+
+    faixas = [
+        ([35, 20, 20], [90, 255, 255]),
+        ([70, 15, 15], [100, 255, 255]),
+        ([8, 20, 20], [35, 255, 220]),
+        ([95, 20, 20], [135, 255, 255]),
+        ([15, 40, 40], [40, 255, 255]),
+        ([0, 30, 30], [10, 255, 255]),
+        ([160, 30, 30], [180, 255, 255]),
+    ]
+    pcb_mask = None
+    for lower, upper in faixas:
+        mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+        pcb_mask = mask if pcb_mask is None else cv2.bitwise_or(pcb_mask, mask)
+
+    kernel = np.ones((5, 5), np.uint8)
+    pcb_mask = cv2.morphologyEx(pcb_mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    pcb_mask = cv2.morphologyEx(pcb_mask, cv2.MORPH_OPEN, kernel, iterations=1)
+
+    board_pixels = float(np.sum(pcb_mask) / 255)
+    if board_pixels / max(total_pixels, 1) < MIN_BOARD_RATIO:
+        return {'grade': None, 'components_count': 0, 'density_score': 0.0}
+
+    components_mask = cv2.bitwise_not(pcb_mask)
+    kernel_small = np.ones((3, 3), np.uint8)
+    components_mask = cv2.morphologyEx(components_mask, cv2.MORPH_OPEN, kernel_small, iterations=2)
+    components_mask = cv2.morphologyEx(components_mask, cv2.MORPH_CLOSE, kernel_small, iterations=2)
+    blurred = cv2.GaussianBlur(components_mask, (5, 5), 0)
+    contours, _ = cv2.findContours(blurred, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    valid_contours = [c for c in contours if MIN_COMPONENT_AREA <= cv2.contourArea(c) <= MAX_COMPONENT_AREA]
+    density = len(valid_contours) / max(board_pixels, 1.0)
+    if density < LOW_DENSITY_THRESHOLD:
+        grade = 'LOW'
+    elif density < HIGH_DENSITY_THRESHOLD:
+        grade = 'MEDIUM'
+    else:
+        grade = 'HIGH'
+    return {'grade': grade, 'components_count': len(valid_contours), 'density_score': density}
+
+def foto_sintetica(largura, altura, densidade, rng):
+    """
+    Placa verde sobre fundo claro com componentes escuros e metálicos.
+    `densidade` é o número de componentes por pixel de placa (mesma unidade dos limiares).
+    """
+    # Fundo cinza (sem saturação, então fora das faixas de cor de placa)
+    img = np.repeat(rng.integers(205, 225, (altura, largura, 1), dtype=np.uint8), 3, axis=2)
+
+    # Como numa foto de celular, a placa ocupa quase todo o quadro e sai por pelo menos dois lados
+    x0 = int(largura * rng.uniform(0.05, 0.2)) if rng.random() < 0.5 else 0
+    y0 = int(altura * rng.uniform(0.05, 0.2)) if rng.random() < 0.5 else 0
+    x1, y1 = largura, altura
+    cor_placa = [(40, 120, 30), (25, 90, 120), (120, 60, 20)][rng.integers(0, 3)]
+    cv2.rectangle(img, (x0, y0), (x1, y1), cor_placa, -1)
+
+    escala = largura / 4000
+    quantidade = int(densidade * (x1 - x0) * (y1 - y0))
+    for _ in range(quantidade):
+        w = max(2, int(rng.uniform(12, 70) * escala))
+        h = max(2, int(rng.uniform(12, 45) * escala))
+        x = int(rng.integers(x0, max(x0 + 1, x1 - w)))
+        y = int(rng.integers(y0, max(y0 + 1, y1 - h)))
+        cor = (8, 8, 8) if rng.random() < 0.6 else (190, 190, 190)
+        cv2.rectangle(img, (x, y), (x + w, y + h), cor, -1)
+
+    ruido = rng.normal(0, 3, img.shape)
+    return np.clip(img.astype(np.int16) + ruido.astype(np.int16), 0, 255).astype(np.uint8)
+
+def fotos_sinteticas(quantidade, semente):
+    rng = np.random.default_rng(semente)
+    tamanhos = [(4000, 3000), (4032, 3024), (3264, 2448), (1920, 1080), (1280, 960)]
+    densidades = [0.000008, 0.000015, 0.00003, 0.00005, 0.00007, 0.00012, 0.0002]
+    for i in range(quantidade):
+        largura, altura = tamanhos[i % len(tamanhos)]
+        densidade = densidades[i % len(densidades)] * rng.uniform(0.85, 1.15)
+        _, jpeg = cv2.imencode('.jpg', foto_sintetica(largura, altura, densidade, rng), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        yield f'sintetica_{i:02d}_{largura}x{altura}', jpeg.tobytes()
+
+def fotos_da_pasta(pasta):
+    for nome in sorted(os.listdir(pasta)):
+        if nome.lower().endswith(EXTENSOES):
+            with open(os.path.join(pasta, nome), 'rb') as arquivo:
+                yield nome, arquivo.read()
+
+def analise_atual(image_bytes, lado):
+    """analyze_pcb_image com outra resolução de trabalho"""
+    img, tamanho_original, erro = decode_image(image_bytes, max_side=lado)
+    if erro:
+        return {'grade': None, 'components_count': 0}
+    return analyze_decoded_image(img, max_side=lado, original_size=tamanho_original)
+
+def medir(funcao, dados, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao(dados)
+    return resultado, (time.perf_counter() - inicio) / repeticoes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pasta', help='pasta com fotos de placas (padrão: fotos sintéticas)')
+    parser.add_argument('--quantidade', type=int, default=20, help='quantidade de fotos sintéticas')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--lado', type=int, default=WORKING_MAX_SIDE, help='maior lado da resolução de trabalho')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    fotos = fotos_da_pasta(args.pasta) if args.pasta else fotos_sinteticas(args.quantidade, args.semente)
+
+    total, iguais = 0, 0
+    tempo_legado, tempo_atual = 0.0, 0.0
+    print(f'{"foto":<32} {"legado":>16} {"atual":>16} {"ms legado":>10} {"ms atual":>9}')
+    for nome, dados in fotos:
+        legado, t_legado = medir(analise_legado, dados, args.repeticoes)
+        atual, t_atual = medir(lambda d: analise_atual(d, args.lado), dados, args.repeticoes)
+
+        total += 1
+        iguais += 1 if legado['grade'] == atual['grade'] else 0
+        tempo_legado += t_legado
+        tempo_atual += t_atual
+        marca = '' if legado['grade'] == atual['grade'] else '  <- diverge'
+        print(f'{nome:<32} {str(legado["grade"]):>6} {legado["components_count"]:>5} cmp '
+              f'{str(atual["grade"]):>6} {atual["components_count"]:>5} cmp '
+              f'{t_legado * 1000:>10.1f} {t_atual * 1000:>9.1f}{marca}')
+
+    if not total:
+        print('Nenhuma foto encontrada')
+        return
+    print(f'\nConcordância das notas: {iguais}/{total} ({iguais / total:.0%})')
+    print(f'Tempo total: legado {tempo_legado * 1000:.0f} ms, atual {tempo_atual * 1000:.0f} ms '
+          f'({tempo_legado / max(tempo_atual, 1e-9):.1f}x mais rápido)')
+
+if __name__ == '__main__':
+    main()
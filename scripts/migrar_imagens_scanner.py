@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Move as imagens do scanner de placas de scanner_analyses.image_data para o blob store
+(UPLOAD_FOLDER/blobs ou BLOB_STORAGE_PATH), gerando as miniaturas do histórico.
+Pode ser interrompido e rodado de novo: só processa linhas ainda sem image_sha256.
+
+Uso: python scripts/migrar_imagens_scanner.py [--lote 100] [--manter-dados]
+"""
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.scanner_imagens import migrar_imagens_legadas
+
+def main():
+    parser = argparse.ArgumentParser(description='Migra imagens do scanner para o blob store')
+    parser.add_argument('--lote', type=int, default=100, help='Linhas por commit')
+    parser.add_argument('--manter-dados', action='store_true', help='Não apaga image_data depois de copiar')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print("🔄 Migrando imagens do scanner para o blob store...")
+        resultado = migrar_imagens_legadas(tamanho_lote=args.lote, manter_dados=args.manter_dados)
+        print(f"✅ {resultado['migradas']} imagem(ns) migrada(s), "
+              f"{resultado['bytes'] / (1024 * 1024):.1f} MB, "
+              f"{resultado['blobs_reaproveitados']} já existiam no blob store")
+
+if __name__ == '__main__':
+    main()
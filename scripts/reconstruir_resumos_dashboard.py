@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Reconstrói as tabelas de resumo mensal do dashboard (resumo_mensal_lotes e
+resumo_mensal_solicitacoes) a partir do histórico completo de lotes e solicitações.
+Seguro para rodar a qualquer momento: apaga e recalcula todos os resumos.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.dashboard_service import reconstruir_resumos_mensais
+
+def main():
+    app = create_app()
+    with app.app_context():
+        print("🔄 Reconstruindo resumos mensais do dashboard...")
+        resultado = reconstruir_resumos_mensais()
+        print(f"✅ {resultado['resumos_lotes']} resumo(s) de lotes e "
+              f"{resultado['resumos_solicitacoes']} resumo(s) de solicitações gravados")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Verificação das comissões do RH: compara o cálculo antigo (solicitações aprovadas
+carregadas e itens somados em Python, uma consulta por funcionário) com as somas em
+SQL de comissoes_service.
+
+Confere, no período escolhido, o resumo por funcionário (/api/rh/comissoes/resumo), o
+valor de cada solicitação (detalhe e exportação) e os totais do mês do dashboard.
+Mostra as divergências e termina com código 1 se houver alguma.
+
+Uso:
+    python scripts/verificar_comissoes.py
+    python scripts/verificar_comissoes.py --data-inicio 2024-01-01 --data-fim 2024-12-31
+    python scripts/verificar_comissoes.py --seed 5000     # popula solicitações antes
+
+ATENÇÃO: o --seed insere dados no banco configurado em DATABASE_URL.
+Nunca rode contra produção.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from app import create_app
+from app.models import db, Fornecedor, Solicitacao, ItemSolicitacao, Usuario
+from app.services.comissoes_service import (
+    periodo, somar_por_funcionario, somar_periodo, valores_por_solicitacao
+)
+
+def valor_solicitacao_legado(sol):
+    """Cópia fiel do laço por item usado antes em rh.py"""
+    valor_solicitacao = 0.0
+    if sol.itens:
+        for item in sol.itens:
+            valor_item = item.valor_calculado if item.valor_calculado else 0.0
+            if valor_item == 0 and item.peso_kg and item.preco_por_kg_snapshot:
+                valor_item = float(item.peso_kg) * float(item.preco_por_kg_snapshot)
+            valor_solicitacao += valor_item
+    return valor_solicitacao
+
+def aprovadas_legado(inicio, fim, funcionario_id=None):
+    query = Solicitacao.query.filter(Solicitacao.status == 'aprovada')
+    if funcionario_id is not None:
+        query = query.filter(Solicitacao.funcionario_id == funcionario_id)
+    if inicio:
+        query = query.filter(Solicitacao.data_envio >= inicio)
+    if fim:
+        query = query.filter(Solicitacao.data_envio < fim)
+    return query.all()
+
+def resumo_legado(inicio, fim):
+    resumo = {}
+    for usuario in Usuario.query.filter(Usuario.percentual_comissao > 0).all():
+        solicitacoes = aprovadas_legado(inicio, fim, usuario.id)
+        total_valor = sum(valor_solicitacao_legado(sol) for sol in solicitacoes)
+        resumo[usuario.id] = (
+            len(solicitacoes),
+            round(total_valor, 2),
+            round(total_valor * (usuario.percentual_comissao / 100), 2)
+        )
+    return resumo
+
+def resumo_agregado(inicio, fim):
+    totais = somar_por_funcionario(inicio, fim)
+    resumo = {}
+    for usuario in Usuario.query.filter(Usuario.percentual_comissao > 0).all():
+        total_solicitacoes, total_valor = totais.get(usuario.id, (0, 0.0))
+        resumo[usuario.id] = (
+            total_solicitacoes,
+            round(total_valor, 2),
+            round(total_valor * (usuario.percentual_comissao / 100), 2)
+        )
+    return resumo
+
+def dashboard_legado(inicio, fim):
+    total_valor, total_comissao = 0.0, 0.0
+    solicitacoes = aprovadas_legado(inicio, fim)
+    for sol in solicitacoes:
+        valor = valor_solicitacao_legado(sol)
+        total_valor += valor
+        if sol.funcionario and sol.funcionario.percentual_comissao:
+            total_comissao += valor * (sol.funcionario.percentual_comissao / 100)
+    return len(solicitacoes), round(total_valor, 2), round(total_comissao, 2)
+
+def dashboard_agregado(inicio, fim):
+    total, total_valor, total_comissao = somar_periodo(inicio, fim)
+    return total, round(total_valor, 2), round(total_comissao, 2)
+
+def popular_solicitacoes(total):
+    """Funcionários comissionados e solicitações com itens nos casos da regra de valor"""
+    funcionarios = []
+    for i in range(10):
+        email = f'bench.comissao{i}@example.com'
+        usuario = Usuario.query.filter_by(email=email).first()
+        if not usuario:
+            usuario = Usuario(nome=f'BENCH Comissão {i}', email=email, senha_hash='-', tipo='funcionario',
+                              percentual_comissao=random.choice([0.0, 1.5, 2.0, 3.25]))
+            db.session.add(usuario)
+        funcionarios.append(usuario)
+    fornecedores = []
+    for i in range(20):
+        fornecedor = Fornecedor(nome=f'BENCH Fornecedor Comissão {i}')
+        db.session.add(fornecedor)
+        fornecedores.append(fornecedor)
+    db.session.commit()
+
+    inicio = datetime.utcnow() - timedelta(days=365)
+    for _ in range(total):
+        sol = Solicitacao(
+            funcionario_id=random.choice(funcionarios).id,
+            fornecedor_id=random.choice(fornecedores).id,
+            status=random.choice(['aprovada', 'aprovada', 'pendente', 'rejeitada']),
+            data_envio=inicio + timedelta(minutes=random.randint(0, 365 * 24 * 60))
+        )
+        db.session.add(sol)
+    db.session.flush()
+
+    itens = []
+    for sol in Solicitacao.query.filter(Solicitacao.fornecedor_id.in_([f.id for f in fornecedores])):
+        # Nenhum item, valor calculado, valor zero com preço por kg e valor zero sem preço
+        for _ in range(random.choice([0, 1, 2, 3, 5])):
+            caso = random.random()
+            itens.append({
+                'solicitacao_id': sol.id,
+                'peso_kg': random.choice([0.0, random.uniform(0.1, 300)]),
+                'valor_calculado': random.uniform(1, 2000) if caso < 0.5 else 0.0,
+                'preco_por_kg_snapshot': random.uniform(0.5, 40) if caso < 0.85 else None,
+                'estrelas_final': 3,
+                'preco_customizado': False,
+                'data_registro': datetime.utcnow()
+            })
+    if itens:
+        db.session.execute(insert(ItemSolicitacao), itens)
+    db.session.commit()
+
+def medir(nome, funcao):
+    contador = {'consultas': 0}
+
+    def contar(*args, **kwargs):
+        contador['consultas'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        inicio = time.perf_counter()
+        resultado = funcao()
+        duracao = time.perf_counter() - inicio
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+    print(f'{nome:<22} consultas: {contador["consultas"]:>6}   tempo: {duracao * 1000:9.1f} ms')
+    return resultado
+
+def comparar(nome, legado, agregado):
+    divergencias = [
+        (chave, legado.get(chave), agregado.get(chave))
+        for chave in sorted(set(legado) | set(agregado))
+        if legado.get(chave) != agregado.get(chave)
+    ]
+    for chave, antes, depois in divergencias[:20]:
+        print(f'  {nome} {chave}: legado {antes} != agregado {depois}')
+    return len(divergencias)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--data-inicio', help='AAAA-MM-DD')
+    parser.add_argument('--data-fim', help='AAAA-MM-DD (inclusiva)')
+    parser.add_argument('--seed', type=int, default=0, help='quantidade de solicitações a inserir antes')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        if args.seed:
+            print(f'Populando {args.seed} solicitações...')
+            popular_solicitacoes(args.seed)
+
+        inicio, fim = periodo(args.data_inicio, args.data_fim)
+        divergencias = 0
+
+        legado = medir('resumo legado', lambda: resumo_legado(inicio, fim))
+        db.session.expunge_all()
+        agregado = medir('resumo agregado', lambda: resumo_agregado(inicio, fim))
+        divergencias += comparar('funcionário', legado, agregado)
+
+        legado = medir('solicitações legado', lambda: {
+            sol.id: round(valor_solicitacao_legado(sol), 2) for sol in aprovadas_legado(inicio, fim)
+        })
+        db.session.expunge_all()
+        agregado = medir('solicitações agregado', lambda: {
+            sol.id: round(float(sol.valor_total), 2) for sol in valores_por_solicitacao(inicio, fim)
+        })
+        divergencias += comparar('solicitação', legado, agregado)
+
+        mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        proximo_mes = (mes + timedelta(days=32)).replace(day=1)
+        legado = medir('dashboard legado', lambda: dashboard_legado(mes, proximo_mes))
+        db.session.expunge_all()
+        agregado = medir('dashboard agregado', lambda: dashboard_agregado(mes, proximo_mes))
+        divergencias += comparar('dashboard', {'mês': legado}, {'mês': agregado})
+
+        if divergencias:
+            print(f'ATENÇÃO: {divergencias} divergência(s)')
+            sys.exit(1)
+        print('Totais idênticos')
+
+if __name__ == '__main__':
+    main()
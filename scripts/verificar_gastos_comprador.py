@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Verificação de regressão dos gastos por comprador do dashboard financeiro
+(dashboard_service.gastos_por_comprador, usado em /api/dashboard/financeiro).
+
+Cria N compradores de teste, cada um com fornecedores e lotes aprovados no mês, na
+semana e fora do período, e mede quantas consultas gastos_por_comprador faz. Depois
+completa 10N compradores e mede de novo: o número de consultas tem que ser o mesmo
+(uma consulta agrupada, sem uma consulta por comprador ou fornecedor). Também confere
+valor do mês, valor da semana e quantidade de compras de cada comprador de teste com
+os valores gerados.
+
+Os registros de teste são apagados no fim (a menos que --manter).
+
+Uso:
+    python scripts/verificar_gastos_comprador.py
+    python scripts/verificar_gastos_comprador.py --compradores 50 --lotes 20
+
+ATENÇÃO: grava no banco configurado em DATABASE_URL. Nunca rode contra produção.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert
+from app import create_app
+from app.models import db, Fornecedor, Lote, TipoLote, Usuario
+from app.services.dashboard_service import gastos_por_comprador
+
+PREFIXO = 'BENCH Comprador'
+
+def periodo_atual():
+    """Início do mês e da semana, como em /api/dashboard/financeiro"""
+    hoje = datetime.now()
+    mes_atual = datetime(hoje.year, hoje.month, 1)
+    inicio_semana = (hoje - timedelta(days=hoje.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return mes_atual, inicio_semana
+
+def popular_compradores(inicio, fim, lotes_por_comprador, tipo_id, mes_atual, inicio_semana, esperados):
+    """Compradores inicio..fim-1, dois fornecedores cada e lotes em datas e status variados"""
+    agora = datetime.now()
+    lotes = []
+    for indice in range(inicio, fim):
+        comprador = Usuario(nome=f'{PREFIXO} {indice:05d}', email=f'bench.comprador{indice}@example.com',
+                            senha_hash='-', tipo='funcionario', ativo=True)
+        db.session.add(comprador)
+        fornecedores = [Fornecedor(nome=f'{PREFIXO} {indice:05d} F{f}', comprador_responsavel=comprador) for f in range(2)]
+        db.session.add_all(fornecedores)
+        db.session.flush()
+
+        valor_mes = valor_semana = 0.0
+        qtd_compras = 0
+        for _ in range(lotes_por_comprador):
+            data_criacao = agora - timedelta(days=random.randint(0, 60), minutes=random.randint(0, 600))
+            status = random.choice(['aprovado', 'aprovado', 'aberto', 'rejeitado'])
+            valor = round(random.uniform(10, 5000), 2)
+            lotes.append({
+                'numero_lote': f'BENCH-GC-{uuid.uuid4().hex[:12].upper()}',
+                'fornecedor_id': random.choice(fornecedores).id,
+                'tipo_lote_id': tipo_id,
+                'status': status,
+                'valor_total': valor,
+                'peso_total_kg': 1.0,
+                'data_criacao': data_criacao,
+                'reservado': False,
+                'bloqueado': False,
+            })
+            if status == 'aprovado':
+                if data_criacao >= mes_atual:
+                    valor_mes += valor
+                    qtd_compras += 1
+                if data_criacao >= inicio_semana:
+                    valor_semana += valor
+        esperados[comprador.nome] = (round(valor_mes, 2), round(valor_semana, 2), qtd_compras)
+    if lotes:
+        db.session.execute(insert(Lote), lotes)
+    db.session.commit()
+
+def limpar():
+    fornecedor_ids = [f.id for f in Fornecedor.query.filter(Fornecedor.nome.like(f'{PREFIXO} %'))]
+    if fornecedor_ids:
+        Lote.query.filter(Lote.fornecedor_id.in_(fornecedor_ids)).delete(synchronize_session=False)
+        Fornecedor.query.filter(Fornecedor.id.in_(fornecedor_ids)).delete(synchronize_session=False)
+    Usuario.query.filter(Usuario.nome.like(f'{PREFIXO} %')).delete(synchronize_session=False)
+    db.session.commit()
+
+def medir(nome, mes_atual, inicio_semana):
+    contador = {'consultas': 0}
+
+    def contar(*args, **kwargs):
+        contador['consultas'] += 1
+
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    try:
+        inicio = time.perf_counter()
+        gastos = gastos_por_comprador(mes_atual, inicio_semana)
+        duracao = time.perf_counter() - inicio
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', contar)
+
+    print(f'{nome:<22} compradores: {len(gastos):>6}   consultas: {contador["consultas"]:>3}   tempo: {duracao * 1000:9.1f} ms')
+    return gastos, contador['consultas']
+
+def comparar(gastos, esperados):
+    obtidos = {
+        g['nome']: (round(g['valor_mes'], 2), round(g['valor_semana'], 2), g['qtd_compras'])
+        for g in gastos if g['nome'] in esperados
+    }
+
+    def confere(esperado, obtido):
+        # Somas em ordens diferentes podem diferir no último centavo do arredondamento
+        return obtido is not None and obtido[2] == esperado[2] and all(
+            abs(a - b) <= 0.011 for a, b in zip(esperado[:2], obtido[:2])
+        )
+
+    divergencias = [
+        (nome, esperado, obtidos.get(nome))
+        for nome, esperado in sorted(esperados.items())
+        if not confere(esperado, obtidos.get(nome))
+    ]
+    for nome, esperado, obtido in divergencias[:20]:
+        print(f'  {nome}: esperado {esperado} != obtido {obtido}')
+    return len(divergencias)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--compradores', type=int, default=20, help='N: compradores na primeira medição (a segunda usa 10N)')
+    parser.add_argument('--lotes', type=int, default=10, help='lotes por comprador')
+    parser.add_argument('--manter', action='store_true', help='não apaga os registros de teste no fim')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        limpar()
+        tipo = TipoLote.query.first()
+        if not tipo:
+            tipo = TipoLote(nome='BENCH Tipo Comprador', codigo='BENCHGC')
+            db.session.add(tipo)
+            db.session.commit()
+        tipo_id = tipo.id
+        mes_atual, inicio_semana = periodo_atual()
+        esperados = {}
+
+        try:
+            popular_compradores(0, args.compradores, args.lotes, tipo_id, mes_atual, inicio_semana, esperados)
+            gastos, consultas_n = medir(f'{args.compradores} compradores', mes_atual, inicio_semana)
+            problemas = comparar(gastos, esperados)
+
+            popular_compradores(args.compradores, 10 * args.compradores, args.lotes, tipo_id, mes_atual, inicio_semana, esperados)
+            gastos, consultas_10n = medir(f'{10 * args.compradores} compradores', mes_atual, inicio_semana)
+            problemas += comparar(gastos, esperados)
+        finally:
+            if not args.manter:
+                limpar()
+
+    if consultas_10n != consultas_n:
+        print(f'  consultas variam com o número de compradores: {consultas_n} -> {consultas_10n}')
+        problemas += 1
+
+    if problemas:
+        print(f'ATENÇÃO: {problemas} problema(s)')
+        sys.exit(1)
+    print(f'{consultas_n} consulta(s) com {args.compradores} e com {10 * args.compradores} compradores; valores conferem')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Verificação da numeração de lotes em acessos simultâneos (app/services/numeracao.py).
+
+Várias threads, cada uma com a própria sessão, criam lotes ao mesmo tempo com
+gerar_numero_lote, como conferências e sublotes fazem, e cada lote é gravado com
+commit. No fim, confere que nenhum número se repetiu e que a sequência não tem
+buracos. Também cria alguns lotes com rollback no meio, que devolvem o número.
+
+Os lotes usam um ano fora de uso (--ano, padrão 1999) para não avançar a numeração
+real, e são apagados no fim junto com o contador (a menos que --manter).
+
+Uso:
+    python scripts/verificar_numeracao.py
+    python scripts/verificar_numeracao.py --threads 16 --lotes 50
+
+ATENÇÃO: grava no banco configurado em DATABASE_URL. Nunca rode contra produção.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy.exc import OperationalError
+from app import create_app
+from app.models import db, ContadorNumeracao, Fornecedor, Lote, TipoLote
+from app.services.numeracao import gerar_numero_lote
+
+def preparar(ano):
+    fornecedor = Fornecedor.query.filter_by(nome='BENCH Fornecedor Numeração').first()
+    if not fornecedor:
+        fornecedor = Fornecedor(nome='BENCH Fornecedor Numeração')
+        db.session.add(fornecedor)
+    tipo = TipoLote.query.first()
+    if not tipo:
+        tipo = TipoLote(nome='BENCH Tipo Numeração', codigo='BENCHNUM')
+        db.session.add(tipo)
+    db.session.commit()
+    limpar(ano)
+    return fornecedor.id, tipo.id
+
+def limpar(ano):
+    Lote.query.filter(Lote.numero_lote.like(f'{ano}-%')).delete(synchronize_session=False)
+    ContadorNumeracao.query.filter_by(chave=f'lote-{ano}').delete(synchronize_session=False)
+    db.session.commit()
+
+def criar_lotes(app, ano, fornecedor_id, tipo_id, quantidade, numeros, erros):
+    momento = datetime(ano, 6, 1)
+    with app.app_context():
+        for indice in range(quantidade):
+            for tentativa in range(20):
+                try:
+                    numero_lote = gerar_numero_lote(momento)
+                    db.session.add(Lote(numero_lote=numero_lote, fornecedor_id=fornecedor_id, tipo_lote_id=tipo_id))
+                    if indice % 10 == 9:
+                        # Transação desfeita: o número volta para a próxima
+                        db.session.rollback()
+                        continue
+                    db.session.commit()
+                    numeros.append(numero_lote)
+                    break
+                except OperationalError:
+                    # SQLite: banco travado por outra thread além do timeout; tenta de novo
+                    db.session.rollback()
+                    time.sleep(0.05 * (tentativa + 1))
+                except Exception as e:
+                    db.session.rollback()
+                    erros.append(repr(e))
+                    break
+        db.session.remove()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--lotes', type=int, default=25, help='lotes por thread')
+    parser.add_argument('--ano', type=int, default=1999, help='ano dos números de teste')
+    parser.add_argument('--manter', action='store_true', help='não apaga os lotes de teste no fim')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        fornecedor_id, tipo_id = preparar(args.ano)
+
+    numeros, erros = [], []
+    threads = [
+        threading.Thread(target=criar_lotes, args=(app, args.ano, fornecedor_id, tipo_id, args.lotes, numeros, erros))
+        for _ in range(args.threads)
+    ]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duracao = time.perf_counter() - inicio
+
+    with app.app_context():
+        gravados = [numero for (numero,) in db.session.query(Lote.numero_lote).filter(Lote.numero_lote.like(f'{args.ano}-%'))]
+        if not args.manter:
+            limpar(args.ano)
+
+    repetidos = [numero for numero, vezes in Counter(numeros).items() if vezes > 1]
+    esperados = {f'{args.ano}-{numero:05d}' for numero in range(1, len(numeros) + 1)}
+    print(f'{len(numeros)} lotes criados por {args.threads} threads em {duracao:.2f} s')
+    for erro in erros[:10]:
+        print(f'  erro: {erro}')
+    problemas = len(erros)
+    if repetidos:
+        print(f'  números repetidos: {repetidos[:20]}')
+        problemas += len(repetidos)
+    if set(gravados) != esperados:
+        faltando = sorted(esperados - set(gravados))
+        print(f'  sequência com buracos ou números fora dela: faltando {faltando[:20]}')
+        problemas += 1
+
+    if problemas:
+        print(f'ATENÇÃO: {problemas} problema(s)')
+        sys.exit(1)
+    print(f'Números únicos e contínuos de {args.ano}-00001 a {args.ano}-{len(numeros):05d}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Verificação das projeções de GET /api/wms/lotes (parâmetro fields).
+
+Cria alguns lotes de teste e chama a rota com projeções só de colunas, só de campos
+derivados, só de contadores e mistas, com e sem paginação (limite/cursor). Cada
+resposta tem que vir com 200, exatamente os campos pedidos e os mesmos valores da
+listagem completa (sem fields).
+
+Os lotes de teste são apagados no fim (a menos que --manter).
+
+Uso:
+    python scripts/verificar_projecoes_wms.py
+
+ATENÇÃO: grava no banco configurado em DATABASE_URL. Nunca rode contra produção.
+"""
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from flask_jwt_extended import create_access_token
+from app import create_app
+from app.auth import get_user_jwt_claims
+from app.models import db, Fornecedor, Lote, TipoLote, Usuario
+
+PREFIXO = 'BENCH-WMS-'
+
+PROJECOES = [
+    ['id', 'numero_lote'],
+    ['fornecedor_nome', 'tipo_lote'],
+    ['id', 'status', 'tipo_lote_nome', 'data_criacao'],
+    ['id', 'itens_count'],
+    ['numero_lote', 'sublotes_count', 'itens_count', 'fornecedor_nome'],
+]
+
+def preparar(quantidade):
+    fornecedor = Fornecedor.query.filter_by(nome='BENCH Fornecedor WMS').first()
+    if not fornecedor:
+        fornecedor = Fornecedor(nome='BENCH Fornecedor WMS')
+        db.session.add(fornecedor)
+    tipo = TipoLote.query.first()
+    if not tipo:
+        tipo = TipoLote(nome='BENCH Tipo WMS', codigo='BENCHWMS')
+        db.session.add(tipo)
+    db.session.flush()
+    pai = Lote(numero_lote=f'{PREFIXO}PAI', fornecedor_id=fornecedor.id, tipo_lote_id=tipo.id, status='bench_wms')
+    db.session.add(pai)
+    db.session.flush()
+    for indice in range(quantidade):
+        db.session.add(Lote(
+            numero_lote=f'{PREFIXO}{indice:04d}', fornecedor_id=fornecedor.id, tipo_lote_id=tipo.id,
+            status='bench_wms', lote_pai_id=pai.id if indice % 2 else None
+        ))
+    db.session.commit()
+
+def limpar():
+    Lote.query.filter(Lote.numero_lote.like(f'{PREFIXO}%'), Lote.lote_pai_id.isnot(None)).delete(synchronize_session=False)
+    Lote.query.filter(Lote.numero_lote.like(f'{PREFIXO}%')).delete(synchronize_session=False)
+    db.session.commit()
+
+def listar(cliente, cabecalhos, parametros):
+    resposta = cliente.get('/api/wms/lotes', query_string={'status': 'bench_wms', **parametros}, headers=cabecalhos)
+    if resposta.status_code != 200:
+        return None, f'{parametros}: HTTP {resposta.status_code} {resposta.get_json()}'
+    if 'limite' not in parametros:
+        return resposta.get_json(), None
+
+    lotes = []
+    pagina = resposta.get_json()
+    while True:
+        lotes.extend(pagina['lotes'])
+        if not pagina['tem_mais']:
+            return lotes, None
+        resposta = cliente.get('/api/wms/lotes', query_string={
+            'status': 'bench_wms', **parametros, 'cursor': pagina['proximo_cursor']
+        }, headers=cabecalhos)
+        if resposta.status_code != 200:
+            return None, f'{parametros} (cursor): HTTP {resposta.status_code} {resposta.get_json()}'
+        pagina = resposta.get_json()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lotes', type=int, default=12)
+    parser.add_argument('--manter', action='store_true', help='não apaga os lotes de teste no fim')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        limpar()
+        preparar(args.lotes)
+        admin = Usuario.query.filter_by(tipo='admin', ativo=True).first()
+        token = create_access_token(identity=str(admin.id), additional_claims=get_user_jwt_claims(admin))
+        cabecalhos = {'Authorization': f'Bearer {token}'}
+        cliente = app.test_client()
+
+        problemas = []
+        try:
+            completos, erro = listar(cliente, cabecalhos, {})
+            if erro:
+                problemas.append(erro)
+            por_id = {lote['id']: lote for lote in completos or []}
+
+            for campos in PROJECOES:
+                for paginado in (False, True):
+                    parametros = {'fields': ','.join(campos)}
+                    if paginado:
+                        parametros['limite'] = 5
+                    lotes, erro = listar(cliente, cabecalhos, parametros)
+                    if erro:
+                        problemas.append(erro)
+                        continue
+                    if len(lotes) != len(por_id):
+                        problemas.append(f'{parametros}: {len(lotes)} lotes, esperado {len(por_id)}')
+                    for indice, lote in enumerate(lotes):
+                        if set(lote) != set(campos):
+                            problemas.append(f'{parametros}: campos {sorted(lote)}')
+                            break
+                        # Sem 'id' na projeção, compara pela ordem da listagem completa
+                        completo = por_id.get(lote['id']) if 'id' in lote else (completos or [{}] * len(lotes))[indice]
+                        diferentes = [campo for campo in campos if completo.get(campo) != lote[campo]]
+                        if diferentes:
+                            problemas.append(f'{parametros}: {diferentes} diferente(s) da listagem completa')
+                            break
+                    print(f'{str(parametros):<75} {len(lotes):>4} lotes')
+        finally:
+            if not args.manter:
+                limpar()
+
+    for problema in problemas[:20]:
+        print(f'  {problema}')
+    if problemas:
+        print(f'ATENÇÃO: {len(problemas)} problema(s)')
+        sys.exit(1)
+    print('Projeções conferem com a listagem completa')
+
+if __name__ == '__main__':
+    main()